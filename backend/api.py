@@ -3,14 +3,22 @@ import tempfile
 import json
 import datetime
 import time
-from fastapi import APIRouter, FastAPI, File, Form, Response, UploadFile, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, FastAPI, File, Form, Header, Response, UploadFile, HTTPException, Query, BackgroundTasks
 from platformdirs import user_downloads_path
 import urllib
 from rdfFile import crear_rdf2 
 from entities import Atestado, AnalisisAtestado, ListaAnalisis
 import decisionTree
+import decision_plan
+import ontology_snapshot
+import llm_cache
+import llm_client
+import llm_telemetry
+import progress_events
+import question_registry
 from atestadoToText import generar_descripcion
 from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from documents import leer_pdf, leer_docx, leer_pdf_memoria, leer_docx_memoria
 import os
 import requests
@@ -23,6 +31,7 @@ from fastapi.responses import FileResponse
 from neo4j_manager import neo4j_client  # Importamos el manager recién creado
 import uuid
 import io
+import threading
 
 from dotenv import load_dotenv
 
@@ -38,15 +47,14 @@ class Neo4jImportRequest(BaseModel):
 # Importar las clases del script de ontología (ajustar la ruta según tu estructura)
 #from ontology_bfs_traversal_v9 import OntologyTraversal
 from ontology_traversal import OntologyTraversal
+from ontology_registry import OntologyRegistry, UnknownOntologyVersion
 
 # Modelos Pydantic para validación de entrada
 class OntologyTraversalRequest(BaseModel):
     class_name: str
     max_depth: Optional[int] = None
     include_metadata: bool = True
-
-# Variable global para mantener la ontología cargada (opcional - para mejor performance)
-global_traversal = None
+    version: Optional[str] = None  # Versión de la ontología (None = activa)
 
 ontology_file_path = f"{os.getenv('ONTOLOGY_PATH')}/{os.getenv('ONTOLOGY')}"  # Configurar con la ruta de tu ontología
 
@@ -65,27 +73,68 @@ app.add_middleware(
 
 CLASSES_TO_ANALYSE = os.getenv("CLASSES_TO_ANALYSE")
 
-def get_ontology_traversal():
-    """Obtiene o inicializa el traversal de ontología"""
-    global global_traversal, ontology_file_path
-    
-    if global_traversal is None:
-        global_traversal = OntologyTraversal()
-        
-        # Opción 1: Cargar ontología desde archivo
-        if ontology_file_path and os.path.exists(ontology_file_path):
-            try:
-                global_traversal.load_ontology(ontology_file_path)
-                print(f"✅ Ontología cargada desde: {ontology_file_path}")
-            except Exception as e:
-                print(f"⚠️ Error cargando ontología, usando ejemplo: {e}")
-                global_traversal.create_sample_ontology()
-        else:
-            # Opción 2: Usar ontología de ejemplo
-            print(f"📝 Ontología no cargada: {ontology_file_path}")
-            global_traversal.create_sample_ontology()
+def precompilar_planes_decision(traversal: OntologyTraversal):
+    """Compila los planes de decisión de CLASSES_TO_ANALYSE para la ontología recién cargada"""
+    if traversal.ontology and CLASSES_TO_ANALYSE:
+        decision_plan.precompilar_planes(traversal, json.loads(CLASSES_TO_ANALYSE))
+
+def preparar_ontologia_cargada(traversal: OntologyTraversal):
+    """Precalcula lo que se sirve por petición: planes de decisión (y con ellos el registro de
+    preguntas de la versión) y catálogo de clases (/ontologia/clases/)"""
+    precompilar_planes_decision(traversal)
+    if traversal.ontology:
+        try:
+            traversal.class_catalog()
+        except Exception as e:
+            print(f"✗ Error construyendo el catálogo de clases: {e}")
+
+# Versiones cargadas de la ontología: cada versión se precalienta antes de activarse
+ontology_registry = OntologyRegistry(warm_up=preparar_ontologia_cargada)
+_inicializacion_lock = threading.Lock()
+
+def _cargar_ontologia_inicial() -> OntologyTraversal:
+    """Carga y activa la ontología configurada (o la de ejemplo si no está disponible)"""
+    # Opción 1: Cargar ontología desde archivo
+    if ontology_file_path and os.path.exists(ontology_file_path):
+        try:
+            traversal = ontology_registry.load(ontology_file_path)["traversal"]
+            print(f"✅ Ontología cargada desde: {ontology_file_path}")
+            return traversal
+        except Exception as e:
+            print(f"⚠️ Error cargando ontología, usando ejemplo: {e}")
+    else:
+        # Opción 2: Usar ontología de ejemplo
+        print(f"📝 Ontología no cargada: {ontology_file_path}")
+    traversal = OntologyTraversal()
+    traversal.create_sample_ontology()
+    ontology_registry.register(traversal, "sample", "sample")
+    ontology_registry.activate("sample")
+    return traversal
+
+def get_ontology_traversal(version: Optional[str] = None):
+    """Obtiene el traversal de la versión indicada o de la versión activa (inicializándola si hace falta)
+
+    Parameters
+    ----------
+    version: str, optional
+        Versión de la ontología (hash del contenido, ver /ontologia/versiones/). None = versión activa
+
+    Raises
+    ------
+    HTTPException
+        404: Si la versión indicada no está cargada
+    """
+    if version:
+        try:
+            return ontology_registry.get(version)
+        except UnknownOntologyVersion:
+            raise HTTPException(status_code=404, detail=f"Versión de ontología '{version}' no cargada")
     
-    return global_traversal
+    traversal = ontology_registry.get()
+    if traversal is None:
+        with _inicializacion_lock:
+            traversal = ontology_registry.get() or _cargar_ontologia_inicial()
+    return traversal
 
 @app.post("/ontologia/recorrer_bfs/")
 async def recorrer_ontologia_bfs(request: OntologyTraversalRequest):
@@ -100,11 +149,13 @@ async def recorrer_ontologia_bfs(request: OntologyTraversalRequest):
         - class_name: Nombre de la clase desde la cual iniciar el recorrido
         - max_depth: Profundidad máxima del recorrido (opcional)
         - include_metadata: Incluir metadatos en la respuesta
+        - version: Versión de la ontología (opcional, por defecto la activa)
     
     Returns
     -------
-    JSONResponse
-        JSON con la estructura de clases recorrida, equivalencias y metadatos
+    StreamingResponse
+        JSON compacto con la estructura de clases recorrida, equivalencias y metadatos,
+        generado clase a clase
     
     Raises
     ------
@@ -114,7 +165,7 @@ async def recorrer_ontologia_bfs(request: OntologyTraversalRequest):
     """
     try:
         # Obtener el traversal de ontología
-        traversal = get_ontology_traversal()
+        traversal = get_ontology_traversal(request.version)
         
         # Verificar que la ontología esté cargada
         if not traversal.ontology:
@@ -135,49 +186,36 @@ async def recorrer_ontologia_bfs(request: OntologyTraversalRequest):
         
         print(f"🔍 Iniciando recorrido BFS desde: {request.class_name}")
         
-        # Crear archivo temporal para la exportación JSON
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp_file:
-            temp_json_path = tmp_file.name
+        # Exportación en memoria: el JSON compacto se envía clase a clase, sin fichero temporal
+        extra_metadata = {
+            "api_endpoint": "/ontologia/recorrer_bfs/",
+            "request_parameters": {
+                "class_name": request.class_name,
+                "max_depth": request.max_depth,
+                "include_metadata": request.include_metadata,
+                "version": request.version
+            }
+        }
+        total_classes, json_chunks = traversal.export_classes_to_json_stream(
+            start_class=request.class_name,
+            max_depth=request.max_depth,
+            include_metadata=request.include_metadata,
+            traversal_method="dfs",
+            extra_metadata=extra_metadata
+        )
         
-        try:
-            # Exportar a JSON usando el método del traversal
-            json_file_path = traversal.export_classes_to_json(
-                start_class=request.class_name,
-                output_file=temp_json_path,
-                max_depth=request.max_depth,
-                include_metadata=request.include_metadata,
-                traversal_method="dfs"
-            )
-            
-            # Leer el JSON generado
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-            
-            # Añadir información adicional sobre el recorrido
-            if request.include_metadata and "metadata" in json_data:
-                json_data["metadata"]["api_endpoint"] = "/ontologia/recorrer_bfs/"
-                json_data["metadata"]["request_parameters"] = {
-                    "class_name": request.class_name,
-                    "max_depth": request.max_depth,
-                    "include_metadata": request.include_metadata
-                }
-            
-            print(f"✅ Recorrido completado. Clases procesadas: {len(json_data.get('classes', {}))}")
-            
-            return JSONResponse(
-                content=json_data,
-                status_code=200,
-                headers={
-                    "Content-Type": "application/json; charset=utf-8",
-                    "X-Total-Classes": str(len(json_data.get('classes', {}))),
-                    "X-Start-Class": request.class_name
-                }
-            )
-            
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_json_path):
-                os.remove(temp_json_path)
+        print(f"✅ Recorrido completado. Clases a enviar: {total_classes}")
+        
+        return StreamingResponse(
+            json_chunks,
+            status_code=200,
+            media_type="application/json",
+            headers={
+                "Content-Type": "application/json; charset=utf-8",
+                "X-Total-Classes": str(total_classes),
+                "X-Start-Class": request.class_name
+            }
+        )
                 
     except HTTPException:
         # Re-lanzar HTTPExceptions sin modificar
@@ -193,7 +231,8 @@ async def recorrer_ontologia_bfs(request: OntologyTraversalRequest):
 async def recorrer_ontologia_bfs_simple(
     class_name: str = Form(...),
     max_depth: Optional[int] = Form(None),
-    include_metadata: bool = Form(True)
+    include_metadata: bool = Form(True),
+    version: Optional[str] = Form(None)
 ):
     """Versión simplificada del endpoint BFS usando Form parameters.
     
@@ -208,34 +247,55 @@ async def recorrer_ontologia_bfs_simple(
         Profundidad máxima del recorrido
     include_metadata: bool
         Si incluir metadatos en la respuesta
+    version: str, optional
+        Versión de la ontología (por defecto la activa)
     
     Returns
     -------
-    JSONResponse
+    StreamingResponse
         JSON con la estructura de clases recorrida
     """
     request_obj = OntologyTraversalRequest(
         class_name=class_name,
         max_depth=max_depth,
-        include_metadata=include_metadata
+        include_metadata=include_metadata,
+        version=version
     )
     
     return await recorrer_ontologia_bfs(request_obj)
 
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Comprueba si la cabecera If-None-Match incluye el ETag (comparación débil, admite '*')"""
+    if not if_none_match:
+        return False
+    etiquetas = [etiqueta.strip() for etiqueta in if_none_match.split(",")]
+    return "*" in etiquetas or etag in [e[2:] if e.startswith("W/") else e for e in etiquetas]
+
 @app.get("/ontologia/clases/")
-async def listar_clases_ontologia():
+async def listar_clases_ontologia(if_none_match: Optional[str] = Header(None), version: Optional[str] = Query(None)):
     """Lista todas las clases disponibles en la ontología.
     
     Endpoint de utilidad para descubrir qué clases están disponibles
     para usar como punto de partida en el recorrido BFS.
+
+    El catálogo se construye una vez por ontología cargada y se sirve ya serializado,
+    con ETag: si la cabecera If-None-Match coincide se responde 304 sin cuerpo.
+    
+    Parameters
+    ----------
+    if_none_match: str, optional
+        Cabecera If-None-Match con el ETag de la respuesta anterior
+    version: str, optional
+        Versión de la ontología (por defecto la activa)
     
     Returns
     -------
-    dict
+    Response
         Lista de clases disponibles con sus nombres y metadatos básicos
+        (o 304 Not Modified)
     """
     try:
-        traversal = get_ontology_traversal()
+        traversal = get_ontology_traversal(version)
         
         if not traversal.ontology:
             raise HTTPException(
@@ -243,39 +303,15 @@ async def listar_clases_ontologia():
                 detail="No hay ontología cargada en el sistema"
             )
         
-        # Obtener todas las clases
-        classes_info = []
-        for cls in traversal.ontology.classes():
-            # Extraer comentarios y seeAlso (pueden devolver listas)
-            comment_values = getattr(cls, "comment", [])
-            see_also_values = getattr(cls, "seeAlso", [])
-
-            #if cls.name != "Thing":  # Excluir la clase Thing de OWL
-            class_info = {
-                "name": cls.name,
-                "iri": str(cls.iri) if hasattr(cls, 'iri') else None,
-                "subclasses_count": len(list(cls.subclasses())),
-                "instances_count": len(list(cls.instances())),
-                "has_equivalents": len(list(cls.equivalent_to)) > 0,
-                "comments": [str(c) for c in comment_values] if comment_values else [],
-                "seeAlso": [str(s) for s in see_also_values] if see_also_values else []
-            }
-            classes_info.append(class_info)
-            # print("Naaaaaaaame: ", cls.name)
-            # for prop in cls.get_properties(cls):
-            #     print("Property: ", prop)
-            #     print("Value: ", prop[cls])
-            
-        
-        # Ordenar por nombre
-        classes_info.sort(key=lambda x: x['name'])
+        body, etag = traversal.class_catalog()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_coincide(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
         
-        return {
-            "total_classes": len(classes_info),
-            "classes": classes_info,
-            "ontology_iri": str(traversal.ontology.base_iri) if traversal.ontology else None
-        }
+        return Response(content=body, media_type="application/json", headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -283,24 +319,27 @@ async def listar_clases_ontologia():
         )
 
 @app.post("/ontologia/cargar/")
-async def cargar_ontologia(file: UploadFile = File(...)):
+async def cargar_ontologia(file: UploadFile = File(...), activar: bool = Form(True)):
     """Carga una nueva ontología desde un archivo OWL/RDF.
     
-    Permite cargar dinámicamente una ontología desde un archivo subido,
-    reemplazando la ontología actual en memoria.
+    Permite cargar dinámicamente una ontología desde un archivo subido como una
+    nueva versión del registro. La versión se carga, indexa y precalienta en un hilo
+    aparte (las peticiones siguen usando la versión activa mientras tanto) y solo
+    después se activa. Los trabajos en curso siguen con la versión con la que empezaron.
     
     Parameters
     ----------
     file: UploadFile
         Archivo OWL/RDF con la ontología a cargar
+    activar: bool
+        Si es False la versión queda cargada sin activarse (para compararla con
+        el parámetro 'version' de los demás endpoints)
     
     Returns
     -------
     dict
-        Información sobre la ontología cargada
+        Información sobre la ontología cargada y su versión
     """
-    global global_traversal
-    
     try:
         # Verificar extensión del archivo
         if not file.filename.lower().endswith(('.owl', '.rdf', '.ttl')):
@@ -316,12 +355,12 @@ async def cargar_ontologia(file: UploadFile = File(...)):
             temp_path = tmp_file.name
         
         try:
-            # Crear nuevo traversal y cargar ontología
-            new_traversal = OntologyTraversal()
-            new_traversal.load_ontology(f"file://{temp_path}")
-            
-            # Si la carga es exitosa, reemplazar el traversal global
-            global_traversal = new_traversal
+            # Cargar y precalentar la nueva versión fuera del bucle de eventos; el cambio de
+            # versión activa solo se produce cuando está completa. Sin instantánea: el fichero
+            # temporal se borra al terminar y su instantánea quedaría huérfana en el directorio
+            entrada = await run_in_threadpool(ontology_registry.load, f"file://{temp_path}", activar, file.filename,
+                                              snapshot=False)
+            new_traversal = entrada["traversal"]
             
             # Obtener estadísticas de la nueva ontología
             classes_count = len(list(new_traversal.ontology.classes()))
@@ -331,6 +370,8 @@ async def cargar_ontologia(file: UploadFile = File(...)):
             return {
                 "status": "success",
                 "filename": file.filename,
+                "version": entrada["version"],
+                "active": ontology_registry.active_version == entrada["version"],
                 "ontology_iri": str(new_traversal.ontology.base_iri),
                 "statistics": {
                     "classes": classes_count,
@@ -351,16 +392,62 @@ async def cargar_ontologia(file: UploadFile = File(...)):
             detail=f"Error cargando ontología: {str(e)}"
         )
 
+@app.get("/ontologia/versiones/")
+async def listar_versiones_ontologia():
+    """Lista las versiones de la ontología cargadas en el registro.
+
+    Returns
+    -------
+    dict
+        Versión activa y, por versión, origen, fecha y tiempo de carga (incluido el precalentamiento)
+    """
+    get_ontology_traversal()
+    return {
+        "active": ontology_registry.active_version,
+        "versions": ontology_registry.versions()
+    }
+
+@app.post("/ontologia/versiones/{version}/activar/")
+async def activar_version_ontologia(version: str):
+    """Activa una versión ya cargada de la ontología (cambio atómico, sin recarga).
+
+    Parameters
+    ----------
+    version: str
+        Versión a activar (ver /ontologia/versiones/)
+
+    Returns
+    -------
+    dict
+        Versión activa tras el cambio
+
+    Raises
+    ------
+    HTTPException
+        404: Si la versión no está cargada
+    """
+    try:
+        ontology_registry.activate(version)
+    except UnknownOntologyVersion:
+        raise HTTPException(status_code=404, detail=f"Versión de ontología '{version}' no cargada")
+    return {"status": "success", "active": version}
+
 # Diccionario para almacenar el estado de las tareas largas
 # En una app real, usarías Redis o una DB
 tareas_en_curso = {}
     
 # Ruta de api para procesar atestados (tu código original)
 @app.post("/procesarG/")
-async def endpoint_procesa_g(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def endpoint_procesa_g(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                             version: Optional[str] = Query(None), sin_cache: bool = Query(False)):
+    # sin_cache=true vuelve a preguntar al LLM aunque haya respuestas guardadas (y las actualiza)
+    # La tarea queda fijada a la versión de la ontología vigente al recibir la petición
+    # (o a la indicada), aunque entretanto se active otra
+    traversal = get_ontology_traversal(version)
+    version = ontology_registry.version_of(traversal)
+
     # 1. Generamos un ID único para esta tarea
     task_id = str(uuid.uuid4())
-    tareas_en_curso[task_id] = {"status": "procesando", "result": None}
 
     try:
         # 2. IMPORTANTE: Leemos el contenido del archivo ANTES de que termine el request
@@ -385,30 +472,46 @@ async def endpoint_procesa_g(background_tasks: BackgroundTasks, file: UploadFile
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {str(e)}")
 
+    # La tarea y su canal de eventos de progreso (/procesarG/{task_id}/eventos) solo se crean
+    # si el archivo se ha leído: con un 400 no queda una tarea "procesando" ni un canal abierto
+    tareas_en_curso[task_id] = {"status": "procesando", "result": None, "version": version}
+    progress_events.crear_canal(task_id)
+
     # 3. Lanzamos la tarea pesada pasando los datos ya leídos
-    background_tasks.add_task(tarea_pesada_wrapper, task_id, contenido_archivo, nombre)
+    background_tasks.add_task(tarea_pesada_wrapper, task_id, contenido_archivo, nombre, traversal, not sin_cache)
 
     # 4. Respondemos de inmediato al frontend
-    return {"task_id": task_id, "message": "Procesamiento de atestado iniciado"}
+    return {"task_id": task_id, "message": "Procesamiento de atestado iniciado", "version": version,
+            "eventos": f"/procesarG/{task_id}/eventos"}
 
-def tarea_pesada_wrapper(task_id: str, texto: str, nombre: str):
+def tarea_pesada_wrapper(task_id: str, texto: str, nombre: str, traversal: Optional[OntologyTraversal] = None,
+                         usar_cache: bool = True):
     """
     Wrapper que envuelve la lógica real de procesar_atestadoG.
+
+    'traversal' es la versión de la ontología fijada al encolar la tarea (None = la activa).
+    'usar_cache' False no lee respuestas de la caché del LLM.
+    El progreso se publica en el canal de la tarea (ver progress_events), que se cierra al terminar.
     """
+    canal = progress_events.canal(task_id)
+    progreso = canal.publicar if canal else None
+    atestado_llm = None
     try:
         # Aquí llamarías a tu función original. 
         # Si tu función original esperaba un UploadFile, 
         # puede que debas refactorizarla para aceptar bytes o guardarlo en un temp file.
 
         # Recuperar el listado de clases en profundidad
-        traversal = get_ontology_traversal()
+        traversal = traversal or get_ontology_traversal()
         if not traversal.ontology:
             raise HTTPException(
                 status_code=500,
                 detail="No hay ontología cargada en el sistema"
             )
  
-        resultado_la = decisionTree.analizarAtestado(decisionTree.AtestadoLLM(texto), nombre, json.loads(CLASSES_TO_ANALYSE), traversal)
+        atestado_llm = decisionTree.AtestadoLLM(texto, usar_cache=usar_cache)
+        resultado_la = decisionTree.analizarAtestado(atestado_llm, nombre, json.loads(CLASSES_TO_ANALYSE), traversal,
+                                                     progreso=progreso)
         
         import time
         time.sleep(5) # Simulación de procesamiento de LLM/Grafos
@@ -420,11 +523,58 @@ def tarea_pesada_wrapper(task_id: str, texto: str, nombre: str):
         }
 
         # Actualizamos el estado al finalizar
-        tareas_en_curso[task_id] = {"status": "completado", "result": resultado}
+        tareas_en_curso[task_id] = {"status": "completado", "result": resultado,
+                                    "version": tareas_en_curso[task_id].get("version")}
+        if canal:
+            llm = {k: v for k, v in atestado_llm.resumen_llamadas().items() if k != "detalle"}
+            canal.publicar("completado", {"status": "completado", "llm": llm})
         
     except Exception as e:
         print(f"Error procesando {task_id}: {e}")
-        tareas_en_curso[task_id] = {"status": "error", "error": str(e)}
+        tareas_en_curso[task_id] = {"status": "error", "error": str(e),
+                                    "version": tareas_en_curso.get(task_id, {}).get("version")}
+        if canal:
+            canal.publicar("error", {"status": "error", "error": str(e)})
+    finally:
+        if canal:
+            canal.cerrar()
+
+@app.get("/procesarG/{task_id}/eventos")
+async def eventos_procesa_g(task_id: str, last_event_id: Optional[str] = Header(None)):
+    """Envía el progreso de una tarea de /procesarG/ como Server-Sent Events.
+
+    Eventos: "ley" (inicio de cada ley), "clase" (tras cada clase: profundidad, existe,
+    excluido, reutilizados, duración, llamadas/latencia/tokens del LLM y objetos y entidades
+    parciales), "ley_completada" y, al final, "completado" (resumen del LLM) o "error".
+
+    Parameters
+    ----------
+    task_id: str
+        Identificador devuelto por /procesarG/.
+    last_event_id: str, optional
+        Cabecera Last-Event-ID (la envía EventSource al reconectar): se reanuda tras ese evento.
+
+    Returns
+    -------
+    StreamingResponse
+        Flujo text/event-stream que termina cuando termina la tarea.
+
+    Raises
+    ------
+    HTTPException
+        404: Si la tarea no existe o su canal ya se eliminó (usar /check_task/)
+    """
+    canal = progress_events.canal(task_id)
+    if canal is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada o sin eventos de progreso")
+    ultimo_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def flujo():
+        async for evento in canal.suscribir(ultimo_id):
+            yield progress_events.formato_sse(evento)
+
+    return StreamingResponse(flujo(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/check_task/{task_id}")
 def check_task(task_id: str):
@@ -741,7 +891,7 @@ async def recorrido_dfs(request: OntologyTraversalRequest):
     Devuelve la estructura recorrida y metadatos.
     """
     try:
-        traversal = get_ontology_traversal()
+        traversal = get_ontology_traversal(request.version)
         if not traversal.ontology:
             raise HTTPException(
                 status_code=500,
@@ -796,6 +946,92 @@ async def recorrido_dfs(request: OntologyTraversalRequest):
             detail=f"Error interno durante el recorrido DFS extendido: {str(e)}"
         )
 
+@app.get("/ontologia/cache_dfs/")
+async def estado_cache_dfs(version: Optional[str] = Query(None)):
+    """Devuelve los contadores de la caché de recorridos DFS de la ontología cargada.
+
+    Parameters
+    ----------
+    version: str, optional
+        Versión de la ontología (por defecto la activa)
+
+    Returns
+    -------
+    dict
+        Aciertos, fallos, entradas y versión de la ontología a la que pertenecen
+    """
+    traversal = get_ontology_traversal(version)
+    return traversal.dfs_cache_stats()
+
+@app.get("/llm/cache/")
+async def estado_cache_llm():
+    """Devuelve los contadores de la caché persistente de respuestas del LLM.
+
+    Returns
+    -------
+    dict
+        Entradas, tamaño, límites (bytes y TTL), aciertos, fallos, saltos (sin_cache),
+        caducadas, expulsadas y tasa de aciertos desde el arranque del proceso
+    """
+    return llm_cache.default_cache_stats()
+
+@app.get("/llm/cliente/")
+async def estado_cliente_llm():
+    """Devuelve los contadores de la capa de acceso al LLM (límites, reintentos y concurrencia).
+
+    Returns
+    -------
+    dict
+        Configuración (reintentos, timeout, límites por minuto, concurrencia máxima), totales de
+        peticiones, reintentos, 429, errores de servidor, timeouts, fallos definitivos y esperas
+        (en cola y en reintentos), y por modelo el límite de concurrencia adaptativo actual
+    """
+    return llm_client.default_client_stats()
+
+@app.get("/llm/telemetria/")
+async def telemetria_llm(top: int = Query(llm_telemetry.LLM_TELEMETRY_TOP)):
+    """Devuelve el coste y la latencia de las llamadas al LLM por clase y pregunta desde el arranque.
+
+    Parameters
+    ----------
+    top: int
+        Número de preguntas (clase, elemento) más costosas que se devuelven.
+
+    Returns
+    -------
+    dict
+        Totales, clases y preguntas ordenadas por coste, modelos, percentiles de latencia e
+        histogramas de latencia y tokens del prompt (ver ``llm_telemetry.Telemetry.summary``)
+    """
+    return llm_telemetry.global_telemetry().summary(top=top)
+
+@app.get("/ontologia/diagnostico/")
+async def diagnostico_ontologia(version: Optional[str] = Query(None)):
+    """Devuelve el estado de las estructuras precalculadas de la ontología cargada.
+
+    Parameters
+    ----------
+    version: str, optional
+        Versión de la ontología (por defecto la activa)
+
+    Returns
+    -------
+    dict
+        Cachés de recorridos DFS y de expresiones, planes de decisión por ley
+        (tiempo de compilación, tamaño, número de clases/pasos/preguntas), ficheros de
+        preguntas cargados e instantánea SQLite de la ontología
+    """
+    traversal = get_ontology_traversal(version)
+    return {
+        "version": ontology_registry.version_of(traversal),
+        "ontology_version": traversal.ontology_version,
+        "cache_dfs": traversal.dfs_cache_stats(),
+        "cache_expresiones": traversal.expression_cache_stats(),
+        "planes_decision": decision_plan.diagnostico_planes(traversal),
+        "preguntas": question_registry.registro_de(traversal).estadisticas(),
+        "instantanea": ontology_snapshot.snapshot_info(traversal.ontology_path) if traversal.ontology_path else None
+    }
+
 @app.post("/procesar_y_generar_rdf_v0/")
 async def procesar_y_generar_rdf_v0(file: UploadFile = File(...)):
     """
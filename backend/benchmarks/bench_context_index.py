@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los índices del análisis: recorridos lineales frente a ListaContextos/ListaEntidades.
+
+1. Acumula N contextos sintéticos (como los que deja procesar_clase_atestado a lo largo de un
+   atestado) y mide el tiempo de las búsquedas de reutilización de una restricción sobre
+   'elementos' valores del dominio con el recorrido lineal original y con el índice.
+2. Acumula N entidades (objetos robados, víctimas, acusados...) con acumular_resultados_clase,
+   con la búsqueda lineal por nombre original y con la lista indexada.
+
+En ambos casos comprueba que los resultados son idénticos.
+
+Uso (desde backend/):
+    python benchmarks/bench_context_index.py [--contextos 100 1000 10000] [--elementos 5]
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decisionTree
+from context_index import ListaContextos, ListaEntidades, contextos_restriccion
+
+
+def _contextos(n: int, rnd: random.Random):
+    propiedades = [f"prop{i}" for i in range(20)]
+    clases = [f"Clase{i}" for i in range(15)]
+    return [{"nombre_elemento": rnd.choice(propiedades), "domain": rnd.sample(clases, 2), "range": [rnd.choice(clases)],
+             "elemento_dominio": f"e{rnd.randrange(50)}", "respuesta": None} for _ in range(n)]
+
+
+def _lineal(listas, nombre, dominio, rango, elementos):
+    return [(ctx, e) for lista in listas for ctx in lista for e in elementos
+            if sorted(ctx.get("domain")) == sorted(dominio) and sorted(ctx.get("range")) == sorted(rango)
+            and ctx.get("nombre_elemento") == nombre and ctx.get("elemento_dominio") == e]
+
+
+class _Traversal:
+    """Jerarquía sintética: ClaseN desciende de Clase(N // 2)"""
+
+    def most_specific(self, clase_a, clase_b):
+        def desciende(a, b):
+            while a != b and a > 0:
+                a //= 2
+            return a == b
+        a, b = int(clase_a[5:]), int(clase_b[5:])
+        return clase_a if desciende(a, b) else clase_b if desciende(b, a) else ""
+
+
+def _acumular_lineal(analisis_atestado, analisis_clase, traversal):
+    """Acumulación de entidades original: búsqueda lineal por nombre en cada entidad nueva."""
+    for entidad in analisis_clase["entidades"]:
+        dominio_nuevo = entidad.get("dominios")[0]
+        ens = [en for en in analisis_atestado["entidades"] if en.get("nombre") == entidad.get("nombre")]
+        if not ens:
+            analisis_atestado["entidades"].append(entidad)
+        elif sorted(ens[0].get("dominios")[0]) != sorted(dominio_nuevo):
+            subclase = decisionTree.devolver_subclase_entre(traversal, dominio_nuevo, ens[0].get("dominios")[0])
+            if subclase:
+                ens[0].get("dominios")[0] = subclase
+            else:
+                analisis_atestado["entidades"].append(entidad)
+
+
+def _entidades(n: int, nombres: int, rnd: random.Random):
+    return [{"nombre": f"Entidad{rnd.randrange(nombres)}", "dominios": [f"Clase{rnd.randrange(1, 32)}"],
+             "dominios_negativos": [], "propiedades": []} for _ in range(n)]
+
+
+def _bench_entidades(tamanos, rnd: random.Random):
+    traversal = _Traversal()
+    for n in tamanos:
+        clases = [{"contexto": [], "objetos": [], "entidades": _entidades(10, n // 2, rnd)} for _ in range(n // 10)]
+        resultados = []
+        for lista, acumular in ((list, _acumular_lineal), (ListaEntidades, decisionTree.acumular_resultados_clase)):
+            analisis = {"contexto_positivo": ListaContextos(), "contexto_negativo": ListaContextos(),
+                        "objetos": [], "entidades": lista()}
+            copia = copy.deepcopy(clases)
+            inicio = time.perf_counter()
+            for analisis_clase in copia:
+                acumular(analisis, analisis_clase, traversal)
+            resultados.append((time.perf_counter() - inicio, analisis["entidades"]))
+        (t_lineal, esperado), (t_indice, obtenido) = resultados
+        print(f"   - {n:6d} entidades   lineal: {t_lineal * 1000:9.1f} ms   índice: {t_indice * 1000:7.1f} ms   "
+              f"decisiones reutilizadas: {obtenido.decisiones_reutilizadas:5d}   iguales: {list(obtenido) == esperado}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contextos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--elementos", type=int, default=5)
+    parser.add_argument("--busquedas", type=int, default=200)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    print("🔎 Búsqueda de contextos previos")
+    for n in args.contextos:
+        planos = _contextos(n, rnd)
+        positivos, negativos = planos[: n // 2], planos[n // 2:]
+        indexados = [ListaContextos(positivos), ListaContextos(negativos)]
+        consultas = [(c["nombre_elemento"], list(reversed(c["domain"])), c["range"],
+                      [c["elemento_dominio"]] + [f"e{rnd.randrange(50)}" for _ in range(args.elementos - 1)])
+                     for c in rnd.choices(planos, k=args.busquedas)]
+
+        inicio = time.perf_counter()
+        esperado = [_lineal([positivos, negativos], *consulta) for consulta in consultas]
+        t_lineal = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        obtenido = [contextos_restriccion(indexados, *consulta) for consulta in consultas]
+        t_indice = time.perf_counter() - inicio
+
+        print(f"   - {n:6d} contextos   lineal: {t_lineal / len(consultas) * 1e6:9.1f} µs/búsqueda   "
+              f"índice: {t_indice / len(consultas) * 1e6:7.1f} µs/búsqueda   "
+              f"aciertos: {sum(map(len, obtenido)):5d}   iguales: {obtenido == esperado}")
+
+    print("👥 Acumulación de entidades")
+    _bench_entidades(args.contextos, rnd)
+
+
+if __name__ == "__main__":
+    main()
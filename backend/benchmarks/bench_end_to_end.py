@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo del árbol de decisión con el LLM simulado (fake_llm_server).
+
+Analiza los atestados de report_examples con las respuestas grabadas en benchmarks/fixtures/llm
+(sin red), con la latencia simulada indicada (--latencia, ver fake_llm_server.LatencyModel) y,
+opcionalmente, con errores inyectados (--tasa-429, --tasa-timeout) que absorbe llm_client. Para
+cada configuración (secuencial, planificador de preguntas, especulación de clases hijas, lotes
+de preguntas, caché de respuestas en frío y en caliente) muestra el tiempo total, el rendimiento en atestados por
+minuto, las llamadas que llegan al LLM simulado, el pico de llamadas simultáneas, las preguntas
+no grabadas (respondidas con respuestas sintéticas), los reintentos y, con especulación, las
+llamadas especulativas útiles y desperdiciadas.
+
+Uso (desde backend/):
+    python benchmarks/bench_end_to_end.py [--latencia lognormal:150:0.5] [--tasa-429 0.05]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+import decisionTree
+import llm_cache
+import llm_client
+from documents import leer_docx
+from fake_llm_server import DEFAULT_FIXTURES, FakeLLM, FixtureStore
+from local_traversal import LocalQuestionsTraversal
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_ONTOLOGY = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+REPORTS = os.path.join(BACKEND_DIR, "..", "report_examples", "1.INFORME_Atestado*.docx")
+
+
+def _ejecutar(textos, traversal, law, fake, max_in_flight, lote, cache, presupuesto):
+    decisionTree.client = fake
+    decisionTree.LLM_BATCH_SIZE = lote
+    especulacion = {"utiles": 0, "desperdiciadas": 0, "canceladas": 0}
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for texto in textos:
+            atestado_llm = decisionTree.AtestadoLLM(texto, modo=decisionTree.MODO_INDEPENDIENTE, cache=cache)
+            resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", [law], traversal,
+                                                      max_in_flight=max_in_flight, presupuesto_especulativo=presupuesto)
+            if "error" in resultado:
+                raise RuntimeError(resultado["error"])
+            for estadisticas in resultado.get("especulacion", {}).values():
+                for clave in especulacion:
+                    especulacion[clave] += estadisticas[clave]
+    return time.perf_counter() - inicio, especulacion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--latencia", default="lognormal:150:0.5")
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--tasa-timeout", type=float, default=0.0)
+    args = parser.parse_args()
+
+    informes = sorted(glob.glob(REPORTS))
+    textos = [leer_docx(informe) for informe in informes]
+    store = FixtureStore([args.fixtures])
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = LocalQuestionsTraversal(os.path.abspath(args.ontology))
+        decision_plan.obtener_plan(traversal, args.law)
+    # Reintentos rápidos: la espera exponencial real (0.5 s base) dominaría el tiempo simulado
+    llm_client._default_client = llm_client.LLMClient(backoff_base=0.02, backoff_max=0.5)
+    llm_cache.LLM_CACHE_ENABLED = False
+
+    print(f"📄 {len(informes)} atestados, {len(store)} respuestas grabadas, latencia {args.latencia}, "
+          f"429: {args.tasa_429:.0%}, timeouts: {args.tasa_timeout:.0%}")
+    ruta_cache = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3")
+    cache = llm_cache.LLMResponseCache(ruta_cache)
+    configuraciones = [
+        ("secuencial", 1, 1, None, 0),
+        ("planificador x4", 4, 1, None, 0),
+        ("planificador x8", 8, 1, None, 0),
+        ("especulación x8/10", 8, 1, None, 10),
+        ("especulación x8/40", 8, 1, None, 40),
+        ("lotes de 4", 1, 4, None, 0),
+        ("caché en frío", 4, 1, cache, 0),
+        ("caché en caliente", 4, 1, cache, 0),
+    ]
+    for nombre, max_in_flight, lote, cache_configuracion, presupuesto in configuraciones:
+        fake = FakeLLM(store, latency=args.latencia, rate_429=args.tasa_429, rate_timeout=args.tasa_timeout,
+                       timeout_seconds=0.05, seed=1)
+        reintentos_previos = llm_client.default_client_stats()["retries"]
+        segundos, especulacion = _ejecutar(textos, traversal, args.law, fake, max_in_flight, lote,
+                                           cache_configuracion, presupuesto)
+        stats = fake.stats()
+        print(f"   - {nombre:<18s} {segundos:6.2f} s   {len(textos) / segundos * 60:6.1f} atestados/min   "
+              f"llamadas: {stats['requests']:4d}   pico simultáneas: {stats['peak_in_flight']:2d}   "
+              f"no grabadas: {stats['misses']:3d}   "
+              f"reintentos: {llm_client.default_client_stats()['retries'] - reintentos_previos}"
+              + (f"   especulativas útiles/desperdiciadas/canceladas: {especulacion['utiles']}/"
+                 f"{especulacion['desperdiciadas']}/{especulacion['canceladas']}" if presupuesto else ""))
+    os.remove(ruta_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark del plan de decisión sin compilar: compilación completa frente a recorrido perezoso.
+
+Simula el primer atestado de una ley (plan aún no compilado, o JSON de preguntas modificado):
+  - Compilación completa (antes): obtener_plan recorre el DFS, extrae todas las clases y
+    compila todos los pasos antes de que el árbol de decisión pueda hacer la primera pregunta.
+  - Recorrido perezoso (iterar_plan): la primera clase llega en cuanto el DFS la visita, y
+    solo se extraen/compilan las clases que el árbol llega a analizar.
+Se mide el tiempo hasta la primera clase lista para preguntar al LLM, el tiempo total y el
+número de extracciones de datos de clase, con una poda simulada (cada clase "existe" con
+probabilidad --existe, de forma determinista) que aplica la misma lógica que analizarAtestado.
+
+Uso (desde backend/):
+    python benchmarks/bench_lazy_dfs.py [--law PropertyCrimeReport] [--repeat 5] [--existe 0.5]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+from ontology_traversal import OntologyTraversal
+
+DEFAULT_ONTOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class _CountingTraversal(OntologyTraversal):
+    """Cuenta las extracciones de datos de clase y usa el JSON de preguntas local"""
+
+    extracciones = 0
+
+    def _extract_class_data(self, class_obj):
+        self.extracciones += 1
+        data = super()._extract_class_data(class_obj)
+        data["seeAlso"] = [ref.replace("file:///app/", f"file://{os.path.abspath(BACKEND_DIR)}/")
+                           for ref in data.get("seeAlso", [])]
+        return data
+
+
+def _existe(nombre: str, proporcion: float) -> bool:
+    return int(hashlib.md5(nombre.encode()).hexdigest(), 16) % 1000 < proporcion * 1000
+
+
+def _recorrer(entradas, proporcion: float, inicio: float):
+    """Aplica la poda de analizarAtestado; devuelve (tiempo hasta la primera clase, clases analizadas)"""
+    primera = None
+    analizadas = 0
+    nivel_excluido = -1
+    for entrada in entradas:
+        profundidad = entrada["profundidad"]
+        if nivel_excluido > -1 and profundidad > nivel_excluido:
+            continue
+        entrada["pasos"]  # lo que consulta procesar_clase_atestado antes de la primera pregunta
+        if primera is None:
+            primera = time.perf_counter() - inicio
+        analizadas += 1
+        # La clase raíz (el propio atestado) siempre existe
+        if profundidad == 0 or _existe(entrada["nombre"], proporcion):
+            if nivel_excluido != -1 and profundidad <= nivel_excluido:
+                nivel_excluido = -1
+        elif nivel_excluido == -1:
+            nivel_excluido = profundidad
+    return primera, analizadas
+
+
+def _medir(traversal: _CountingTraversal, law: str, proporcion: float, perezoso: bool):
+    traversal.clear_dfs_cache()
+    traversal.extracciones = 0
+    with decision_plan._planes_lock:
+        decision_plan._planes.pop(traversal, None)
+    inicio = time.perf_counter()
+    if perezoso:
+        # Se consume el iterador sin dejar que lance la compilación en segundo plano al final
+        entradas = decision_plan.iterar_plan(traversal, law)
+        with decision_plan._planes_lock:
+            decision_plan._compilando.add((id(traversal), law))
+        try:
+            primera, analizadas = _recorrer(entradas, proporcion, inicio)
+        finally:
+            with decision_plan._planes_lock:
+                decision_plan._compilando.discard((id(traversal), law))
+    else:
+        primera, analizadas = _recorrer(decision_plan.obtener_plan(traversal, law)["clases"], proporcion, inicio)
+    return primera, time.perf_counter() - inicio, traversal.extracciones, analizadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--existe", type=float, default=0.5,
+                        help="Proporción de clases que 'existen' en el atestado simulado (1.0 = sin poda)")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = _CountingTraversal(os.path.abspath(args.ontology))
+
+    print(f"🦉 Ley: {args.law}  (clases que existen: {args.existe:.0%}, mejor de {args.repeat})")
+    for etiqueta, perezoso in (("Compilación completa (antes)", False), ("Recorrido perezoso", True)):
+        mejores = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.repeat):
+                resultado = _medir(traversal, args.law, args.existe, perezoso)
+                if mejores is None or resultado[0] < mejores[0]:
+                    mejores = resultado
+        primera, total, extracciones, analizadas = mejores
+        print(f"   - {etiqueta:30s} primera clase: {primera * 1000:8.2f} ms   total: {total * 1000:8.2f} ms   "
+              f"extracciones: {extracciones:3d}   clases analizadas: {analizadas}")
+
+
+if __name__ == "__main__":
+    main()
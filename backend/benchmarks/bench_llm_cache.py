@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la caché persistente de respuestas del LLM: primer análisis frente a reprocesado.
+
+Analiza dos veces el mismo atestado real (report_examples) con el cliente OpenAI sustituido por
+uno simulado (respuestas deterministas por pregunta, --latencia ms por llamada) y una caché en un
+directorio temporal. Muestra, para cada pasada, el tiempo total, las llamadas al modelo, la tasa
+de aciertos de la caché y si el resultado coincide con el de la primera pasada.
+
+Uso (desde backend/):
+    python benchmarks/bench_llm_cache.py [--atestado ../report_examples/1.INFORME_Atestado1.docx] [--latencia 300]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+import decisionTree
+from documents import leer_docx
+from llm_cache import LLMResponseCache
+from local_traversal import LocalQuestionsTraversal
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_ONTOLOGY = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+DEFAULT_ATESTADO = os.path.join(BACKEND_DIR, "..", "report_examples", "1.INFORME_Atestado1.docx")
+
+
+class _ClienteSimulado:
+    """Imita client.chat.completions.create con respuestas deterministas y latencia fija"""
+
+    def __init__(self, latencia_ms: float):
+        self.latencia_ms = latencia_ms
+        self.llamadas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.llamadas += 1
+        time.sleep(self.latencia_ms / 1000)
+        esquema = kwargs.get("extra_body", kwargs).get("response_format", {}).get("json_schema", {}).get("schema") or {}
+        h = int(hashlib.md5(messages[-1]["content"].encode()).hexdigest(), 16)
+        respuesta = esquema.get("properties", {}).get("respuesta", {})
+        if respuesta.get("type") == "array":
+            elementos = [f"Elemento{(h >> (4 * i)) % 5}" for i in range(h % 3 + (1 if h % 7 else 0))]
+            contenido = {"respuesta": elementos, "referencia": [["fragmento"] for _ in elementos]}
+        elif respuesta.get("type") == "object":
+            contenido = {"respuesta": {k: h % 1000 for k in respuesta.get("properties", {})} if h % 4 else {}}
+        else:
+            contenido = {"respuesta": [], "referencia": []}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(contenido)))],
+                               usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--atestado", default=DEFAULT_ATESTADO)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--latencia", type=float, default=300, help="Latencia por llamada (ms)")
+    args = parser.parse_args()
+
+    texto = leer_docx(os.path.abspath(args.atestado))
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = LocalQuestionsTraversal(os.path.abspath(args.ontology))
+        decision_plan.obtener_plan(traversal, args.law)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        cache = LLMResponseCache(os.path.join(directorio, "llm_cache.sqlite3"))
+        print(f"📄 Atestado: {os.path.basename(args.atestado)}  (latencia simulada: {args.latencia:.0f} ms/llamada)")
+        referencia = None
+        for pasada in ("primera", "reprocesado"):
+            decisionTree.client = cliente = _ClienteSimulado(args.latencia)
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                resultado = decisionTree.analizarAtestado(decisionTree.AtestadoLLM(texto, cache=cache), "atestado",
+                                                          [args.law], traversal, max_in_flight=1)
+                total = time.perf_counter() - inicio
+            resumen = resultado.pop("llm")
+            volcado = json.dumps(resultado, default=str)
+            referencia = referencia or volcado
+            print(f"   - {pasada:12s} total: {total:7.2f} s   llamadas al modelo: {cliente.llamadas:3d}   "
+                  f"respuestas de la caché: {resumen['respuestas_cacheadas']:3d}/{resumen['llamadas']:3d}   "
+                  f"mismo resultado: {volcado == referencia}")
+        print(f"📊 Caché: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
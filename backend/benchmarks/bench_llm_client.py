@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la capa de acceso al LLM bajo carga: llamadas directas frente a llm_client.
+
+Simula un proveedor que atiende como mucho --capacidad peticiones simultáneas (latencia
+--latencia ms) y devuelve 429 al resto, y lanza --peticiones llamadas desde --hilos hilos (como
+varios atestados con el planificador de preguntas). Sin la capa, cada 429 es un fallo que aborta
+el análisis de su atestado; con ella, las peticiones se reintentan con espera exponencial y el
+límite de concurrencia adaptativo (AIMD) baja hasta la capacidad del proveedor. Muestra los
+fallos, los 429 recibidos, los reintentos, el límite final y el tiempo total.
+
+Uso (desde backend/):
+    python benchmarks/bench_llm_client.py [--capacidad 4] [--hilos 16] [--peticiones 200]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from llm_client import LLMClient
+
+
+class _Throttled(Exception):
+    status_code = 429
+
+
+class _ProveedorSimulado:
+    """Atiende 'capacidad' peticiones simultáneas; el resto recibe un 429"""
+
+    def __init__(self, capacidad: int, latencia_ms: float):
+        self.capacidad = capacidad
+        self.latencia_ms = latencia_ms
+        self.en_curso = 0
+        self.rechazadas = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        with self._lock:
+            if self.en_curso >= self.capacidad:
+                self.rechazadas += 1
+                raise _Throttled("429 Too Many Requests")
+            self.en_curso += 1
+        try:
+            time.sleep(self.latencia_ms / 1000)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))])
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def _ejecutar(llamar, hilos: int, peticiones: int):
+    fallos = 0
+
+    def una(_):
+        nonlocal fallos
+        try:
+            llamar()
+        except Exception:
+            fallos += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(hilos) as pool:
+        list(pool.map(una, range(peticiones)))
+    return fallos, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacidad", type=int, default=4)
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=20)
+    args = parser.parse_args()
+    mensajes = [{"role": "user", "content": "¿?"}]
+
+    proveedor = _ProveedorSimulado(args.capacidad, args.latencia)
+    fallos, segundos = _ejecutar(lambda: proveedor.create(model="m", messages=mensajes), args.hilos, args.peticiones)
+    print(f"   - sin capa:   fallos: {fallos:4d}/{args.peticiones}   429: {proveedor.rechazadas:4d}   "
+          f"tiempo: {segundos:5.2f} s")
+
+    proveedor = _ProveedorSimulado(args.capacidad, args.latencia)
+    capa = LLMClient(max_retries=8, backoff_base=args.latencia / 1000, max_concurrency=args.hilos)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fallos, segundos = _ejecutar(lambda: capa.create(proveedor, model="m", messages=mensajes),
+                                     args.hilos, args.peticiones)
+    stats = capa.stats()
+    print(f"   - llm_client: fallos: {fallos:4d}/{args.peticiones}   429: {proveedor.rechazadas:4d}   "
+          f"tiempo: {segundos:5.2f} s   reintentos: {stats['retries']}   "
+          f"límite final: {stats['models']['m']['concurrency_limit']} (capacidad {args.capacidad})   "
+          f"espera en cola: {stats['queue_wait_ms'] / 1000:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
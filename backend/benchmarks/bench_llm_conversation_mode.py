@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los modos de conversación de AtestadoLLM: historial acumulado frente a independiente.
+
+Ejecuta el árbol de decisión completo sobre un atestado real (report_examples) con el cliente
+OpenAI sustituido por uno simulado: las respuestas dependen solo de la última pregunta (como
+con temperature=0), 'usage.prompt_tokens' se estima como caracteres/4 y la latencia simulada
+crece con el tamaño del prompt (--latencia-base ms + --ms-por-1k-tokens). Simula además la caché
+de prefijo del proveedor: se sirven desde caché los tokens del prefijo (hasta el final de un mensaje)
+ya enviado en una llamada anterior, en bloques de 128 tokens y a partir de 1024, como OpenAI; los
+tokens cacheados no suman latencia. Para cada modo muestra las llamadas, los tokens de prompt
+(total, máximo por llamada y proporción cacheada), la latencia acumulada y si el resultado
+coincide con el del modo historial.
+
+Uso (desde backend/):
+    python benchmarks/bench_llm_conversation_mode.py [--atestado ../report_examples/1.INFORME_Atestado1.docx]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+import decisionTree
+import llm_cache
+from documents import leer_docx
+from local_traversal import LocalQuestionsTraversal
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_ONTOLOGY = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+DEFAULT_ATESTADO = os.path.join(BACKEND_DIR, "..", "report_examples", "1.INFORME_Atestado1.docx")
+
+
+class _ClienteSimulado:
+    """Imita client.chat.completions.create con respuestas deterministas, 'usage' estimado y caché de prefijo"""
+
+    def __init__(self, latencia_base_ms: float, ms_por_1k_tokens: float):
+        self.latencia_base_ms = latencia_base_ms
+        self.ms_por_1k_tokens = ms_por_1k_tokens
+        self.prefijos = set()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _tokens_cacheados(self, textos):
+        """Prefijo más largo (en límites de mensaje) ya visto, en bloques de 128 tokens desde 1024"""
+        cacheados, caracteres, h = 0, 0, hashlib.sha256()
+        for texto in textos:
+            h.update(texto.encode())
+            caracteres += len(texto)
+            clave = h.copy().hexdigest()
+            if clave in self.prefijos:
+                cacheados = caracteres // 4
+            self.prefijos.add(clave)
+        return cacheados // 128 * 128 if cacheados >= 1024 else 0
+
+    def create(self, model, messages, **kwargs):
+        textos = [m["content"] if isinstance(m["content"], str) else "".join(p["text"] for p in m["content"])
+                  for m in messages]
+        prompt_tokens = sum(len(t) for t in textos) // 4
+        cached_tokens = self._tokens_cacheados(textos)
+        time.sleep((self.latencia_base_ms + self.ms_por_1k_tokens * (prompt_tokens - cached_tokens) / 1000) / 1000)
+
+        formato = kwargs.get("extra_body", kwargs).get("response_format", {})
+        esquema = formato.get("json_schema", {}).get("schema") or {}
+        h = int(hashlib.md5(textos[-1].encode()).hexdigest(), 16)
+        respuesta = esquema.get("properties", {}).get("respuesta", {})
+        if respuesta.get("type") == "array":
+            elementos = [f"Elemento{(h >> (4 * i)) % 5}" for i in range(h % 3 + (1 if h % 7 else 0))]
+            contenido = {"respuesta": elementos, "referencia": [["fragmento"] for _ in elementos]}
+        elif respuesta.get("type") == "object":
+            contenido = {"respuesta": {k: h % 1000 for k in respuesta.get("properties", {})} if h % 4 else {}}
+        else:
+            contenido = {"respuesta": [], "referencia": []}
+        texto = json.dumps(contenido)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))],
+                               usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(texto) // 4,
+                                                     prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--atestado", default=DEFAULT_ATESTADO)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--latencia-base", type=float, default=20)
+    parser.add_argument("--ms-por-1k-tokens", type=float, default=10)
+    args = parser.parse_args()
+
+    texto = leer_docx(os.path.abspath(args.atestado))
+    # Se mide el coste de las llamadas reales: sin la caché persistente de respuestas
+    llm_cache.LLM_CACHE_ENABLED = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = LocalQuestionsTraversal(os.path.abspath(args.ontology))
+        decision_plan.obtener_plan(traversal, args.law)
+
+    print(f"📄 Atestado: {os.path.basename(args.atestado)} ({len(texto)} caracteres, ~{len(texto) // 4} tokens)")
+    referencia = None
+    for modo in (decisionTree.MODO_HISTORIAL, decisionTree.MODO_INDEPENDIENTE):
+        # Cada modo empieza con la caché del proveedor vacía
+        decisionTree.client = _ClienteSimulado(args.latencia_base, args.ms_por_1k_tokens)
+        atestado_llm = decisionTree.AtestadoLLM(texto, modo=modo)
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", [args.law], traversal, max_in_flight=1)
+        resumen = resultado.pop("llm")
+        volcado = json.dumps(resultado, default=str)
+        referencia = referencia or volcado
+        print(f"   - {modo:14s} llamadas: {resumen['llamadas']:3d}   prompt_tokens: {resumen['prompt_tokens']:8d} "
+              f"(máx. {resumen['prompt_tokens_max']:6d}/llamada, {resumen['proporcion_cacheada']:6.1%} cacheados)   "
+              f"latencia: {resumen['latencia_ms'] / 1000:6.2f} s   mismo resultado: {volcado == referencia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark del arranque de la ontología: análisis del RDF/XML frente a la instantánea SQLite.
+
+Compara, con un World nuevo en cada repetición:
+  - Análisis del RDF/XML (comportamiento anterior de load_ontology y de los razonadores)
+  - Apertura de la instantánea SQLite compartida (OntologyTraversal)
+  - Apertura de una copia privada de la instantánea (reasoner_ttl / reasoner_ttls)
+y el arranque completo de OntologyTraversal (carga + índices + cierre de subsunción) en un
+proceso nuevo, con ONTOLOGY_SNAPSHOT=0 y =1.
+
+Uso (desde backend/):
+    python benchmarks/bench_ontology_snapshot.py [--repeat 10] [--snapshot-dir /tmp/ontology_snapshots]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from owlready2 import World
+import ontology_snapshot
+
+DEFAULT_ONTOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+
+def _best_time(func, repeat: int) -> float:
+    """Mejor tiempo (s) de 'repeat' ejecuciones"""
+    best = float("inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _parse_rdfxml(path: str):
+    world = World()
+    onto = world.get_ontology(f"file://{path}").load()
+    # Se fuerza la carga de todas las clases para comparar con el acceso perezoso de SQLite
+    list(onto.classes())
+    world.close()
+
+
+def _open_snapshot(path: str, private_copy: bool):
+    world, onto = ontology_snapshot.open_snapshot(path, private_copy=private_copy)
+    list(onto.classes())
+    world.close()
+
+
+# Se ejecuta en un proceso nuevo: mide el arranque real, sin ontologías ya cargadas en el mundo por defecto
+_COLD_START = """
+import contextlib, io, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from ontology_traversal import OntologyTraversal
+    OntologyTraversal(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def _cold_start(path: str, snapshot: bool, snapshot_dir: str, repeat: int) -> float:
+    """Mejor tiempo (s) de arranque de OntologyTraversal (imports incluidos) en procesos nuevos"""
+    env = dict(os.environ, ONTOLOGY_SNAPSHOT="1" if snapshot else "0", ONTOLOGY_SNAPSHOT_DIR=snapshot_dir)
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    best = float("inf")
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", _COLD_START, path], cwd=backend, env=env,
+                                capture_output=True, text=True, check=True)
+        best = min(best, float(result.stdout.strip().splitlines()[-1]))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--snapshot-dir", default=ontology_snapshot.SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.ontology)
+    ontology_snapshot.SNAPSHOT_DIR = args.snapshot_dir
+    snapshot = ontology_snapshot.snapshot_path(path)
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+        os.remove(snapshot + ".json")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        ontology_snapshot.build_snapshot(path)
+        t_build = time.perf_counter() - start
+
+    print(f"🦉 Ontología: {os.path.basename(path)} ({os.path.getsize(path) / 1024:.0f} KB RDF/XML)")
+    print(f"   Instantánea: {snapshot} ({os.path.getsize(snapshot) / 1024:.0f} KB)")
+
+    t_parse = _best_time(lambda: _parse_rdfxml(path), args.repeat)
+    t_open = _best_time(lambda: _open_snapshot(path, False), args.repeat)
+    t_copy = _best_time(lambda: _open_snapshot(path, True), args.repeat)
+    print(f"\n📊 Carga de la ontología (todas las clases, mejor de {args.repeat})")
+    print(f"   - Análisis RDF/XML (antes):        {t_parse * 1000:8.2f} ms")
+    print(f"   - Instantánea compartida:          {t_open * 1000:8.2f} ms   ({t_parse / t_open:.1f}x)")
+    print(f"   - Copia privada (razonadores):     {t_copy * 1000:8.2f} ms   ({t_parse / t_copy:.1f}x)")
+    print(f"   - Creación de la instantánea (una vez por hash): {t_build * 1000:8.2f} ms")
+
+    t_cold_parse = _cold_start(path, False, args.snapshot_dir, args.repeat)
+    t_cold_open = _cold_start(path, True, args.snapshot_dir, args.repeat)
+    print(f"\n📊 Arranque de OntologyTraversal en un proceso nuevo (imports + carga + índices, mejor de {args.repeat})")
+    print(f"   - Desde RDF/XML:      {t_cold_parse * 1000:8.2f} ms")
+    print(f"   - Desde instantánea:  {t_cold_open * 1000:8.2f} ms   ({t_cold_parse / t_cold_open:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark del recorrido DFS de la ontología: índices precalculados frente al escaneo completo.
+
+Compara 'OntologyTraversal' (índice inverso de equivalencias e índice de dominio/rango
+construidos en load_ontology) con una variante que reproduce el comportamiento anterior,
+que recorría todas las clases y todas las propiedades por cada clase visitada.
+
+Uso (desde backend/):
+    python benchmarks/bench_ontology_traversal.py [--start PropertyCrimeReport] [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from owlready2 import ObjectProperty, ThingClass
+from ontology_traversal import OntologyTraversal
+
+DEFAULT_ONTOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+
+class LegacyScanTraversal(OntologyTraversal):
+    """Reproduce el coste anterior: escaneo completo de clases y propiedades en cada consulta"""
+
+    def get_equivalent_inverse(self, class_name: str) -> List[Tuple[ThingClass, str]]:
+        result = []
+        for cls in self.ontology.classes():
+            for eq in getattr(cls, "equivalent_to", []):
+                if hasattr(eq, "name") and eq.name == class_name:
+                    result.append((cls, "equivalent_to_inverse"))
+                elif hasattr(eq, "Classes"):
+                    for sub_eq in eq.Classes:
+                        if hasattr(sub_eq, "name") and sub_eq.name == class_name:
+                            result.append((cls, "equivalent_complex_inverse"))
+        return result
+
+    def get_class_properties(self, class_obj: ThingClass) -> Dict[str, List[Dict[str, str]]]:
+        properties = {"domain": [], "range": []}
+        for prop in self.ontology.properties():
+            prop_type = "ObjectProperty" if isinstance(prop, ObjectProperty) else "DataProperty"
+            if hasattr(prop, 'domain') and class_obj in prop.domain:
+                properties["domain"].append({"name": prop.name, "type": prop_type})
+            if hasattr(prop, 'range') and class_obj in prop.range:
+                properties["range"].append({"name": prop.name, "type": prop_type})
+        return properties
+
+
+def _time_dfs(traversal: OntologyTraversal, start_classes: List[str], repeat: int) -> Tuple[float, List[str]]:
+    """Devuelve el mejor tiempo (s) de 'repeat' pasadas y el volcado de resultados para comparar"""
+    best = float("inf")
+    dumps = []
+    for _ in range(repeat):
+        dumps = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in start_classes:
+                dumps.append(json.dumps(traversal.dfs_equivalent_and_subclasses(name, use_cache=False), default=str))
+        best = min(best, time.perf_counter() - start)
+    return best, dumps
+
+
+def _legacy_most_specific(traversal: OntologyTraversal, class_a: str, class_b: str) -> str:
+    """devolver_subclase_entre anterior: dos DFS de subclases por consulta"""
+    if class_a == class_b:
+        return class_a
+    if class_a in traversal.dfs_subclasses(class_b, use_cache=False)["classes"]:
+        return class_a
+    if class_b in traversal.dfs_subclasses(class_a, use_cache=False)["classes"]:
+        return class_b
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--start", default="PropertyCrimeReport", help="Clase raíz del DFS individual")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexed = OntologyTraversal(args.ontology)
+        legacy = LegacyScanTraversal(args.ontology)
+
+    all_classes = [cls.name for cls in indexed.ontology.classes()]
+    print(f"🦉 Ontología: {os.path.basename(args.ontology)} - {len(all_classes)} clases, "
+          f"{len(list(indexed.ontology.properties()))} propiedades")
+
+    scenarios = [
+        (f"DFS desde {args.start}", [args.start], args.repeat),
+        ("DFS desde todas las clases", all_classes, 1),
+    ]
+    for label, start_classes, repeat in scenarios:
+        t_legacy, out_legacy = _time_dfs(legacy, start_classes, repeat)
+        t_indexed, out_indexed = _time_dfs(indexed, start_classes, repeat)
+        same = "✓ resultados idénticos" if out_legacy == out_indexed else "✗ RESULTADOS DISTINTOS"
+        print(f"\n📊 {label}")
+        print(f"   - Escaneo completo (antes): {t_legacy * 1000:9.2f} ms")
+        print(f"   - Índices (después):        {t_indexed * 1000:9.2f} ms")
+        print(f"   - Aceleración:              {t_legacy / t_indexed:9.1f}x   {same}")
+
+    # Subsunción: devolver_subclase_entre con DFS frente al cierre precalculado
+    pairs = [(a, b) for a in all_classes[::7] for b in all_classes[::11]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        legacy_answers = [_legacy_most_specific(indexed, a, b) for a, b in pairs]
+        t_legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    closure_answers = [indexed.most_specific(a, b) for a, b in pairs]
+    t_closure = time.perf_counter() - start
+    same = "✓ resultados idénticos" if legacy_answers == closure_answers else "✗ RESULTADOS DISTINTOS"
+    print(f"\n📊 most_specific sobre {len(pairs)} pares de clases")
+    print(f"   - Dos DFS por consulta (antes): {t_legacy / len(pairs) * 1e6:10.1f} us/consulta")
+    print(f"   - Cierre precalculado:          {t_closure / len(pairs) * 1e6:10.3f} us/consulta   {same}")
+
+    # Caché DFS: mismo recorrido repetido (caso de producción, una raíz por atestado)
+    indexed.clear_dfs_cache()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        indexed.dfs_equivalent_and_subclasses(args.start)
+        t_miss = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            indexed.dfs_equivalent_and_subclasses(args.start)
+        t_hit = (time.perf_counter() - start) / args.repeat
+    print(f"\n📊 Caché DFS desde {args.start}")
+    print(f"   - Primer recorrido (fallo): {t_miss * 1000:9.2f} ms")
+    print(f"   - Recorrido cacheado:       {t_hit * 1000:9.4f} ms")
+    print(f"   - Estado: {indexed.dfs_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark del análisis de expresiones 'equivalent_to' de la ontología.
+
+Compara, sobre todas las expresiones equivalent_to de la ontología:
+  - analizar_expresion_owl_simplificada_dict_v5_split (anterior: split('&') + regex)
+  - parser de un solo paso (owl_expression_parser) sin caché
+  - analizar_expresion_owl_simplificada_dict_v5 con la caché LRU caliente
+e informa de las expresiones cuyo resultado cambia (solo deberían ser las que tienen
+'&' / '|' anidados dentro de una restricción, que antes se separaban mal).
+
+Uso (desde backend/):
+    python benchmarks/bench_owl_expression_parser.py [--repeat 20]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ontology_traversal import OntologyTraversal
+from owl_expression_parser import parse_owl_expression
+
+DEFAULT_ONTOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+
+def _best_time(func, expressions, repeat: int) -> float:
+    """Mejor tiempo (s) de 'repeat' pasadas analizando todas las expresiones"""
+    best = float("inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for expression in expressions:
+                func(expression)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = OntologyTraversal(args.ontology)
+    expressions = [str(eq) for cls in traversal.ontology.classes() for eq in cls.equivalent_to]
+    print(f"🦉 Ontología: {os.path.basename(args.ontology)} - {len(expressions)} expresiones equivalent_to")
+
+    changed = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for expression in expressions:
+            if (traversal.analizar_expresion_owl_simplificada_dict_v5_split(expression) !=
+                    traversal.analizar_expresion_owl_simplificada_dict_v5(expression)):
+                changed.append(expression)
+
+    t_split = _best_time(traversal.analizar_expresion_owl_simplificada_dict_v5_split, expressions, args.repeat)
+    t_parser = _best_time(lambda e: traversal._emitir_expresion(parse_owl_expression(e), 0), expressions, args.repeat)
+    t_tokens = _best_time(parse_owl_expression, expressions, args.repeat)
+    t_cached = _best_time(traversal.analizar_expresion_owl_simplificada_dict_v5, expressions, args.repeat)
+
+    n = len(expressions)
+    print(f"\n📊 Tiempo por pasada completa ({n} expresiones, mejor de {args.repeat})")
+    print(f"   - split('&') + regex (antes):     {t_split * 1000:8.2f} ms  ({t_split / n * 1e6:7.1f} us/expr)")
+    print(f"   - Parser sin caché:               {t_parser * 1000:8.2f} ms  ({t_parser / n * 1e6:7.1f} us/expr)")
+    print(f"     · de ello, tokenizar + analizar: {t_tokens * 1000:8.2f} ms")
+    print(f"   - Parser con caché LRU:           {t_cached * 1000:8.2f} ms  ({t_cached / n * 1e6:7.1f} us/expr)")
+    print(f"   - Estado caché: {traversal.expression_cache_stats()}")
+
+    print(f"\n🔎 Expresiones con resultado distinto: {len(changed)} (anidamiento de '&'/'|' corregido)")
+    for expression in changed:
+        print(f"   - {traversal._limpiar_elemento(expression)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los lotes de preguntas: una llamada por pregunta frente a llamadas compuestas.
+
+Ejecuta el árbol de decisión completo sobre un atestado real (report_examples) con el cliente
+OpenAI sustituido por uno simulado. Las respuestas dependen solo de cada pregunta (como con
+temperature=0), también dentro de una llamada compuesta, y la latencia simulada es un coste fijo
+por petición (--latencia-base ms) más un coste por cada 1000 tokens de prompt (--ms-por-1k-tokens,
+tokens estimados como caracteres/4). Para cada tamaño de lote (LLM_BATCH_SIZE) muestra las
+llamadas, los tokens de prompt, la latencia acumulada y si el resultado coincide con el de las
+preguntas sueltas.
+
+Uso (desde backend/):
+    python benchmarks/bench_question_batching.py [--lotes 1 4 8] [--latencia-base 400]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+import decisionTree
+import llm_cache
+from documents import leer_docx
+from local_traversal import LocalQuestionsTraversal
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_ONTOLOGY = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+DEFAULT_ATESTADO = os.path.join(BACKEND_DIR, "..", "report_examples", "1.INFORME_Atestado1.docx")
+
+
+def _responder(pregunta, esquema):
+    h = int(hashlib.md5(pregunta.encode()).hexdigest(), 16)
+    respuesta = (esquema or {}).get("properties", {}).get("respuesta", {})
+    if respuesta.get("type") == "array":
+        elementos = [f"Elemento{(h >> (4 * i)) % 5}" for i in range(h % 3 + (1 if h % 7 else 0))]
+        return {"respuesta": elementos, "referencia": [["fragmento"] for _ in elementos]}
+    if respuesta.get("type") == "object":
+        return {"respuesta": {k: h % 1000 for k in respuesta.get("properties", {})} if h % 4 else {}}
+    return {"respuesta": [], "referencia": []}
+
+
+class _ClienteSimulado:
+    """Imita client.chat.completions.create, también con esquemas compuestos 'pregunta_<i>'"""
+
+    def __init__(self, latencia_base_ms: float, ms_por_1k_tokens: float):
+        self.latencia_base_ms = latencia_base_ms
+        self.ms_por_1k_tokens = ms_por_1k_tokens
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        time.sleep((self.latencia_base_ms + self.ms_por_1k_tokens * prompt_tokens / 1000) / 1000)
+
+        esquema = kwargs.get("extra_body", kwargs).get("response_format", {}).get("json_schema", {}).get("schema") or {}
+        pregunta = messages[-1]["content"]
+        campos = esquema.get("properties", {})
+        if campos and all(campo.startswith("pregunta_") for campo in campos):
+            partes = [parte.split("\n", 1) for parte in pregunta.split("\n\n### ")[1:]]
+            contenido = {campo: _responder(texto, campos[campo]) for campo, texto in partes}
+        else:
+            contenido = _responder(pregunta, esquema)
+        texto = json.dumps(contenido)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))],
+                               usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(texto) // 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--atestado", default=DEFAULT_ATESTADO)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latencia-base", type=float, default=400)
+    parser.add_argument("--ms-por-1k-tokens", type=float, default=10)
+    args = parser.parse_args()
+
+    texto = leer_docx(os.path.abspath(args.atestado))
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = LocalQuestionsTraversal(os.path.abspath(args.ontology))
+        decision_plan.obtener_plan(traversal, args.law)
+    # Se miden las llamadas reales: sin la caché persistente de respuestas
+    llm_cache.LLM_CACHE_ENABLED = False
+    decisionTree.client = _ClienteSimulado(args.latencia_base, args.ms_por_1k_tokens)
+
+    print(f"📄 Atestado: {os.path.basename(args.atestado)}  (latencia simulada: {args.latencia_base:.0f} ms/petición "
+          f"+ {args.ms_por_1k_tokens:.0f} ms/1k tokens)")
+    referencia = None
+    for lote in args.lotes:
+        decisionTree.LLM_BATCH_SIZE = lote
+        atestado_llm = decisionTree.AtestadoLLM(texto, modo=decisionTree.MODO_INDEPENDIENTE)
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", [args.law], traversal, max_in_flight=1)
+        resumen = resultado.pop("llm")
+        volcado = json.dumps(resultado, default=str)
+        referencia = referencia or volcado
+        print(f"   - LLM_BATCH_SIZE={lote:<3d} llamadas: {resumen['llamadas']:3d}   prompt_tokens: {resumen['prompt_tokens']:8d}   "
+              f"latencia: {resumen['latencia_ms'] / 1000:6.2f} s   igual que sin lotes: {volcado == referencia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark del planificador de preguntas: analizarAtestado secuencial frente a concurrente.
+
+Usa un LLM simulado que responde en función solo de la pregunta (como temperature=0) tras una
+latencia aleatoria (--latencia ms de media, distribución exponencial con semilla fija), y
+ejecuta el árbol de decisión completo con distintos máximos de llamadas simultáneas. Para cada
+configuración muestra el tiempo total, las llamadas al LLM, el pico de llamadas simultáneas y
+si el resultado es idéntico al del recorrido secuencial.
+
+Uso (desde backend/):
+    python benchmarks/bench_question_scheduler.py [--latencia 300] [--in-flight 1 2 4 8] [--law PropertyCrimeReport]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import decision_plan
+import decisionTree
+from local_traversal import LocalQuestionsTraversal
+
+DEFAULT_ONTOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+
+class LLMSimulado(decisionTree.AtestadoLLM):
+    """Respuestas deterministas por pregunta con latencia inyectada"""
+
+    def __init__(self, contexto_atestado: str, latencia_ms: float):
+        super().__init__(contexto_atestado, modo=decisionTree.MODO_INDEPENDIENTE)
+        self.latencia_ms = latencia_ms
+        self.llamadas = 0
+        self.en_curso = 0
+        self.pico = 0
+        self._contador = threading.Lock()
+
+    def preguntar_llm(self, pregunta, llm_model, output_schema, contexto_previo=None):
+        h = int(hashlib.md5(pregunta.encode()).hexdigest(), 16)
+        with self._contador:
+            self.llamadas += 1
+            self.en_curso += 1
+            self.pico = max(self.pico, self.en_curso)
+        try:
+            time.sleep(random.Random(h).expovariate(1000 / self.latencia_ms) if self.latencia_ms else 0)
+        finally:
+            with self._contador:
+                self.en_curso -= 1
+
+        respuesta = (output_schema or {}).get("properties", {}).get("respuesta", {})
+        if respuesta.get("type") == "array":
+            elementos = [f"Elemento{(h >> (4 * i)) % 5}" for i in range(h % 3 + (1 if h % 7 else 0))]
+            return json.dumps({"respuesta": elementos, "referencia": [["fragmento"] for _ in elementos]})
+        if respuesta.get("type") == "object":
+            return json.dumps({"respuesta": {k: h % 1000 for k in respuesta.get("properties", {})} if h % 4 else {}})
+        return json.dumps({"respuesta": [], "referencia": []})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--law", default="PropertyCrimeReport")
+    parser.add_argument("--latencia", type=float, default=300, help="Latencia media por llamada (ms)")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        traversal = LocalQuestionsTraversal(os.path.abspath(args.ontology))
+        decision_plan.obtener_plan(traversal, args.law)
+
+    print(f"🦉 Ley: {args.law}  (latencia media simulada: {args.latencia:.0f} ms)")
+    referencia = None
+    for max_in_flight in args.in_flight:
+        llm = LLMSimulado("Atestado de prueba", args.latencia)
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultado = decisionTree.analizarAtestado(llm, "atestado", [args.law], traversal, max_in_flight=max_in_flight)
+            total = time.perf_counter() - inicio
+        volcado = json.dumps(resultado, default=str)
+        referencia = referencia or volcado
+        print(f"   - max_in_flight={max_in_flight:<3d} total: {total:7.2f} s   llamadas: {llm.llamadas:3d}   "
+              f"pico simultáneas: {llm.pico:2d}   igual al secuencial: {volcado == referencia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Índices de los contextos y entidades acumulados en el análisis de un atestado.
+
+Antes de preguntar al LLM, 'procesar_clase_atestado' busca si la misma restricción
+(propiedad, dominio, rango y elemento del dominio) ya se preguntó en otra clase, en los
+contextos positivos y negativos acumulados en el análisis del atestado. Recorrer esas
+listas en cada paso es O(contextos × elementos) y crece a medida que avanza el atestado.
+
+ListaContextos es la lista que guarda esos contextos (se serializa como una lista normal)
+y mantiene a la vez, al añadir cada contexto, un índice por
+(nombre_elemento, dominio, rango, elemento_dominio) y otro por (nombre_elemento, dominio).
+Dominios y rangos se comparan como en el código original, 'sorted(a) == sorted(b)': la
+clave usa la tupla ordenada (un frozenset perdería los repetidos).
+
+ListaEntidades hace lo mismo con las entidades del atestado, indexadas por nombre, que
+'acumular_resultados_clase' y 'procesar_preguntas_propiedad' consultan para cada entidad nueva.
+"""
+
+import copy
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+def normalizar(valor: Any) -> Optional[Tuple]:
+    """Forma comparable de un dominio o rango: misma igualdad que 'sorted(a) == sorted(b)'."""
+    return tuple(sorted(valor)) if valor is not None else None
+
+
+def _hashable(valor: Any) -> bool:
+    try:
+        hash(valor)
+    except TypeError:
+        return False
+    return True
+
+
+class ListaIndexada(list):
+    """
+    Lista que mantiene índices de sus elementos al añadirlos (``append``/``extend``).
+
+    Cualquier otra modificación reconstruye los índices. Las copias (``copy.deepcopy``
+    en el planificador de preguntas) reconstruyen los índices sobre los elementos copiados.
+    Las subclases definen ``_vaciar_indices`` e ``_indexar``.
+    """
+
+    def __init__(self, elementos: Iterable[Dict[str, Any]] = ()):
+        super().__init__()
+        self._vaciar_indices()
+        self.extend(elementos)
+
+    def _vaciar_indices(self):
+        # Elementos cuya clave no es hashable: se comparan uno a uno
+        self._sin_indice: List[int] = []
+
+    def _indexar(self, posicion: int, elemento: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _reindexar(self):
+        self._vaciar_indices()
+        for posicion, elemento in enumerate(self):
+            self._indexar(posicion, elemento)
+
+    def append(self, elemento: Dict[str, Any]):
+        super().append(elemento)
+        self._indexar(len(self) - 1, elemento)
+
+    def extend(self, elementos: Iterable[Dict[str, Any]]):
+        for elemento in elementos:
+            self.append(elemento)
+
+    def __iadd__(self, elementos):
+        self.extend(elementos)
+        return self
+
+    def _modificar(nombre):
+        def modificar(self, *args, **kwargs):
+            resultado = getattr(super(ListaIndexada, self), nombre)(*args, **kwargs)
+            self._reindexar()
+            return resultado
+        return modificar
+
+    insert = _modificar("insert")
+    remove = _modificar("remove")
+    pop = _modificar("pop")
+    clear = _modificar("clear")
+    sort = _modificar("sort")
+    reverse = _modificar("reverse")
+    __setitem__ = _modificar("__setitem__")
+    __delitem__ = _modificar("__delitem__")
+    del _modificar
+
+    def __deepcopy__(self, memo):
+        return type(self)(copy.deepcopy(list(self), memo))
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+    def _coincidencias(self, indice: Dict[Any, List[int]], clave: Any, coincide) -> List[int]:
+        posiciones = list(indice.get(clave, ())) if _hashable(clave) else []
+        if self._sin_indice or not _hashable(clave):
+            sin_indice = self._sin_indice if _hashable(clave) else range(len(self))
+            posiciones.extend(p for p in sin_indice if coincide(self[p]))
+            posiciones.sort()
+        return posiciones
+
+
+class ListaContextos(ListaIndexada):
+    """Lista de ContextoElementoClase indexada para la búsqueda de contextos previos."""
+
+    def _vaciar_indices(self):
+        super()._vaciar_indices()
+        self._por_clave: Dict[Tuple, List[int]] = {}
+        self._por_dominio: Dict[Tuple, List[int]] = {}
+
+    def _indexar(self, posicion: int, contexto: Dict[str, Any]):
+        try:
+            dominio = (contexto.get("nombre_elemento"), normalizar(contexto.get("domain")))
+            clave = dominio + (normalizar(contexto.get("range")), contexto.get("elemento_dominio"))
+            if not _hashable(clave):
+                raise TypeError
+        except TypeError:
+            self._sin_indice.append(posicion)
+            return
+        self._por_dominio.setdefault(dominio, []).append(posicion)
+        self._por_clave.setdefault(clave, []).append(posicion)
+
+    def buscar(self, nombre_elemento: str, dominio: Any, rango: Any, elemento_dominio: Hashable) -> List[int]:
+        """Posiciones (en orden de inserción) de los contextos con la misma restricción y elemento del dominio."""
+        clave = (nombre_elemento, normalizar(dominio), normalizar(rango), elemento_dominio)
+        return self._coincidencias(self._por_clave, clave, lambda ctx: (
+            ctx.get("nombre_elemento") == nombre_elemento and sorted(ctx.get("domain")) == sorted(dominio)
+            and sorted(ctx.get("range")) == sorted(rango) and ctx.get("elemento_dominio") == elemento_dominio))
+
+    def buscar_por_dominio(self, nombre_elemento: str, dominio: Any) -> List[int]:
+        """Posiciones (en orden de inserción) de los contextos de la propiedad con el mismo dominio."""
+        clave = (nombre_elemento, normalizar(dominio))
+        return self._coincidencias(self._por_dominio, clave, lambda ctx: (
+            ctx.get("nombre_elemento") == nombre_elemento and sorted(ctx.get("domain")) == sorted(dominio)))
+
+
+class ListaEntidades(ListaIndexada):
+    """
+    Lista de EntidadClase del atestado indexada por nombre.
+
+    Guarda además las decisiones ya resueltas de dominio más específico entre dos clases
+    (``devolver_subclase_entre``), que se repiten para cada entidad con el mismo par de dominios.
+    """
+
+    def __init__(self, entidades: Iterable[Dict[str, Any]] = (), subclases: Optional[Dict[Tuple, Any]] = None):
+        # Decisiones (dominio_nuevo, dominio_almacenado) -> subclase más específica o ""
+        self._subclases: Dict[Tuple, Any] = dict(subclases or {})
+        self.decisiones_reutilizadas = 0
+        super().__init__(entidades)
+
+    def _vaciar_indices(self):
+        super()._vaciar_indices()
+        self._por_nombre: Dict[Any, List[int]] = {}
+
+    def _indexar(self, posicion: int, entidad: Dict[str, Any]):
+        nombre = entidad.get("nombre")
+        if _hashable(nombre):
+            self._por_nombre.setdefault(nombre, []).append(posicion)
+        else:
+            self._sin_indice.append(posicion)
+
+    def __deepcopy__(self, memo):
+        return ListaEntidades(copy.deepcopy(list(self), memo), self._subclases)
+
+    def con_nombre(self, nombre: Any) -> List[Dict[str, Any]]:
+        """Entidades (en orden de inserción) cuyo nombre es igual a 'nombre'."""
+        return [self[p] for p in self._coincidencias(self._por_nombre, nombre, lambda en: en.get("nombre") == nombre)]
+
+    def subclase_entre(self, dominio_a: Any, dominio_b: Any, resolver: Callable[[Any, Any], Any]) -> Any:
+        """
+        Dominio más específico entre 'dominio_a' y 'dominio_b', resuelto una sola vez por par.
+
+        Parameters
+        ----------
+        resolver: Callable
+            Función que resuelve el par si no está en la caché (``devolver_subclase_entre``).
+            Los errores (resultado False) no se guardan.
+        """
+        clave = (dominio_a, dominio_b)
+        if not _hashable(clave):
+            return resolver(dominio_a, dominio_b)
+        if clave in self._subclases:
+            self.decisiones_reutilizadas += 1
+            return self._subclases[clave]
+        subclase = resolver(dominio_a, dominio_b)
+        if subclase is not False:
+            self._subclases[clave] = subclase
+        return subclase
+
+
+def contextos_restriccion(listas: Iterable[ListaContextos], nombre_elemento: str, dominio: Any, rango: Any,
+                          elementos: List[Any]) -> List[Tuple[Dict[str, Any], Any]]:
+    """
+    Pares (contexto, elemento) reutilizables para una restricción sobre los elementos dados.
+
+    El orden es el del doble bucle original (contextos de cada lista en orden de inserción y,
+    para cada contexto, los elementos en orden), de modo que los resultados son idénticos.
+    """
+    encontrados = []
+    for orden_lista, lista in enumerate(listas):
+        for orden_elemento, elemento_contexto in enumerate(elementos):
+            for posicion in lista.buscar(nombre_elemento, dominio, rango, elemento_contexto):
+                encontrados.append(((orden_lista, posicion, orden_elemento), lista[posicion], elemento_contexto))
+    encontrados.sort(key=lambda encontrado: encontrado[0])
+    return [(contexto, elemento_contexto) for _, contexto, elemento_contexto in encontrados]
+
+
+def contextos_propiedad(listas: Iterable[ListaContextos], nombre_elemento: str, dominio: Any) -> List[Dict[str, Any]]:
+    """Contextos de la propiedad con el mismo dominio, en el orden de las listas y de inserción."""
+    return [lista[posicion] for lista in listas for posicion in lista.buscar_por_dominio(nombre_elemento, dominio)]
@@ -2,7 +2,7 @@ from decimal import Decimal
 from itertools import combinations
 from time import sleep
 import time
-from typing import List, Dict, Any, Optional, Union, Set
+from typing import Callable, List, Dict, Any, Optional, Union, Set, Tuple
 from openai import OpenAI
 import entities
 # import questions
@@ -12,32 +12,107 @@ from fastapi import HTTPException
 import json
 import requests
 from entities import AnalisisAtestado, AnalisisClase, ObjetoClase, EntidadClase, PropiedadEntidad, ContextoElementoClase, ListaAnalisis
+import contextlib
+import contextvars
 import copy
+import threading
+import context_index
 from datetime import datetime
+import decision_plan
+import llm_cache
+import llm_cascade
+import llm_client
+import llm_telemetry
+import question_registry
+import question_scheduler
+from ontology_traversal import thaw
 
 # ---- Inicializar LLM ----
 load_dotenv()
 
+# Timeout por petición; los reintentos (con espera exponencial y límites por modelo) los hace llm_client
 client = OpenAI(
    base_url=os.getenv("OPENROUTER_URL"),
    api_key=os.getenv("OPENROUTER_API_KEY"),
+   timeout=llm_client.LLM_TIMEOUT,
+   max_retries=0,
 )
 
 ROOT_CLASS = os.getenv("ROOT_CLASS")
 
+# Modo de conversación con el LLM:
+#   "historial"     cada pregunta reenvía el atestado y todas las preguntas y respuestas anteriores
+#   "independiente" cada pregunta envía solo el atestado y las preguntas/respuestas de las que depende
+MODO_HISTORIAL = "historial"
+MODO_INDEPENDIENTE = "independiente"
+LLM_CONVERSATION_MODE = os.getenv("LLM_CONVERSATION_MODE", MODO_HISTORIAL)
+
+# Caché de prefijo del proveedor: el mensaje de sistema con el atestado es idéntico (byte a byte)
+# en todas las llamadas y va siempre primero, de modo que el proveedor puede reutilizarlo.
+#   "auto" marca el prefijo con cache_control solo en los modelos que lo requieren
+#          (OpenAI, DeepSeek, etc. cachean el prefijo automáticamente)
+#   "on"/"off" fuerza o desactiva las marcas cache_control
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "auto").lower()
+MODELOS_CACHE_EXPLICITA = ("anthropic/", "google/gemini")
+
+# Preguntas por llamada al LLM: la misma pregunta sobre varios elementos de la respuesta anterior
+# (independientes entre sí) se envía en una sola llamada con un esquema compuesto. 1 = sin lotes
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+PROMPT_LOTE = (
+    "Responde de forma independiente a cada una de las siguientes preguntas. La respuesta a cada "
+    "pregunta va en el campo con su mismo nombre y con el formato indicado para ese campo."
+)
+
+# Dentro de un bloque ``historial_diferido`` las llamadas no se añaden al historial al registrarlas
+_historial_diferido: contextvars.ContextVar[bool] = contextvars.ContextVar("historial_diferido", default=False)
+
+
+@contextlib.contextmanager
+def historial_diferido(activo: bool = True):
+    """Las llamadas del bloque no se añaden al historial (modo historial).
+
+    El llamante añade después solo la respuesta que acepte (``AtestadoLLM.anadir_al_historial``),
+    p.ej. la del modelo rápido de la cascada, que puede acabar descartada.
+
+    Parameters
+    ----------
+    activo: bool
+        False para no diferir nada (el bloque no tiene efecto).
+    """
+    token = _historial_diferido.set(activo or _historial_diferido.get())
+    try:
+        yield
+    finally:
+        _historial_diferido.reset(token)
+
 # ---- Clase para manejar el contexto del atestado y las preguntas al modelo LLM ----
 class AtestadoLLM:
     """Wrapper para interactuar con el modelo LLM usando un contexto de atestado."""
 
-    def __init__(self, contexto_atestado: str):
+    def __init__(self, contexto_atestado: str, modo: Optional[str] = None,
+                 cache: Optional[llm_cache.LLMResponseCache] = None, usar_cache: bool = True):
         """Inicializar el asistente.
 
         Parameters
         ----------
         contexto_atestado: str
             Texto completo del atestado que servirá como contexto del modelo.
+        modo: str, optional
+            Modo de conversación (``MODO_HISTORIAL`` o ``MODO_INDEPENDIENTE``). Por defecto
+            el de la variable de entorno LLM_CONVERSATION_MODE.
+        cache: LLMResponseCache, optional
+            Caché de respuestas. Por defecto la compartida del proceso (``llm_cache.default_cache``).
+        usar_cache: bool
+            False para no leer respuestas de la caché (se pregunta siempre al modelo y la
+            caché se actualiza con las respuestas nuevas).
         """
         self.contexto_atestado = contexto_atestado
+        self.hash_atestado = llm_cache.document_hash(contexto_atestado)
+        self.cache = cache
+        self.usar_cache = usar_cache
+        self.modo = modo or LLM_CONVERSATION_MODE
+        if self.modo not in (MODO_HISTORIAL, MODO_INDEPENDIENTE):
+            raise ValueError(f"Modo de conversación desconocido: {self.modo}")
         self.mensajes = [
             {
                 "role": "system",
@@ -47,14 +122,208 @@ class AtestadoLLM:
                 ),
             }
         ]
+        # Una entrada por llamada: modelo, mensajes enviados, tokens y latencia
+        self.registro_llamadas: List[Dict[str, Any]] = []
+        # Una entrada por pregunta con cascada de modelos: modelo rápido, principal y motivo de escalado
+        self.decisiones_cascada: List[Dict[str, Any]] = []
+        # Con el planificador de preguntas varias llamadas comparten el historial a la vez
+        self._lock = threading.Lock()
+
+    @property
+    def comparte_historial(self) -> bool:
+        """True en modo historial: cada llamada envía todas las preguntas y respuestas anteriores."""
+        return self.modo == MODO_HISTORIAL
+
+    def _mensaje_sistema(self, llm_model: str) -> Dict[str, Any]:
+        """Mensaje de sistema con el atestado, con la marca cache_control si el modelo la necesita."""
+        if LLM_PROMPT_CACHE == "off" or (LLM_PROMPT_CACHE == "auto" and not (llm_model or "").startswith(MODELOS_CACHE_EXPLICITA)):
+            return self.mensajes[0]
+        # Punto de corte de la caché al final del atestado: todo el mensaje de sistema se reutiliza
+        return {
+            "role": "system",
+            "content": [{"type": "text", "text": self.mensajes[0]["content"], "cache_control": {"type": "ephemeral"}}]
+        }
+
+    def _mensajes_llamada(self, pregunta: Dict[str, str], contexto_previo: Optional[List[List[str]]],
+                          llm_model: str) -> List[Dict[str, Any]]:
+        """Mensajes a enviar: todo el historial, o solo el atestado y la cadena de dependencias.
+
+        En ambos modos el mensaje de sistema (atestado) es el primero y no cambia, y lo que varía
+        entre llamadas va detrás, para que el proveedor pueda cachear el prefijo.
+        """
+        if self.modo == MODO_HISTORIAL:
+            with self._lock:
+                mensajes = self.mensajes[1:] + [pregunta]
+        else:
+            mensajes = []
+            for pregunta_previa, respuesta_previa in contexto_previo or []:
+                mensajes.append({"role": "user", "content": pregunta_previa})
+                mensajes.append({"role": "system", "content": respuesta_previa})
+            mensajes.append(pregunta)
+        return [self._mensaje_sistema(llm_model)] + mensajes
+
+    def _cache(self) -> Optional[llm_cache.LLMResponseCache]:
+        return self.cache if self.cache is not None else llm_cache.default_cache()
+
+    def _clave_cache(self, llm_model: str, mensajes: List[Dict[str, Any]], output_schema: Any) -> str:
+        """Clave de la llamada: atestado, modelo, pregunta, esquema, modo y mensajes intermedios."""
+        return llm_cache.cache_key(self.hash_atestado, llm_model, mensajes[-1]["content"], output_schema,
+                                   self.modo, mensajes[1:-1])
+
+    def _respuesta_cacheada(self, clave: str) -> Optional[str]:
+        """Respuesta guardada para la clave, o None si no hay caché, no está o se pidió saltarla."""
+        cache = self._cache()
+        if cache is None:
+            return None
+        if not self.usar_cache:
+            cache.record_bypass()
+            return None
+        return cache.get(clave)
+
+    def _guardar_respuesta(self, clave: str, llm_model: str, respuesta: Optional[str], output_schema: Any):
+        """Guarda la respuesta en la caché solo si es JSON y cumple el esquema de salida.
+
+        Una respuesta truncada o mal formada no se guarda: al reprocesar el atestado se vuelve
+        a preguntar al modelo en lugar de repetir el mismo error.
+        """
+        cache = self._cache()
+        if cache is None or not isinstance(respuesta, str):
+            return
+        motivo = llm_cache.response_problem(respuesta, output_schema)
+        if motivo:
+            print(f"❗ Respuesta de {llm_model} no guardada en la caché ({motivo})")
+            return
+        cache.put(clave, respuesta, self.hash_atestado, llm_model)
+
+    def _registrar_llamada(self, llm_model: str, mensajes: List[Dict[str, str]], completion: Any,
+                           respuesta: str, inicio: float, desde_cache: bool = False,
+                           llamada: Optional[Dict[str, Any]] = None):
+        """Añade la llamada al historial (modo historial) y a ``registro_llamadas``.
+
+        La llamada se atribuye a la clase y pregunta en curso (``llm_telemetry.tag``); 'llamada'
+        son los reintentos y la espera en cola de ``llm_client`` (``LLMClient.last_call``).
+        """
+        etiqueta = llm_telemetry.current_tag()
+        llamada = llamada or {}
+        usage = getattr(completion, "usage", None)
+        prompt_tokens = 0 if desde_cache else getattr(usage, "prompt_tokens", None)
+        # Tokens del prompt servidos desde la caché del proveedor (formato OpenAI/OpenRouter)
+        cached_tokens = 0 if desde_cache else getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        registro = {
+            "modelo": llm_model,
+            "modo": self.modo,
+            "mensajes": len(mensajes),
+            "caracteres_prompt": sum(len(m["content"]) if isinstance(m["content"], str)
+                                     else sum(len(parte["text"]) for parte in m["content"]) for m in mensajes),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": prompt_tokens - (cached_tokens or 0) if prompt_tokens is not None else None,
+            "completion_tokens": 0 if desde_cache else getattr(usage, "completion_tokens", None),
+            "respuesta_cacheada": desde_cache,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "reintentos": llamada.get("retries", 0),
+            "espera_cola_ms": llamada.get("queue_wait_ms", 0.0),
+            "clase": etiqueta.get("clase"),
+            "elemento": etiqueta.get("elemento"),
+            "cascada": etiqueta.get("cascada"),
+            "motivo_escalado": etiqueta.get("motivo_escalado")
+        }
+        with self._lock:
+            if self.modo == MODO_HISTORIAL and not _historial_diferido.get():
+                # La pregunta y su respuesta se añaden juntas al historial
+                self.mensajes.extend([mensajes[-1], {"role": "system", "content": respuesta}])
+            self.registro_llamadas.append(registro)
+
+    def anadir_al_historial(self, pregunta: str, respuesta: str):
+        """Añade al historial (solo en modo historial) una respuesta obtenida con ``historial_diferido``.
+
+        Parameters
+        ----------
+        pregunta: str
+            Pregunta enviada al modelo.
+        respuesta: str
+            Respuesta aceptada.
+        """
+        if self.modo != MODO_HISTORIAL:
+            return
+        with self._lock:
+            self.mensajes.extend([{"role": "user", "content": pregunta}, {"role": "system", "content": respuesta}])
+
+    def registrar_cascada(self, modelo_rapido: str, llm_model: str, motivo: Optional[str]):
+        """Anota la decisión de la cascada de una pregunta (``preguntar_con_cascada``).
+
+        Parameters
+        ----------
+        modelo_rapido: str
+            Modelo que respondió primero.
+        llm_model: str
+            Modelo principal de la pregunta.
+        motivo: str | None
+            Motivo del escalado al modelo principal, o None si se aceptó la respuesta rápida.
+        """
+        etiqueta = llm_telemetry.current_tag()
+        with self._lock:
+            self.decisiones_cascada.append({
+                "modelo_rapido": modelo_rapido,
+                "modelo": llm_model,
+                "motivo": motivo,
+                "clase": etiqueta.get("clase"),
+                "elemento": etiqueta.get("elemento")
+            })
+
+    def resumen_llamadas(self, desde: int = 0) -> Dict[str, Any]:
+        """Totales de ``registro_llamadas`` (a partir de la llamada 'desde') para comparar coste y latencia entre modos.
+
+        Returns
+        -------
+        dict
+            modo, llamadas, prompt_tokens (total y máximo por llamada), cached_tokens y
+            uncached_tokens (parte del prompt servida o no desde la caché del proveedor),
+            proporcion_cacheada, respuestas_cacheadas (servidas por la caché local de
+            respuestas, sin llamar al modelo) y su tasa, completion_tokens, caracteres_prompt,
+            latencia_ms (total y media) y el detalle por llamada. Los tokens son None si el
+            proveedor no devuelve ``usage``.
+        """
+        with self._lock:
+            registros = self.registro_llamadas[desde:]
+
+        def total(clave):
+            valores = [r[clave] for r in registros if r[clave] is not None]
+            return sum(valores) if valores else None
+
+        latencia = sum(r["latencia_ms"] for r in registros)
+        prompt_tokens = total("prompt_tokens")
+        cached_tokens = total("cached_tokens")
+        respuestas_cacheadas = sum(1 for r in registros if r["respuesta_cacheada"])
+        return {
+            "modo": self.modo,
+            "llamadas": len(registros),
+            "prompt_tokens": prompt_tokens,
+            "prompt_tokens_max": max((r["prompt_tokens"] or 0 for r in registros), default=0) or None,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": total("uncached_tokens"),
+            "proporcion_cacheada": round(cached_tokens / prompt_tokens, 4) if prompt_tokens and cached_tokens is not None else None,
+            "respuestas_cacheadas": respuestas_cacheadas,
+            "tasa_respuestas_cacheadas": round(respuestas_cacheadas / len(registros), 4) if registros else None,
+            "completion_tokens": total("completion_tokens"),
+            "caracteres_prompt": sum(r["caracteres_prompt"] for r in registros),
+            "latencia_ms": round(latencia, 2),
+            "latencia_media_ms": round(latencia / len(registros), 2) if registros else None,
+            "detalle": registros
+        }
     
-    def preguntar_llm(self, pregunta: str, llm_model: str, output_schema: Any) ->  str: #Optional[Dict[str, Any]]:
+    def preguntar_llm(self, pregunta: str, llm_model: str, output_schema: Any,
+                      contexto_previo: Optional[List[List[str]]] = None) ->  str: #Optional[Dict[str, Any]]:
         """Lanza una pregunta al modelo y devuelve su respuesta como texto.
 
         Parameters
         ----------
         pregunta: str
             Pregunta que se enviará al modelo de lenguaje.
+        contexto_previo: list, optional
+            Pares [pregunta, respuesta] de los que depende la pregunta (ver
+            ``cadena_dependencias``). Solo se envían en modo independiente; en modo
+            historial ya forman parte del historial.
 
         Returns
         -------
@@ -63,18 +332,28 @@ class AtestadoLLM:
         """
     
         #sleep(0.5)  # Simula un tiempo de espera para evitar saturar el modelo
-        self.mensajes.append({"role": "user", "content": pregunta})
+        mensajes = self._mensajes_llamada({"role": "user", "content": pregunta}, contexto_previo, llm_model)
         #print(f"\n📌 output_schema: {output_schema}")
         print(f"📌 llm_model: {llm_model}")
         # print(f"📌?self.mensajes: {self.mensajes}")
+        inicio = time.perf_counter()
+        clave = self._clave_cache(llm_model, mensajes, output_schema)
+        respuesta = self._respuesta_cacheada(clave)
+        if respuesta is not None:
+            self._registrar_llamada(llm_model, mensajes, None, respuesta, inicio, desde_cache=True)
+            return respuesta
+        capa_llm = llm_client.default_client()
         try:
-            completion = client.chat.completions.create(
+            completion = capa_llm.create(
+                client,
                 model=llm_model,
-                messages=self.mensajes,
+                messages=mensajes,
                 temperature=0,
                 top_p=1.0,
                 #max_tokens=1024,
                 extra_body={
+                    # OpenRouter: incluir en 'usage' el detalle de tokens cacheados
+                    "usage": {"include": True},
                     "response_format": {
                         "type": "json_schema",
                         "json_schema": {
@@ -86,20 +365,25 @@ class AtestadoLLM:
                 }
             )
         except Exception as e:
+            # Error no reintentable o reintentos agotados (ver llm_client)
             raise RuntimeError(f"Error llamando a llm ({llm_model}): {e}")
     
         respuesta = completion.choices[0].message.content
-        self.mensajes.append({"role": "system", "content": respuesta})
+        self._guardar_respuesta(clave, llm_model, respuesta, output_schema)
+        self._registrar_llamada(llm_model, mensajes, completion, respuesta, inicio, llamada=capa_llm.last_call())
         # print(f"preguntar_llm : {respuesta}")
         return respuesta
     
-    def preguntar_llm_openai(self, pregunta: str, llm_model: str, output_schema: Any) ->  str: #Optional[Dict[str, Any]]:
+    def preguntar_llm_openai(self, pregunta: str, llm_model: str, output_schema: Any,
+                             contexto_previo: Optional[List[List[str]]] = None) ->  str: #Optional[Dict[str, Any]]:
         """Lanza una pregunta al modelo y devuelve su respuesta como texto.
 
         Parameters
         ----------
         pregunta: str
             Pregunta que se enviará al modelo de lenguaje.
+        contexto_previo: list, optional
+            Pares [pregunta, respuesta] de los que depende la pregunta (solo modo independiente).
 
         Returns
         -------
@@ -107,12 +391,20 @@ class AtestadoLLM:
             Respuesta devuelta por el modelo.
         """
     
-        self.mensajes.append({"role": "user", "content": pregunta})
+        mensajes = self._mensajes_llamada({"role": "user", "content": pregunta}, contexto_previo, llm_model)
         print(f"📌 llm_model: {llm_model}")
+        inicio = time.perf_counter()
+        clave = self._clave_cache(llm_model, mensajes, output_schema)
+        respuesta = self._respuesta_cacheada(clave)
+        if respuesta is not None:
+            self._registrar_llamada(llm_model, mensajes, None, respuesta, inicio, desde_cache=True)
+            return respuesta
+        capa_llm = llm_client.default_client()
         try:
-            completion = client.chat.completions.create(
+            completion = capa_llm.create(
+                client,
                 model=llm_model,
-                messages=self.mensajes,
+                messages=mensajes,
                 temperature=0,
                 top_p=1.0,
                 #max_tokens=1024,
@@ -126,10 +418,12 @@ class AtestadoLLM:
                 }
             )
         except Exception as e:
+            # Error no reintentable o reintentos agotados (ver llm_client)
             raise RuntimeError(f"Error llamando a llm ({llm_model}): {e}")
     
         respuesta = completion.choices[0].message.content
-        self.mensajes.append({"role": "system", "content": respuesta})
+        self._guardar_respuesta(clave, llm_model, respuesta, output_schema)
+        self._registrar_llamada(llm_model, mensajes, completion, respuesta, inicio, llamada=capa_llm.last_call())
         # print(f"preguntar_llm : {respuesta}")
         return respuesta
 
@@ -137,7 +431,10 @@ traversal_global = {}
 
 # ---- Función principal del árbol de decisión de delito contra la propiedad ----
 # def analizarAtestado(atestado_llm: AtestadoLLM, laws: List[str], traversal: Any) -> Union[List[Dict[str, Any]], Dict[str, str]]:
-def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], traversal: Any) -> ListaAnalisis:
+def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], traversal: Any,
+                     max_in_flight: Optional[int] = None,
+                     progreso: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                     presupuesto_especulativo: Optional[int] = None) -> ListaAnalisis:
     """
     Ejecuta el árbol de decisión principal para clasificar el delito, iterando por las leyes de entrada.
 
@@ -149,6 +446,21 @@ def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], trav
         Lista de leyes/clases raíz a analizar (e.g., ["PropertyCrimeReport"]).
     traversal: Any
         Instancia de la clase de manejo de la ontología.
+    max_in_flight: int, optional
+        Llamadas simultáneas al LLM (por defecto LLM_MAX_IN_FLIGHT). Con más de una, las
+        preguntas independientes se lanzan en paralelo con ``question_scheduler``; el
+        resultado es el mismo que el del recorrido secuencial. Solo en modo independiente: en
+        modo historial cada pregunta lleva todas las anteriores y se pregunta en secuencia.
+    progreso: Callable, optional
+        Función ``progreso(evento, datos)`` a la que se avisa al empezar cada ley ("ley"), tras
+        cada clase ("clase": profundidad, existe/excluido, reutilizadas, duración, llamadas al
+        LLM de ese paso y objetos y entidades de la clase) y al terminar la ley ("ley_completada").
+        Ver ``progress_events``.
+    presupuesto_especulativo: int, optional
+        Llamadas especulativas por ley (por defecto LLM_SPECULATIVE_BUDGET; 0 sin especulación).
+        Con el planificador, las primeras preguntas de las clases hijas se lanzan sin esperar a
+        saber si existe su clase padre (ver ``question_scheduler``); las útiles y desperdiciadas
+        se devuelven en "especulacion" por ley. Como el planificador, solo en modo independiente.
 
     Returns
     -------
@@ -157,6 +469,16 @@ def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], trav
     """
     global traversal_global
 
+    if max_in_flight is None:
+        max_in_flight = question_scheduler.LLM_MAX_IN_FLIGHT
+    if presupuesto_especulativo is None:
+        presupuesto_especulativo = question_scheduler.LLM_SPECULATIVE_BUDGET
+    if max_in_flight > 1 and atestado_llm.comparte_historial:
+        # El historial enviado depende del orden de todas las respuestas anteriores (DFS): anticipar
+        # preguntas lo cambiaría, así que en modo historial el recorrido es siempre secuencial
+        print("❗ Modo historial: las preguntas se hacen en secuencia (el planificador requiere el modo independiente)")
+        max_in_flight = 1
+
     try:
         # Simplificación de la selección del LLM y estructura inicial
         llms = [os.getenv("DEFAULT_LLM")] #["openai/gpt-5.2-chat"]
@@ -179,21 +501,22 @@ def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], trav
             analisis_atestado: AnalisisAtestado = {
                 "ley": law,
                 "llm_model": llm_model,
-                "contexto_positivo": [],
-                "contexto_negativo": [],
+                # Listas indexadas para buscar contextos ya evaluados (context_index)
+                "contexto_positivo": context_index.ListaContextos(),
+                "contexto_negativo": context_index.ListaContextos(),
                 "objetos": [],
-                "entidades": [],  # Se inicializa vacío para poblar con las entidades reales
+                "entidades": context_index.ListaEntidades(),  # Se puebla con las entidades reales (indexadas por nombre)
                 "analisis": [],
             }
             
 
-            # 2. Realizar el recorrido DFS para obtener las subclases
-            dfs_result = traversal.dfs_equivalent_and_subclasses(law, None)
-            clases = dfs_result.get("classes", {})
+            # 2. Plan de decisión (recorrido DFS, restricciones y preguntas ya resueltos). Si aún no
+            # está compilado, las clases llegan según avanza el recorrido y solo se resuelven las analizadas
+            planes_clase = decision_plan.iterar_plan(traversal, law)
             
             # Se usa el bucle para todas las clases, aunque la restricción [:1] esté en el código original
             # Se ha eliminado la restricción [:1] para un recorrido completo, si es necesario.
-            clases_disponibles = [cls for cls in clases] #[:20] #[:15] #para limitar 
+            clases_disponibles = [] #[:20] #[:15] #para limitar 
             analisis_atestado["entidades"].append({
                 "nombre": name,
                 "repetido": False,
@@ -201,39 +524,92 @@ def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], trav
                 "dominios_negativos": [],
                 "propiedades": []
             })
-            print(f"\n✅ Clases disponibles (incluido Report) para análisis: {clases_disponibles}")
 
             nivel_excluido = -1  # Inicializa el nivel que excluye clases (poda)
-
-            # 3. Iterar sobre las clases (delitos)
-            for clase_nombre in clases_disponibles:
-                clase_data = clases[clase_nombre]
-
-                # Llama a la función que procesa una clase (el nodo del árbol)
-                analisis_clase = procesar_clase_atestado(
-                    atestado_llm, traversal, clase_nombre, clase_data, llm_model, nivel_excluido, analisis_atestado
+            inicio_ley = time.perf_counter()
+            notificar_progreso(progreso, "ley", {"ley": law})
+
+            # Con el planificador, las clases se anticipan en paralelo y el bucle secuencial
+            # de abajo toma las respuestas de las llamadas ya lanzadas
+            planificador = None
+            consulta_llm = atestado_llm
+            if max_in_flight > 1:
+                planes_clase = list(planes_clase)
+                planificador = question_scheduler.PlanificadorPreguntas(atestado_llm, max_in_flight,
+                                                                        presupuesto_especulativo)
+                planificador.anticipar_clases(
+                    planes_clase,
+                    lambda consulta, plan_clase, estado: anticipar_clase(consulta, traversal, plan_clase, llm_model, estado),
+                    analisis_atestado
                 )
+                consulta_llm = planificador.definitiva
 
-                # 4. Acumular los resultados y gestionar la poda
-                if analisis_clase:
-                    analisis_atestado["analisis"].append(analisis_clase)
+            # 3. Iterar sobre las clases (delitos)
+            try:
+                for plan_clase in planes_clase:
+                    clase_nombre = plan_clase["nombre"]
+                    clase_data = plan_clase["clase_data"]
+                    clases_disponibles.append(clase_nombre)
+                    inicio_clase, llamadas_previas = time.perf_counter(), len(atestado_llm.registro_llamadas)
+
+                    # Llama a la función que procesa una clase (el nodo del árbol)
+                    analisis_clase = procesar_clase_atestado(
+                        consulta_llm, traversal, clase_nombre, clase_data, llm_model, nivel_excluido, analisis_atestado,
+                        plan_clase
+                    )
+                    if analisis_clase:
+                        notificar_progreso(progreso, "clase", progreso_clase(
+                            law, analisis_clase, atestado_llm, llamadas_previas, inicio_clase
+                        ))
+
+                    # 4. Acumular los resultados y gestionar la poda
+                    if analisis_clase:
+                        analisis_atestado["analisis"].append(analisis_clase)
                     
-                    # Acumulación de contextos, objetos y entidades
-                    acumular_resultados_clase(analisis_atestado, analisis_clase, traversal)
-                    # Lógica de poda: Si la clase actual no existe, establece el nivel de exclusión.
-                    # Si existe, reinicia el nivel si previamente estaba en un nivel de poda.
-                    if analisis_clase.get("existe"):
-                        if nivel_excluido != -1 and analisis_clase.get("profundidad") <= nivel_excluido:
-                            nivel_excluido = -1 # Se vuelve a la rama principal/equivalente
-                    else:
-                        if nivel_excluido == -1:
-                            nivel_excluido = analisis_clase.get("profundidad")
-
+                        # Acumulación de contextos, objetos y entidades
+                        acumular_resultados_clase(analisis_atestado, analisis_clase, traversal)
+                        # Lógica de poda: Si la clase actual no existe, establece el nivel de exclusión.
+                        # Si existe, reinicia el nivel si previamente estaba en un nivel de poda.
+                        if analisis_clase.get("existe"):
+                            if nivel_excluido != -1 and analisis_clase.get("profundidad") <= nivel_excluido:
+                                nivel_excluido = -1 # Se vuelve a la rama principal/equivalente
+                        else:
+                            if nivel_excluido == -1:
+                                nivel_excluido = analisis_clase.get("profundidad")
+            finally:
+                if planificador is not None:
+                    estadisticas_planificador = planificador.cerrar()
+                    print(f"\n🧵 Planificador de preguntas '{law}': {estadisticas_planificador}")
+                    if "especulacion" in estadisticas_planificador:
+                        analisis_atestados.setdefault("especulacion", {})[law] = estadisticas_planificador["especulacion"]
+
+            print(f"\n✅ Clases recorridas (incluido Report) para análisis: {clases_disponibles}")
+            reutilizados = sum(analisis_clase.get('reutilizados', 0) for analisis_clase in analisis_atestado['analisis'])
+            print(f"♻️ Respuestas reutilizadas de contextos previos: {reutilizados}")
             analisis_atestados["respuestas"].append(analisis_atestado)
+            notificar_progreso(progreso, "ley_completada", {
+                "ley": law,
+                "clases": len(clases_disponibles),
+                "reutilizados": reutilizados,
+                "duracion_ms": round((time.perf_counter() - inicio_ley) * 1000, 2)
+            })
 
         fin = datetime.now()
         ha = fin.strftime("%H:%M:%S")
         print(f"\n⏳ {ha} - Fin extracción Tiempo transcurrido: {tiempo_transcurrido(inicio, fin)}")
+        # Tokens (cacheados y no cacheados) y latencia de cada llamada al LLM
+        analisis_atestados["llm"] = atestado_llm.resumen_llamadas()
+        print(f"📊 Llamadas al LLM: { {k: v for k, v in analisis_atestados['llm'].items() if k != 'detalle'} }")
+        # Coste y latencia por clase y pregunta (también acumulados en el proceso: GET /llm/telemetria/)
+        analisis_atestados["telemetria"] = telemetria_analisis(atestado_llm, analisis_atestados["respuestas"])
+        for pregunta in analisis_atestados["telemetria"]["preguntas_top"][:3]:
+            print(f"💸 {pregunta['clase']} / {pregunta['elemento']}: {pregunta['llamadas']} llamadas, "
+                  f"{pregunta['tokens']} tokens, {pregunta['latencia_ms']} ms")
+        if atestado_llm.decisiones_cascada:
+            # Preguntas respondidas por el modelo rápido o escaladas al principal, con el ahorro estimado
+            analisis_atestados["cascada"] = llm_cascade.summary(list(atestado_llm.decisiones_cascada),
+                                                                list(atestado_llm.registro_llamadas))
+            print(f"🪜 Cascada de modelos: {analisis_atestados['cascada']}")
 
         # return {"respuestas": analisis_atestados}
         return analisis_atestados
@@ -242,6 +618,55 @@ def analizarAtestado(atestado_llm: AtestadoLLM, name: str, laws: List[str], trav
         print(f"Error en analizarAtestado: {e}")
         return {"error": str(e)}
 
+def telemetria_analisis(atestado_llm: AtestadoLLM, respuestas: List[AnalisisAtestado]) -> Dict[str, Any]:
+    """
+    Resumen de telemetría de las llamadas del análisis (ver ``llm_telemetry.Telemetry.summary``).
+
+    Incluye las respuestas reutilizadas de contextos previos de cada clase y se suma al
+    acumulado del proceso (``llm_telemetry.global_telemetry``).
+    """
+    telemetria = llm_telemetry.Telemetry()
+    with atestado_llm._lock:
+        telemetria.add_records(list(atestado_llm.registro_llamadas))
+    for analisis_atestado in respuestas:
+        for analisis_clase in analisis_atestado["analisis"]:
+            telemetria.add_reused(analisis_clase["nombre"], analisis_clase.get("reutilizados", 0))
+    llm_telemetry.global_telemetry().merge(telemetria)
+    return telemetria.summary()
+
+def notificar_progreso(progreso: Optional[Callable[[str, Dict[str, Any]], None]], evento: str, datos: Dict[str, Any]):
+    """Avisa del progreso del análisis; un error del receptor no interrumpe el análisis."""
+    if progreso is None:
+        return
+    try:
+        progreso(evento, datos)
+    except Exception as e:
+        print(f"📌?Error notificando el progreso '{evento}': {e}")
+
+def progreso_clase(law: str, analisis_clase: AnalisisClase, atestado_llm: AtestadoLLM, llamadas_previas: int,
+                   inicio: float) -> Dict[str, Any]:
+    """
+    Datos del evento de progreso de una clase procesada.
+
+    Las llamadas al LLM son las registradas durante el paso (con el planificador de preguntas
+    incluyen las anticipadas de otras clases que terminan en ese intervalo).
+    """
+    llm = atestado_llm.resumen_llamadas(desde=llamadas_previas)
+    llm.pop("detalle")
+    return {
+        "ley": law,
+        "clase": analisis_clase.get("nombre"),
+        "profundidad": analisis_clase.get("profundidad"),
+        "orden": analisis_clase.get("orden"),
+        "existe": analisis_clase.get("existe"),
+        "excluido": analisis_clase.get("excluido"),
+        "reutilizados": analisis_clase.get("reutilizados", 0),
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        "llm": llm,
+        "objetos": analisis_clase.get("objetos", []),
+        "entidades": analisis_clase.get("entidades", [])
+    }
+
 def acumular_resultados_clase(analisis_atestado: AnalisisAtestado, analisis_clase: AnalisisClase, traversal: Any):
     """Función auxiliar para acumular los contextos, objetos y entidades de un AnalisisClase."""
     
@@ -256,29 +681,71 @@ def acumular_resultados_clase(analisis_atestado: AnalisisAtestado, analisis_clas
     analisis_atestado["objetos"].extend(analisis_clase.get("objetos", []))
 
     # Acumular entidades (evitando duplicados si se considera una lógica de deduplicación)
+    entidades = entidades_atestado(analisis_atestado)
     for entidad in analisis_clase["entidades"]:
         nombre_entidad = entidad.get("nombre")
         dominio_nuevo = entidad.get("dominios")[0]
-        ens = [en for en in analisis_atestado["entidades"] if en.get("nombre") == nombre_entidad]
+        ens = entidades.con_nombre(nombre_entidad)
         if ens:
             dominio_almacenado = ens[0].get("dominios")[0]
             if sorted(dominio_almacenado) != sorted(dominio_nuevo):
-                subclase = devolver_subclase_entre(traversal, dominio_nuevo, dominio_almacenado)
+                subclase = entidades.subclase_entre(
+                    dominio_nuevo, dominio_almacenado, lambda a, b: devolver_subclase_entre(traversal, a, b)
+                )
                 if subclase:                    
                     ens[0].get("dominios")[0] = subclase
                 else:
-                    analisis_atestado["entidades"].append(entidad)
+                    entidades.append(entidad)
             else:
                 pass
         else:
-            analisis_atestado["entidades"].append(entidad)
+            entidades.append(entidad)
+
+def contextos_atestado(analisis_atestado: AnalisisAtestado) -> List[context_index.ListaContextos]:
+    """Contextos positivos y negativos acumulados (en ese orden) como listas indexadas."""
+    listas = []
+    for clave in ("contexto_positivo", "contexto_negativo"):
+        if not isinstance(analisis_atestado[clave], context_index.ListaContextos):
+            analisis_atestado[clave] = context_index.ListaContextos(analisis_atestado[clave])
+        listas.append(analisis_atestado[clave])
+    return listas
+
+def entidades_atestado(analisis_atestado: AnalisisAtestado) -> context_index.ListaEntidades:
+    """Entidades acumuladas en el análisis del atestado como lista indexada por nombre."""
+    if not isinstance(analisis_atestado["entidades"], context_index.ListaEntidades):
+        analisis_atestado["entidades"] = context_index.ListaEntidades(analisis_atestado["entidades"])
+    return analisis_atestado["entidades"]
+
+def anticipar_clase(consulta_llm: Any, traversal: Any, plan_clase: Dict[str, Any], llm_model: str,
+                    analisis_atestado: AnalisisAtestado) -> Optional[AnalisisAtestado]:
+    """
+    Recorrido anticipado de una clase para el planificador de preguntas (``question_scheduler``).
+
+    Procesa la clase sobre una copia del análisis (la de su rama del DFS) solo para lanzar sus
+    preguntas cuanto antes; el resultado definitivo lo construye el bucle de ``analizarAtestado``.
+
+    Returns
+    -------
+    AnalisisAtestado | None
+        La copia con los resultados de la clase acumulados (estado de partida de sus clases
+        hijas), o None si la clase no existe y sus hijas quedarían podadas.
+    """
+    analisis_clase = procesar_clase_atestado(
+        consulta_llm, traversal, plan_clase["nombre"], plan_clase["clase_data"], llm_model, -1, analisis_atestado,
+        plan_clase
+    )
+    if not analisis_clase.get("existe"):
+        return None
+    acumular_resultados_clase(analisis_atestado, analisis_clase, traversal)
+    return analisis_atestado
 
 
 
 
 
 def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nombre: str,
-                            clase_data: Dict[str, Any], llm_model: str, nivel_excluido: int, analisis_atestado: AnalisisAtestado) -> AnalisisClase:
+                            clase_data: Dict[str, Any], llm_model: str, nivel_excluido: int, analisis_atestado: AnalisisAtestado,
+                            plan_clase: Optional[Dict[str, Any]] = None) -> AnalisisClase:
     """
     Procesa una clase específica (nodo en el árbol de decisión).
 
@@ -296,20 +763,21 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
         Nombre del modelo LLM a utilizar.
     nivel_excluido: int
         El nivel de profundidad que excluyó una rama anterior.
+    plan_clase: dict, optional
+        Entrada de la clase en el plan de decisión (``decision_plan``). Si se indica,
+        se usan sus detalles, restricciones, dominios y preguntas ya resueltos en
+        lugar de derivarlos de nuevo de la ontología y del JSON de preguntas.
 
     Returns
     -------
     AnalisisClase
         Diccionario con el resultado completo del análisis de la clase.
     """
-    detalles_clase = recuperarContexto(clase_nombre, clase_data)
+    # La posición en el DFS no requiere extraer los datos de la clase: la poda se decide antes
     dfs_extended_info = clase_data.get("dfs_extended_info", {})
     depth = dfs_extended_info.get("depth_level", "N/A")
     visit_order = dfs_extended_info.get("visit_order", "N/A")
 
-    if not detalles_clase:
-        raise ValueError(f"📌?No hay detalles para la clase {clase_nombre}.")
-
     analisis_clase: AnalisisClase = {
         "nombre": clase_nombre,
         "existe": True,
@@ -318,7 +786,8 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
         "objetos": [],
         "entidades": [],
         "profundidad": depth,
-        "orden": visit_order
+        "orden": visit_order,
+        "reutilizados": 0  # Respuestas tomadas de contextos ya evaluados en lugar de preguntar al LLM
     }
 
     # 1. Lógica de Poda (Pruning)
@@ -329,12 +798,22 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
         analisis_clase["excluido"] = True
         return analisis_clase
 
+    # Copia de trabajo del plan: los pasos (rangos, dominios) acaban en el análisis y se modifican
+    pasos_plan = thaw(plan_clase["pasos"]) if plan_clase is not None else None
+    detalles_clase = plan_clase["detalles"] if plan_clase is not None else recuperarContexto(clase_nombre, clase_data, traversal)
+
+    if not detalles_clase:
+        raise ValueError(f"📌?No hay detalles para la clase {clase_nombre}.")
+
     # 2. Obtener los elementos de la expresión equivalent_to
-    equivalencias = clase_data.get("equivalent_classes", [])
-    elementos_eq = []
-    for eq in equivalencias:
-        # Se asume que este método devuelve la estructura plana y ordenada por recorrido
-        elementos_eq.extend(traversal.analizar_expresion_owl_simplificada_dict_v5(eq.get("raw")))
+    if pasos_plan is not None:
+        elementos_eq = [paso["elemento"] for paso in pasos_plan]
+    else:
+        equivalencias = clase_data.get("equivalent_classes", [])
+        elementos_eq = []
+        for eq in equivalencias:
+            # Se asume que este método devuelve la estructura plana y ordenada por recorrido
+            elementos_eq.extend(traversal.analizar_expresion_owl_simplificada_dict_v5(eq.get("raw"), como_split=True))
 
     # 3. Recorrido del Árbol de Restricciones (equivalent_to)
     nivel_anterior = 0
@@ -345,7 +824,8 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
     no_preguntas = detalles_clase.get("no_preguntas", None)
     res_anterior = {}
 
-    for elemento_eq in elementos_eq:
+    for indice_eq, elemento_eq in enumerate(elementos_eq):
+        paso = pasos_plan[indice_eq] if pasos_plan is not None else None
         nivel = elemento_eq.get("level")
         tipo = elemento_eq.get("type")
         elemento = elemento_eq.get("element")
@@ -358,8 +838,11 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
             return analisis_clase 
         
         # Buscar la pregunta asociada a este elemento (propiedad de objeto)
-        pregs = [preg for preg in preguntas_clase if preg.get("elemento") == str(elemento)]
-        pregunta = pregs[0] if pregs else None
+        if paso is not None:
+            pregunta = paso["pregunta"]
+        else:
+            pregs = [preg for preg in preguntas_clase if preg.get("elemento") == str(elemento)]
+            pregunta = pregs[0] if pregs else None
         elementos_a_preguntar = []
 
         if nivel < nivel_anterior:
@@ -406,15 +889,13 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
                 if res_anterior and res_anterior.get("content"):
                     elementos_a_preguntar = res_anterior["content"].get("respuesta", [])
 
-                ctxs = [cp for cp in analisis_atestado["contexto_positivo"] if cp.get("nombre_elemento") == str(elemento)]
-                ctxs.extend([cn for cn in analisis_atestado["contexto_negativo"] if cn.get("nombre_elemento") == str(elemento)])
+                # Contextos ya evaluados de la propiedad con el mismo dominio (índice de context_index)
+                ctxs = context_index.contextos_propiedad(contextos_atestado(analisis_atestado), elemento, dominio_actual)
                 contexto_previo = False
                 
                 for ctx in ctxs:
                     for elemento_contexto in elementos_a_preguntar:
-                        if ( sorted(ctx.get("domain")) == sorted(dominio_actual) and  
-                                                ctx.get("nombre_elemento") == elemento and 
-                                                ctx.get("elemento_dominio") in elemento_contexto):                            
+                        if ctx.get("elemento_dominio") in elemento_contexto:
 
                             print(f"🔄 data_property - repetido:  ({dominio_actual}) - {elemento} - ({rango})")
                             resultados_parciales.append({
@@ -431,13 +912,18 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
                                 }
                             })
                             contexto_previo = True
+                            analisis_clase["reutilizados"] += 1
                             
 
                 if not contexto_previo:
-                    range_property = traversal.get_data_property_xsd_range(elemento)
-                    resultados_parciales = procesar_preguntas_propiedad( atestado_llm, elemento, range_property.get("ranges_xsd", []), 
-                                            dominio_actual, clase_nombre, pregunta, 
-                                            llm_model, analisis_clase, analisis_atestado, res_anterior)
+                    if paso is not None and paso["ranges_xsd"] is not None:
+                        ranges_xsd = paso["ranges_xsd"]
+                    else:
+                        ranges_xsd = traversal.get_data_property_xsd_range(elemento).get("ranges_xsd", [])
+                    with llm_telemetry.tag(clase=clase_nombre, elemento=str(elemento)):
+                        resultados_parciales = procesar_preguntas_propiedad( atestado_llm, elemento, ranges_xsd, 
+                                                dominio_actual, clase_nombre, pregunta, 
+                                                llm_model, analisis_clase, analisis_atestado, res_anterior)
             case "operator":
                 # Manejar operadores (ej. NOT) - la lógica de "NOT" se debe manejar en el
                 # procesamiento de la restricción o en el LLM (aunque aquí no se ve
@@ -454,48 +940,47 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
                 # Lógica de cambio de nivel (anidamiento)
                 if nivel > nivel_anterior:
                     # Profundización: El dominio pasa a ser la clase anterior o el rango de la propiedad anterior
-                    dominios.append(traversal.get_object_property_detail(elemento, "domain"))
+                    if paso is not None:
+                        dominios.append(paso["dominio_propiedad"])
+                    else:
+                        dominios.append(traversal.get_object_property_detail(elemento, "domain"))
                 dominio_actual = dominios[-1] if dominios else clase_nombre # Fallback a la clase actual
 
                 #Contrastar si ya se ha evaluado este contexto positivamente o negativamente
                 if res_anterior and res_anterior.get("content"):
                     elementos_a_preguntar = res_anterior["content"].get("respuesta", [])
 
-                ctxs = [cp for cp in analisis_atestado["contexto_positivo"] if cp.get("nombre_elemento") == str(elemento)]
-                ctxs.extend([cn for cn in analisis_atestado["contexto_negativo"] if cn.get("nombre_elemento") == str(elemento)])
                 contexto_previo = False
                 print(f"❓ objectproperty repetido:  ({dominio_actual}) - {elemento} - ({rango})")
 
-                for ctx in ctxs:
-                    for elemento_contexto in elementos_a_preguntar:
-                        if (sorted(ctx.get("domain")) == sorted(dominio_actual) and
-                                                sorted(ctx.get("range")) == sorted(rango) and  
-                                                ctx.get("nombre_elemento") == elemento and 
-                                                ctx.get("elemento_dominio") == elemento_contexto):                            
-                            
-                            resultados_parciales.append({
-                                "class": clase_nombre,
-                                "existe": True,
-                                "content": {
-                                    "tipo_elemeto": "objeto",
-                                    "nombre_elemento": elemento,
-                                    "domain": dominio_actual,
-                                    "elemento_dominio": elemento_contexto,
-                                    "range": rango,
-                                    "prompt":ctx.get("prompt"),
-                                    "respuesta":ctx.get("respuesta")
-                                }
-                            })
-                            contexto_previo = True
-                            print(f"🔄 objectproperty repetido:  ({dominio_actual}) - {elemento} - ({rango})")
+                # Búsqueda por (propiedad, dominio, rango, elemento del dominio) en el índice de context_index
+                for ctx, elemento_contexto in context_index.contextos_restriccion(
+                        contextos_atestado(analisis_atestado), elemento, dominio_actual, rango, elementos_a_preguntar):
+                    resultados_parciales.append({
+                        "class": clase_nombre,
+                        "existe": True,
+                        "content": {
+                            "tipo_elemeto": "objeto",
+                            "nombre_elemento": elemento,
+                            "domain": dominio_actual,
+                            "elemento_dominio": elemento_contexto,
+                            "range": rango,
+                            "prompt":ctx.get("prompt"),
+                            "respuesta":ctx.get("respuesta")
+                        }
+                    })
+                    contexto_previo = True
+                    analisis_clase["reutilizados"] += 1
+                    print(f"🔄 objectproperty repetido:  ({dominio_actual}) - {elemento} - ({rango})")
 
                 if not contexto_previo:
                     # Llamada refactorizada a procesar_pregunta_objeto
                     if pregunta:
-                        resultados_parciales = procesar_pregunta_objeto(
-                            atestado_llm, traversal, pregunta, clase_nombre, llm_model, 
-                            dominio_actual, rango, analisis_clase, res_anterior
-                        )
+                        with llm_telemetry.tag(clase=clase_nombre, elemento=str(elemento)):
+                            resultados_parciales = procesar_pregunta_objeto(
+                                atestado_llm, traversal, pregunta, clase_nombre, llm_model, 
+                                dominio_actual, rango, analisis_clase, res_anterior
+                            )
                         contexto_previo = False
                     elif no_preguntas: #Definición explicita de que no se necesita preguntar por una relación 
                         print(f"📌?Procesar_clase_atestado: No hay preguntas para la relación {elemento} de {clase_nombre} ")
@@ -507,12 +992,11 @@ def procesar_clase_atestado(atestado_llm: AtestadoLLM, traversal: Any, clase_nom
                     if operador_not:
                         for re in resultados_parciales:
                             if not re.get("existe"):
-                                for ent in analisis_atestado["entidades"]:
-                                    if ent.get("nombre") == re.get("content").get("elemento_dominio"):
-                                        rel = re.get("content").get("nombre_elemento")
-                                        ran = re.get("content").get("range")[0]
-                                        print(f"📌?Evaluando  NOT: not ({rel} some {ran}) ")
-                                        ent["dominios_negativos"].append(f"not ({rel} some {ran})")
+                                for ent in entidades_atestado(analisis_atestado).con_nombre(re.get("content").get("elemento_dominio")):
+                                    rel = re.get("content").get("nombre_elemento")
+                                    ran = re.get("content").get("range")[0]
+                                    print(f"📌?Evaluando  NOT: not ({rel} some {ran}) ")
+                                    ent["dominios_negativos"].append(f"not ({rel} some {ran})")
                                 re["existe"] =  True
                             else:
                                 re["existe"] =  False 
@@ -560,6 +1044,9 @@ def procesar_pregunta_objeto(atestado_llm: AtestadoLLM, traversal: Any, pregunta
     else:
         # No anidado: caso base (ej. PropertyCrimeReport)
         elementos_a_preguntar = [""]
+    contexto_previo = cadena_dependencias(respuesta_anterior)
+    anticipar_preguntas(atestado_llm, pregunta_data, llm_model, elementos_a_preguntar, contexto_previo)
+    respuestas_lote = preguntar_elementos_en_lote(atestado_llm, pregunta_data, llm_model, elementos_a_preguntar, contexto_previo)
     
     # 1. Iterar sobre los elementos (si no es anidado, solo se ejecuta una vez con "")
     for elemento_contexto in elementos_a_preguntar:
@@ -577,8 +1064,8 @@ def procesar_pregunta_objeto(atestado_llm: AtestadoLLM, traversal: Any, pregunta
         ha = inicio.strftime("%H:%M:%S")
         print(f"⚙️\t{ha} preguntar objeto: **{extraccion_prompt}**")
 
-        respuesta_extraccion_raw = atestado_llm.preguntar_llm(
-            extraccion_prompt, llm, pregunta_data.get("formato_extraccion")
+        respuesta_extraccion_raw = preguntar_con_cascada(
+            atestado_llm, pregunta_data, extraccion_prompt, llm, contexto_previo, respuestas_lote.get(extraccion_prompt)
         )
 
         fin = datetime.now()
@@ -595,6 +1082,7 @@ def procesar_pregunta_objeto(atestado_llm: AtestadoLLM, traversal: Any, pregunta
             resultado_no_existe = {
                 "class": clase_nombre,
                 "existe": False,
+                "cadena": contexto_previo,
                 "content": {
                     "tipo_elemeto": "objeto",
                     "nombre_elemento": elemento_nombre,
@@ -622,6 +1110,7 @@ def procesar_pregunta_objeto(atestado_llm: AtestadoLLM, traversal: Any, pregunta
         resultado_extraido = {
             "class": clase_nombre,
             "existe": not not_operator,
+            "cadena": contexto_previo,
             "content": {
                 "tipo_elemeto": "objeto",
                 "nombre_elemento": elemento_nombre,
@@ -712,6 +1201,9 @@ def procesar_preguntas_propiedad(atestado_llm: AtestadoLLM, propiedad: str, rang
         entidades_extraidas = [""]
 
     print(f"📌 entidades_extraidas: {entidades_extraidas}")
+    contexto_previo = cadena_dependencias(respuesta_anterior)
+    anticipar_preguntas(atestado_llm, pregunta_data, llm_model, entidades_extraidas, contexto_previo)
+    respuestas_lote = preguntar_elementos_en_lote(atestado_llm, pregunta_data, llm_model, entidades_extraidas, contexto_previo)
     # 1. Iterar sobre los elementos (si no es anidado, solo se ejecuta una vez con "")
     for entidad in entidades_extraidas: # [:1]:
         llm = pregunta_data.get("llm_preferente", llm_model)
@@ -729,8 +1221,8 @@ def procesar_preguntas_propiedad(atestado_llm: AtestadoLLM, propiedad: str, rang
         ha = inicio.strftime("%H:%M:%S")
         print(f"⚙️\t{ha} preguntar propiedad: **{extraccion_prompt}**")
 
-        respuesta_extraccion_raw = atestado_llm.preguntar_llm(
-            extraccion_prompt, llm, pregunta_data.get("formato_extraccion")
+        respuesta_extraccion_raw = preguntar_con_cascada(
+            atestado_llm, pregunta_data, extraccion_prompt, llm, contexto_previo, respuestas_lote.get(extraccion_prompt)
         )
 
         fin = datetime.now()
@@ -746,6 +1238,7 @@ def procesar_preguntas_propiedad(atestado_llm: AtestadoLLM, propiedad: str, rang
             resultado_no_existe = {
                 "class": clase_nombre,
                 "existe": False,
+                "cadena": contexto_previo,
                 "content": {
                     "tipo_elemeto": "propiedad",
                     "nombre_elemento": propiedad,
@@ -773,6 +1266,7 @@ def procesar_preguntas_propiedad(atestado_llm: AtestadoLLM, propiedad: str, rang
         resultado_extraido = {
             "class": clase_nombre,
             "existe": True,
+            "cadena": contexto_previo,
             "content": {
                 "tipo_elemeto": "objeto",
                 "nombre_elemento": propiedad,
@@ -805,7 +1299,7 @@ def procesar_preguntas_propiedad(atestado_llm: AtestadoLLM, propiedad: str, rang
         }
     
         # No estamos contando posibles repeticiones
-        ents = [en for en in analisis_atestado["entidades"] if en.get("nombre") == str(entidad)]
+        ents = entidades_atestado(analisis_atestado).con_nombre(str(entidad))
         print(f"ℹ️ analisis_atestado['entidades'] de '{entidad}': {ents}")
         if ents:    
             props = [prop for prop in ents[-1]['propiedades'] if prop.get(propiedad, "") != ""]
@@ -906,6 +1400,206 @@ def procesar_preguntas_entidad(atestado_llm: AtestadoLLM, entidad_nombre: str, p
     return propiedades_extraidas
 
 
+def cadena_dependencias(respuesta_anterior: Union[Dict[str, Any], None]) -> List[List[str]]:
+    """
+    Preguntas y respuestas de las que depende una pregunta anidada: las de la respuesta anterior
+    y la propia respuesta anterior, como pares [pregunta, respuesta]. Es el único contexto previo
+    que recibe el LLM en modo independiente.
+    """
+    contenido = (respuesta_anterior or {}).get("content") or {}
+    if not contenido.get("prompt"):
+        # Sin pregunta previa (p.ej. la entidad raíz Report)
+        return []
+    respuesta = json.dumps({"respuesta": contenido.get("respuesta")}, ensure_ascii=False)
+    return respuesta_anterior.get("cadena", []) + [[contenido["prompt"], respuesta]]
+
+
+def prompts_elementos(pregunta_data: Dict[str, Any], llm: str, elementos: List[str]) -> List[str]:
+    """Prompt de extracción de la pregunta para cada elemento de la respuesta anterior."""
+    return [
+        construir_prompt(
+            pregunta_data.get("pre_contexto_extracción_objetos", {}),
+            pregunta_data.get("extracción_objetos", {}),
+            pregunta_data.get("post_contexto_extracción_objetos", {}),
+            llm,
+            elemento_contexto
+        )
+        for elemento_contexto in elementos
+    ]
+
+
+def anticipar_preguntas(atestado_llm: Any, pregunta_data: Dict[str, Any], llm_model: str, elementos: List[str],
+                        contexto_previo: Optional[List[List[str]]] = None):
+    """
+    Con el planificador de preguntas, lanza a la vez la pregunta sobre cada elemento de la
+    respuesta anterior (son independientes entre sí). Con AtestadoLLM no hace nada, y con
+    lotes tampoco: la llamada compuesta de ``preguntar_elementos_en_lote`` ya las agrupa.
+    """
+    anticipar = getattr(atestado_llm, "anticipar", None)
+    if anticipar is None or len(elementos) < 2 or LLM_BATCH_SIZE > 1:
+        return
+    llm = pregunta_data.get("llm_preferente", llm_model)
+    # Con cascada se anticipa la respuesta del modelo rápido (la del principal depende de ella)
+    with tag_primera_llamada(pregunta_data):
+        for extraccion_prompt in prompts_elementos(pregunta_data, llm, elementos):
+            anticipar(extraccion_prompt, modelo_primera_llamada(pregunta_data, llm), pregunta_data.get("formato_extraccion"),
+                      contexto_previo)
+
+
+def preguntar_elementos_en_lote(atestado_llm: Any, pregunta_data: Dict[str, Any], llm_model: str, elementos: List[str],
+                                contexto_previo: Optional[List[List[str]]] = None) -> Dict[str, str]:
+    """
+    Con LLM_BATCH_SIZE > 1, hace la pregunta sobre todos los elementos de la respuesta anterior
+    en lotes de hasta LLM_BATCH_SIZE preguntas por llamada (ver ``preguntar_lote``).
+
+    Returns
+    -------
+    Dict[str, str]
+        Respuesta (texto JSON, como la de ``preguntar_llm``) por prompt de extracción; vacío
+        sin lotes o con un solo elemento, de modo que se pregunta elemento a elemento.
+    """
+    if LLM_BATCH_SIZE <= 1 or len(elementos) < 2:
+        return {}
+    llm = pregunta_data.get("llm_preferente", llm_model)
+    formato = pregunta_data.get("formato_extraccion")
+    # Elementos repetidos en la respuesta anterior generan el mismo prompt: se pregunta una vez
+    prompts = list(dict.fromkeys(prompts_elementos(pregunta_data, llm, elementos)))
+    respuestas = {}
+    # Con cascada el lote va al modelo rápido y cada respuesta se valida (y se añade al historial,
+    # si se acepta) en ``preguntar_con_cascada``
+    with tag_primera_llamada(pregunta_data), historial_diferido(llm_cascade.POLICY_KEY in pregunta_data):
+        for i in range(0, len(prompts), LLM_BATCH_SIZE):
+            lote = prompts[i:i + LLM_BATCH_SIZE]
+            respuestas.update(zip(lote, preguntar_lote(atestado_llm, [(prompt, formato) for prompt in lote],
+                                                       modelo_primera_llamada(pregunta_data, llm), contexto_previo)))
+    return respuestas
+
+
+def modelo_primera_llamada(pregunta_data: Dict[str, Any], llm: str) -> str:
+    """Modelo rápido de la cascada de la pregunta (``llm_cascade``) o, sin cascada, el modelo 'llm'."""
+    cascada = pregunta_data.get(llm_cascade.POLICY_KEY)
+    return cascada["modelo"] if cascada else llm
+
+
+def tag_primera_llamada(pregunta_data: Dict[str, Any]):
+    """Etiqueta de telemetría de las llamadas al modelo rápido (ninguna sin cascada)."""
+    return llm_telemetry.tag(cascada="rapido" if pregunta_data.get(llm_cascade.POLICY_KEY) else None)
+
+
+def preguntar_con_cascada(atestado_llm: Any, pregunta_data: Dict[str, Any], prompt: str, llm: str,
+                          contexto_previo: Optional[List[List[str]]] = None,
+                          respuesta_rapida: Optional[str] = None) -> str:
+    """
+    Hace la pregunta de extracción, primero al modelo rápido si la pregunta tiene cascada.
+
+    La respuesta del modelo rápido se acepta salvo que ``llm_cascade.escalation_reason``
+    encuentre un motivo de los de su política (esquema, respuesta vacía o referencias que no
+    están en el atestado); entonces se repite con el modelo principal. La decisión se anota con
+    ``registrar_cascada`` y las llamadas se etiquetan en la telemetría ("rapido"/"escalado").
+    En modo historial solo la respuesta aceptada entra en el historial: la llamada al modelo
+    rápido se hace con ``historial_diferido`` y su respuesta se añade si no se escala, de modo
+    que la pregunta escalada y las siguientes no ven la respuesta descartada.
+
+    Parameters
+    ----------
+    atestado_llm: AtestadoLLM
+        Asistente (o consulta del planificador) con ``preguntar_llm``.
+    pregunta_data: dict
+        Pregunta de preguntas_extendido.json (con su política resuelta en "_cascada", si la tiene).
+    prompt: str
+        Prompt de extracción.
+    llm: str
+        Modelo principal de la pregunta.
+    contexto_previo: list, optional
+        Cadena de dependencias de la pregunta.
+    respuesta_rapida: str, optional
+        Respuesta ya obtenida en la primera llamada (p.ej. de un lote).
+
+    Returns
+    -------
+    str
+        Respuesta (texto JSON) aceptada.
+    """
+    formato = pregunta_data.get("formato_extraccion")
+    cascada = pregunta_data.get(llm_cascade.POLICY_KEY)
+    if respuesta_rapida is None:
+        with tag_primera_llamada(pregunta_data), historial_diferido(bool(cascada)):
+            respuesta_rapida = atestado_llm.preguntar_llm(prompt, modelo_primera_llamada(pregunta_data, llm), formato,
+                                                          contexto_previo=contexto_previo)
+    if not cascada:
+        return respuesta_rapida
+
+    motivo = llm_cascade.escalation_reason(respuesta_rapida, formato, atestado_llm.contexto_atestado,
+                                           cascada["escalar_si"])
+    registrar = getattr(atestado_llm, "registrar_cascada", None)
+    if registrar is not None:
+        registrar(cascada["modelo"], llm, motivo)
+    if motivo is None:
+        anadir_al_historial = getattr(atestado_llm, "anadir_al_historial", None)
+        if anadir_al_historial is not None:
+            anadir_al_historial(prompt, respuesta_rapida)
+        return respuesta_rapida
+    print(f"🪜 Respuesta de {cascada['modelo']} descartada ({motivo}): se pregunta a {llm}")
+    with llm_telemetry.tag(cascada="escalado", motivo_escalado=motivo):
+        return atestado_llm.preguntar_llm(prompt, llm, formato, contexto_previo=contexto_previo)
+
+
+def preguntar_lote(atestado_llm: Any, preguntas: List[Tuple[str, Any]], llm_model: str,
+                   contexto_previo: Optional[List[List[str]]] = None) -> List[str]:
+    """
+    Hace varias preguntas independientes en una sola llamada con salida estructurada.
+
+    El esquema compuesto tiene un campo 'pregunta_<i>' con el esquema de cada pregunta, y la
+    respuesta se separa de nuevo en una respuesta por pregunta, idéntica en forma a la que
+    devolvería ``preguntar_llm`` para esa pregunta sola. Si falta el campo de alguna pregunta
+    (o no es un objeto), esa pregunta se repite sola.
+
+    Parameters
+    ----------
+    atestado_llm: AtestadoLLM
+        Asistente (o consulta del planificador) con ``preguntar_llm``.
+    preguntas: List[Tuple[str, dict]]
+        Pares (prompt, esquema de salida).
+    llm_model: str
+        Modelo a utilizar.
+    contexto_previo: list, optional
+        Cadena de dependencias común a todas las preguntas.
+
+    Returns
+    -------
+    List[str]
+        Respuesta (texto JSON) de cada pregunta, en el mismo orden.
+    """
+    if len(preguntas) == 1:
+        prompt, esquema = preguntas[0]
+        return [atestado_llm.preguntar_llm(prompt, llm_model, esquema, contexto_previo=contexto_previo)]
+
+    campos = [f"pregunta_{i}" for i in range(len(preguntas))]
+    prompt_lote = PROMPT_LOTE + "".join(f"\n\n### {campo}\n{prompt}" for campo, (prompt, _) in zip(campos, preguntas))
+    esquema_lote = {
+        "type": "object",
+        "properties": {campo: esquema for campo, (_, esquema) in zip(campos, preguntas)},
+        "required": campos,
+        "additionalProperties": False
+    }
+    print(f"📦 Lote de {len(preguntas)} preguntas en una llamada")
+    try:
+        respuesta_lote = json.loads(atestado_llm.preguntar_llm(prompt_lote, llm_model, esquema_lote,
+                                                               contexto_previo=contexto_previo))
+    except json.JSONDecodeError:
+        respuesta_lote = {}
+
+    respuestas = []
+    for campo, (prompt, esquema) in zip(campos, preguntas):
+        parcial = respuesta_lote.get(campo) if isinstance(respuesta_lote, dict) else None
+        if isinstance(parcial, dict):
+            respuestas.append(json.dumps(parcial, ensure_ascii=False))
+        else:
+            print(f"❗ Lote sin respuesta para '{campo}': se pregunta sola")
+            respuestas.append(atestado_llm.preguntar_llm(prompt, llm_model, esquema, contexto_previo=contexto_previo))
+    return respuestas
+
+
 def construir_prompt(pre_contexto: Dict[str, str], pregunta_base: Dict[str, str], post_contexto: Dict[str, str], llm_model: str, elemento: str | None ) -> str:
     """Construye el prompt completo concatenando las partes."""    
     
@@ -928,59 +1622,37 @@ def construir_prompt(pre_contexto: Dict[str, str], pregunta_base: Dict[str, str]
 
     return f"{pre} {pregunta} {post}".strip()
     
-def recuperarContexto(clase_nombre: str, clase_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def recuperarContexto(clase_nombre: str, clase_data: Dict[str, Any], traversal: Any = None) -> Optional[Dict[str, Any]]:
     """
     Recupera el contexto extendido (detalles_clase) para una clase a partir
     de la referencia en 'seeAlso' y el archivo JSON correspondiente.
 
+    El fichero se lee del registro de preguntas (``question_registry``): se carga una vez
+    y solo se vuelve a leer si cambia en disco.
+
     Parameters
     ----------
     clase_nombre: str
         El nombre de la clase cuya información se busca.
     clase_data: Dict[str, Any]
         El sub-árbol de datos para esa clase, que contiene 'seeAlso'.
+    traversal: Any, optional
+        Versión de la ontología cuyo registro de preguntas se usa (por defecto el común).
 
     Returns
     -------
     Optional[Dict[str, Any]]
-        El diccionario con los detalles de la clase (preguntas/contextos)
+        El diccionario (de solo lectura) con los detalles de la clase (preguntas/contextos)
         o None si el archivo o la clase no se encuentran.
     """
-    # 1. Recuperar seeAlso
-    see_also = clase_data.get("seeAlso", [])
-    if not see_also:
-        # print("📌?No hay seeAlso para esta clase.") # Opcional: imprimir advertencia
-        return None
-
-    # 2. Buscar referencia al fichero JSON (parte del IRI antes del '#')
-    fichero_json = None
-    for ref in see_also:
-        if "#" in ref:
-            # Obtiene la parte antes del último '#', y reemplaza 'file://' si existe
-            fichero_json = ref.split("#")[-2].replace('file://', '')
-            break
-    print(f"📌 Archivo JSON en {fichero_json}")        
+    # 1. Referencia al fichero JSON en seeAlso (parte del IRI antes del '#')
+    fichero_json = question_registry.fichero_preguntas(clase_data)
     if not fichero_json:
         return None
 
-    # 3. Cargar el fichero preguntas_extendido.json
-    if not os.path.exists(fichero_json):
-        # La lógica original de 'analizarAtestado' devolvía 'return' (terminando la función) en este punto.
-        # Aquí solo devolvemos None, y el llamante (analizarAtestado) decide si terminar o continuar el bucle.
-        print(f"📌?No se encontró el archivo JSON en {fichero_json}")
-        return None
-
-    try:
-        with open(fichero_json, "r", encoding="utf-8") as f:
-            preguntas_extendido = json.load(f)
-    except Exception as e:
-        print(f"📌?Error al cargar/parsear el archivo JSON {fichero_json}: {e}")
-        return None
-
-    # 4. Recuperar los detalles específicos de la clase
-    detalles_clase = preguntas_extendido.get(clase_nombre, None)
-    
-    return detalles_clase
+    # 2. Fichero preguntas_extendido.json ya cargado (o cargado ahora) y detalles de la clase
+    fichero = question_registry.registro_de(traversal).fichero(fichero_json)
+    return fichero.detalles(clase_nombre) if fichero else None
 
 
 def obtenerEstructuraEquivalente(
@@ -1203,10 +1875,11 @@ def es_subclase_de(traversal: Any, clase_a: str, clase_b: str) -> bool:
     """
     Determina si 'clase_a' es una subclase (propia) de 'clase_b'.
 
-    Utiliza la lógica de 'dfs_equivalent_and_subclasses' asumiendo que:
-    1. Ejecuta un DFS desde 'clase_b'.
-    2. Si 'clase_a' se encuentra, está en la jerarquía (subclase o equivalente).
-    3. 'dfs_extended_info.depth_level' indica la profundidad (0 para 'clase_b').
+    Consulta el cierre de subsunción precalculado en la carga de la ontología,
+    con el mismo criterio que 'dfs_equivalent_and_subclasses':
+    1. Se siguen las subclases y el 'equivalent_to' inverso desde 'clase_b'.
+    2. Si 'clase_a' se alcanza, está en la jerarquía (subclase o equivalente).
+    3. 'clase_b' no es subclase propia de sí misma.
 
     Parameters
     ----------
@@ -1223,24 +1896,10 @@ def es_subclase_de(traversal: Any, clase_a: str, clase_b: str) -> bool:
         True si clase_a es una subclase propia de clase_b, False en caso contrario.
     """
     try:
-        # 1. Ejecutar el DFS desde la supuesta superclase (clase_b)
-        dfs_result = traversal.dfs_equivalent_and_subclasses(clase_b, None)
-        clases_encontradas: Dict[str, Any] = dfs_result.get("classes", {})
-
-        # 2. Si clase_a no está en los resultados, no es subclase.
-        if clase_a not in clases_encontradas:
-            return False
-
-        # 3. Si A es B, no es subclase *propia*.
+        # Si A es B, no es subclase *propia*.
         if clase_a == clase_b:
             return False
-
-        # 4. Verificar la profundidad. Asumimos que la raíz (clase_b) tiene depth_level 0.
-        #    Cualquier descendiente propio debe tener una profundidad > 0.
-        clase_a_data = clases_encontradas.get(clase_a, {})
-        depth = clase_a_data.get("dfs_extended_info", {}).get("depth_level", -1)
-
-        return depth > 0
+        return traversal.is_subclass(clase_a, clase_b, via_equivalences=True)
 
     except Exception as e:
         print(f"Error en es_subclase_de: {e}")
@@ -1249,63 +1908,30 @@ def es_subclase_de(traversal: Any, clase_a: str, clase_b: str) -> bool:
 
 def devolver_subclase_entre(traversal: Any, clase_a: str, clase_b: str) -> str:
     """
-    Determina si 'clase_a' es una subclase (propia) de 'clase_b'.
+    Devuelve la más específica entre 'clase_a' y 'clase_b' si una es subclase de la otra.
 
-    Utiliza la lógica de 'dfs_equivalent_and_subclasses' asumiendo que:
-    1. Ejecuta un DFS desde 'clase_b'.
-    2. Si 'clase_a' se encuentra, está en la jerarquía (subclase o equivalente).
-    3. 'dfs_extended_info.depth_level' indica la profundidad (0 para 'clase_b').
+    Consulta el cierre de subsunción precalculado (solo subclases, mismo criterio
+    que 'dfs_subclasses'):
+    1. Si 'clase_a' es 'clase_b' o desciende de ella, devuelve 'clase_a'.
+    2. Si 'clase_b' desciende de 'clase_a', devuelve 'clase_b'.
+    3. Si no están en la misma rama, devuelve "".
 
     Parameters
     ----------
     traversal: Any
         Instancia de la clase de manejo de la ontología (como en el script).
     clase_a: str
-        Nombre de la clase que se sospecha es la subclase.
+        Nombre de la primera clase (dominio nuevo).
     clase_b: str
-        Nombre de la clase que se sospecha es la superclase.
+        Nombre de la segunda clase (dominio almacenado).
 
     Returns
     -------
-    bool
-        True si clase_a es una subclase propia de clase_b, False en caso contrario.
+    str
+        Nombre de la subclase más específica, o "" si no hay relación.
     """
     try:
-        # 1. Si A es B, no es subclase *propia*.
-        if clase_a == clase_b:
-            return clase_a
-        
-        # 2. Ejecutar el DFS desde la supuesta superclase (clase_b) y subclase (clase_a)
-        dfs_result_b = traversal.dfs_subclasses(clase_b)
-        if dfs_result_b:
-            clases_encontradas_b: Dict[str, Any] = dfs_result_b.get("classes", {})
-        else:
-            clases_encontradas_b: Dict[str, Any] = {}
-
-        # print(f"\t\t📌 devolver_subclase_entre clases_encontradas_b: {clases_encontradas_b}")
-
-        dfs_result_a = traversal.dfs_subclasses(clase_a)
-        if dfs_result_a:
-            clases_encontradas_a: Dict[str, Any] = dfs_result_a.get("classes", {})
-        else:
-            clases_encontradas_a: Dict[str, Any] = {}
-        # print(f"\t\t📌 devolver_subclase_entre clases_encontradas_a: {clases_encontradas_a}")
-
-        # 3. Si clase_a no está en los resultados, no es subclase.
-        if clase_a not in clases_encontradas_b:
-            if clase_b not in clases_encontradas_a:
-                return ""
-            else:
-                return clase_b
-        else: 
-            return clase_a 
-
-        # # 4. Verificar la profundidad. Asumimos que la raíz (clase_b) tiene depth_level 0.
-        # #    Cualquier descendiente propio debe tener una profundidad > 0.
-        # clase_a_data = clases_encontradas.get(clase_a, {})
-        # depth = clase_a_data.get("dfs_extended_info", {}).get("depth_level", -1)
-
-        # return depth > 0
+        return traversal.most_specific(clase_a, clase_b)
 
     except Exception as e:
         print(f"Error en devolver_subclase_entre: {e}")
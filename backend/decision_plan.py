@@ -0,0 +1,242 @@
+"""
+Plan de decisión precompilado por ley (entrada de CLASSES_TO_ANALYSE).
+
+Todo lo que 'procesar_clase_atestado' deriva de la ontología y de preguntas_extendido.json
+es igual para todos los atestados: el orden DFS de las clases, su profundidad, la lista
+plana de restricciones de 'equivalent_to', los dominios/rangos de las propiedades y la
+pregunta asociada a cada elemento. El plan lo calcula una vez por ontología cargada y lo
+comparte (congelado) entre peticiones; el bucle por atestado solo hace llamadas al LLM.
+Los ficheros de preguntas se leen del registro de preguntas del traversal (``question_registry``).
+"""
+
+import functools
+import json
+import threading
+import time
+import weakref
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+from ontology_traversal import FrozenDict, LazyDict, freeze
+from question_registry import FicheroPreguntas, fichero_preguntas, firma_fichero, registro_de
+
+# Planes por traversal: traversal -> {ley: plan}. Al descartar un traversal (/ontologia/cargar/) se liberan sus planes.
+_planes: "weakref.WeakKeyDictionary[Any, Dict[str, FrozenDict]]" = weakref.WeakKeyDictionary()
+_planes_lock = threading.Lock()
+# Compilaciones en segundo plano en curso: (id del traversal, ley)
+_compilando = set()
+
+
+def _compilar_pasos(traversal: Any, clase_nombre: str, clase_data: Dict[str, Any],
+                    fichero: FicheroPreguntas) -> List[Dict[str, Any]]:
+    """Lista plana de restricciones de la clase con dominios, rangos y pregunta ya resueltos."""
+    pasos = []
+    for eq in clase_data.get("equivalent_classes", []):
+        # Formato de la versión split: el árbol de decisión apila dominios según los niveles de esa lista
+        for elemento_eq in traversal.analizar_expresion_owl_simplificada_dict_v5(eq.get("raw"), como_split=True):
+            elemento = elemento_eq.get("element")
+            tipo = elemento_eq.get("type")
+            paso = {
+                "elemento": elemento_eq,
+                "pregunta": fichero.pregunta(clase_nombre, elemento),
+                "dominio_propiedad": None,
+                "ranges_xsd": None
+            }
+            if tipo == "object_property":
+                paso["dominio_propiedad"] = traversal.get_object_property_detail(elemento, "domain")
+            elif tipo == "data_property" and paso["pregunta"]:
+                paso["ranges_xsd"] = traversal.get_data_property_xsd_range(elemento).get("ranges_xsd", [])
+            pasos.append(paso)
+    return pasos
+
+
+def _compilar_clase(traversal: Any, clase_nombre: str, clase_data: Dict[str, Any],
+                    ficheros: Dict[str, Any]) -> Dict[str, Any]:
+    """Detalles (entrada de preguntas_extendido.json) y pasos de una clase del plan.
+
+    'ficheros' fija la versión de cada fichero de preguntas usada durante una compilación,
+    aunque el registro lo recargue entretanto.
+    """
+    ruta = fichero_preguntas(clase_data)
+    if ruta and ruta not in ficheros:
+        ficheros[ruta] = registro_de(traversal).fichero(ruta)
+    fichero = ficheros.get(ruta)
+    detalles = fichero.detalles(clase_nombre) if fichero else None
+    pasos = _compilar_pasos(traversal, clase_nombre, clase_data, fichero) if detalles else []
+    return {"detalles": detalles, "pasos": pasos}
+
+
+def compilar_plan(traversal: Any, ley: str) -> FrozenDict:
+    """
+    Compila el plan de decisión de una ley.
+
+    Parameters
+    ----------
+    traversal: Any
+        Instancia de OntologyTraversal con la ontología cargada.
+    ley: str
+        Clase raíz del recorrido (p.ej. "PropertyCrimeReport").
+
+    Returns
+    -------
+    FrozenDict
+        Plan de solo lectura: {"ley", "ontology_version", "clases": (...), "ficheros": {ruta: (mtime, tamaño)},
+        "estadisticas": {...}}. Cada clase contiene nombre, clase_data, profundidad, orden,
+        detalles (entrada de preguntas_extendido.json o None) y pasos.
+    """
+    inicio = time.perf_counter()
+    dfs_result = traversal.dfs_equivalent_and_subclasses(ley, None)
+    ficheros: Dict[str, Any] = {}
+    clases = []
+    n_pasos = n_preguntas = 0
+
+    for clase_nombre, clase_data in dfs_result.get("classes", {}).items():
+        dfs_extended_info = clase_data.get("dfs_extended_info", {})
+        compilado = _compilar_clase(traversal, clase_nombre, clase_data, ficheros)
+        n_pasos += len(compilado["pasos"])
+        n_preguntas += sum(1 for paso in compilado["pasos"] if paso["pregunta"])
+        clases.append({
+            "nombre": clase_nombre,
+            "clase_data": clase_data,
+            "profundidad": dfs_extended_info.get("depth_level", "N/A"),
+            "orden": dfs_extended_info.get("visit_order", "N/A"),
+            **compilado
+        })
+
+    plan = {
+        "ley": ley,
+        "ontology_version": traversal.ontology_version,
+        "clases": clases,
+        "ficheros": {ruta: fichero.firma if fichero else firma_fichero(ruta) for ruta, fichero in ficheros.items()},
+        "estadisticas": {}
+    }
+    plan["estadisticas"] = {
+        "clases": len(clases),
+        "pasos": n_pasos,
+        "preguntas_vinculadas": n_preguntas,
+        "tiempo_compilacion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        "tamano_bytes": len(json.dumps(plan, default=str))
+    }
+    return freeze(plan)
+
+
+def _plan_vigente(traversal: Any, plan: Optional[FrozenDict]) -> bool:
+    """El plan sigue siendo válido si no ha cambiado la ontología ni los JSON de preguntas.
+
+    Los ficheros se comparan por fecha de modificación y tamaño, como en el registro de preguntas:
+    una edición en el mismo tick de mtime (sistemas de ficheros con resolución de 1-2 s) cambia
+    normalmente el tamaño.
+    """
+    if plan is None or plan["ontology_version"] != traversal.ontology_version:
+        return False
+    return all(firma_fichero(ruta) == firma for ruta, firma in plan["ficheros"].items())
+
+
+def obtener_plan(traversal: Any, ley: str) -> FrozenDict:
+    """
+    Devuelve el plan compartido de la ley, compilándolo si no existe o está obsoleto.
+
+    Parameters
+    ----------
+    traversal: Any
+        Instancia de OntologyTraversal.
+    ley: str
+        Clase raíz del recorrido.
+
+    Returns
+    -------
+    FrozenDict
+        Plan de decisión de solo lectura.
+    """
+    with _planes_lock:
+        plan = _planes.get(traversal, {}).get(ley)
+    if _plan_vigente(traversal, plan):
+        return plan
+
+    plan = compilar_plan(traversal, ley)
+    with _planes_lock:
+        _planes.setdefault(traversal, {})[ley] = plan
+    print(f"✓ Plan de decisión '{ley}': {plan['estadisticas']}")
+    return plan
+
+
+def iterar_plan(traversal: Any, ley: str) -> Iterator[Mapping]:
+    """
+    Recorre las clases del plan de la ley en orden DFS, a medida que se consumen.
+
+    Si el plan compilado está vigente se recorren sus clases. Si no (ley no precompilada,
+    o JSON de preguntas modificado) no se espera a compilarlo: se recorre el DFS de forma
+    perezosa, de modo que la primera clase llega sin esperar al recorrido completo, y los
+    datos, detalles y pasos de cada clase solo se calculan si el árbol de decisión la
+    procesa (las clases podadas no los calculan). Al agotar el recorrido se compila el plan
+    completo en segundo plano para los atestados siguientes.
+
+    Parameters
+    ----------
+    traversal: Any
+        Instancia de OntologyTraversal.
+    ley: str
+        Clase raíz del recorrido.
+
+    Returns
+    -------
+    Iterator[Mapping]
+        Entradas de clase con las mismas claves que las del plan compilado: nombre,
+        clase_data, profundidad, orden, detalles y pasos.
+    """
+    with _planes_lock:
+        plan = _planes.get(traversal, {}).get(ley)
+    if _plan_vigente(traversal, plan):
+        yield from plan["clases"]
+        return
+
+    ficheros: Dict[str, Any] = {}
+    for clase_nombre, clase_data, profundidad, orden in traversal.iter_dfs_equivalent_and_subclasses(ley):
+        yield LazyDict(
+            {"nombre": clase_nombre, "clase_data": clase_data, "profundidad": profundidad, "orden": orden},
+            functools.partial(_compilar_clase_congelada, traversal, clase_nombre, clase_data, ficheros)
+        )
+    _compilar_en_segundo_plano(traversal, ley)
+
+
+def _compilar_clase_congelada(traversal: Any, clase_nombre: str, clase_data: Mapping,
+                              ficheros: Dict[str, Any]) -> Dict[str, Any]:
+    return freeze(_compilar_clase(traversal, clase_nombre, clase_data, ficheros))
+
+
+def _compilar_en_segundo_plano(traversal: Any, ley: str):
+    """Compila el plan de la ley en un hilo aparte (una sola compilación en curso por traversal y ley)."""
+    clave = (id(traversal), ley)
+    with _planes_lock:
+        if clave in _compilando:
+            return
+        _compilando.add(clave)
+
+    def compilar():
+        try:
+            precompilar_planes(traversal, [ley])
+        finally:
+            with _planes_lock:
+                _compilando.discard(clave)
+
+    threading.Thread(target=compilar, name=f"plan-{ley}", daemon=True).start()
+
+
+def precompilar_planes(traversal: Any, leyes: List[str]):
+    """Compila los planes de las leyes indicadas (al cargar la ontología)."""
+    for ley in leyes:
+        try:
+            obtener_plan(traversal, ley)
+        except Exception as e:
+            print(f"✗ Error compilando el plan de decisión '{ley}': {e}")
+
+
+def diagnostico_planes(traversal: Any) -> Dict[str, Any]:
+    """Estadísticas (tiempo de compilación, tamaño...) de los planes del traversal."""
+    with _planes_lock:
+        planes = dict(_planes.get(traversal, {}))
+    return {
+        ley: {"ontology_version": plan["ontology_version"], "vigente": _plan_vigente(traversal, plan),
+              **plan["estadisticas"]}
+        for ley, plan in planes.items()
+    }
@@ -73,6 +73,7 @@ class AnalisisClase(BaseModel):
     entidades: List[EntidadClase] #= Field(default_factory=list)
     profundidad: int
     orden: int
+    reutilizados: int = 0  # Respuestas tomadas de contextos ya evaluados (sin llamar al LLM)
 
     # def __eq__(self, other):
     #     if not isinstance(other, AnalisisClase):
@@ -98,6 +99,10 @@ class AnalisisAtestado(BaseModel):
 class ListaAnalisis(BaseModel):
     nombre_grafo: str
     respuestas: List[AnalisisAtestado]
+    llm: Optional[Dict[str, Any]] = None  # Resumen de las llamadas al LLM (AtestadoLLM.resumen_llamadas)
+    telemetria: Optional[Dict[str, Any]] = None  # Coste y latencia por clase y pregunta (llm_telemetry)
+    especulacion: Optional[Dict[str, Any]] = None  # Llamadas especulativas útiles y desperdiciadas por ley (question_scheduler)
+    cascada: Optional[Dict[str, Any]] = None  # Tasa de escalado y ahorro de la cascada de modelos (llm_cascade)
 
 
 # resultado_extraido = {
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+LLM simulado compatible con la API de OpenAI que reproduce respuestas grabadas.
+
+Permite medir y probar 'decisionTree.analizarAtestado' de extremo a extremo sin acceso a
+OpenRouter. Las respuestas se guardan en ficheros de fixtures con la clave
+(sha256 del mensaje de sistema con el atestado, pregunta, esquema de salida): ni el modelo ni
+los mensajes intermedios forman parte de la clave, de modo que las mismas fixtures sirven en
+modo historial e independiente. Las llamadas compuestas de los lotes de preguntas
+(campos 'pregunta_<i>', ver LLM_BATCH_SIZE) se responden pregunta a pregunta.
+
+- Reproducción: FakeLLM se usa dentro del proceso como sustituto de 'decisionTree.client'
+  (``chat.completions.create``) o como servidor HTTP (POST .../chat/completions) al que apuntar
+  OPENROUTER_URL. Las preguntas que no están en las fixtures se responden con una respuesta
+  sintética determinista construida a partir del texto del atestado (o con un error 404).
+- Latencia: fija, uniforme, normal, lognormal o la grabada (ver LatencyModel).
+- Errores inyectados: 429, 503 y timeouts con las probabilidades indicadas.
+- Grabación: RecordingClient envuelve el cliente real y guarda cada respuesta (modo 'record').
+- Síntesis: el modo 'synthesize' genera fixtures sin red, con las respuestas de un análisis
+  real guardado (report_examples/1INFORME_Atestado1.json) cuando la pregunta coincide y
+  respuestas sintéticas en el resto. Así se han generado las de benchmarks/fixtures/llm/.
+
+Uso (desde backend/):
+    python fake_llm_server.py serve [--fixtures benchmarks/fixtures/llm] [--port 8765]
+                                    [--latency lognormal:800:0.5] [--rate-429 0.05] [--rate-timeout 0.01]
+    python fake_llm_server.py record --atestado ../report_examples/1.INFORME_Atestado1.docx --output f.json
+    python fake_llm_server.py synthesize --atestado ../report_examples/1.INFORME_Atestado1.docx --output f.json
+                                         [--seed-run ../report_examples/1INFORME_Atestado1.json]
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "llm")
+FIXTURE_FORMAT = 1
+
+# Sección de cada pregunta en el prompt de una llamada compuesta (decisionTree.preguntar_lote)
+_BATCH_SECTION = "\n\n### "
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Texto de un mensaje, también con contenido en partes (marcas cache_control)"""
+    content = message.get("content")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def document_key(messages: List[Dict[str, Any]]) -> str:
+    """SHA-256 del mensaje de sistema (instrucciones + atestado)"""
+    return hashlib.sha256(message_text(messages[0]).encode("utf-8")).hexdigest()
+
+
+def request_key(document_sha256: str, prompt: str, schema: Any) -> str:
+    """Clave de una respuesta: atestado, pregunta y esquema de salida"""
+    payload = json.dumps([document_sha256, prompt, schema], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_schema(kwargs: Dict[str, Any]) -> Any:
+    """Esquema JSON de la petición (response_format directo o dentro de extra_body)"""
+    response_format = kwargs.get("response_format") or (kwargs.get("extra_body") or {}).get("response_format") or {}
+    return (response_format.get("json_schema") or {}).get("schema")
+
+
+def is_batch_schema(schema: Any) -> bool:
+    properties = (schema or {}).get("properties") or {}
+    return bool(properties) and all(name.startswith("pregunta_") for name in properties)
+
+
+def split_batch_prompt(prompt: str) -> Dict[str, str]:
+    """Pregunta de cada campo 'pregunta_<i>' de un prompt compuesto"""
+    sections = {}
+    for section in prompt.split(_BATCH_SECTION)[1:]:
+        name, _, text = section.partition("\n")
+        sections[name.strip()] = text
+    return sections
+
+
+class FixtureStore:
+    """Respuestas grabadas por clave (ver request_key), cargadas de uno o varios ficheros JSON"""
+
+    def __init__(self, paths: Optional[List[str]] = None):
+        """
+        Args:
+            paths: Ficheros de fixtures o directorios con ficheros *.json
+        """
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.documents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        for path in paths or []:
+            files = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+            for file in files:
+                self.load(file)
+
+    def load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FIXTURE_FORMAT:
+            raise ValueError(f"Formato de fixtures no soportado en {path}: {data.get('format')}")
+        with self._lock:
+            self.entries.update(data.get("entries", {}))
+            if data.get("document_sha256"):
+                self.documents[data["document_sha256"]] = data.get("document", "")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self.entries[key] = entry
+
+    def save(self, path: str, document: str = "", document_sha256: str = ""):
+        """Guarda las entradas ordenadas por clave (ficheros estables entre ejecuciones)"""
+        with self._lock:
+            data = {"format": FIXTURE_FORMAT, "document": document, "document_sha256": document_sha256,
+                    "entries": dict(sorted(self.entries.items()))}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class LatencyModel:
+    """
+    Distribución de la latencia simulada por petición (en milisegundos)
+
+    Especificaciones:
+        "0"                      sin latencia
+        "fixed:MS"               constante
+        "uniform:MIN:MAX"        uniforme
+        "normal:MEDIA:DESV"      normal (truncada en 0)
+        "lognormal:MEDIANA:SIGMA" lognormal (cola larga, como los LLM reales)
+        "recorded[:ESCALA]"      la grabada en la fixture (multiplicada por ESCALA)
+    """
+
+    def __init__(self, spec: str = "0"):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("0", "fixed", "uniform", "normal", "lognormal", "recorded"):
+            raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+    def sample_ms(self, rng: random.Random, recorded_ms: Optional[float] = None) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p[0]), p[1])
+        if self.kind == "recorded":
+            return (recorded_ms or 0.0) * (p[0] if p else 1.0)
+        return 0.0
+
+
+class FakeAPIError(Exception):
+    """Error HTTP simulado con 'status_code' y cabeceras, como los de la librería openai"""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+# ---- Respuestas sintéticas ----
+
+_ENTITY_RE = re.compile(r"\b[A-ZÁÉÍÓÚÑ][\wáéíóúñü]+(?: (?:de |del |la )?[A-ZÁÉÍÓÚÑ][\wáéíóúñü]+)*")
+
+
+def _candidates(document: str) -> List[str]:
+    """Nombres propios / términos en mayúscula del atestado, sin repetir, en orden de aparición"""
+    seen = []
+    for match in _ENTITY_RE.findall(document):
+        if len(match) > 3 and match not in seen:
+            seen.append(match)
+    return seen or ["Elemento"]
+
+
+def _fragment(document: str, term: str) -> str:
+    """Frase del atestado que contiene el término"""
+    position = document.find(term)
+    if position < 0:
+        return term
+    start = max(document.rfind(".", 0, position), document.rfind("\n", 0, position)) + 1
+    end = min([i for i in (document.find(".", position), document.find("\n", position)) if i >= 0] or [len(document)])
+    return document[start:end].strip()[:200]
+
+
+def _synthetic_value(schema: Dict[str, Any], h: int, document: str, candidates: List[str]) -> Any:
+    kind = schema.get("type")
+    if kind in ("number", "integer"):
+        return h % 100
+    if kind == "boolean":
+        return bool(h % 2)
+    if kind == "string":
+        return candidates[h % len(candidates)]
+    if kind == "array":
+        return [_synthetic_value(schema.get("items") or {"type": "string"}, h >> 8, document, candidates)]
+    if kind == "object":
+        return {name: _synthetic_value(sub, h >> (5 * i), document, candidates)
+                for i, (name, sub) in enumerate((schema.get("properties") or {}).items())}
+    return None
+
+
+def synthesize_response(document: str, prompt: str, schema: Any) -> Dict[str, Any]:
+    """
+    Respuesta sintética determinista (depende solo de atestado, pregunta y esquema)
+
+    Las listas de 'respuesta' toman 0-3 términos en mayúscula del atestado (vacía una de cada seis
+    veces, para que el árbol también pode ramas) y 'referencia' la frase del atestado donde aparece
+    cada uno.
+    """
+    h = int(hashlib.sha256(f"{prompt}\x00{json.dumps(schema, sort_keys=True)}".encode("utf-8")).hexdigest(), 16)
+    properties = (schema or {}).get("properties") or {}
+    answer = properties.get("respuesta") or {}
+    candidates = _candidates(document)
+    if answer.get("type") == "array":
+        chosen = []
+        for i in range((0, 1, 1, 2, 2, 3)[h % 6]):
+            term = candidates[(h >> (8 * (i + 1))) % len(candidates)]
+            if term not in chosen:
+                chosen.append(term)
+        return {"respuesta": chosen, "referencia": [[_fragment(document, term)] for term in chosen]}
+    response = {name: _synthetic_value(sub, h >> (3 * i), document, candidates)
+                for i, (name, sub) in enumerate(properties.items())}
+    return response
+
+
+class FakeLLM:
+    """Servidor LLM simulado: reproducción de fixtures, latencia, errores inyectados y contadores"""
+
+    def __init__(self, store: Optional[FixtureStore] = None, latency: str = "0", rate_429: float = 0.0,
+                 rate_5xx: float = 0.0, rate_timeout: float = 0.0, timeout_seconds: float = 1.0,
+                 on_miss: str = "synthesize", seed: int = 0, sleep=time.sleep):
+        """
+        Args:
+            store: Respuestas grabadas (vacío = todo sintético)
+            latency: Distribución de la latencia (ver LatencyModel)
+            rate_429: Probabilidad de responder 429 (límite de ritmo)
+            rate_5xx: Probabilidad de responder 503
+            rate_timeout: Probabilidad de no responder (timeout)
+            timeout_seconds: Espera antes del timeout (acotada por el 'timeout' de la petición)
+            on_miss: "synthesize" (respuesta sintética) o "error" (404) si la pregunta no está grabada
+            seed: Semilla de la latencia y los errores
+            sleep: Función de espera (inyectable en las pruebas)
+        """
+        if on_miss not in ("synthesize", "error"):
+            raise ValueError(f"on_miss desconocido: {on_miss}")
+        self.store = store if store is not None else FixtureStore()
+        self.latency = LatencyModel(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_timeout = rate_timeout
+        self.timeout_seconds = timeout_seconds
+        self.on_miss = on_miss
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "hits": 0, "misses": 0, "synthesized": 0, "throttled": 0,
+                         "server_errors": 0, "timeouts": 0, "in_flight": 0, "peak_in_flight": 0}
+        # Interfaz del cliente OpenAI (client.chat.completions.create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+            if counter == "in_flight":
+                self.counters["peak_in_flight"] = max(self.counters["peak_in_flight"], self.counters["in_flight"])
+
+    def _draw(self) -> Tuple[Optional[str], random.Random]:
+        with self._lock:
+            roll = self._rng.random()
+            latency_rng = random.Random(self._rng.random())
+        fault = None
+        if roll < self.rate_429:
+            fault = "429"
+        elif roll < self.rate_429 + self.rate_5xx:
+            fault = "503"
+        elif roll < self.rate_429 + self.rate_5xx + self.rate_timeout:
+            fault = "timeout"
+        return fault, latency_rng
+
+    def _answer(self, document_sha256: str, document: str, prompt: str, schema: Any) -> Tuple[Any, Optional[float]]:
+        """Respuesta (dict) y latencia grabada de una pregunta suelta"""
+        entry = self.store.get(request_key(document_sha256, prompt, schema))
+        if entry is not None:
+            self._count("hits")
+            return json.loads(entry["response"]), entry.get("latency_ms")
+        self._count("misses")
+        if self.on_miss == "error":
+            raise FakeAPIError(404, f"Respuesta no grabada para la pregunta: {prompt[:80]}")
+        self._count("synthesized")
+        return synthesize_response(document, prompt, schema), None
+
+    def complete(self, model: str, messages: List[Dict[str, Any]], schema: Any,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Respuesta en formato chat.completion de la API de OpenAI (como dict)
+
+        Raises:
+            FakeAPIError: 429/503 inyectados, o 404 si la pregunta no está grabada y on_miss="error"
+            TimeoutError: Timeout inyectado
+        """
+        self._count("requests")
+        self._count("in_flight")
+        try:
+            fault, latency_rng = self._draw()
+            if fault == "429":
+                self._count("throttled")
+                raise FakeAPIError(429, "Rate limit exceeded (simulado)", retry_after=None)
+            if fault == "503":
+                self._count("server_errors")
+                raise FakeAPIError(503, "Service unavailable (simulado)")
+            if fault == "timeout":
+                self._count("timeouts")
+                self._sleep(min(self.timeout_seconds, timeout or self.timeout_seconds))
+                raise TimeoutError("Request timed out (simulado)")
+
+            document_sha256 = document_key(messages)
+            document = message_text(messages[0])
+            prompt = message_text(messages[-1])
+            if is_batch_schema(schema):
+                sections = split_batch_prompt(prompt)
+                content, recorded = {}, []
+                for name, sub_schema in schema["properties"].items():
+                    answer, latency_ms = self._answer(document_sha256, document, sections.get(name, ""), sub_schema)
+                    content[name] = answer
+                    recorded.append(latency_ms or 0.0)
+                recorded_ms = max(recorded, default=0.0)
+            else:
+                content, recorded_ms = self._answer(document_sha256, document, prompt, schema)
+            self._sleep(self.latency.sample_ms(latency_rng, recorded_ms) / 1000)
+
+            text = json.dumps(content, ensure_ascii=False)
+            prompt_tokens = sum(len(message_text(m)) for m in messages) // 4
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                          "total_tokens": prompt_tokens + len(text) // 4,
+                          "prompt_tokens_details": {"cached_tokens": 0}}
+            }
+        finally:
+            self._count("in_flight", -1)
+
+    def create(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> Any:
+        """Sustituto en proceso de client.chat.completions.create"""
+        completion = self.complete(model, messages, response_schema(kwargs), kwargs.get("timeout"))
+        return _namespace(completion)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "fixtures": len(self.store), "latency": self.latency.spec,
+                    "rate_429": self.rate_429, "rate_5xx": self.rate_5xx, "rate_timeout": self.rate_timeout}
+
+
+def _namespace(value: Any) -> Any:
+    """dict -> SimpleNamespace recursivo (acceso por atributos como en los objetos de openai)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(v) for v in value]
+    return value
+
+
+class RecordingClient:
+    """Envuelve un cliente OpenAI y graba cada respuesta en un FixtureStore"""
+
+    def __init__(self, client: Any, store: FixtureStore, origin: str = "recorded"):
+        self.client = client
+        self.store = store
+        self.origin = origin
+        self.recorded = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> Any:
+        start = time.perf_counter()
+        completion = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        schema = response_schema(kwargs)
+        content = completion.choices[0].message.content
+        document_sha256 = document_key(messages)
+        prompt = message_text(messages[-1])
+        if is_batch_schema(schema):
+            # Se graban las preguntas sueltas: las fixtures sirven con y sin lotes
+            sections = split_batch_prompt(prompt)
+            answers = json.loads(content)
+            items = [(sections.get(name, ""), sub, answers.get(name)) for name, sub in schema["properties"].items()
+                     if name in answers]
+        else:
+            items = [(prompt, schema, json.loads(content))]
+        for question, sub_schema, answer in items:
+            self.store.put(request_key(document_sha256, question, sub_schema), {
+                "prompt": question,
+                "model": model or "",
+                "origin": self.origin,
+                "latency_ms": latency_ms,
+                "response": json.dumps(answer, ensure_ascii=False)
+            })
+            self.recorded += 1
+        return completion
+
+
+# ---- Servidor HTTP ----
+
+def make_handler(fake: FakeLLM):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._json(200, fake.stats())
+            else:
+                self._json(404, {"error": {"message": "Not found", "code": 404}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "Not found", "code": 404}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            try:
+                completion = fake.complete(body.get("model", ""), body.get("messages", []), response_schema(body))
+            except FakeAPIError as e:
+                headers = {"Retry-After": e.response.headers["retry-after"]} if "retry-after" in e.response.headers else {}
+                self._json(e.status_code, {"error": {"message": str(e), "code": e.status_code}}, headers)
+                return
+            except TimeoutError:
+                # Sin respuesta: se cierra la conexión como haría un proveedor colgado
+                self.close_connection = True
+                return
+            self._json(200, completion)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(fake: FakeLLM, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Servidor HTTP (sin arrancar: usar serve_forever) con POST .../chat/completions y GET .../stats"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    return server
+
+
+# ---- Grabación y síntesis de fixtures ----
+
+def _seed_answers(path: str) -> Dict[str, Dict[str, Any]]:
+    """Respuestas de un análisis guardado (ListaAnalisis en JSON): pregunta -> respuesta y referencias"""
+    with open(path, "r", encoding="utf-8") as f:
+        run = json.load(f)
+    answers: Dict[str, Dict[str, Any]] = {}
+    for analysis in run.get("respuestas", []):
+        references: Dict[str, List[str]] = {}
+        for obj in analysis.get("objetos", []):
+            references.setdefault(str(obj.get("entidad_rango")), (obj.get("referencia") or "").split("|"))
+        contexts = analysis.get("contexto_positivo", []) + analysis.get("contexto_negativo", [])
+        contexts += [c for a in analysis.get("analisis", []) for c in a.get("contexto", [])]
+        for context in contexts:
+            answers.setdefault(context.get("prompt"), {"respuesta": context.get("respuesta"),
+                                                       "nombre_elemento": context.get("nombre_elemento"),
+                                                       "referencias": references})
+    return answers
+
+
+class _SeededFake(FakeLLM):
+    """FakeLLM que responde con un análisis real guardado cuando la pregunta coincide"""
+
+    def __init__(self, seed_answers: Dict[str, Dict[str, Any]], **kwargs):
+        super().__init__(**kwargs)
+        self.seed_answers = seed_answers
+        self.imported_keys = set()
+
+    def _answer(self, document_sha256, document, prompt, schema):
+        seed = self.seed_answers.get(prompt)
+        answer_schema = ((schema or {}).get("properties") or {}).get("respuesta") or {}
+        if seed is not None:
+            value = seed["respuesta"]
+            if answer_schema.get("type") == "array" and isinstance(value, list):
+                self.imported_keys.add(request_key(document_sha256, prompt, schema))
+                return {"respuesta": value,
+                        "referencia": [seed["referencias"].get(str(v), [_fragment(document, str(v))]) for v in value]}, None
+            fields = list((answer_schema.get("properties") or {}))
+            if answer_schema.get("type") == "object" and len(fields) == 1 and not isinstance(value, (list, dict)):
+                self.imported_keys.add(request_key(document_sha256, prompt, schema))
+                return {"respuesta": {fields[0]: value}}, None
+        return super()._answer(document_sha256, document, prompt, schema)
+
+
+def _run_tree(texto: str, client: Any, law: str, max_in_flight: int):
+    """Ejecuta el árbol de decisión completo con 'client' como cliente del LLM (sin caché de respuestas)"""
+    import decisionTree
+    import decision_plan
+    import llm_cache
+    from local_traversal import LocalQuestionsTraversal
+
+    # El cliente y la caché se restauran al terminar, para otros análisis del mismo proceso
+    cache_enabled, previous_client = llm_cache.LLM_CACHE_ENABLED, decisionTree.client
+    llm_cache.LLM_CACHE_ENABLED = False
+    decisionTree.client = client
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            traversal = LocalQuestionsTraversal(os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl"))
+            decision_plan.obtener_plan(traversal, law)
+            for modo in (decisionTree.MODO_INDEPENDIENTE, decisionTree.MODO_HISTORIAL):
+                atestado_llm = decisionTree.AtestadoLLM(texto, modo=modo)
+                decisionTree.analizarAtestado(atestado_llm, "atestado", [law], traversal, max_in_flight=max_in_flight)
+    finally:
+        llm_cache.LLM_CACHE_ENABLED = cache_enabled
+        decisionTree.client = previous_client
+    return atestado_llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Servidor HTTP compatible con OpenAI")
+    serve_parser.add_argument("--fixtures", nargs="*", default=[DEFAULT_FIXTURES])
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", default="0")
+    serve_parser.add_argument("--rate-429", type=float, default=0.0)
+    serve_parser.add_argument("--rate-5xx", type=float, default=0.0)
+    serve_parser.add_argument("--rate-timeout", type=float, default=0.0)
+    serve_parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    serve_parser.add_argument("--on-miss", choices=["synthesize", "error"], default="synthesize")
+    serve_parser.add_argument("--seed", type=int, default=0)
+
+    for name, help_text in (("record", "Graba un análisis real (llamadas a OPENROUTER_URL)"),
+                            ("synthesize", "Genera fixtures sin red")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--atestado", required=True)
+        p.add_argument("--output", required=True)
+        p.add_argument("--law", default="PropertyCrimeReport")
+        p.add_argument("--max-in-flight", type=int, default=4)
+        if name == "synthesize":
+            p.add_argument("--seed-run", help="Análisis guardado (JSON) cuyas respuestas se reutilizan")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        fake = FakeLLM(FixtureStore(args.fixtures), args.latency, args.rate_429, args.rate_5xx, args.rate_timeout,
+                       args.timeout_seconds, args.on_miss, args.seed)
+        server = serve(fake, args.host, args.port)
+        print(f"🧪 LLM simulado en http://{args.host}:{args.port}/v1 ({len(fake.store)} respuestas grabadas, "
+              f"latencia {args.latency}); OPENROUTER_URL=http://{args.host}:{args.port}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"\n📊 {fake.stats()}")
+        return
+
+    sys.path.insert(0, BACKEND_DIR)
+    from documents import leer_docx
+    import decisionTree
+
+    texto = leer_docx(os.path.abspath(args.atestado))
+    store = FixtureStore()
+    if args.command == "record":
+        client = RecordingClient(decisionTree.client, store)
+    else:
+        seed_answers = _seed_answers(args.seed_run) if args.seed_run else {}
+        client = RecordingClient(_SeededFake(seed_answers), store, origin="synthetic")
+    atestado_llm = _run_tree(texto, client, args.law, args.max_in_flight)
+    document_sha256 = document_key(atestado_llm.mensajes)
+    if args.command == "synthesize":
+        for key, entry in store.entries.items():
+            entry["origin"] = "imported" if key in client.client.imported_keys else "synthetic"
+            entry["latency_ms"] = None
+    store.save(args.output, os.path.basename(args.atestado), document_sha256)
+    origins = {}
+    for entry in store.entries.values():
+        origins[entry["origin"]] = origins.get(entry["origin"], 0) + 1
+    print(f"💾 {len(store)} respuestas en {args.output}: {origins}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Caché persistente (SQLite) de las respuestas del LLM.
+
+Las llamadas se hacen con temperature=0 y top_p=1.0, de modo que volver a subir el mismo
+atestado a /procesarG/ (o repetir un análisis interrumpido) repite exactamente las mismas
+preguntas. La caché guarda cada respuesta con la clave
+(sha256 del atestado, modelo, pregunta, esquema de salida, modo de conversación, contexto),
+donde el contexto son los mensajes enviados entre el atestado y la pregunta (el historial
+en modo historial, la cadena de dependencias en modo independiente): la misma pregunta con
+otro contexto previo puede tener otra respuesta.
+
+El fichero se comparte entre hilos y procesos. Las entradas caducan a los LLM_CACHE_TTL
+segundos y, si el tamaño total de las respuestas supera LLM_CACHE_MAX_MB, se expulsan las
+usadas hace más tiempo (LRU). Solo se guardan las respuestas que son JSON y cumplen su esquema
+de salida (ver response_problem).
+
+La caché está desactivada por defecto: la clave no incluye el código que construye los mensajes
+ni la versión del proveedor del modelo, así que tras un cambio de ese tipo una caché activa
+devolvería respuestas antiguas hasta que caducan. Para repetir una pregunta sin usar la caché
+(y guardar la respuesta nueva) se crea AtestadoLLM con usar_cache=False; para empezar de cero se
+borra el fichero LLM_CACHE_PATH.
+
+Configuración:
+    LLM_CACHE          "1"/"true" activa la caché (desactivada por defecto)
+    LLM_CACHE_PATH     Fichero SQLite (por defecto <tmp>/llm_cache.sqlite3)
+    LLM_CACHE_MAX_MB   Tamaño máximo de las respuestas guardadas (por defecto 256)
+    LLM_CACHE_TTL      Segundos de validez de una respuesta (por defecto 30 días; 0 = sin caducidad)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "0").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "llm_cache.sqlite3"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+_default_cache: Optional["LLMResponseCache"] = None
+_default_lock = threading.Lock()
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str, "number": (int, float), "integer": int,
+               "boolean": bool, "null": type(None)}
+
+
+def document_hash(text: str) -> str:
+    """SHA-256 del texto del atestado"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(document_sha256: str, model: str, prompt: str, output_schema: Any, mode: str,
+              context: List[Dict[str, Any]]) -> str:
+    """
+    Clave de una llamada al LLM
+
+    Args:
+        document_sha256: Hash del atestado (ver document_hash)
+        model: Modelo consultado
+        prompt: Pregunta
+        output_schema: Esquema JSON de la respuesta estructurada
+        mode: Modo de conversación
+        context: Mensajes enviados entre el atestado y la pregunta
+
+    Returns:
+        SHA-256 (hexadecimal) de todos los componentes
+    """
+    payload = json.dumps([document_sha256, model, prompt, output_schema, mode, context],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schema_violation(value: Any, schema: Any, path: str = "$") -> Optional[str]:
+    """
+    Primera discrepancia entre el valor y el esquema JSON (subconjunto usado en los formatos de
+    extracción: type, properties, required, additionalProperties, items, enum)
+
+    Returns:
+        Descripción de la discrepancia, o None si el valor cumple el esquema
+    """
+    if not isinstance(schema, dict):
+        return None
+    kinds = schema.get("type")
+    if kinds is not None:
+        kinds = kinds if isinstance(kinds, list) else [kinds]
+        matches = [k for k in kinds if k in _JSON_TYPES and isinstance(value, _JSON_TYPES[k])
+                   and not (k in ("number", "integer") and isinstance(value, bool))]
+        if not matches and any(k in _JSON_TYPES for k in kinds):
+            return f"{path}: se esperaba {'/'.join(kinds)}"
+    if "enum" in schema and value not in schema["enum"]:
+        return f"{path}: valor fuera de enum"
+    if isinstance(value, dict):
+        properties = schema.get("properties") or {}
+        for name in schema.get("required", ()):
+            # Solo se exigen los campos definidos (algunos formatos piden 'respuesta' sin definirla)
+            if name in properties and name not in value:
+                return f"{path}.{name}: falta"
+        if schema.get("additionalProperties") is False and properties:
+            extra = sorted(set(value) - set(properties))
+            if extra:
+                return f"{path}: campos no permitidos {extra}"
+        for name, sub_schema in properties.items():
+            if name in value:
+                violation = schema_violation(value[name], sub_schema, f"{path}.{name}")
+                if violation:
+                    return violation
+    if isinstance(value, list) and isinstance(schema.get("items"), dict):
+        for i, item in enumerate(value):
+            violation = schema_violation(item, schema["items"], f"{path}[{i}]")
+            if violation:
+                return violation
+    return None
+
+
+def response_problem(response: str, output_schema: Any) -> Optional[str]:
+    """
+    Motivo por el que una respuesta del LLM no debe guardarse en la caché
+
+    Args:
+        response: Contenido devuelto por el modelo
+        output_schema: Esquema JSON de la respuesta estructurada
+
+    Returns:
+        "no es JSON", la discrepancia con el esquema (ver schema_violation) o None si es válida
+    """
+    try:
+        value = json.loads(response)
+    except json.JSONDecodeError:
+        return "no es JSON"
+    return schema_violation(value, output_schema)
+
+
+class LLMResponseCache:
+    """Respuestas del LLM en SQLite con caducidad, expulsión LRU por tamaño y contadores"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+                 ttl_seconds: int = LLM_CACHE_TTL):
+        """
+        Args:
+            path: Fichero SQLite (se crea si no existe)
+            max_bytes: Tamaño máximo de las respuestas guardadas
+            ttl_seconds: Validez de una respuesta en segundos (0 = sin caducidad)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, document TEXT NOT NULL, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Respuesta guardada (y la marca como usada) o None si no está o ha caducado"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, document_sha256: Optional[str] = "", model: Optional[str] = ""):
+        """Guarda la respuesta y expulsa las menos usadas recientemente si se supera max_bytes"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, document, model, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", (key, document_sha256 or "", model or "", response, size, now, now)
+            )
+            self._evict()
+
+    def record_bypass(self):
+        """Cuenta una consulta que se saltó la caché a petición del llamante"""
+        with self._lock:
+            self.bypassed += 1
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.evicted += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Vacía la caché (los contadores se conservan)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Entradas, tamaño, aciertos, fallos, saltos, caducadas, expulsadas y tasa de aciertos"""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            total = self.hits + self.misses
+            return {
+                "enabled": True,
+                "path": self.path,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def default_cache() -> Optional[LLMResponseCache]:
+    """Caché compartida del proceso, o None si LLM_CACHE la desactiva"""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
+
+
+def default_cache_stats() -> Dict[str, Any]:
+    """Contadores de la caché compartida (para diagnóstico)"""
+    cache = default_cache()
+    return cache.stats() if cache else {"enabled": False}
@@ -0,0 +1,214 @@
+"""
+Cascada de modelos: un modelo rápido y barato responde primero a cada pregunta y solo se repite
+con el modelo principal (``llm_preferente`` o DEFAULT_LLM) si su respuesta no es fiable:
+
+- "esquema": no es JSON o no cumple el esquema de salida ('formato_extraccion').
+- "vacia": la respuesta está vacía (lista u objeto sin valores), que con el modelo rápido puede
+  ser un falso negativo que poda toda la rama.
+- "referencia": algún fragmento de 'referencia' no aparece en el texto del atestado (sin
+  distinguir mayúsculas ni espacios), o un elemento de la respuesta no tiene ninguno.
+
+La política se configura por tipo de pregunta en la clave de primer nivel "cascada" de
+preguntas_extendido.json:
+
+    "cascada": {
+        "modelo": "openai/gpt-4.1-nano",
+        "tipos": {
+            "lista": {"escalar_si": ["esquema", "vacia", "referencia"]},
+            "propiedad": {"escalar_si": ["esquema", "vacia"]},
+            "simple": {"activa": false}
+        }
+    }
+
+El tipo de una pregunta es su campo "tipo" o, si no lo tiene, "lista" si su 'respuesta' es una
+lista y "propiedad" en otro caso. Cada pregunta puede sustituir la política de su tipo con su
+propia clave "cascada" (false, o un objeto con "modelo", "escalar_si" o "activa"). Al cargar el
+fichero (``question_registry``) cada pregunta con cascada recibe su política resuelta en
+"_cascada"; sin modelo rápido (ni en el fichero ni en LLM_CASCADE_MODEL) no hay cascada.
+
+Las decisiones de cada pregunta y las llamadas etiquetadas (``llm_telemetry.tag(cascada=...)``)
+dan la tasa de escalado y el ahorro estimado de tiempo de LLM y coste frente a preguntar todo
+al modelo principal (``summary``).
+
+Configuración:
+    LLM_CASCADE_MODEL  Modelo rápido si el fichero no indica otro (por defecto ninguno: sin cascada)
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import llm_telemetry
+from llm_cache import schema_violation
+
+LLM_CASCADE_MODEL = os.getenv("LLM_CASCADE_MODEL", "")
+
+REASONS = ("esquema", "vacia", "referencia")
+# Clave de primer nivel del fichero de preguntas y clave resuelta en cada pregunta
+CONFIG_KEY = "cascada"
+POLICY_KEY = "_cascada"
+
+
+def question_type(question: Dict[str, Any]) -> str:
+    """Tipo de la pregunta: su campo "tipo", o "lista"/"propiedad" según el esquema de 'respuesta'"""
+    if question.get("tipo"):
+        return question["tipo"]
+    answer = ((question.get("formato_extraccion") or {}).get("properties") or {}).get("respuesta") or {}
+    return "lista" if answer.get("type") == "array" else "propiedad"
+
+
+def resolve_policy(question: Dict[str, Any], config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Política de cascada de una pregunta
+
+    Args:
+        question: Pregunta de preguntas_extendido.json
+        config: Sección "cascada" del fichero (puede estar vacía)
+
+    Returns:
+        {"modelo": modelo rápido, "escalar_si": motivos de escalado}, o None si la pregunta no
+        usa cascada
+    """
+    override = question.get(CONFIG_KEY)
+    if override is False:
+        return None
+    policy = {"modelo": config.get("modelo") or LLM_CASCADE_MODEL, "escalar_si": list(REASONS), "activa": True}
+    policy.update((config.get("tipos") or {}).get(question_type(question)) or {})
+    if isinstance(override, dict):
+        policy.update(override)
+    if not policy["activa"] or not policy["modelo"] or question.get("llm_preferente") == policy["modelo"]:
+        return None
+    return {"modelo": policy["modelo"], "escalar_si": [r for r in policy["escalar_si"] if r in REASONS]}
+
+
+def resolve_policies(content: Any) -> Any:
+    """Añade "_cascada" a cada pregunta con cascada del fichero de preguntas (antes de congelarlo)"""
+    if not isinstance(content, dict):
+        return content
+    config = content.get(CONFIG_KEY) if isinstance(content.get(CONFIG_KEY), dict) else {}
+    for details in content.values():
+        if not isinstance(details, dict):
+            continue
+        for question in details.get("preguntas", ()):
+            if isinstance(question, dict):
+                policy = resolve_policy(question, config)
+                if policy is not None:
+                    question[POLICY_KEY] = policy
+    return content
+
+
+# ---- Validación de la respuesta del modelo rápido ----
+
+def _is_empty(value: Any) -> bool:
+    if isinstance(value, dict):
+        return all(_is_empty(v) for v in value.values())
+    if isinstance(value, list):
+        return all(_is_empty(v) for v in value)
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).casefold().strip()
+
+
+def fragment_found(fragment: str, document: str) -> bool:
+    """El fragmento (o cada trozo, si el modelo lo abrevia con puntos suspensivos) está en el texto"""
+    pieces = [p.strip(" \t\n\"'«»“”‘’.,;:") for p in re.split(r"\.\.\.|…", _normalize(fragment))]
+    pieces = [p for p in pieces if p]
+    return bool(pieces) and all(p in document for p in pieces)
+
+
+def escalation_reason(answer_text: Optional[str], schema: Any, document: str,
+                      criteria: Iterable[str] = REASONS) -> Optional[str]:
+    """
+    Motivo para repetir la pregunta con el modelo principal, o None si la respuesta vale
+
+    Args:
+        answer_text: Respuesta (texto JSON) del modelo rápido
+        schema: Esquema de salida de la pregunta
+        document: Texto del atestado (contexto de la pregunta)
+        criteria: Motivos de escalado activos ("esquema", "vacia", "referencia")
+    """
+    criteria = set(criteria)
+    try:
+        answer = json.loads(answer_text) if isinstance(answer_text, str) else None
+    except json.JSONDecodeError:
+        answer = None
+    if answer is None:
+        return "esquema" if "esquema" in criteria else None
+    if "esquema" in criteria and schema_violation(answer, schema):
+        return "esquema"
+    properties = (schema or {}).get("properties") or {} if isinstance(schema, dict) else {}
+    if not isinstance(answer, dict):
+        return None
+    value = answer.get("respuesta") if "respuesta" in properties else {k: v for k, v in answer.items() if k != "referencia"}
+    if "vacia" in criteria and _is_empty(value):
+        return "vacia"
+    if "referencia" in criteria and "referencia" in properties and isinstance(value, list) and value:
+        references = answer.get("referencia")
+        normalized = _normalize(document)
+        for i in range(len(value)):
+            fragments = references[i] if isinstance(references, list) and i < len(references) else None
+            fragments = [fragments] if isinstance(fragments, str) else fragments
+            if not fragments or not all(isinstance(f, str) and fragment_found(f, normalized) for f in fragments):
+                return "referencia"
+    return None
+
+
+# ---- Resumen ----
+
+def summary(decisions: List[Dict[str, Any]], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Tasa de escalado y ahorro estimado de la cascada en un análisis
+
+    El ahorro compara el tiempo de LLM (suma de latencias) y el coste de las llamadas de la
+    cascada (rápidas y escaladas) con el de preguntar todo al modelo principal, estimado con la
+    media de las llamadas del modelo principal del mismo análisis (escaladas o sin cascada).
+
+    Args:
+        decisions: Decisiones por pregunta (AtestadoLLM.decisiones_cascada)
+        records: Llamadas registradas (AtestadoLLM.registro_llamadas)
+
+    Returns:
+        preguntas, aceptadas, escaladas, tasa_escalado, motivos, llamadas rápidas y escaladas,
+        latencia (ms) y coste (USD, None sin precios) de la cascada, estimación sin cascada y
+        ahorro
+    """
+    escalated = sum(1 for d in decisions if d["motivo"])
+    fresh = [r for r in records if not r.get("respuesta_cacheada")]
+    cascade_calls = [r for r in fresh if r.get("cascada") in ("rapido", "escalado")]
+    strong_calls = [r for r in fresh if r.get("cascada") != "rapido"]
+
+    def total(calls, measure):
+        values = [measure(r) for r in calls]
+        return None if any(v is None for v in values) else sum(values)
+
+    def latency(r):
+        return r.get("latencia_ms") or 0.0
+
+    cascade_latency = total(cascade_calls, latency)
+    cascade_cost = total(cascade_calls, llm_telemetry.call_cost)
+    mean_latency = total(strong_calls, latency) / len(strong_calls) if strong_calls else None
+    strong_cost = total(strong_calls, llm_telemetry.call_cost)
+    mean_cost = strong_cost / len(strong_calls) if strong_calls and strong_cost is not None else None
+    baseline_latency = mean_latency * len(decisions) if mean_latency is not None else None
+    baseline_cost = mean_cost * len(decisions) if mean_cost is not None else None
+    return {
+        "preguntas": len(decisions),
+        "aceptadas": len(decisions) - escalated,
+        "escaladas": escalated,
+        "tasa_escalado": round(escalated / len(decisions), 4) if decisions else None,
+        "motivos": dict(Counter(d["motivo"] for d in decisions if d["motivo"])),
+        "modelos_rapidos": sorted({d["modelo_rapido"] for d in decisions}),
+        "llamadas_rapidas": sum(1 for r in records if r.get("cascada") == "rapido"),
+        "llamadas_escaladas": sum(1 for r in records if r.get("cascada") == "escalado"),
+        "latencia_ms": round(cascade_latency, 2),
+        "latencia_sin_cascada_ms": round(baseline_latency, 2) if baseline_latency is not None else None,
+        "ahorro_latencia_ms": round(baseline_latency - cascade_latency, 2) if baseline_latency is not None else None,
+        "coste_usd": round(cascade_cost, 6) if cascade_cost is not None else None,
+        "coste_sin_cascada_usd": round(baseline_cost, 6) if baseline_cost is not None else None,
+        "ahorro_coste_usd": round(baseline_cost - cascade_cost, 6)
+        if baseline_cost is not None and cascade_cost is not None else None
+    }
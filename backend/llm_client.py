@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Capa de acceso al LLM (OpenRouter) con límites de ritmo, reintentos y concurrencia adaptativa.
+
+Con muchos atestados a la vez (o con el planificador de preguntas) las peticiones que devuelve
+el proveedor con 429 (límite de ritmo) o 5xx abortaban todo el análisis. Esta capa se coloca
+entre AtestadoLLM y el cliente OpenAI y, por modelo:
+
+- Limita el ritmo con dos cubos de fichas (token buckets): peticiones por minuto y tokens de
+  prompt por minuto (estimados como caracteres/4). Las peticiones esperan su turno en orden.
+- Reintenta los 429, los 5xx, los timeouts y los errores de conexión con espera exponencial con
+  jitter completo (``uniform(0, min(máx, base·2^intento))``), respetando la cabecera Retry-After.
+- Ajusta el máximo de peticiones simultáneas según los 429 observados (AIMD): cada respuesta
+  correcta suma 1/límite y cada 429 lo divide por dos, como mucho una vez por "ventana" (las
+  peticiones lanzadas antes de la última reducción no vuelven a reducirlo).
+- Cuenta peticiones, reintentos, 429, errores de servidor, timeouts, fallos definitivos y la
+  espera en cola (cubos y concurrencia) y en los reintentos.
+
+Configuración:
+    LLM_TIMEOUT              Segundos máximos por petición (por defecto 120)
+    LLM_MAX_RETRIES          Reintentos por petición (por defecto 5)
+    LLM_BACKOFF_BASE         Espera base de los reintentos en segundos (por defecto 0.5)
+    LLM_BACKOFF_MAX          Espera máxima entre reintentos en segundos (por defecto 30)
+    LLM_RATE_LIMIT_RPM       Peticiones por minuto y modelo (por defecto 0 = sin límite)
+    LLM_RATE_LIMIT_TPM       Tokens de prompt por minuto y modelo (por defecto 0 = sin límite)
+    LLM_CONCURRENCY_MAX      Máximo de peticiones simultáneas por modelo (por defecto 16)
+    LLM_CONCURRENCY_MIN      Mínimo al que puede bajar el límite adaptativo (por defecto 1)
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import openai
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "16"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+
+# Códigos HTTP que se reintentan (408 timeout del proveedor, 429 límite de ritmo, 5xx)
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+_default_client: Optional["LLMClient"] = None
+_default_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Cubo de fichas: 'rate' fichas por segundo con ráfagas de hasta 'capacity'"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Fichas por segundo (0 = sin límite)
+            capacity: Fichas máximas acumuladas (ráfaga)
+            clock: Reloj monótono (inyectable en las pruebas)
+            sleep: Función de espera (inyectable en las pruebas)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Reserva 'amount' fichas, esperando si no hay suficientes
+
+        Las reservas se hacen en orden de llegada: el saldo puede quedar en negativo y cada
+        petición espera lo que tarda en reponerse su parte.
+
+        Returns:
+            Segundos esperados
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Una petición mayor que el cubo entero pasa cuando el cubo está lleno
+            self._tokens -= min(amount, self.capacity)
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class AIMDLimiter:
+    """Límite de peticiones simultáneas con aumento aditivo y reducción multiplicativa"""
+
+    def __init__(self, maximum: int = LLM_CONCURRENCY_MAX, minimum: int = LLM_CONCURRENCY_MIN,
+                 decrease: float = 0.5):
+        """
+        Args:
+            maximum: Límite inicial y máximo
+            minimum: Límite mínimo
+            decrease: Factor de reducción ante un 429
+        """
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.decrease = decrease
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self.decreases = 0
+        self._started = 0
+        # Peticiones lanzadas antes de esta marca no vuelven a reducir el límite
+        self._window = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> Tuple[int, float]:
+        """
+        Espera un hueco bajo el límite actual
+
+        Returns:
+            Tupla (número de la petición, segundos esperados)
+        """
+        start = time.perf_counter()
+        with self._cond:
+            while self.in_flight >= math.floor(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self._started += 1
+            return self._started, time.perf_counter() - start
+
+    def release(self, ticket: int, throttled: bool = False):
+        """Libera el hueco y ajusta el límite (reducción si la petición recibió un 429)"""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if ticket > self._window:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease)
+                    self._window = self._started
+                    self.decreases += 1
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """Código HTTP de un error del cliente OpenAI (o de un error con 'status_code'), o None"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Segundos de la cabecera Retry-After del error, o None"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_timeout(error: Exception) -> bool:
+    return isinstance(error, (openai.APITimeoutError, TimeoutError))
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx, timeouts y errores de conexión"""
+    if status_code(error) in RETRY_STATUS:
+        return True
+    return isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError))
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Tokens de prompt aproximados (caracteres/4), también con contenido en partes (cache_control)"""
+    chars = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+        else:
+            chars += len(content or "")
+    return chars // 4
+
+
+class _ModelState:
+    """Cubos, límite de concurrencia y contadores de un modelo"""
+
+    def __init__(self, rpm: float, tpm: float, max_concurrency: int, min_concurrency: int):
+        self.requests_bucket = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0))
+        # Ráfaga de hasta un segundo de tokens (mínimo, una petición grande entera)
+        self.tokens_bucket = TokenBucket(tpm / 60.0, max(tpm / 60.0, 1.0))
+        self.limiter = AIMDLimiter(max_concurrency, min_concurrency)
+        self.counters = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "queue_wait_ms": 0.0,
+            "backoff_ms": 0.0
+        }
+
+
+class LLMClient:
+    """Llamadas chat.completions con límites de ritmo, reintentos y concurrencia adaptativa por modelo"""
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, timeout: float = LLM_TIMEOUT,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 rpm: float = LLM_RATE_LIMIT_RPM, tpm: float = LLM_RATE_LIMIT_TPM,
+                 max_concurrency: int = LLM_CONCURRENCY_MAX, min_concurrency: int = LLM_CONCURRENCY_MIN,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        """
+        Args:
+            max_retries: Reintentos por petición
+            timeout: Segundos máximos por petición (parámetro 'timeout' del cliente OpenAI)
+            backoff_base: Espera base de los reintentos en segundos
+            backoff_max: Espera máxima entre reintentos en segundos
+            rpm: Peticiones por minuto y modelo (0 = sin límite)
+            tpm: Tokens de prompt por minuto y modelo (0 = sin límite)
+            max_concurrency: Máximo (e inicial) de peticiones simultáneas por modelo
+            min_concurrency: Mínimo del límite adaptativo
+            sleep: Función de espera de los reintentos (inyectable en las pruebas)
+            rng: Generador aleatorio del jitter
+        """
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._models: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+        # Reintentos y espera de la última petición de cada hilo (telemetría por llamada)
+        self._local = threading.local()
+
+    def _state(self, model: str) -> _ModelState:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                state = self._models[model] = _ModelState(self.rpm, self.tpm, self.max_concurrency,
+                                                          self.min_concurrency)
+            return state
+
+    def _count(self, state: _ModelState, counter: str, amount: float = 1):
+        with self._lock:
+            state.counters[counter] += amount
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Espera antes del reintento 'attempt' (0, 1, ...): jitter completo, o Retry-After si es mayor"""
+        delay = self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        hint = retry_after(error) if error is not None else None
+        return min(self.backoff_max, max(delay, hint or 0.0))
+
+    def create(self, client: Any, model: str, messages: List[Dict[str, Any]], **kwargs) -> Any:
+        """
+        Lanza client.chat.completions.create con los límites y reintentos del modelo
+
+        Args:
+            client: Cliente OpenAI (o compatible)
+            model: Modelo consultado
+            messages: Mensajes de la llamada
+            **kwargs: Resto de parámetros de chat.completions.create
+
+        Returns:
+            Respuesta del cliente
+
+        Raises:
+            La última excepción del cliente si no es reintentable o se agotan los reintentos
+        """
+        state = self._state(model or "")
+        tokens = estimate_tokens(messages)
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        queue_wait = 0.0
+        while True:
+            waited = state.requests_bucket.acquire(1) + state.tokens_bucket.acquire(tokens)
+            ticket, waited_slot = state.limiter.acquire()
+            queue_wait += waited + waited_slot
+            self._count(state, "queue_wait_ms", (waited + waited_slot) * 1000)
+            self._count(state, "requests")
+            try:
+                completion = client.chat.completions.create(model=model, messages=messages, **kwargs)
+            except Exception as e:
+                status = status_code(e)
+                state.limiter.release(ticket, throttled=status == 429)
+                if status == 429:
+                    self._count(state, "throttled")
+                elif status is not None and status >= 500:
+                    self._count(state, "server_errors")
+                elif is_timeout(e):
+                    self._count(state, "timeouts")
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count(state, "failures")
+                    raise
+                delay = self.backoff(attempt, e)
+                print(f"⏳ LLM ({model}): {status or type(e).__name__}, reintento {attempt + 1}/{self.max_retries} "
+                      f"en {delay:.2f} s")
+                self._count(state, "retries")
+                self._count(state, "backoff_ms", delay * 1000)
+                self._sleep(delay)
+                attempt += 1
+                continue
+            state.limiter.release(ticket)
+            self._local.last_call = {"retries": attempt, "queue_wait_ms": round(queue_wait * 1000, 2)}
+            return completion
+
+    def last_call(self) -> Dict[str, Any]:
+        """Reintentos y espera en cola (ms) de la última petición correcta del hilo actual"""
+        return dict(getattr(self._local, "last_call", {"retries": 0, "queue_wait_ms": 0.0}))
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores, límite de concurrencia actual y peticiones en curso por modelo, y totales"""
+        with self._lock:
+            models = {
+                model: {
+                    **{k: round(v, 2) if isinstance(v, float) else v for k, v in state.counters.items()},
+                    "concurrency_limit": round(state.limiter.limit, 2),
+                    "concurrency_decreases": state.limiter.decreases,
+                    "in_flight": state.limiter.in_flight
+                }
+                for model, state in self._models.items()
+            }
+        totals = {counter: round(sum(m[counter] for m in models.values()), 2)
+                  for counter in ("requests", "retries", "throttled", "server_errors", "timeouts", "failures",
+                                  "queue_wait_ms", "backoff_ms")}
+        return {
+            "max_retries": self.max_retries,
+            "timeout_seconds": self.timeout,
+            "rate_limit_rpm": self.rpm,
+            "rate_limit_tpm": self.tpm,
+            "max_concurrency": self.max_concurrency,
+            **totals,
+            "models": models
+        }
+
+
+def default_client() -> LLMClient:
+    """Capa compartida del proceso (los límites por modelo valen para todos los atestados)"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
+
+
+def default_client_stats() -> Dict[str, Any]:
+    """Contadores de la capa compartida (para diagnóstico)"""
+    return default_client().stats()
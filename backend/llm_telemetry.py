@@ -0,0 +1,246 @@
+"""
+Telemetría de las llamadas al LLM: coste y latencia por clase de la ontología y por pregunta.
+
+AtestadoLLM registra cada llamada en 'registro_llamadas' (modelo, tokens de 'completion.usage',
+latencia, reintentos y si la respuesta salió de la caché local). Este módulo añade a cada
+llamada la clase y la pregunta que la originan y agrega los registros:
+
+- tag(clase=..., elemento=...): contexto (contextvars) con la clase y el elemento de la
+  restricción (el 'elemento' de la pregunta en preguntas_extendido.json) que se están
+  procesando. AtestadoLLM lo lee al registrar la llamada; el planificador de preguntas copia el
+  contexto al lanzar cada llamada en su pool, de modo que las llamadas anticipadas se atribuyen
+  a la clase y pregunta que las lanzó.
+- Telemetry: totales por clase, por pregunta (clase, elemento) y por modelo, ordenados por
+  coste, histogramas de latencia y de tokens del prompt y percentiles de latencia. Las
+  respuestas reutilizadas de contextos ya evaluados (sin llamada) se suman por clase.
+- global_telemetry(): acumulado de todos los análisis del proceso (GET /llm/telemetria/).
+
+El coste se estima con los precios de LLM_PRICES; sin precio para el modelo, el coste es None y
+el orden se hace por tokens (prompt no cacheado + respuesta).
+
+Configuración:
+    LLM_PRICES         JSON con el precio en USD por millón de tokens de cada modelo, p.ej.
+                       {"openai/gpt-4.1-mini": {"prompt": 0.4, "cached": 0.1, "completion": 1.6}}
+    LLM_TELEMETRY_TOP  Preguntas más costosas que se incluyen en el resumen (por defecto 10)
+"""
+
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LLM_PRICES: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_PRICES", "{}") or "{}")
+LLM_TELEMETRY_TOP = int(os.getenv("LLM_TELEMETRY_TOP", "10"))
+
+# Límites superiores de los intervalos de los histogramas (el último intervalo no tiene límite)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKEN_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+_tag: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("llm_telemetry_tag", default={})
+
+
+@contextlib.contextmanager
+def tag(**fields: Optional[str]) -> Iterator[Dict[str, str]]:
+    """
+    Atribuye las llamadas al LLM hechas dentro del bloque (se combina con la etiqueta exterior)
+
+    Args:
+        **fields: Campos de la etiqueta, p.ej. clase y elemento
+
+    Yields:
+        La etiqueta en vigor dentro del bloque
+    """
+    current = {**_tag.get(), **{k: v for k, v in fields.items() if v is not None}}
+    token = _tag.set(current)
+    try:
+        yield current
+    finally:
+        _tag.reset(token)
+
+
+def current_tag() -> Dict[str, str]:
+    """Etiqueta de la llamada en curso (vacía fuera de un bloque tag())"""
+    return dict(_tag.get())
+
+
+def call_cost(record: Dict[str, Any]) -> Optional[float]:
+    """Coste estimado en USD de una llamada registrada, o None si no hay precio o tokens"""
+    prices = LLM_PRICES.get(record.get("modelo") or "")
+    if prices is None or record.get("respuesta_cacheada"):
+        return 0.0 if prices is not None else None
+    if record.get("prompt_tokens") is None:
+        return None
+    cached = record.get("cached_tokens") or 0
+    uncached = record["prompt_tokens"] - cached
+    cost = (uncached * prices.get("prompt", 0.0) + cached * prices.get("cached", prices.get("prompt", 0.0))
+            + (record.get("completion_tokens") or 0) * prices.get("completion", 0.0))
+    return cost / 1_000_000
+
+
+class Histogram:
+    """Recuento por intervalos [límite anterior, límite) con un último intervalo sin límite"""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_right(self.bounds, value)] += 1
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [{"hasta": bound, "llamadas": count}
+                for bound, count in zip(list(self.bounds) + [None], self.counts)]
+
+
+class _Group:
+    """Totales de un grupo de llamadas (una clase, una pregunta o un modelo)"""
+
+    FIELDS = ("llamadas", "respuestas_cacheadas", "reintentos", "prompt_tokens", "cached_tokens",
+              "completion_tokens", "latencia_ms", "latencia_max_ms", "coste_usd", "reutilizados")
+
+    def __init__(self):
+        self.values: Dict[str, Any] = dict.fromkeys(self.FIELDS, 0)
+        self.values["coste_usd"] = None
+        self.values["latencia_max_ms"] = 0.0
+
+    def add(self, record: Dict[str, Any]):
+        v = self.values
+        v["llamadas"] += 1
+        v["respuestas_cacheadas"] += 1 if record.get("respuesta_cacheada") else 0
+        v["reintentos"] += record.get("reintentos") or 0
+        for field in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+            v[field] += record.get(field) or 0
+        v["latencia_ms"] += record.get("latencia_ms") or 0.0
+        v["latencia_max_ms"] = max(v["latencia_max_ms"], record.get("latencia_ms") or 0.0)
+        cost = call_cost(record)
+        if cost is not None:
+            v["coste_usd"] = (v["coste_usd"] or 0.0) + cost
+
+    def merge(self, other: "_Group"):
+        for field in self.FIELDS:
+            a, b = self.values[field], other.values[field]
+            if field == "latencia_max_ms":
+                self.values[field] = max(a, b)
+            elif field == "coste_usd":
+                self.values[field] = None if a is None and b is None else (a or 0.0) + (b or 0.0)
+            else:
+                self.values[field] = a + b
+
+    def to_dict(self) -> Dict[str, Any]:
+        v = dict(self.values)
+        llamadas = v["llamadas"]
+        v["tokens"] = v["prompt_tokens"] - v["cached_tokens"] + v["completion_tokens"]
+        v["latencia_media_ms"] = round(v["latencia_ms"] / llamadas, 2) if llamadas else None
+        v["latencia_ms"] = round(v["latencia_ms"], 2)
+        v["latencia_max_ms"] = round(v["latencia_max_ms"], 2)
+        if v["coste_usd"] is not None:
+            v["coste_usd"] = round(v["coste_usd"], 6)
+        return v
+
+
+def _ranking(groups: Dict[Any, _Group]) -> List[Tuple[Any, Dict[str, Any]]]:
+    """Grupos de mayor a menor coste (tokens si no hay precio) y latencia"""
+    items = [(key, group.to_dict()) for key, group in groups.items()]
+    return sorted(items, key=lambda item: (-(item[1]["coste_usd"] or 0.0), -item[1]["tokens"], -item[1]["latencia_ms"]))
+
+
+class Telemetry:
+    """Agregado de llamadas registradas por AtestadoLLM"""
+
+    def __init__(self):
+        self.total = _Group()
+        self.classes: Dict[str, _Group] = {}
+        self.questions: Dict[Tuple[str, str], _Group] = {}
+        self.models: Dict[str, _Group] = {}
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def add_records(self, records: Iterable[Dict[str, Any]]):
+        """Añade llamadas de 'registro_llamadas' (con sus campos clase/elemento, si los tienen)"""
+        with self._lock:
+            for record in records:
+                clase = record.get("clase") or "(sin clase)"
+                elemento = record.get("elemento") or "(sin pregunta)"
+                for group in (self.total, self.classes.setdefault(clase, _Group()),
+                              self.questions.setdefault((clase, elemento), _Group()),
+                              self.models.setdefault(record.get("modelo") or "", _Group())):
+                    group.add(record)
+                if not record.get("respuesta_cacheada"):
+                    # Las respuestas de la caché local no miden al modelo
+                    self.latency.add(record.get("latencia_ms") or 0.0)
+                    bisect.insort(self._latencies, record.get("latencia_ms") or 0.0)
+                if record.get("prompt_tokens") is not None:
+                    self.prompt_tokens.add(record["prompt_tokens"])
+
+    def add_reused(self, clase: str, count: int):
+        """Suma las respuestas de una clase reutilizadas de contextos ya evaluados (sin llamada)"""
+        if not count:
+            return
+        with self._lock:
+            for group in (self.total, self.classes.setdefault(clase, _Group())):
+                group.values["reutilizados"] += count
+
+    def merge(self, other: "Telemetry"):
+        """Suma otro agregado (p.ej. el de un análisis al acumulado del proceso)"""
+        with other._lock:
+            classes, questions, models = dict(other.classes), dict(other.questions), dict(other.models)
+            latencies = list(other._latencies)
+            total, latency, prompt_tokens = other.total, other.latency, other.prompt_tokens
+        with self._lock:
+            self.total.merge(total)
+            for mine, theirs in ((self.classes, classes), (self.questions, questions), (self.models, models)):
+                for key, group in theirs.items():
+                    mine.setdefault(key, _Group()).merge(group)
+            self.latency.merge(latency)
+            self.prompt_tokens.merge(prompt_tokens)
+            self._latencies = sorted(self._latencies + latencies)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentil p (0-100) de la latencia de las llamadas al modelo"""
+        if not self._latencies:
+            return None
+        return self._latencies[min(len(self._latencies) - 1, int(p / 100 * len(self._latencies)))]
+
+    def summary(self, top: int = LLM_TELEMETRY_TOP) -> Dict[str, Any]:
+        """
+        Resumen para el resultado del análisis
+
+        Args:
+            top: Número de preguntas más costosas que se incluyen en 'preguntas_top'
+
+        Returns:
+            total, clases (por clase, de mayor a menor coste), preguntas_top ((clase, elemento) más
+            costosas), modelos, percentiles de latencia (p50, p90, p99) e histogramas de
+            latencia y de tokens del prompt. Cada grupo tiene llamadas, respuestas_cacheadas,
+            reintentos, tokens (prompt, cached, completion y la suma no cacheada), latencia
+            (total, media y máxima), coste_usd y reutilizados.
+        """
+        with self._lock:
+            return {
+                "total": self.total.to_dict(),
+                "clases": [{"clase": clase, **values} for clase, values in _ranking(self.classes)],
+                "preguntas_top": [{"clase": clase, "elemento": elemento, **values}
+                                  for (clase, elemento), values in _ranking(self.questions)[:top]],
+                "modelos": {modelo: values for modelo, values in _ranking(self.models)},
+                "latencia_percentiles_ms": {f"p{p}": self.percentile(p) for p in (50, 90, 99)},
+                "histogramas": {
+                    "latencia_ms": self.latency.to_dict(),
+                    "prompt_tokens": self.prompt_tokens.to_dict()
+                }
+            }
+
+
+_global_telemetry = Telemetry()
+
+
+def global_telemetry() -> Telemetry:
+    """Acumulado de los análisis del proceso"""
+    return _global_telemetry
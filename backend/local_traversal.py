@@ -0,0 +1,37 @@
+"""
+Traversal de la ontología con un JSON de preguntas local.
+
+Cada clase de la ontología referencia sus preguntas en 'seeAlso' con la ruta del contenedor
+(file:///app/preguntas_extendido.json). Fuera del contenedor (pruebas, benchmarks y
+fake_llm_server) LocalQuestionsTraversal sustituye esa ruta por la de un fichero local: por
+defecto el preguntas_extendido.json de backend/, o una copia que se puede modificar.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from ontology_traversal import OntologyTraversal
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_QUESTIONS_FILE = "file:///app/preguntas_extendido.json"
+DEFAULT_QUESTIONS_FILE = os.path.join(BACKEND_DIR, "preguntas_extendido.json")
+
+
+class LocalQuestionsTraversal(OntologyTraversal):
+    """OntologyTraversal cuyo 'seeAlso' apunta al JSON de preguntas indicado"""
+
+    def __init__(self, ontology_path: Optional[str] = None, questions_path: str = DEFAULT_QUESTIONS_FILE):
+        """
+        Args:
+            ontology_path: Ruta al archivo OWL (opcional)
+            questions_path: JSON de preguntas que sustituye a file:///app/preguntas_extendido.json
+        """
+        # Antes de cargar la ontología: la carga ya extrae los datos de las clases
+        self.questions_path = os.path.abspath(questions_path)
+        super().__init__(ontology_path)
+
+    def _extract_class_data(self, class_obj) -> Dict[str, Any]:
+        data = super()._extract_class_data(class_obj)
+        data["seeAlso"] = [ref.replace(APP_QUESTIONS_FILE, f"file://{self.questions_path}")
+                           for ref in data.get("seeAlso", [])]
+        return data
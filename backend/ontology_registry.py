@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Registro de versiones cargadas de la ontología.
+
+Cada versión se identifica por el hash de su contenido y guarda su propio OntologyTraversal
+(índices, cachés, planes de decisión). Una versión nueva se carga y se precalienta por
+completo antes de publicarse; la versión activa se cambia con una sola asignación bajo
+lock, de modo que ninguna petición ve un estado a medio construir. Los trabajos en curso
+conservan la referencia al traversal con el que empezaron aunque se active otra versión
+o se expulse la suya del registro.
+
+Configuración:
+    ONTOLOGY_MAX_VERSIONS  Versiones cargadas simultáneamente (por defecto 3; la activa nunca se expulsa)
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from ontology_snapshot import file_hash, local_path
+from ontology_traversal import OntologyTraversal
+
+ONTOLOGY_MAX_VERSIONS = int(os.getenv("ONTOLOGY_MAX_VERSIONS", "3"))
+
+
+class UnknownOntologyVersion(KeyError):
+    """La versión solicitada no está cargada en el registro"""
+
+
+def version_id(path: str) -> str:
+    """
+    Identificador de versión: hash del contenido del fichero (o de la IRI si no es local)
+
+    Args:
+        path: Ruta o IRI de la ontología
+
+    Returns:
+        Primeros 16 caracteres hexadecimales del SHA-256
+    """
+    source = local_path(path)
+    if source:
+        return file_hash(source)[:16]
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+
+
+class OntologyRegistry:
+    """Versiones cargadas de la ontología con una versión activa intercambiable de forma atómica"""
+
+    def __init__(self, warm_up: Optional[Callable[[OntologyTraversal], None]] = None,
+                 max_versions: int = ONTOLOGY_MAX_VERSIONS):
+        """
+        Args:
+            warm_up: Función que precalcula lo necesario (planes, catálogo...) sobre un traversal
+                recién cargado, antes de que la versión sea visible
+            max_versions: Máximo de versiones cargadas a la vez
+        """
+        self.warm_up = warm_up
+        self.max_versions = max(1, max_versions)
+        self._versions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._active: Optional[str] = None
+        self._lock = threading.Lock()
+        # Serializa las cargas: dos peticiones con el mismo contenido no lo cargan dos veces
+        self._load_lock = threading.Lock()
+
+    @property
+    def active_version(self) -> Optional[str]:
+        return self._active
+
+    def load(self, path: str, activate: bool = True, source: Optional[str] = None,
+             snapshot: bool = True) -> Dict[str, Any]:
+        """
+        Carga y precalienta una versión (si no estaba ya cargada) y opcionalmente la activa
+
+        Args:
+            path: Ruta o IRI de la ontología
+            activate: Si es True pasa a ser la versión activa una vez lista
+            source: Nombre descriptivo del origen (p.ej. nombre del fichero subido)
+            snapshot: Si es False no se crea instantánea SQLite (ver ontology_snapshot)
+
+        Returns:
+            Entrada del registro: {"version", "traversal", "source", "loaded_at", "load_ms"}
+        """
+        version = version_id(path)
+        with self._load_lock:
+            with self._lock:
+                entry = self._versions.get(version)
+            if entry is None:
+                start = time.perf_counter()
+                traversal = OntologyTraversal()
+                traversal.load_ontology(path, snapshot=snapshot)
+                if self.warm_up:
+                    self.warm_up(traversal)
+                entry = self.register(traversal, version, source or path,
+                                      load_ms=round((time.perf_counter() - start) * 1000, 2))
+            else:
+                print(f"✓ Versión de ontología {version} ya cargada")
+
+        if activate:
+            self.activate(version)
+        return entry
+
+    def register(self, traversal: OntologyTraversal, version: str, source: str,
+                 load_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Añade un traversal ya cargado al registro (sin activarlo)"""
+        entry = {
+            "version": version,
+            "traversal": traversal,
+            "source": source,
+            "loaded_at": datetime.datetime.now().isoformat(),
+            "load_ms": load_ms
+        }
+        with self._lock:
+            self._versions[version] = entry
+            evicted = self._evict(keep=version)
+        self._release(evicted)
+        print(f"✓ Versión de ontología {version} registrada ({source})")
+        return entry
+
+    def _evict(self, keep: str) -> List[Dict[str, Any]]:
+        """Expulsa las versiones más antiguas por encima de max_versions, salvo la activa y 'keep'. Requiere _lock"""
+        evicted = []
+        for version in list(self._versions):
+            if len(self._versions) <= self.max_versions:
+                break
+            if version not in (self._active, keep):
+                evicted.append(self._versions.pop(version))
+        return evicted
+
+    @staticmethod
+    def _release(evicted: List[Dict[str, Any]]):
+        """Libera las cachés de las versiones expulsadas (los trabajos que las usan siguen funcionando)"""
+        for old in evicted:
+            old["traversal"].clear_dfs_cache()
+            print(f"🗑️ Versión de ontología {old['version']} expulsada del registro")
+
+    def activate(self, version: str):
+        """
+        Cambia la versión activa (intercambio atómico del puntero)
+
+        Raises:
+            UnknownOntologyVersion: Si la versión no está cargada
+        """
+        with self._lock:
+            if version not in self._versions:
+                raise UnknownOntologyVersion(version)
+            self._active = version
+            self._versions.move_to_end(version)
+            # La versión que deja de estar activa puede ser ya la más antigua sobrante
+            evicted = self._evict(keep=version)
+        self._release(evicted)
+        print(f"✅ Versión de ontología activa: {version}")
+
+    def get(self, version: Optional[str] = None) -> Optional[OntologyTraversal]:
+        """
+        Traversal de la versión indicada, o de la activa si no se indica ninguna
+
+        Returns:
+            OntologyTraversal, o None si no se indica versión y aún no hay ninguna activa
+
+        Raises:
+            UnknownOntologyVersion: Si se indica una versión que no está cargada
+        """
+        with self._lock:
+            if version is None:
+                entry = self._versions.get(self._active) if self._active else None
+                return entry["traversal"] if entry else None
+            entry = self._versions.get(version)
+        if entry is None:
+            raise UnknownOntologyVersion(version)
+        return entry["traversal"]
+
+    def version_of(self, traversal: OntologyTraversal) -> Optional[str]:
+        """Versión del registro a la que pertenece el traversal (None si no está o fue expulsada)"""
+        with self._lock:
+            for version, entry in self._versions.items():
+                if entry["traversal"] is traversal:
+                    return version
+        return None
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Resumen de las versiones cargadas (sin los objetos traversal)"""
+        with self._lock:
+            entries = list(self._versions.values())
+            active = self._active
+        return [
+            {
+                "version": entry["version"],
+                "active": entry["version"] == active,
+                "source": entry["source"],
+                "loaded_at": entry["loaded_at"],
+                "load_ms": entry["load_ms"],
+                "ontology_iri": str(entry["traversal"].ontology.base_iri) if entry["traversal"].ontology else None,
+                "ontology_version": entry["traversal"].ontology_version
+            }
+            for entry in entries
+        ]
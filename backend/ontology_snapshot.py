@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Instantánea persistente de la ontología en un quadstore SQLite de owlready2.
+
+Analizar el RDF/XML de la ontología en cada arranque (y en cada llamada al razonador)
+repite siempre el mismo trabajo. La primera vez se vuelca la ontología a un fichero
+SQLite de owlready2 identificado por el hash del .owl (y la versión de owlready2);
+las cargas siguientes, incluso desde otros procesos, abren ese fichero directamente.
+
+Si el .owl cambia, su hash cambia y se genera una instantánea nueva; las antiguas
+quedan en el directorio y pueden borrarse sin riesgo.
+
+Configuración:
+    ONTOLOGY_SNAPSHOT      "0"/"false" desactiva las instantáneas (se analiza el RDF/XML como antes)
+    ONTOLOGY_SNAPSHOT_DIR  Directorio de las instantáneas (por defecto <tmp>/ontology_snapshots)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import owlready2
+from owlready2 import World
+
+SNAPSHOT_ENABLED = os.getenv("ONTOLOGY_SNAPSHOT", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_DIR = os.getenv("ONTOLOGY_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "ontology_snapshots"))
+
+# Evita que dos hilos del mismo proceso construyan la misma instantánea a la vez
+_build_lock = threading.Lock()
+
+
+def local_path(path: str) -> Optional[str]:
+    """
+    Ruta absoluta del fichero de ontología si es local y existe
+
+    Args:
+        path: Ruta o IRI 'file://' de la ontología
+
+    Returns:
+        Ruta absoluta o None (IRIs remotas, ficheros inexistentes)
+    """
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    if "://" in path or not os.path.isfile(path):
+        return None
+    return os.path.abspath(path)
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 del contenido del fichero"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(path: str, directory: Optional[str] = None) -> str:
+    """
+    Ruta de la instantánea SQLite correspondiente al contenido actual del fichero
+
+    Args:
+        path: Ruta local del fichero de ontología
+        directory: Directorio de instantáneas (por defecto SNAPSHOT_DIR)
+
+    Returns:
+        Ruta '<dir>/<nombre>-<hash>-owlready<versión>.sqlite3'
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(directory or SNAPSHOT_DIR,
+                        f"{stem}-{file_hash(path)[:16]}-owlready{owlready2.VERSION}.sqlite3")
+
+
+def _metadata_path(snapshot: str) -> str:
+    return snapshot + ".json"
+
+
+def build_snapshot(path: str, directory: Optional[str] = None) -> str:
+    """
+    Analiza el RDF/XML y lo guarda como quadstore SQLite, si no existe ya
+
+    La escritura es atómica (fichero temporal + os.replace), de modo que varios procesos
+    pueden arrancar a la vez sin leer nunca una instantánea a medio escribir.
+
+    Args:
+        path: Ruta local del fichero de ontología
+        directory: Directorio de instantáneas (por defecto SNAPSHOT_DIR)
+
+    Returns:
+        Ruta de la instantánea
+    """
+    snapshot = snapshot_path(path, directory)
+    with _build_lock:
+        if os.path.exists(snapshot) and os.path.exists(_metadata_path(snapshot)):
+            return snapshot
+
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        fd, tmp_snapshot = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(snapshot))
+        os.close(fd)
+        os.remove(tmp_snapshot)
+        try:
+            world = World(filename=tmp_snapshot)
+            onto = world.get_ontology(f"file://{path}").load()
+            # owlready2 registra la ontología por su base IRI al reabrir; el nombre (prefijo
+            # de str() en las expresiones, p.ej. 'SCPO_Extended_Ontology_V01R08_AT08Q.') se guarda aparte
+            metadata = {"source": path, "base_iri": onto.base_iri, "name": onto.name,
+                        "owlready2": owlready2.VERSION}
+            world.save()
+            world.close()
+
+            with open(tmp_snapshot + ".json", "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+            os.replace(tmp_snapshot + ".json", _metadata_path(snapshot))
+            os.replace(tmp_snapshot, snapshot)
+        finally:
+            for leftover in (tmp_snapshot, tmp_snapshot + ".json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+    print(f"✓ Instantánea de la ontología creada: {snapshot}")
+    return snapshot
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def open_snapshot(path: str, private_copy: bool = False, directory: Optional[str] = None) -> Tuple[World, Any]:
+    """
+    Abre la ontología desde su instantánea SQLite (creándola si hace falta)
+
+    Args:
+        path: Ruta local del fichero de ontología
+        private_copy: Si es True se abre una copia propia de la instantánea, para mundos
+            que se van a modificar (individuos, inferencias del razonador). La copia se
+            borra cuando el World deja de usarse.
+        directory: Directorio de instantáneas (por defecto SNAPSHOT_DIR)
+
+    Returns:
+        Tupla (World, ontología)
+    """
+    snapshot = build_snapshot(path, directory)
+    with open(_metadata_path(snapshot), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    if private_copy:
+        fd, filename = tempfile.mkstemp(suffix=".sqlite3", dir=os.path.dirname(snapshot))
+        os.close(fd)
+        shutil.copyfile(snapshot, filename)
+        world = World(filename=filename)
+        weakref.finalize(world, _remove_file, filename)
+    else:
+        # Solo lectura: la instantánea no se modifica nunca una vez creada, así que varios procesos
+        # pueden mantener a la vez el bloqueo compartido de SQLite (sin bloquear/desbloquear por consulta)
+        world = World(filename=snapshot, read_only=True)
+
+    onto = world.get_ontology(metadata["base_iri"])
+    onto.name = metadata["name"]
+    return world, onto
+
+
+def load_ontology_world(path: str, private_copy: bool = False, snapshot: bool = True) -> Tuple[World, Any]:
+    """
+    Carga la ontología usando la instantánea si está habilitada y el fichero es local
+
+    Args:
+        path: Ruta o IRI de la ontología
+        private_copy: Ver open_snapshot
+        snapshot: Si es False se analiza siempre el RDF/XML, sin crear instantánea (ficheros
+            temporales, como las ontologías subidas, cuya instantánea no se volvería a abrir)
+
+    Returns:
+        Tupla (World, ontología). Sin instantánea, la ontología se analiza desde el RDF/XML en un
+        World nuevo: nunca en el mundo por defecto de owlready2, donde dos versiones con el mismo
+        IRI base (ontology_registry) compartirían y mezclarían sus entidades.
+    """
+    source = local_path(path)
+    if SNAPSHOT_ENABLED and snapshot and source:
+        try:
+            return open_snapshot(source, private_copy)
+        except Exception as e:
+            print(f"✗ Error usando la instantánea de la ontología, se analiza el RDF/XML: {e}")
+
+    world = World()
+    return world, world.get_ontology(f"file://{source}" if source else path).load()
+
+
+def snapshot_info(path: str) -> Dict[str, Any]:
+    """Estado de la instantánea de la ontología indicada (para diagnóstico)"""
+    source = local_path(path)
+    if not source:
+        return {"enabled": SNAPSHOT_ENABLED, "snapshot": None}
+    snapshot = snapshot_path(source)
+    exists = os.path.exists(snapshot)
+    return {
+        "enabled": SNAPSHOT_ENABLED,
+        "snapshot": snapshot,
+        "exists": exists,
+        "size_bytes": os.path.getsize(snapshot) if exists else None
+    }
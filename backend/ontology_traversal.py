@@ -4,13 +4,156 @@ Script para recorrer una ontología en amplitud (BFS) usando owlready2
 """
 
 from owlready2 import *
-from collections import deque
+from collections import deque, OrderedDict
+from collections.abc import Mapping
+import hashlib
+import itertools
 import json
 import datetime
 import os
-from typing import Dict, Any, List, Optional, Union, Tuple
+import threading
+from typing import Callable, Dict, Any, Iterator, List, Optional, Union, Tuple
 import re
 
+from owl_expression_parser import parse_owl_expression, OwlExpressionSyntaxError, CARDINALITY_TYPES
+from ontology_snapshot import load_ontology_world
+
+# Tamaño máximo de las cachés (por instancia de OntologyTraversal)
+DFS_CACHE_SIZE = int(os.getenv("DFS_CACHE_SIZE", "128"))
+EXPRESSION_CACHE_SIZE = int(os.getenv("EXPRESSION_CACHE_SIZE", "1024"))
+
+# Tipos de dato que el análisis de expresiones trata como data property
+XSD_BASIC_TYPES = ["int", "integer", "decimal", "float", "string", "boolean"]
+
+# Contador global de versiones: cada carga de ontología recibe una versión distinta
+_ontology_versions = itertools.count(1)
+
+
+class FrozenDict(dict):
+    """Diccionario de solo lectura para los resultados compartidos desde la caché.
+
+    Serializa como un dict normal (json, JSONResponse). Para modificarlo, usar
+    ``copy()`` (copia superficial mutable) o ``thaw()`` (copia profunda mutable).
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Resultado DFS cacheado de solo lectura: use thaw() para obtener una copia mutable")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class LRUCache:
+    """Caché LRU segura entre hilos con contadores de aciertos y fallos"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Devuelve el valor cacheado (y lo marca como reciente) o None si no está"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Vacía la caché (los contadores se conservan)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def freeze(value: Any) -> Any:
+    """Convierte recursivamente dicts/listas en FrozenDict/tuplas"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Inversa de freeze: devuelve una copia profunda con dicts y listas mutables"""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+class LazyDict(Mapping):
+    """Diccionario de solo lectura cuyas claves se calculan al primer acceso.
+
+    Las claves de ``values`` están disponibles de inmediato; el resto las aporta
+    ``loader`` (una sola llamada, el resultado se memoriza). Se usa para ceder clases
+    del recorrido DFS sin extraer sus datos hasta que alguien los consulta.
+    """
+
+    def __init__(self, values: Dict[str, Any], loader: Callable[[], Dict[str, Any]]):
+        self._values = values
+        self._loader = loader
+        self._data: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """Indica si ya se ha llamado al loader"""
+        return self._data is not None
+
+    def materialize(self) -> Dict[str, Any]:
+        """Devuelve el diccionario completo (cargándolo si hace falta)"""
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = {**self._loader(), **self._values}
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        if self._data is None and key in self._values:
+            return self._values[key]
+        return self.materialize()[key]
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+
 class OntologyTraversal:
     """Clase para realizar recorrido en amplitud de una ontología"""
     
@@ -22,18 +165,334 @@ class OntologyTraversal:
             ontology_path: Ruta al archivo OWL (opcional)
         """
         self.ontology = None
+        self.ontology_path: Optional[str] = None
+        self.world = None  # World de owlready2 propio de la ontología cargada (ver ontology_snapshot)
+        # Índice inverso de equivalencias: clase -> [(clase que la referencia, tipo de relación)]
+        self.equivalence_inverse_index: Dict[str, List[Tuple[ThingClass, str]]] = {}
+        # Índice de propiedades: clase -> {"domain": [{name, type}], "range": [{name, type}]}
+        self.property_index: Dict[ThingClass, Dict[str, List[Dict[str, str]]]] = {}
+        # Cierre transitivo de subsunción: nombre -> posición del bit, y por clase el bitset de descendientes
+        # (reflexivo) siguiendo solo subclases o subclases + 'equivalent_to' inverso
+        self._class_bit: Dict[str, int] = {}
+        self._subclass_closure: List[int] = []
+        self._descendant_closure: List[int] = []
+        # Versión de la ontología cargada (forma parte de la clave de la caché DFS)
+        self.ontology_version = 0
+        # Caché LRU de recorridos DFS: (versión, tipo, clase inicial, max_depth) -> resultado congelado
+        self._dfs_cache = LRUCache(DFS_CACHE_SIZE)
+        # Catálogo de clases serializado (/ontologia/clases/): (versión, bytes JSON, ETag)
+        self._class_catalog: Optional[Tuple[int, bytes, str]] = None
+        self._class_catalog_lock = threading.Lock()
+        # Caché LRU del análisis de expresiones: (versión, expresión, nivel inicial) -> tupla de elementos
+        self._expression_cache = LRUCache(EXPRESSION_CACHE_SIZE)
         if ontology_path:
             self.load_ontology(ontology_path)
-    
-    def load_ontology(self, path: str):
-        """Carga una ontología desde un archivo"""
+
+    def load_ontology(self, path: str, snapshot: bool = True):
+        """Carga una ontología desde un archivo (o desde su instantánea SQLite, ver ontology_snapshot)"""
         try:
-            self.ontology = get_ontology(path).load()
+            self.world, self.ontology = load_ontology_world(path, snapshot=snapshot)
+            self.ontology_path = path
             print(f"✓ Ontología cargada desde: {path}")
         except Exception as e:
             print(f"✗ Error cargando ontología: {e}")
             raise
-    
+        self.ontology_version = next(_ontology_versions)
+        self.clear_dfs_cache()
+        self._expression_cache.clear()
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Construye los índices derivados de la ontología cargada (una sola vez por carga)"""
+        self.equivalence_inverse_index = self._build_equivalence_inverse_index()
+        self.property_index = self._build_property_index()
+        self._build_subsumption_closure()
+        print(f"✓ Índice inverso de equivalencias: {len(self.equivalence_inverse_index)} clases referenciadas")
+        print(f"✓ Índice de dominio/rango: {len(self.property_index)} clases con propiedades")
+        print(f"✓ Cierre de subsunción: {len(self._class_bit)} clases")
+
+    def _build_equivalence_inverse_index(self) -> Dict[str, List[Tuple[ThingClass, str]]]:
+        """
+        Construye el índice inverso de 'equivalent_to': para cada clase, las clases
+        cuya definición la referencian.
+
+        Se recorre la ontología en el mismo orden que lo hacía el DFS original, de modo
+        que el orden de apilado (y por tanto el orden de visita) se mantiene idéntico.
+
+        Returns:
+            Diccionario nombre de clase -> lista de tuplas (clase que la referencia, relación),
+            con relación 'equivalent_to_inverse' o 'equivalent_complex_inverse'
+        """
+        index: Dict[str, List[Tuple[ThingClass, str]]] = {}
+        if not self.ontology:
+            return index
+
+        for cls in self.ontology.classes():
+            for eq in getattr(cls, "equivalent_to", []):
+                if hasattr(eq, "name") and eq.name:
+                    index.setdefault(eq.name, []).append((cls, "equivalent_to_inverse"))
+                elif hasattr(eq, "Classes"):
+                    for sub_eq in eq.Classes:
+                        if hasattr(sub_eq, "name") and sub_eq.name:
+                            index.setdefault(sub_eq.name, []).append((cls, "equivalent_complex_inverse"))
+        return index
+
+    def _build_property_index(self) -> Dict[ThingClass, Dict[str, List[Dict[str, str]]]]:
+        """
+        Construye el índice de propiedades por clase: para cada clase, las propiedades
+        en las que aparece como dominio o como rango.
+
+        Sustituye al recorrido de 'self.ontology.properties()' que se hacía por cada clase
+        en '_extract_class_data'. Las listas conservan el orden de declaración de las propiedades.
+
+        Returns:
+            Diccionario clase -> {"domain": [{name, type}], "range": [{name, type}]}
+        """
+        index: Dict[ThingClass, Dict[str, List[Dict[str, str]]]] = {}
+        if not self.ontology:
+            return index
+
+        for prop in self.ontology.properties():
+            prop_data = {
+                "name": prop.name,
+                "type": "ObjectProperty" if isinstance(prop, ObjectProperty) else "DataProperty"
+            }
+            for key in ("domain", "range"):
+                if not hasattr(prop, key):
+                    continue
+                # dict.fromkeys: una sola entrada por propiedad aunque la clase esté repetida
+                for cls in dict.fromkeys(c for c in getattr(prop, key) if isinstance(c, ThingClass)):
+                    index.setdefault(cls, {"domain": [], "range": []})[key].append(prop_data)
+        return index
+
+    def _build_subsumption_closure(self):
+        """
+        Precalcula, como bitsets (enteros), los descendientes de cada clase.
+
+        Sigue exactamente las aristas de dfs_subclasses (subclases directas) y de
+        dfs_equivalent_and_subclasses (subclases + 'equivalent_to' inverso), resolviendo
+        los nombres con getattr(self.ontology, nombre) igual que los recorridos, de modo
+        que is_subclass/most_specific responden lo mismo que un DFS completo.
+        """
+        self._class_bit, self._subclass_closure, self._descendant_closure = {}, [], []
+        if not self.ontology:
+            return
+
+        # 1. Nodos: clases resolubles por nombre, incluidas subclases de otras ontologías del mundo
+        classes: List[ThingClass] = []
+        pending = [cls.name for cls in self.ontology.classes()]
+        while pending:
+            name = pending.pop()
+            if name in self._class_bit:
+                continue
+            cls = getattr(self.ontology, name, None)
+            if not isinstance(cls, ThingClass):
+                continue
+            self._class_bit[name] = len(classes)
+            classes.append(cls)
+            pending.extend(sub.name for sub in cls.subclasses())
+
+        # 2. Aristas padre -> hijo
+        bit = self._class_bit
+        subclass_edges = [[bit[sub.name] for sub in cls.subclasses() if sub.name in bit] for cls in classes]
+        descendant_edges = [
+            edges + [bit[eq_cls.name] for eq_cls, _ in self.get_equivalent_inverse(cls.name) if eq_cls.name in bit]
+            for cls, edges in zip(classes, subclass_edges)
+        ]
+        self._subclass_closure = self._transitive_closure(subclass_edges)
+        self._descendant_closure = self._transitive_closure(descendant_edges)
+
+    @staticmethod
+    def _transitive_closure(edges: List[List[int]]) -> List[int]:
+        """
+        Cierre transitivo reflexivo de un grafo dirigido como bitsets.
+
+        Propaga los bitsets de los hijos a los padres en post-orden; con ciclos
+        (p.ej. subclases cíclicas) se repite la pasada hasta que no hay cambios.
+        """
+        n = len(edges)
+        order: List[int] = []
+        seen = [False] * n
+        for root in range(n):
+            if seen[root]:
+                continue
+            seen[root] = True
+            stack = [(root, iter(edges[root]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if not seen[child]:
+                        seen[child] = True
+                        stack.append((child, iter(edges[child])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+
+        closure = [1 << i for i in range(n)]
+        changed = True
+        while changed:
+            changed = False
+            for node in order:
+                bits = closure[node]
+                for child in edges[node]:
+                    bits |= closure[child]
+                if bits != closure[node]:
+                    closure[node] = bits
+                    changed = True
+        return closure
+
+    def is_subclass(self, class_a: str, class_b: str, via_equivalences: bool = False) -> bool:
+        """
+        Indica si 'class_a' es 'class_b' o desciende de ella (cierre precalculado, O(1))
+
+        Args:
+            class_a: Nombre de la supuesta subclase
+            class_b: Nombre de la supuesta superclase
+            via_equivalences: Si True, sigue también el 'equivalent_to' inverso
+                (mismo criterio que dfs_equivalent_and_subclasses); si False, solo subclases
+                (mismo criterio que dfs_subclasses)
+
+        Returns:
+            True si class_a se alcanza desde class_b; False si no, o si alguna no existe
+        """
+        bit_a = self._class_bit.get(class_a)
+        bit_b = self._class_bit.get(class_b)
+        if bit_a is None or bit_b is None:
+            return False
+        closure = self._descendant_closure if via_equivalences else self._subclass_closure
+        return bool((closure[bit_b] >> bit_a) & 1)
+
+    def most_specific(self, class_a: str, class_b: str, via_equivalences: bool = False) -> str:
+        """
+        Devuelve la más específica de dos clases si están en la misma rama
+
+        Args:
+            class_a: Nombre de la primera clase (tiene preferencia si son la misma o hay ciclo)
+            class_b: Nombre de la segunda clase
+            via_equivalences: Igual que en is_subclass
+
+        Returns:
+            class_a o class_b, o "" si ninguna desciende de la otra
+        """
+        if class_a == class_b:
+            return class_a
+        if self.is_subclass(class_a, class_b, via_equivalences):
+            return class_a
+        if self.is_subclass(class_b, class_a, via_equivalences):
+            return class_b
+        return ""
+
+    def get_class_properties(self, class_obj: ThingClass) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Devuelve las propiedades en las que la clase es dominio o rango
+
+        Args:
+            class_obj: Objeto de clase de owlready2
+
+        Returns:
+            Diccionario {"domain": [...], "range": [...]} con copias de las entradas del índice
+        """
+        props = self.property_index.get(class_obj)
+        if not props:
+            return {"domain": [], "range": []}
+        return {
+            "domain": [dict(p) for p in props["domain"]],
+            "range": [dict(p) for p in props["range"]]
+        }
+
+    def get_equivalent_inverse(self, class_name: str) -> List[Tuple[ThingClass, str]]:
+        """
+        Devuelve las clases cuyo 'equivalent_to' referencia a la clase indicada
+
+        Args:
+            class_name: Nombre de la clase referenciada
+
+        Returns:
+            Lista de tuplas (clase, relación) en orden de declaración en la ontología
+        """
+        return self.equivalence_inverse_index.get(class_name, [])
+
+    def clear_dfs_cache(self):
+        """Vacía la caché de recorridos DFS (los contadores de aciertos/fallos se conservan)"""
+        self._dfs_cache.clear()
+
+    def dfs_cache_stats(self) -> Dict[str, Any]:
+        """Devuelve el estado de la caché DFS: aciertos, fallos, entradas y versión de la ontología"""
+        return {"ontology_version": self.ontology_version, **self._dfs_cache.stats()}
+
+    def expression_cache_stats(self) -> Dict[str, Any]:
+        """Devuelve el estado de la caché de análisis de expresiones equivalent_to"""
+        return {"ontology_version": self.ontology_version, **self._expression_cache.stats()}
+
+    def class_catalog(self) -> Tuple[bytes, str]:
+        """
+        Catálogo de clases de la ontología (respuesta de /ontologia/clases/) ya serializado
+
+        Se construye una sola vez por versión de la ontología cargada; las llamadas siguientes
+        devuelven los mismos bytes. El ETag es el hash del contenido, de modo que es estable
+        entre reinicios y procesos mientras la ontología no cambie.
+
+        Returns:
+            Tupla (JSON compacto en UTF-8, ETag entre comillas)
+        """
+        with self._class_catalog_lock:
+            if self._class_catalog is None or self._class_catalog[0] != self.ontology_version:
+                body = json.dumps(self._build_class_catalog(), ensure_ascii=False, allow_nan=False,
+                                  separators=(",", ":")).encode("utf-8")
+                etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+                self._class_catalog = (self.ontology_version, body, etag)
+            return self._class_catalog[1], self._class_catalog[2]
+
+    def _build_class_catalog(self) -> Dict[str, Any]:
+        """Recorre todas las clases y construye el catálogo ordenado por nombre"""
+        classes_info = []
+        for cls in self.ontology.classes():
+            # Extraer comentarios y seeAlso (pueden devolver listas)
+            comment_values = getattr(cls, "comment", [])
+            see_also_values = getattr(cls, "seeAlso", [])
+            classes_info.append({
+                "name": cls.name,
+                "iri": str(cls.iri) if hasattr(cls, 'iri') else None,
+                "subclasses_count": len(list(cls.subclasses())),
+                "instances_count": len(list(cls.instances())),
+                "has_equivalents": len(list(cls.equivalent_to)) > 0,
+                "comments": [str(c) for c in comment_values] if comment_values else [],
+                "seeAlso": [str(s) for s in see_also_values] if see_also_values else []
+            })
+
+        # Ordenar por nombre
+        classes_info.sort(key=lambda x: x['name'])
+
+        return {
+            "total_classes": len(classes_info),
+            "classes": classes_info,
+            "ontology_iri": str(self.ontology.base_iri) if self.ontology else None
+        }
+
+    def _cached_dfs(self, kind: str, start_class_name: str, max_depth: Optional[int], compute) -> Dict[str, Any]:
+        """
+        Devuelve el recorrido DFS desde la caché o lo calcula y lo guarda congelado
+
+        Args:
+            kind: Tipo de recorrido (forma parte de la clave)
+            start_class_name: Clase raíz
+            max_depth: Profundidad máxima (None = sin límite)
+            compute: Función que realiza el recorrido si no está en caché
+
+        Returns:
+            Resultado compartido de solo lectura (FrozenDict)
+        """
+        key = (self.ontology_version, kind, start_class_name, max_depth)
+        cached = self._dfs_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # El recorrido se hace fuera del lock; si dos hilos coinciden, ambos resultados son equivalentes
+        result = freeze(compute(start_class_name, max_depth))
+        self._dfs_cache.put(key, result)
+        return result
+
     def bfs_traversal_subclasses(self, start_class: Union[str, ThingClass], 
                                 max_depth: int = None) -> List[tuple]:
         """
@@ -195,6 +654,30 @@ class OntologyTraversal:
         except Exception as e:
             return f"Expresión compleja: {str(expression)}"
     
+    def _classes_to_export(self, start_class: Union[str, ThingClass] = None, max_depth: int = None,
+                           traversal_method: str = "bfs") -> List[ThingClass]:
+        """Clases a exportar: recorrido BFS/DFS desde start_class, o todas las de la ontología"""
+        if start_class:
+            # Recorrido BFS o DFS desde una clase específica
+            if traversal_method == "dfs":
+                traversal_result = self.dfs_equivalent_and_subclasses_instances(start_class, max_depth)
+            else:
+                traversal_result = self.bfs_traversal_subclasses(start_class, max_depth)
+            return [cls for cls, level, parent in traversal_result]
+        # Todas las clases de la ontología
+        return list(self.ontology.classes()) if self.ontology else []
+
+    def _export_metadata(self, start_class: Union[str, ThingClass], max_depth: int) -> Dict[str, Any]:
+        """Metadatos de la exportación JSON (los contadores se rellenan después)"""
+        return {
+            "export_timestamp": datetime.datetime.now().isoformat(),
+            "ontology_iri": str(self.ontology.base_iri) if self.ontology else "Unknown",
+            "start_class": start_class if isinstance(start_class, str) else (start_class.name if start_class else "All classes"),
+            "max_depth": max_depth,
+            "total_classes": 0,
+            "classes_with_equivalents": 0
+        }
+
     def export_classes_to_json(self, start_class: Union[str, ThingClass] = None, 
                               output_file: str = None, max_depth: int = None,
                               include_metadata: bool = True, traversal_method: str = "bfs") -> str:
@@ -212,7 +695,7 @@ class OntologyTraversal:
         """
         # Generar nombre de archivo si no se proporciona
         if not output_file:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             if start_class:
                 start_name = start_class if isinstance(start_class, str) else start_class.name
                 output_file = f"ontology_export_{start_name}_{timestamp}.json"
@@ -227,27 +710,10 @@ class OntologyTraversal:
         
         # Agregar metadatos si se solicita
         if include_metadata:
-            export_data["metadata"] = {
-                "export_timestamp": datetime.now().isoformat(),
-                "ontology_iri": str(self.ontology.base_iri) if self.ontology else "Unknown",
-                "start_class": start_class if isinstance(start_class, str) else (start_class.name if start_class else "All classes"),
-                "max_depth": max_depth,
-                "total_classes": 0,
-                "classes_with_equivalents": 0
-            }
+            export_data["metadata"] = self._export_metadata(start_class, max_depth)
         
         # Determinar qué clases procesar
-        if start_class:
-            # Recorrido BFS o DFS desde una clase específica
-            if traversal_method == "dfs":
-                traversal_result = self.dfs_equivalent_and_subclasses_instances(start_class, max_depth)
-            else:
-                traversal_result = self.bfs_traversal_subclasses(start_class, max_depth)
-            classes_to_process = [cls for cls, level, parent in traversal_result]
-        else:
-            # Todas las clases de la ontología
-            classes_to_process = list(self.ontology.classes()) if self.ontology else []
-        
+        classes_to_process = self._classes_to_export(start_class, max_depth, traversal_method)
         
         print(f"🔄 Exportando {len(classes_to_process)} clases a JSON...")
         
@@ -281,7 +747,51 @@ class OntologyTraversal:
         except Exception as e:
             print(f"❌ Error al guardar archivo JSON: {e}")
             raise
-    
+
+    def export_classes_to_json_stream(self, start_class: Union[str, ThingClass] = None,
+                                      max_depth: int = None, include_metadata: bool = True,
+                                      traversal_method: str = "bfs",
+                                      extra_metadata: Optional[Dict[str, Any]] = None) -> Tuple[int, Iterator[str]]:
+        """
+        Variante en memoria de export_classes_to_json: genera el mismo documento como JSON
+        compacto, clase a clase, sin pasar por disco ni construir el diccionario completo
+
+        El recorrido se hace al llamar al método (para conocer el número de clases antes de
+        empezar a enviar); los datos de cada clase se extraen a medida que se consume el generador.
+
+        Args:
+            start_class: Clase inicial (None = todas las clases de la ontología)
+            max_depth: Profundidad máxima para el recorrido
+            include_metadata: Incluir metadatos adicionales
+            traversal_method: "bfs" o "dfs"
+            extra_metadata: Claves adicionales para "metadata" (solo si include_metadata)
+
+        Returns:
+            Tupla (número de clases, generador de fragmentos de texto JSON)
+        """
+        classes_to_process = self._classes_to_export(start_class, max_depth, traversal_method)
+        metadata = {}
+        if include_metadata:
+            metadata = self._export_metadata(start_class, max_depth)
+            metadata["total_classes"] = len(classes_to_process)
+            # Se calcula antes de extraer los datos para poder enviar "metadata" en primer lugar
+            metadata["classes_with_equivalents"] = sum(1 for cls in classes_to_process if cls.equivalent_to)
+            metadata.update(extra_metadata or {})
+
+        def dumps(value: Any) -> str:
+            # Mismo formato que JSONResponse
+            return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+        def chunks() -> Iterator[str]:
+            yield '{"metadata":' + dumps(metadata) + ',"classes":{'
+            for index, class_obj in enumerate(classes_to_process):
+                prefix = "," if index else ""
+                yield prefix + dumps(class_obj.name) + ":" + dumps(self._extract_class_data(class_obj))
+            yield "}}"
+
+        print(f"🔄 Exportando {len(classes_to_process)} clases a JSON (streaming)...")
+        return len(classes_to_process), chunks()
+
     def _extract_class_data(self, class_obj: ThingClass) -> Dict[str, Any]:
         """
         Extrae datos detallados de una clase para exportación JSON
@@ -335,22 +845,9 @@ class OntologyTraversal:
             # Contar instancias
             class_data["instances_count"] = len(list(class_obj.instances()))
             
-            # Extraer propiedades donde esta clase es dominio o rango
+            # Extraer propiedades donde esta clase es dominio o rango (índice precalculado en load_ontology)
             if self.ontology:
-                for prop in self.ontology.properties():
-                    # Verificar si es dominio
-                    if hasattr(prop, 'domain') and class_obj in prop.domain:
-                        class_data["properties"]["domain"].append({
-                            "name": prop.name,
-                            "type": "ObjectProperty" if isinstance(prop, ObjectProperty) else "DataProperty"
-                        })
-                    
-                    # Verificar si es rango
-                    if hasattr(prop, 'range') and class_obj in prop.range:
-                        class_data["properties"]["range"].append({
-                            "name": prop.name,
-                            "type": "ObjectProperty" if isinstance(prop, ObjectProperty) else "DataProperty"
-                        })
+                class_data["properties"] = self.get_class_properties(class_obj)
         
         except Exception as e:
             # En caso de error, al menos mantener el nombre
@@ -742,9 +1239,6 @@ class OntologyTraversal:
         result = []
         stack = [(start_class, 0, None)]  # (clase, nivel, padre)
 
-        # Precalcular todas las clases de la ontología
-        all_classes = list(self.ontology.classes())
-
         while stack:
             current_class, depth, parent = stack.pop()
 
@@ -761,17 +1255,10 @@ class OntologyTraversal:
                 if subclass not in visited:
                     stack.append((subclass, depth + 1, current_class))
 
-            # 2. Dependencias por 'equivalent_to' inverso
-            for cls in all_classes:
-                for eq in getattr(cls, "equivalent_to", []):
-                    if hasattr(eq, "name") and eq.name == current_class.name:
-                        if cls not in visited:
-                            stack.append((cls, depth + 1, current_class))
-                    elif hasattr(eq, "Classes"):
-                        for sub_eq in eq.Classes:
-                            if hasattr(sub_eq, "name") and sub_eq.name == current_class.name:
-                                if cls not in visited:
-                                    stack.append((cls, depth + 1, current_class))
+            # 2. Dependencias por 'equivalent_to' inverso (índice precalculado en load_ontology)
+            for cls, _relation in self.get_equivalent_inverse(current_class.name):
+                if cls not in visited:
+                    stack.append((cls, depth + 1, current_class))
 
         return result
 
@@ -1063,10 +1550,178 @@ class OntologyTraversal:
         except Exception as e:
             return {"error": f"Error parsing datatype: {e}", "raw": content}
 
-    def analizar_expresion_owl_simplificada_dict_v5(self, expresion: str, is_internal_call: bool = False, start_level: int = 0) -> List[Dict[str, Union[str, int, Optional[str]]]]:
+    def analizar_expresion_owl_simplificada_dict_v5(self, expresion: str, is_internal_call: bool = False, start_level: int = 0,
+                                                   como_split: bool = False) -> List[Dict[str, Union[str, int, Optional[str]]]]:
+        """
+        Función Principal: Analiza expresiones OWL con AND (&), OR (|) y NOT y devuelve la
+        lista plana de elementos (level, type, element, description, range, cardinality).
+
+        La expresión se tokeniza y analiza una sola vez (owl_expression_parser), respetando
+        los paréntesis: los '&' y '|' anidados dentro de una restricción quedan en el nivel
+        de esa restricción. El resultado se cachea por (versión de ontología, expresión,
+        nivel inicial, como_split) y cada llamada recibe una copia que puede modificar.
+        Si la expresión no se puede analizar, se usa la versión anterior basada en split('&').
+
+        Con como_split=True la lista es la de la versión por split('&'), que es la que recorre
+        el árbol de decisión (procesar_clase_atestado, que apila dominios según 'level'):
+        cada disyunción es un único 'entity_object' con su texto ("A | B"), y en una conjunción
+        anidada dentro de una restricción el primer término queda en el nivel anidado, pero
+        los '&' y los términos siguientes pasan al nivel inicial de la expresión, como al
+        cortar por '&' sin tener en cuenta los paréntesis.
+        """
+        key = (self.ontology_version, expresion, start_level, como_split)
+        cached = self._expression_cache.get(key)
+        if cached is None:
+            try:
+                componentes = self._emitir_expresion(parse_owl_expression(expresion), start_level,
+                                                     start_level if como_split else None)
+            except OwlExpressionSyntaxError as e:
+                print(f"✗ Expresión no reconocida, se usa el análisis por split('&'): {e}")
+                componentes = self.analizar_expresion_owl_simplificada_dict_v5_split(expresion, is_internal_call, start_level)
+            cached = tuple(componentes)
+            self._expression_cache.put(key, cached)
+        # Copia por elemento: los llamantes modifican los dicts y las listas de rango (dominios)
+        return [
+            {**c, "range": list(c["range"])} if isinstance(c["range"], list) else dict(c)
+            for c in cached
+        ]
+
+    def _emitir_expresion(self, nodo: Dict[str, Any], nivel: int,
+                          nivel_split: Optional[int] = None) -> List[Dict[str, Union[str, int, Optional[str]]]]:
+        """
+        Convierte un nodo del árbol sintáctico (and/or/not/...) en la lista plana de elementos.
+        'nivel_split' es el nivel inicial de la expresión en el formato de la versión por split('&')
+        (ver analizar_expresion_owl_simplificada_dict_v5); None para los niveles por paréntesis.
+        """
+        kind = nodo["kind"]
+        if kind == "or" and nivel_split is not None:
+            element_clean = self._limpiar_elemento(nodo["raw"])
+            return [{
+                "level": nivel,
+                "type": "entity_object",
+                "element": element_clean,
+                "description": element_clean,
+                "range": None, "cardinality": None
+            }]
+
+        if kind in ("and", "or"):
+            operador = {"element": "&", "description": "AND"} if kind == "and" else {"element": "|", "description": "OR"}
+            componentes = []
+            for i, item in enumerate(nodo["items"]):
+                nivel_item = nivel
+                if i and kind == "and" and nivel_split is not None:
+                    nivel_item = nivel_split
+                if i:
+                    componentes.append({"level": nivel_item, "type": "operator", **operador, "range": None, "cardinality": None})
+                componentes.extend(self._emitir_expresion(item, nivel_item, nivel_split))
+            return componentes
+
+        if kind == "group":
+            return self._emitir_expresion(nodo["item"], nivel, nivel_split)
+
+        if kind == "not":
+            rango_clean = self._limpiar_elemento(nodo["raw"]).replace('(', ' ').replace(')', ' ').replace('.', ' ').strip()
+            componentes = [{
+                "level": nivel,
+                "type": "operator",
+                "element": "Not",
+                "description": "Negación (NOT)",
+                "range": rango_clean,
+                "cardinality": None
+            }]
+            componentes.extend(self._emitir_expresion(nodo["item"], nivel + 1, nivel_split))
+            return componentes
+
+        if kind == "restriction":
+            return self._emitir_restriccion(nodo, nivel, nivel_split)
+
+        element_clean = self._limpiar_elemento(nodo["raw"])
+        return [{
+            "level": nivel,
+            "type": "entity_object",
+            "element": element_clean,
+            "description": element_clean,
+            "range": None, "cardinality": None
+        }]
+
+    def _emitir_restriccion(self, nodo: Dict[str, Any], nivel: int,
+                            nivel_split: Optional[int] = None) -> List[Dict[str, Union[str, int, Optional[str]]]]:
         """
-        Función Principal: Analiza expresiones OWL con AND (&), OR (|) y NOT, delegando
-        el análisis detallado a la función anidada.
+        Convierte una restricción (prop.some/only/value/min/max/exactly) en elementos planos.
+        Mismos criterios que _analizar_restriccion_anidada_dict_v5: rango explícito si el
+        destino es una clase simple, rango de la ontología en otro caso.
+        """
+        propiedad = self._limpiar_elemento(nodo["property"])
+        cardinalidad_type = nodo["restriction"]
+        target = nodo["target"]
+        description_suffix = cardinalidad_type
+        is_datatype = False
+
+        if cardinalidad_type in CARDINALITY_TYPES:
+            if nodo["cardinality"] is not None:
+                description_suffix = f"{cardinalidad_type} {nodo['cardinality']['raw']}"
+            else:
+                # Cardinalidad sin clase destino: p.min(2)
+                description_suffix = f"{cardinalidad_type} {target['raw']}"
+                target = None
+                is_datatype = True
+
+        if target is not None:
+            if (target["kind"] == "datatype" or target["raw"] in XSD_BASIC_TYPES or
+                    cardinalidad_type == "value"):
+                is_datatype = True
+
+        # Rango: explícito si el destino es una clase simple, si no el de la propiedad en la ontología
+        rango_nombres = []
+        if target is not None and not is_datatype and target["kind"] == "atom":
+            rango_nombres = [self._limpiar_elemento(target["raw"])]
+        if not rango_nombres:
+            try:
+                rango_nombres = self.get_object_property_detail(propiedad, "range")
+            except Exception:
+                pass
+
+        componentes = [{
+            "level": nivel,
+            "type": "data_property" if is_datatype else "object_property",
+            "element": propiedad,
+            "description": f"Propiedad: '{propiedad}' ({description_suffix})",
+            "range": rango_nombres,
+            "cardinality": cardinalidad_type
+        }]
+        if target is None:
+            return componentes
+
+        nivel_siguiente = nivel + 1
+        if target["kind"] == "datatype":
+            data_info = self._parse_constrained_datatype(target["raw"])
+            restr_txt = ", ".join([f"{k}={v}" for k, v in data_info.get("constraints", {}).items()])
+            componentes.append({
+                "level": nivel_siguiente,
+                "type": "datatype_restriction",
+                "element": data_info.get("base_type", "datatype"),
+                "description": f"Restricción: {data_info.get('base_type')} [{restr_txt}]",
+                "range": None, "cardinality": None
+            })
+        elif target["kind"] == "atom":
+            raw = target["raw"]
+            node_type = "literal_value" if (is_datatype or raw[0].isdigit() or raw[0] in "\"'") else "entity_object"
+            componentes.append({
+                "level": nivel_siguiente,
+                "type": node_type,
+                "element": self._limpiar_elemento(raw),
+                "description": raw,
+                "range": None, "cardinality": None
+            })
+        else:
+            # Restricción encadenada, Not, conjunción/disyunción anidada o grupo
+            componentes.extend(self._emitir_expresion(target, nivel_siguiente, nivel_split))
+        return componentes
+
+    def analizar_expresion_owl_simplificada_dict_v5_split(self, expresion: str, is_internal_call: bool = False, start_level: int = 0) -> List[Dict[str, Union[str, int, Optional[str]]]]:
+        """
+        Versión anterior de analizar_expresion_owl_simplificada_dict_v5: separa por '&' sin
+        tener en cuenta los paréntesis. Se conserva como respaldo y para comparar resultados.
         """
         componentes_anidados: List[Dict[str, Union[str, int, Optional[str]]]] = []
         nivel = start_level
@@ -1133,7 +1788,7 @@ class OntologyTraversal:
                 elif char == ')': parentesis_abiertos -= 1
                 if parentesis_abiertos == 0: break 
                 contenido_not += char
-            componentes.extend(self.analizar_expresion_owl_simplificada_dict_v5(contenido_not, is_internal_call=True, start_level=nivel_actual_interno))
+            componentes.extend(self.analizar_expresion_owl_simplificada_dict_v5_split(contenido_not, is_internal_call=True, start_level=nivel_actual_interno))
             return componentes
 
         # 2. Análisis de restricciones (.some, .only, etc.)
@@ -1249,7 +1904,7 @@ class OntologyTraversal:
                     match_next = re.search(r'\.(\w+)\.(some|only|value|min|max|exactly)\(', target_content)
                     
                     if is_nested_complex:
-                        componentes.extend(self.analizar_expresion_owl_simplificada_dict_v5(target_content, is_internal_call=True, start_level=nivel_siguiente))
+                        componentes.extend(self.analizar_expresion_owl_simplificada_dict_v5_split(target_content, is_internal_call=True, start_level=nivel_siguiente))
                         break 
                     elif match_next:
                         cuerpo_restriccion = target_content[match_next.start() + 1:].strip()
@@ -1696,21 +2351,66 @@ class OntologyTraversal:
             })
         return componentes
     
-    def dfs_equivalent_and_subclasses(self, start_class_name: str, max_depth: Optional[int] = None):
+    def dfs_equivalent_and_subclasses(self, start_class_name: str, max_depth: Optional[int] = None,
+                                      use_cache: bool = True):
         """
         Recorrido DFS: dada una clase raíz, encuentra:
         - Sus subclases
         - Todas las clases que la referencian en 'equivalent_to'
         Recorre en profundidad hacia abajo combinando ambas relaciones.
+
+        El resultado se cachea por (versión de ontología, clase, max_depth) y es de solo
+        lectura; use thaw() si necesita modificarlo. Con use_cache=False se recalcula
+        y se devuelve un resultado mutable.
         """
-        visited = set()
+        if use_cache:
+            return self._cached_dfs("equivalent_and_subclasses", start_class_name, max_depth,
+                                    self._dfs_equivalent_and_subclasses)
+        return self._dfs_equivalent_and_subclasses(start_class_name, max_depth)
+
+    def _dfs_equivalent_and_subclasses(self, start_class_name: str, max_depth: Optional[int] = None):
+        """Implementación sin caché de dfs_equivalent_and_subclasses"""
         classes = {}
         traversal_path = []
-        stack = [(start_class_name, 0, None, "root")]
         max_depth_reached = 0
 
-        # Precalcular todas las clases de la ontología
-        all_classes = list(self.ontology.classes())
+        for class_name, class_data, depth, visit_order in self.iter_dfs_equivalent_and_subclasses(start_class_name, max_depth):
+            dfs_info = class_data["dfs_extended_info"]
+            classes[class_name] = class_data.materialize()
+            traversal_path.append({
+                "class": class_name,
+                "depth": depth,
+                "parent": dfs_info["parent"],
+                "relation": dfs_info["discovered_via"],
+                "visit_order": visit_order
+            })
+            max_depth_reached = max(max_depth_reached, depth)
+
+        return {
+            "classes": classes,
+            "traversal_path": traversal_path,
+            "max_depth_reached": max_depth_reached
+        }
+
+    def iter_dfs_equivalent_and_subclasses(self, start_class_name: str,
+                                           max_depth: Optional[int] = None) -> Iterator[Tuple[str, LazyDict, int, int]]:
+        """
+        Variante perezosa de dfs_equivalent_and_subclasses: cede las clases en el mismo orden de visita
+        a medida que se recorren, sin esperar al recorrido completo
+
+        Los datos de cada clase (_extract_class_data) no se extraen hasta que se consulta alguna de sus
+        claves distinta de 'dfs_extended_info', de modo que las clases que el consumidor descarta
+        (p.ej. podadas en el árbol de decisión) no pagan la extracción. No usa la caché DFS.
+
+        Args:
+            start_class_name: Clase raíz
+            max_depth: Profundidad máxima (None = sin límite)
+
+        Returns:
+            Generador de tuplas (nombre de clase, datos de clase perezosos, profundidad, orden de visita)
+        """
+        visited = set()
+        stack = [(start_class_name, 0, None, "root")]
 
         while stack:
             current_class_name, depth, parent, relation_type = stack.pop()
@@ -1720,72 +2420,56 @@ class OntologyTraversal:
                 continue
 
             visited.add(current_class_name)
-            max_depth_reached = max(max_depth_reached, depth)
 
             # Obtener el objeto de la clase
             current_class = getattr(self.ontology, current_class_name, None)
             if current_class is None:
                 continue
 
-            # Extraer datos de la clase
-            class_data = self._extract_class_data(current_class)
-            class_data["dfs_extended_info"] = {
-                "visit_order": len(visited),
+            visit_order = len(visited)
+            dfs_extended_info = {
+                "visit_order": visit_order,
                 "depth_level": depth,
                 "discovered_via": relation_type,
                 "parent": parent if parent else None
             }
-            classes[current_class_name] = class_data
-            traversal_path.append({
-                "class": current_class_name,
-                "depth": depth,
-                "parent": parent,
-                "relation": relation_type,
-                "visit_order": len(visited)
-            })
 
+            # Se apilan los vecinos antes de ceder la clase: el orden no depende del consumidor
             # 1. Subclases directas
             for subclass in current_class.subclasses():
                 if subclass.name not in visited:
                     stack.append((subclass.name, depth + 1, current_class_name, "subclass"))
 
-            # 2. Dependencias por 'equivalent_to' inverso
-            for cls in all_classes:
-                # print(f"✓ Equivalentes de : {cls.name}")
-                for eq in getattr(cls, "equivalent_to", []):
-                    # print(f"✓ Elemetssssssss de : {eq}")
-                    if hasattr(eq, "name") and eq.name == current_class_name:
-                        if cls.name not in visited:
-                            stack.append((cls.name, depth + 1, current_class_name, "equivalent_to_inverse"))
-                    elif hasattr(eq, "Classes"):
-                        for sub_eq in eq.Classes:
-                            if hasattr(sub_eq, "name") and sub_eq.name == current_class_name:
-                                if cls.name not in visited:
-                                    stack.append((cls.name, depth + 1, current_class_name, "equivalent_complex_inverse"))
+            # 2. Dependencias por 'equivalent_to' inverso (índice precalculado en load_ontology)
+            for cls, relation in self.get_equivalent_inverse(current_class_name):
+                if cls.name not in visited:
+                    stack.append((cls.name, depth + 1, current_class_name, relation))
 
-        return {
-            "classes": classes,
-            "traversal_path": traversal_path,
-            "max_depth_reached": max_depth_reached
-        }
+            yield current_class_name, self._lazy_class_data(current_class, dfs_extended_info), depth, visit_order
+
+    def _lazy_class_data(self, class_obj: ThingClass, dfs_extended_info: Dict[str, Any]) -> LazyDict:
+        """Datos de clase de _extract_class_data (más 'dfs_extended_info') extraídos al primer acceso"""
+        return LazyDict({"dfs_extended_info": dfs_extended_info}, lambda: self._extract_class_data(class_obj))
     
 
-    def dfs_subclasses(self, start_class_name: str, max_depth: Optional[int] = None):
+    def dfs_subclasses(self, start_class_name: str, max_depth: Optional[int] = None, use_cache: bool = True):
         """
-        Recorrido DFS: dada una clase raíz, encuentra:
-        - Sus subclases
-        - Todas las clases que la referencian en 'equivalent_to'
-        Recorre en profundidad hacia abajo combinando ambas relaciones.
+        Recorrido DFS: dada una clase raíz, encuentra sus subclases (sin seguir 'equivalent_to').
+
+        Usa la misma caché de solo lectura que dfs_equivalent_and_subclasses.
         """
+        if use_cache:
+            return self._cached_dfs("subclasses", start_class_name, max_depth, self._dfs_subclasses)
+        return self._dfs_subclasses(start_class_name, max_depth)
+
+    def _dfs_subclasses(self, start_class_name: str, max_depth: Optional[int] = None):
+        """Implementación sin caché de dfs_subclasses"""
         visited = set()
         classes = {}
         traversal_path = []
         stack = [(start_class_name, 0, None, "root")]
         max_depth_reached = 0
 
-        # Precalcular todas las clases de la ontología
-        all_classes = list(self.ontology.classes())
-
         while stack:
             current_class_name, depth, parent, relation_type = stack.pop()
             if max_depth is not None and depth > max_depth:
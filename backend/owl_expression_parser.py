@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Tokenizador y parser descendente recursivo para expresiones de clase de owlready2 en forma de texto
+(p.ej. el campo "raw" de 'equivalent_classes': str(And([...])) ).
+
+Gramática (misma precedencia que owlready2 al imprimir: '&' liga más que '|'):
+
+    expresion   := conjuncion ('|' conjuncion)*
+    conjuncion  := primario ('&' primario)*
+    primario    := '(' expresion ')'
+                 | 'Not' '(' expresion ')'
+                 | 'ConstrainedDatatype' '(' ... ')'
+                 | propiedad '.' tipo '(' argumento [',' expresion] ')'
+                 | 'Inverse' '(' propiedad ')' '.' tipo '(' ... ')'
+                 | nombre | literal
+
+El resultado es un árbol de diccionarios {"kind": ..., "raw": ...}; la conversión a la lista plana
+que consume el árbol de decisión la hace OntologyTraversal.analizar_expresion_owl_simplificada_dict_v5.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tipos de restricción reconocidos tras 'propiedad.'
+RESTRICTION_TYPES = ("some", "only", "value", "min", "max", "exactly")
+CARDINALITY_TYPES = ("min", "max", "exactly")
+
+_TOKEN_RE = re.compile(r"""
+      (?P<ws>\s+)
+    | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<pytype><class\s'[^']*'>)
+    | (?P<punct>[()&|,=])
+    | (?P<name>[^\s()&|,='"]+)
+""", re.VERBOSE)
+
+_RESTRICTION_NAME_RE = re.compile(rf"^(?P<head>.+)\.(?P<kind>{'|'.join(RESTRICTION_TYPES)})$")
+_RESTRICTION_SUFFIX_RE = re.compile(rf"^\.(?P<kind>{'|'.join(RESTRICTION_TYPES)})$")
+
+
+class OwlExpressionSyntaxError(ValueError):
+    """La expresión no sigue la sintaxis de owlready2 (paréntesis desbalanceados, token inesperado...)"""
+
+
+def tokenize(expresion: str) -> List[Tuple[str, str, int, int]]:
+    """
+    Divide la expresión en tokens en una sola pasada
+
+    Args:
+        expresion: Texto de la expresión owlready2
+
+    Returns:
+        Lista de tuplas (tipo, texto, inicio, fin); tipo es 'string', 'pytype', 'punct' o 'name'
+    """
+    tokens = []
+    pos = 0
+    while pos < len(expresion):
+        match = _TOKEN_RE.match(expresion, pos)
+        if not match:
+            raise OwlExpressionSyntaxError(f"Carácter inesperado en posición {pos}: {expresion[pos]!r}")
+        kind = match.lastgroup
+        if kind != "ws":
+            tokens.append((kind, match.group(), match.start(), match.end()))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Parser descendente recursivo sobre la lista de tokens"""
+
+    def __init__(self, expresion: str):
+        self.text = expresion
+        self.tokens = tokenize(expresion)
+        self.pos = 0
+
+    # --- utilidades ---
+
+    def _peek(self, offset: int = 0) -> Optional[Tuple[str, str, int, int]]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def _is_punct(self, value: str, offset: int = 0) -> bool:
+        token = self._peek(offset)
+        return token is not None and token[0] == "punct" and token[1] == value
+
+    def _expect(self, value: str) -> Tuple[str, str, int, int]:
+        if not self._is_punct(value):
+            token = self._peek()
+            found = token[1] if token else "fin de la expresión"
+            raise OwlExpressionSyntaxError(f"Se esperaba '{value}' y se encontró '{found}' en: {self.text}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _raw(self, start: int, end: int) -> str:
+        return self.text[start:end]
+
+    def _skip_balanced(self) -> int:
+        """Consume desde '(' hasta su ')' correspondiente y devuelve la posición final en el texto"""
+        self._expect("(")
+        depth = 1
+        while depth:
+            token = self._peek()
+            if token is None:
+                raise OwlExpressionSyntaxError(f"Paréntesis sin cerrar en: {self.text}")
+            if token[0] == "punct" and token[1] == "(":
+                depth += 1
+            elif token[0] == "punct" and token[1] == ")":
+                depth -= 1
+            self.pos += 1
+        return self.tokens[self.pos - 1][3]
+
+    # --- gramática ---
+
+    def parse(self) -> Dict[str, Any]:
+        if not self.tokens:
+            raise OwlExpressionSyntaxError("Expresión vacía")
+        node = self._expression()
+        if self._peek() is not None:
+            raise OwlExpressionSyntaxError(f"Token inesperado '{self._peek()[1]}' en: {self.text}")
+        return node
+
+    def _expression(self) -> Dict[str, Any]:
+        return self._binary("|", "or", self._conjunction)
+
+    def _conjunction(self) -> Dict[str, Any]:
+        return self._binary("&", "and", self._primary)
+
+    def _binary(self, operator: str, kind: str, operand) -> Dict[str, Any]:
+        items = [operand()]
+        while self._is_punct(operator):
+            self.pos += 1
+            items.append(operand())
+        if len(items) == 1:
+            return items[0]
+        return {"kind": kind, "items": items, "start": items[0]["start"], "end": items[-1]["end"],
+                "raw": self._raw(items[0]["start"], items[-1]["end"])}
+
+    def _primary(self) -> Dict[str, Any]:
+        token = self._peek()
+        if token is None:
+            raise OwlExpressionSyntaxError(f"Expresión incompleta: {self.text}")
+        token_type, value, start, end = token
+
+        if token_type == "punct" and value == "(":
+            self.pos += 1
+            inner = self._expression()
+            end = self._expect(")")[3]
+            return {"kind": "group", "item": inner, "start": start, "end": end, "raw": self._raw(start, end)}
+
+        if token_type in ("string", "pytype"):
+            self.pos += 1
+            return self._atom(start, end)
+
+        if token_type != "name":
+            raise OwlExpressionSyntaxError(f"Token inesperado '{value}' en: {self.text}")
+
+        self.pos += 1
+        if not self._is_punct("("):
+            return self._atom(start, end)
+
+        if value == "Not":
+            self.pos += 1
+            inner = self._expression()
+            end = self._expect(")")[3]
+            return {"kind": "not", "item": inner, "start": start, "end": end, "raw": self._raw(start, end)}
+
+        if value == "ConstrainedDatatype":
+            end = self._skip_balanced()
+            return {"kind": "datatype", "start": start, "end": end, "raw": self._raw(start, end)}
+
+        restriction = _RESTRICTION_NAME_RE.match(value)
+        if restriction:
+            head = restriction.group("head")
+            return self._restriction(head.rsplit(".", 1)[-1], restriction.group("kind"), start)
+
+        if value == "Inverse":
+            # Inverse(prop).some(...): la propiedad es la expresión Inverse completa
+            prop_end = self._skip_balanced()
+            token = self._peek()
+            if token and token[0] == "name" and token[2] == prop_end:
+                suffix = _RESTRICTION_SUFFIX_RE.match(token[1])
+                if suffix and self._is_punct("(", 1):
+                    self.pos += 1
+                    return self._restriction(self._raw(start, prop_end), suffix.group("kind"), start)
+            return self._atom(start, prop_end)
+
+        # Otras construcciones (OneOf([...]), funciones desconocidas): se tratan como un elemento opaco
+        end = self._skip_balanced()
+        return self._atom(start, end)
+
+    def _restriction(self, prop: str, kind: str, start: int) -> Dict[str, Any]:
+        self._expect("(")
+        first = self._expression()
+        cardinality, target = None, first
+        if kind in CARDINALITY_TYPES and self._is_punct(","):
+            self.pos += 1
+            cardinality, target = first, self._expression()
+        end = self._expect(")")[3]
+        return {"kind": "restriction", "property": prop, "restriction": kind,
+                "cardinality": cardinality, "target": target,
+                "start": start, "end": end, "raw": self._raw(start, end)}
+
+    def _atom(self, start: int, end: int) -> Dict[str, Any]:
+        return {"kind": "atom", "start": start, "end": end, "raw": self._raw(start, end)}
+
+
+def parse_owl_expression(expresion: str) -> Dict[str, Any]:
+    """
+    Analiza una expresión de clase owlready2 y devuelve su árbol sintáctico
+
+    Args:
+        expresion: Texto de la expresión (str() de un constructo owlready2)
+
+    Returns:
+        Nodo raíz {"kind": "and"|"or"|"not"|"group"|"restriction"|"datatype"|"atom", "raw": ..., ...}
+
+    Raises:
+        OwlExpressionSyntaxError: Si la expresión está mal formada
+    """
+    return _Parser(expresion).parse()
@@ -0,0 +1,154 @@
+"""
+Eventos de progreso de los análisis en segundo plano (/procesarG/) para Server-Sent Events.
+
+'analizarAtestado' avisa de cada clase procesada (ver su parámetro 'progreso') y
+'tarea_pesada_wrapper' publica esos avisos en el canal de su tarea. El endpoint
+/procesarG/{task_id}/eventos los envía al cliente según se producen, de modo que el frontend
+puede pintar el resultado poco a poco sin consultar /check_task/.
+
+Cada canal guarda todos sus eventos numerados: un cliente que se conecta tarde, o que se
+reconecta con la cabecera Last-Event-ID, recibe primero los que se perdió. Los datos se
+serializan al publicarlos (el análisis sigue modificando sus objetos y entidades después). La
+tarea publica desde su hilo y los suscriptores esperan en el bucle de asyncio del servidor;
+los canales terminados se eliminan a los PROGRESS_TTL segundos.
+
+Configuración:
+    PROGRESS_TTL        Segundos que se conserva un canal terminado (por defecto 3600)
+    PROGRESS_KEEPALIVE  Segundos sin eventos tras los que se envía un comentario SSE (por defecto 15)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "3600"))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", "15"))
+
+# Evento publicado: (id, tipo, datos serializados en JSON)
+Evento = Tuple[int, str, str]
+
+_canales: Dict[str, "CanalProgreso"] = {}
+_canales_lock = threading.Lock()
+
+
+class CanalProgreso:
+    """
+    Eventos de progreso de una tarea y sus suscriptores.
+
+    Parameters
+    ----------
+    task_id: str
+        Identificador de la tarea de /procesarG/.
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.eventos: List[Evento] = []
+        self.cerrado = False
+        self.cerrado_en: Optional[float] = None
+        self._suscriptores: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def _entregar(self, evento: Optional[Evento], suscriptores):
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                # Bucle cerrado: el cliente ya se desconectó
+                pass
+
+    def publicar(self, tipo: str, datos: Dict[str, Any]):
+        """Añade un evento (se ignora si el canal ya está cerrado) y lo entrega a los suscriptores."""
+        datos_json = json.dumps(datos, ensure_ascii=False, default=str)
+        with self._lock:
+            if self.cerrado:
+                return
+            evento = (len(self.eventos) + 1, tipo, datos_json)
+            self.eventos.append(evento)
+            suscriptores = list(self._suscriptores)
+        self._entregar(evento, suscriptores)
+
+    def cerrar(self):
+        """Marca la tarea como terminada: los suscriptores terminan tras el último evento."""
+        with self._lock:
+            if self.cerrado:
+                return
+            self.cerrado = True
+            self.cerrado_en = time.time()
+            suscriptores = list(self._suscriptores)
+        self._entregar(None, suscriptores)
+
+    async def suscribir(self, ultimo_id: int = 0, keepalive: float = PROGRESS_KEEPALIVE) -> AsyncIterator[Optional[Evento]]:
+        """
+        Eventos posteriores a 'ultimo_id' según se publican, hasta que se cierra el canal.
+
+        Parameters
+        ----------
+        ultimo_id: int
+            Último evento recibido por el cliente (cabecera Last-Event-ID); 0 para todos.
+        keepalive: float
+            Segundos sin eventos tras los que se devuelve None (para enviar un comentario
+            SSE y que los proxies no corten la conexión).
+
+        Yields
+        ------
+        Tuple[int, str, str] | None
+            Evento (id, tipo, datos JSON), o None si no ha habido eventos en 'keepalive' segundos.
+        """
+        cola: asyncio.Queue = asyncio.Queue()
+        suscriptor = (asyncio.get_running_loop(), cola)
+        # Histórico y alta en el mismo bloqueo: ningún evento se pierde ni se repite
+        with self._lock:
+            pendientes = self.eventos[ultimo_id:]
+            cerrado = self.cerrado
+            if not cerrado:
+                self._suscriptores.append(suscriptor)
+        try:
+            for evento in pendientes:
+                yield evento
+            if cerrado:
+                return
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if evento is None:
+                    return
+                yield evento
+        finally:
+            with self._lock:
+                if suscriptor in self._suscriptores:
+                    self._suscriptores.remove(suscriptor)
+
+
+def formato_sse(evento: Optional[Evento]) -> str:
+    """Texto SSE de un evento ('id', 'event' y 'data'), o un comentario de keepalive si es None."""
+    if evento is None:
+        return ": keepalive\n\n"
+    evento_id, tipo, datos = evento
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {datos}\n\n"
+
+
+def _purgar():
+    limite = time.time() - PROGRESS_TTL
+    for task_id in [t for t, c in _canales.items() if c.cerrado and c.cerrado_en < limite]:
+        del _canales[task_id]
+
+
+def crear_canal(task_id: str) -> CanalProgreso:
+    """Canal de progreso de una tarea nueva (y eliminación de los terminados hace más de PROGRESS_TTL)."""
+    with _canales_lock:
+        _purgar()
+        canal = _canales[task_id] = CanalProgreso(task_id)
+        return canal
+
+
+def canal(task_id: str) -> Optional[CanalProgreso]:
+    """Canal de progreso de la tarea, o None si no existe (o ya se eliminó)."""
+    with _canales_lock:
+        return _canales.get(task_id)
@@ -0,0 +1,167 @@
+"""
+Registro en memoria de los ficheros de preguntas (preguntas_extendido.json).
+
+Cada clase de la ontología referencia en 'seeAlso' el JSON con sus preguntas. El registro
+carga cada fichero una sola vez, lo congela (vistas de solo lectura compartidas entre
+peticiones e hilos) y lo indexa por (clase, elemento), de modo que ni la lectura de disco,
+ni el análisis del JSON, ni la búsqueda lineal de la pregunta de cada elemento se repiten
+por atestado. Antes de servir un fichero se comprueba su fecha de modificación (y tamaño):
+si ha cambiado, se vuelve a cargar. Al cargarlo se resuelve la política de cascada de modelos
+de cada pregunta (``llm_cascade``).
+
+Hay un registro por traversal (versión de la ontología cargada), que vive y se libera con
+él, como los planes de decisión; las llamadas sin traversal usan un registro común.
+"""
+
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import llm_cascade
+from ontology_traversal import FrozenDict, freeze
+
+# Registros por traversal: al descartar un traversal (/ontologia/cargar/) se libera su registro
+_registros: "weakref.WeakKeyDictionary[Any, RegistroPreguntas]" = weakref.WeakKeyDictionary()
+_registros_lock = threading.Lock()
+
+
+def fichero_preguntas(clase_data: Dict[str, Any]) -> Optional[str]:
+    """Ruta del JSON de preguntas referenciado en 'seeAlso' (parte del IRI antes del '#')."""
+    for ref in clase_data.get("seeAlso", []):
+        if "#" in ref:
+            return ref.split("#")[-2].replace('file://', '')
+    return None
+
+
+def firma_fichero(ruta: str) -> Optional[Tuple[float, int]]:
+    """Fecha de modificación y tamaño del fichero, o None si no existe."""
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return estado.st_mtime, estado.st_size
+
+
+class FicheroPreguntas:
+    """
+    Contenido congelado de un fichero de preguntas con su índice por (clase, elemento).
+
+    Parameters
+    ----------
+    ruta: str
+        Ruta del fichero.
+    firma: Tuple[float, int]
+        Fecha de modificación y tamaño en el momento de la carga.
+    contenido: FrozenDict
+        JSON del fichero (clase -> detalles) de solo lectura.
+    """
+
+    def __init__(self, ruta: str, firma: Tuple[float, int], contenido: FrozenDict):
+        self.ruta = ruta
+        self.firma = firma
+        self.contenido = contenido
+        # Primera pregunta de cada (clase, elemento), como la búsqueda lineal que sustituye
+        self._indice: Dict[Tuple[str, str], FrozenDict] = {}
+        for clase_nombre, detalles in contenido.items():
+            if not isinstance(detalles, dict):
+                continue
+            for pregunta in detalles.get("preguntas", ()):
+                if isinstance(pregunta, dict):
+                    self._indice.setdefault((clase_nombre, str(pregunta.get("elemento"))), pregunta)
+
+    @property
+    def mtime(self) -> float:
+        return self.firma[0]
+
+    def detalles(self, clase_nombre: str) -> Optional[FrozenDict]:
+        """Entrada de la clase (preguntas, contextos...) o None si el fichero no la define."""
+        return self.contenido.get(clase_nombre)
+
+    def pregunta(self, clase_nombre: str, elemento: Any) -> Optional[FrozenDict]:
+        """Pregunta de la clase asociada al elemento (propiedad) de su 'equivalent_to'."""
+        return self._indice.get((clase_nombre, str(elemento)))
+
+
+class RegistroPreguntas:
+    """Ficheros de preguntas cargados, recargados cuando cambian en disco."""
+
+    def __init__(self):
+        self._ficheros: Dict[str, FicheroPreguntas] = {}
+        self._lock = threading.Lock()
+        self.cargas = 0
+        self.recargas = 0
+        self.consultas = 0
+
+    def fichero(self, ruta: Optional[str]) -> Optional[FicheroPreguntas]:
+        """
+        Fichero de preguntas cargado e indexado.
+
+        Parameters
+        ----------
+        ruta: str
+            Ruta del JSON de preguntas.
+
+        Returns
+        -------
+        FicheroPreguntas | None
+            El fichero (cargado de nuevo si ha cambiado en disco desde la última carga), o
+            None si no existe o no es un JSON válido.
+        """
+        if not ruta:
+            return None
+        firma = firma_fichero(ruta)
+        with self._lock:
+            self.consultas += 1
+            fichero = self._ficheros.get(ruta)
+            if fichero is not None and fichero.firma == firma:
+                return fichero
+            if firma is None:
+                print(f"📌?No se encontró el archivo JSON en {ruta}")
+                self._ficheros.pop(ruta, None)
+                return None
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    # La política de cascada de cada pregunta se resuelve una vez, al cargar
+                    contenido = freeze(llm_cascade.resolve_policies(json.load(f)))
+            except Exception as e:
+                print(f"📌?Error al cargar/parsear el archivo JSON {ruta}: {e}")
+                return None
+            if fichero is None:
+                self.cargas += 1
+            else:
+                self.recargas += 1
+                print(f"🔄 Fichero de preguntas modificado, recargado: {ruta}")
+            fichero = FicheroPreguntas(ruta, firma, contenido if isinstance(contenido, dict) else FrozenDict())
+            self._ficheros[ruta] = fichero
+            return fichero
+
+    def detalles(self, clase_nombre: str, clase_data: Dict[str, Any]) -> Optional[FrozenDict]:
+        """Detalles de la clase en el fichero de preguntas referenciado por su 'seeAlso'."""
+        fichero = self.fichero(fichero_preguntas(clase_data))
+        return fichero.detalles(clase_nombre) if fichero else None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Ficheros cargados (con su fecha de modificación y nº de preguntas), cargas, recargas y consultas."""
+        with self._lock:
+            return {
+                "ficheros": {ruta: {"mtime": f.mtime, "preguntas": len(f._indice)} for ruta, f in self._ficheros.items()},
+                "cargas": self.cargas,
+                "recargas": self.recargas,
+                "consultas": self.consultas
+            }
+
+
+_registro_comun = RegistroPreguntas()
+
+
+def registro_de(traversal: Any = None) -> RegistroPreguntas:
+    """Registro de preguntas de la versión de la ontología (traversal), o el común si es None."""
+    if traversal is None:
+        return _registro_comun
+    with _registros_lock:
+        registro = _registros.get(traversal)
+        if registro is None:
+            registro = _registros[traversal] = RegistroPreguntas()
+        return registro
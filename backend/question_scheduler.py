@@ -0,0 +1,344 @@
+"""
+Planificador concurrente de las preguntas al LLM del árbol de decisión.
+
+El recorrido de 'analizarAtestado' es secuencial: cada pregunta espera a la anterior aunque
+no dependa de ella. Las dependencias reales entre preguntas forman un grafo (DAG):
+
+- Una pregunta anidada depende de la lista 'respuesta' de su pregunta padre (se pregunta una
+  vez por cada elemento extraído); las preguntas sobre distintos elementos son independientes.
+- Dentro de una clase, una restricción de la conjunción depende de que la anterior exista
+  (poda interna de 'procesar_clase_atestado').
+- Las preguntas de una clase dependen de que exista su clase padre en el DFS (poda por
+  'nivel_excluido'); las clases hermanas son independientes entre sí.
+
+El planificador anticipa cada clase en un hilo propio en cuanto su clase padre existe, y las
+preguntas se lanzan a un pool acotado (LLM_MAX_IN_FLIGHT llamadas simultáneas) en cuanto se
+conoce su texto. El recorrido definitivo sigue siendo el secuencial, en orden DFS y con la misma
+poda y reutilización de contexto, pero toma las respuestas de las llamadas ya lanzadas (o las
+lanza si nadie las anticipó). Por eso el resultado es idéntico al secuencial siempre que la
+respuesta dependa solo de (pregunta, modelo, esquema), como con temperature=0. Las llamadas
+anticipadas que el recorrido definitivo no usa (p.ej. preguntas que reutiliza de otra clase)
+se cuentan como descartadas; las pendientes se cancelan al terminar.
+
+Solo hay preguntas independientes en el modo de conversación independiente: en modo historial
+cada llamada envía todas las preguntas y respuestas anteriores, en el orden en que terminan, así
+que anticiparlas cambiaría lo que se envía. El planificador no acepta asistentes que comparten
+historial ('comparte_historial') y 'analizarAtestado' los recorre en secuencia.
+
+Especulación (opcional): en la mayoría de los atestados la clase padre existe, así que sus clases
+hijas se pueden empezar a recorrer a la vez que el padre, sin esperar a saber si existe. Cada
+hija especulativa lanza solo sus primeras LLM_SPECULATIVE_QUESTIONS preguntas, y el total de
+llamadas especulativas del atestado está acotado por LLM_SPECULATIVE_BUDGET. Si el padre no
+existe (la rama queda podada por 'nivel_excluido'), las llamadas especulativas que aún no han
+empezado se cancelan. Al cerrar se cuentan las útiles (las usó el recorrido definitivo) y las
+desperdiciadas, para ajustar el presupuesto entre latencia y coste. Como el resto del
+planificador, solo se especula en modo independiente: una respuesta especulativa, que puede
+acabar descartada, nunca llega al historial de la conversación.
+
+Configuración:
+    LLM_MAX_IN_FLIGHT              Llamadas simultáneas al LLM por atestado (por defecto 1: recorrido secuencial, sin planificador)
+    LLM_SPECULATIVE_BUDGET         Llamadas especulativas por atestado (por defecto 0: sin especulación)
+    LLM_SPECULATIVE_QUESTIONS      Preguntas especulativas por clase hija (por defecto 2)
+"""
+
+import contextvars
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "1"))
+# Hilos que anticipan clases: pasan casi todo el tiempo esperando respuestas del LLM
+MAX_RECORRIDOS_ANTICIPADOS = 32
+LLM_SPECULATIVE_BUDGET = int(os.getenv("LLM_SPECULATIVE_BUDGET", "0"))
+LLM_SPECULATIVE_QUESTIONS = int(os.getenv("LLM_SPECULATIVE_QUESTIONS", "2"))
+
+
+class RamaEspeculativa:
+    """Llamadas lanzadas por el recorrido especulativo de una clase hija."""
+
+    def __init__(self, clase: str, padre: str):
+        self.clase = clase
+        self.padre = padre
+        self.claves: List[Tuple[str, str, str, str]] = []
+        self.descartada = False
+
+
+class ConsultaPlanificada:
+    """
+    Sustituto de AtestadoLLM para 'procesar_clase_atestado' que pasa por el planificador.
+
+    Parameters
+    ----------
+    planificador: PlanificadorPreguntas
+        Planificador que ejecuta y comparte las llamadas.
+    definitiva: bool
+        True para el recorrido secuencial que construye el resultado, False para los
+        recorridos anticipados (cuyo resultado se descarta).
+    """
+
+    def __init__(self, planificador: "PlanificadorPreguntas", definitiva: bool,
+                 rama: Optional[RamaEspeculativa] = None):
+        self.planificador = planificador
+        self.definitiva = definitiva
+        self.rama = rama
+        self.contexto_atestado = planificador.atestado_llm.contexto_atestado
+
+    def anticipar(self, pregunta: str, llm_model: str, output_schema: Any,
+                  contexto_previo: Optional[List[List[str]]] = None) -> Future:
+        """Lanza la pregunta sin esperar la respuesta (si no estaba ya lanzada)."""
+        return self.planificador.lanzar(pregunta, llm_model, output_schema, contexto_previo, rama=self.rama)
+
+    def preguntar_llm(self, pregunta: str, llm_model: str, output_schema: Any,
+                      contexto_previo: Optional[List[List[str]]] = None) -> str:
+        """Misma interfaz que AtestadoLLM.preguntar_llm: espera y devuelve la respuesta."""
+        if self.definitiva:
+            return self.planificador.respuesta(pregunta, llm_model, output_schema, contexto_previo)
+        if self.planificador.cerrado:
+            # El recorrido definitivo ya terminó: el anticipado se abandona en su siguiente pregunta
+            raise CancelledError()
+        return self.anticipar(pregunta, llm_model, output_schema, contexto_previo).result()
+
+    def registrar_cascada(self, modelo_rapido: str, llm_model: str, motivo: Optional[str]):
+        """Anota la decisión de la cascada de modelos solo en el recorrido definitivo."""
+        if self.definitiva:
+            registrar = getattr(self.planificador.atestado_llm, "registrar_cascada", None)
+            if registrar is not None:
+                registrar(modelo_rapido, llm_model, motivo)
+
+
+class PlanificadorPreguntas:
+    """
+    Ejecuta las preguntas de un atestado en paralelo respetando sus dependencias.
+
+    Parameters
+    ----------
+    atestado_llm: AtestadoLLM
+        Asistente que hace las llamadas reales al modelo.
+    max_in_flight: int
+        Máximo de llamadas simultáneas al LLM.
+    presupuesto_especulativo: int
+        Máximo de llamadas especulativas (clases hijas recorridas antes de saber si su padre
+        existe); 0 desactiva la especulación.
+    preguntas_especulativas: int
+        Preguntas que lanza como mucho cada clase hija especulativa.
+    """
+
+    def __init__(self, atestado_llm: Any, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 presupuesto_especulativo: int = LLM_SPECULATIVE_BUDGET,
+                 preguntas_especulativas: int = LLM_SPECULATIVE_QUESTIONS):
+        if getattr(atestado_llm, "comparte_historial", False):
+            raise ValueError("El planificador de preguntas necesita el modo de conversación independiente: "
+                             "en modo historial cada pregunta depende de todas las respuestas anteriores")
+        self.atestado_llm = atestado_llm
+        self.max_in_flight = max(1, max_in_flight)
+        self.presupuesto_especulativo = max(0, presupuesto_especulativo)
+        self.preguntas_especulativas = max(0, preguntas_especulativas)
+        self._especulativas: Set[Tuple[str, str, str, str]] = set()
+        self._especulativas_lanzadas = 0
+        self._especulativas_canceladas = 0
+        self._ramas_descartadas = 0
+        self._llamadas = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="llm")
+        self._recorridos: Optional[ThreadPoolExecutor] = None
+        self._futuros: Dict[Tuple[str, str, str, str], Future] = {}
+        self._usadas: Set[Tuple[str, str, str, str]] = set()
+        self._lock = threading.Lock()
+        self._cerrado = False
+        self._espera = 0.0
+        self.definitiva = ConsultaPlanificada(self, definitiva=True)
+        self.anticipada = ConsultaPlanificada(self, definitiva=False)
+
+    @property
+    def cerrado(self) -> bool:
+        return self._cerrado
+
+    @staticmethod
+    def _clave(pregunta: str, llm_model: str, output_schema: Any,
+               contexto_previo: Optional[List[List[str]]]) -> Tuple[str, str, str, str]:
+        return (pregunta, llm_model, json.dumps(output_schema, sort_keys=True, default=str),
+                json.dumps(contexto_previo or [], ensure_ascii=False))
+
+    def lanzar(self, pregunta: str, llm_model: str, output_schema: Any,
+               contexto_previo: Optional[List[List[str]]] = None,
+               rama: Optional[RamaEspeculativa] = None, usada: bool = False) -> Future:
+        """
+        Lanza la pregunta al pool de llamadas, o devuelve la llamada ya lanzada con la misma
+        clave (pregunta, modelo, esquema, contexto previo).
+
+        Parameters
+        ----------
+        rama: RamaEspeculativa, optional
+            Rama especulativa que lanza la pregunta: la llamada nueva cuenta para el presupuesto
+            y para las preguntas de la clase, y se cancela si la rama se descarta.
+        usada: bool
+            True si la llamada es del recorrido definitivo: se marca como usada con el mismo
+            bloqueo con el que se obtiene, de modo que descartar una rama especulativa que la
+            lanzó ya no puede cancelarla.
+
+        Raises
+        ------
+        CancelledError
+            Si el planificador ya se ha cerrado, la rama especulativa se ha descartado o ha
+            agotado sus preguntas o el presupuesto.
+        """
+        clave = self._clave(pregunta, llm_model, output_schema, contexto_previo)
+        with self._lock:
+            futuro = self._futuros.get(clave)
+            if futuro is not None and futuro.cancelled():
+                # Cancelada al descartar una rama especulativa: otra clase la vuelve a necesitar
+                futuro = None
+            if futuro is None:
+                if self._cerrado:
+                    raise CancelledError()
+                if rama is not None:
+                    if (rama.descartada or len(rama.claves) >= self.preguntas_especulativas
+                            or self._especulativas_lanzadas >= self.presupuesto_especulativo):
+                        raise CancelledError()
+                    rama.claves.append(clave)
+                    self._especulativas.add(clave)
+                    self._especulativas_lanzadas += 1
+                # El contexto (etiqueta de llm_telemetry) viaja con la llamada al hilo del pool
+                futuro = self._llamadas.submit(contextvars.copy_context().run, self.atestado_llm.preguntar_llm,
+                                               pregunta, llm_model, output_schema, contexto_previo=contexto_previo)
+                self._futuros[clave] = futuro
+            if usada:
+                self._usadas.add(clave)
+        return futuro
+
+    def respuesta(self, pregunta: str, llm_model: str, output_schema: Any,
+                  contexto_previo: Optional[List[List[str]]] = None) -> str:
+        """Respuesta para el recorrido definitivo (espera a la llamada anticipada si la hay)."""
+        futuro = self.lanzar(pregunta, llm_model, output_schema, contexto_previo, usada=True)
+        inicio = time.perf_counter()
+        try:
+            return futuro.result()
+        finally:
+            self._espera += time.perf_counter() - inicio
+
+    def _descartar_rama(self, rama: RamaEspeculativa):
+        """Cancela las llamadas de la rama que aún no han empezado (su clase padre no existe)."""
+        with self._lock:
+            rama.descartada = True
+            self._ramas_descartadas += 1
+            for clave in rama.claves:
+                futuro = self._futuros.get(clave)
+                if futuro is not None and clave not in self._usadas and futuro.cancel():
+                    del self._futuros[clave]
+                    self._especulativas.discard(clave)
+                    self._especulativas_canceladas += 1
+
+    def anticipar_clases(self, planes_clase: List[Any], anticipar_clase: Callable[[Any, Any, Any], Any],
+                         estado_inicial: Any):
+        """
+        Empieza a anticipar las clases del plan siguiendo el DAG de clases del DFS.
+
+        Con presupuesto especulativo, las hijas de cada clase empiezan a la vez que ella (con el
+        estado de antes de la clase padre) y sus ramas se descartan si la clase no existe.
+
+        Parameters
+        ----------
+        planes_clase: List[Mapping]
+            Entradas del plan de decisión en orden DFS.
+        anticipar_clase: Callable
+            Función (consulta, plan_clase, estado) que recorre una clase con la consulta
+            anticipada sobre una copia del estado. Devuelve el estado para las clases hijas
+            si la clase existe, o None si no existe (sus hijas no se anticipan).
+        estado_inicial: Any
+            Estado del análisis antes de la primera clase (se copia para cada rama).
+        """
+        hijas: Dict[Optional[str], List[Any]] = {}
+        nombres = {plan_clase["nombre"] for plan_clase in planes_clase}
+        for plan_clase in planes_clase:
+            padre = plan_clase["clase_data"].get("dfs_extended_info", {}).get("parent")
+            hijas.setdefault(padre if padre in nombres else None, []).append(plan_clase)
+
+        self._recorridos = ThreadPoolExecutor(max_workers=max(1, min(MAX_RECORRIDOS_ANTICIPADOS, len(planes_clase))),
+                                              thread_name_prefix="anticipar")
+
+        def especular(plan_clase, estado, rama):
+            if self._cerrado or rama.descartada:
+                return
+            try:
+                anticipar_clase(ConsultaPlanificada(self, definitiva=False, rama=rama), plan_clase, estado)
+            except Exception:
+                # Fin de las preguntas especulativas de la clase (o rama descartada)
+                return
+
+        def recorrer(plan_clase, estado):
+            if self._cerrado:
+                return
+            ramas = []
+            if self.presupuesto_especulativo and self.preguntas_especulativas:
+                for hija in hijas.get(plan_clase["nombre"], []):
+                    rama = RamaEspeculativa(hija["nombre"], plan_clase["nombre"])
+                    ramas.append(rama)
+                    self._enviar_recorrido(especular, hija, copy.deepcopy(estado), rama)
+            try:
+                estado_hijas = anticipar_clase(self.anticipada, plan_clase, estado)
+            except Exception:
+                # Cancelaciones y errores se tratan (o no se producen) en el recorrido definitivo
+                estado_hijas = None
+            if estado_hijas is None:
+                for rama in ramas:
+                    self._descartar_rama(rama)
+                return
+            for hija in hijas.get(plan_clase["nombre"], []):
+                self._enviar_recorrido(recorrer, hija, copy.deepcopy(estado_hijas))
+
+        for raiz in hijas.get(None, []):
+            self._enviar_recorrido(recorrer, raiz, copy.deepcopy(estado_inicial))
+
+    def _enviar_recorrido(self, recorrer: Callable, plan_clase: Any, *args: Any):
+        with self._lock:
+            if self._cerrado:
+                return
+            self._recorridos.submit(recorrer, plan_clase, *args)
+
+    def cerrar(self) -> Dict[str, Any]:
+        """
+        Cancela las llamadas y recorridos pendientes y devuelve las estadísticas.
+
+        Las llamadas que ya están en curso terminan en segundo plano sin bloquear al llamante.
+
+        Returns
+        -------
+        Dict[str, Any]
+            llamadas (lanzadas), usadas (por el recorrido definitivo), descartadas (anticipadas
+            y no usadas), canceladas (no llegaron a ejecutarse), espera_ms (tiempo que el
+            recorrido definitivo esperó respuestas), max_in_flight y, con especulación,
+            "especulacion": presupuesto, lanzadas, útiles (usadas por el recorrido definitivo),
+            desperdiciadas (ejecutadas y no usadas), canceladas (al descartar su rama o al
+            cerrar, sin llegar a ejecutarse) y ramas_descartadas (hijas de clases inexistentes).
+        """
+        with self._lock:
+            self._cerrado = True
+            futuros = dict(self._futuros)
+            usadas = set(self._usadas)
+            especulativas = set(self._especulativas)
+        if self._recorridos is not None:
+            self._recorridos.shutdown(wait=False, cancel_futures=True)
+        self._llamadas.shutdown(wait=False, cancel_futures=True)
+        canceladas = sum(1 for futuro in futuros.values() if futuro.cancelled())
+        estadisticas = {
+            "llamadas": len(futuros) - canceladas,
+            "usadas": len(usadas),
+            "descartadas": len(futuros) - canceladas - len(usadas),
+            "canceladas": canceladas,
+            "espera_ms": round(self._espera * 1000, 2),
+            "max_in_flight": self.max_in_flight
+        }
+        if self.presupuesto_especulativo:
+            utiles = len(especulativas & usadas)
+            canceladas_al_cerrar = sum(1 for clave in especulativas if futuros[clave].cancelled())
+            estadisticas["especulacion"] = {
+                "presupuesto": self.presupuesto_especulativo,
+                "lanzadas": self._especulativas_lanzadas,
+                "utiles": utiles,
+                "desperdiciadas": len(especulativas) - utiles - canceladas_al_cerrar,
+                "canceladas": self._especulativas_canceladas + canceladas_al_cerrar,
+                "ramas_descartadas": self._ramas_descartadas
+            }
+        return estadisticas
@@ -6,6 +6,7 @@ from rdflib.namespace import RDF, OWL
 from owlready2 import ThingClass, ObjectPropertyClass, FunctionalProperty, OwlReadyInconsistentOntologyError, Not
 from owlready2 import *
 from entities import AnalisisAtestado
+from ontology_snapshot import load_ontology_world
 # Renombramos el Namespace de rdflib para evitar el error de base_iri
 from rdflib import Graph, URIRef, RDF, Literal, Namespace as RDFNamespace, RDFS
 
@@ -207,10 +208,9 @@ def construir_articulos_inferidos_v1(lista_clases: list[str]) -> list[str]:
     return res
 
 def reasoner(tmp_path):
-    world = World()
     try:
-        # Cargar ontología base e individuos
-        base_onto = world.get_ontology(ONTOLOGY).load()
+        # Cargar ontología base (copia propia de la instantánea SQLite) e individuos
+        world, base_onto = load_ontology_world(ONTOLOGY, private_copy=True)
         user_data = world.get_ontology(f"file://{tmp_path}").load()
         
         # Ejecutar razonador
@@ -247,14 +247,14 @@ def clean_uri(text):
 
 
 def reasoner_ttls(tmp_path,  data: list[AnalisisAtestado]):
-    world = World()
+    world = None
     # Aumentar memoria para procesos de materialización pesados
     owlready2.reasoning.JAVA_MAX_MEM = "4000M" 
     
     try:
         NS = RDFNamespace(NS_URI)
-        base_path = os.path.abspath(ONTOLOGY)
-        base_onto = world.get_ontology(f"file://{base_path}").load()
+        # Copia propia de la instantánea SQLite de la ontología (el razonador escribe en el World)
+        world, base_onto = load_ontology_world(os.path.abspath(ONTOLOGY), private_copy=True)
 
         # 1. Carga de datos de usuario
         user_onto = world.get_ontology("http://temp.org/user_data")
@@ -431,13 +431,13 @@ def write_turtle_star(path, triples, triple_annotations):
                 f.write(f"{quoted} <{apred}> {aval_t} .\n")
 
 def reasoner_ttl(tmp_path):
-    world = World()
+    world = None
     # Aumentar memoria para procesos de materialización pesados
     owlready2.reasoning.JAVA_MAX_MEM = "4000M" 
     
     try:
-        base_path = os.path.abspath(ONTOLOGY)
-        base_onto = world.get_ontology(f"file://{base_path}").load()
+        # Copia propia de la instantánea SQLite de la ontología (el razonador escribe en el World)
+        world, base_onto = load_ontology_world(os.path.abspath(ONTOLOGY), private_copy=True)
 
         # 1. Carga de datos de usuario
         user_onto = world.get_ontology("http://temp.org/user_data")
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+
+from local_traversal import BACKEND_DIR, DEFAULT_QUESTIONS_FILE, LocalQuestionsTraversal
+
+ONTOLOGY_FILE = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+# ------------------------- LLM SIMULADO -------------------------
+
+def _hash(pregunta):
+    return int(hashlib.md5(pregunta.encode()).hexdigest(), 16)
+
+def respuesta_simulada(pregunta, output_schema):
+    """Respuesta determinista que depende solo de la pregunta y de su esquema."""
+    h = _hash(pregunta)
+    propiedades = (output_schema or {}).get("properties", {})
+    respuesta = propiedades.get("respuesta", {})
+    if respuesta.get("type") == "array":
+        elementos = [f"E{(h >> (4 * i)) % 5}" for i in range(h % 3 + (1 if h % 7 else 0))]
+        return {"respuesta": elementos, "referencia": [[e] for e in elementos]}
+    if respuesta.get("type") == "object":
+        return {"respuesta": {k: h % 1000 for k in respuesta.get("properties", {})} if h % 4 else {}}
+    return {k: f"valor {h % 1000}" for k in propiedades}
+
+class ClienteSimulado:
+    """
+    Imita client.chat.completions.create con respuesta_simulada y guarda los modelos y mensajes
+    enviados. 'errores' se lanzan antes de la primera respuesta, 'latencia' se multiplica por un
+    valor de 0 a 4 que depende de la pregunta y 'alterar(modelo, h, respuesta)' puede sustituir el
+    contenido devuelto.
+    """
+
+    def __init__(self, errores=(), latencia=0.0, alterar=None, cached_tokens=0):
+        self.errores = list(errores)
+        self.latencia = latencia
+        self.alterar = alterar
+        self.cached_tokens = cached_tokens
+        self.modelos = []
+        self.envios = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        with self._lock:
+            if self.errores:
+                raise self.errores.pop(0)
+            self.modelos.append(model)
+            self.envios.append(json.dumps(messages, sort_keys=True))
+        pregunta = messages[-1]["content"]
+        h = _hash(pregunta)
+        respuesta = respuesta_simulada(pregunta, kwargs["extra_body"]["response_format"]["json_schema"]["schema"])
+        contenido = (self.alterar and self.alterar(model, h, respuesta)) or json.dumps(respuesta)
+        time.sleep(self.latencia * (h % 5))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+                               usage=SimpleNamespace(prompt_tokens=100, completion_tokens=10,
+                                                     prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens)))
+
+@pytest.fixture(scope="session")
+def responder():
+    return respuesta_simulada
+
+@pytest.fixture(scope="session")
+def cliente_simulado():
+    return ClienteSimulado
+
+# ------------------------- ONTOLOGÍA -------------------------
+
+@pytest.fixture(scope="session")
+def crear_traversal(tmp_path_factory):
+    """Traversal de la ontología sobre una copia del JSON de preguntas, o sobre el JSON indicado."""
+
+    def crear(questions_path=None):
+        if questions_path is None:
+            questions_path = tmp_path_factory.mktemp("preguntas") / "preguntas_extendido.json"
+            shutil.copy(DEFAULT_QUESTIONS_FILE, questions_path)
+        return LocalQuestionsTraversal(ONTOLOGY_FILE, str(questions_path))
+
+    return crear
+
+@pytest.fixture(scope="session")
+def traversal(crear_traversal):
+    return crear_traversal()
@@ -0,0 +1,121 @@
+import json
+from types import SimpleNamespace
+import pytest
+
+import decisionTree
+import llm_cache
+
+# ------------------------- FIXTURES -------------------------
+
+class ClienteSimulado:
+    """Registra los mensajes de cada llamada y devuelve 'usage' = número de mensajes.
+
+    Simula la caché de prefijo del proveedor: a partir de la segunda llamada los 10 tokens del
+    mensaje de sistema se sirven desde la caché.
+    """
+
+    def __init__(self):
+        self.llamadas = []
+        self.mensajes_sistema = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.mensajes_sistema.append(messages[0])
+        self.llamadas.append([m["content"] if isinstance(m["content"], str) else m["content"][0]["text"]
+                              for m in messages])
+        contenido = json.dumps({"respuesta": [f"R{len(self.llamadas)}"]})
+        detalles = SimpleNamespace(cached_tokens=10 if len(self.llamadas) > 1 else 0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+                               usage=SimpleNamespace(prompt_tokens=10 * len(messages), completion_tokens=3,
+                                                     prompt_tokens_details=detalles))
+
+@pytest.fixture
+def cliente(monkeypatch):
+    cliente = ClienteSimulado()
+    monkeypatch.setattr(decisionTree, "client", cliente)
+    # Sin la caché de respuestas compartida: cada test ve todas sus llamadas
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    return cliente
+
+# ------------------------- TESTS DE MODOS DE CONVERSACIÓN -------------------------
+
+def test_modo_historial_reenvia_todo(cliente):
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_HISTORIAL)
+    llm.preguntar_llm("p1", "m", {})
+    llm.preguntar_llm("p2", "m", {}, contexto_previo=[["otra", "{}"]])
+    assert cliente.llamadas[1][1:] == ["p1", '{"respuesta": ["R1"]}', "p2"]
+    assert len(llm.mensajes) == 5
+
+def test_modo_independiente_solo_envia_la_cadena(cliente):
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE)
+    llm.preguntar_llm("p1", "m", {})
+    llm.preguntar_llm("p2", "m", {})
+    llm.preguntar_llm("p3", "m", {}, contexto_previo=[["p1", "r1"]])
+    assert cliente.llamadas[1][1:] == ["p2"]
+    assert cliente.llamadas[2][1:] == ["p1", "r1", "p3"]
+    assert cliente.llamadas[2][0] == llm.mensajes[0]["content"]
+    assert len(llm.mensajes) == 1
+
+def test_registro_de_tokens_por_llamada(cliente):
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_HISTORIAL)
+    for pregunta in ("p1", "p2", "p3"):
+        llm.preguntar_llm(pregunta, "m", {})
+    assert [r["prompt_tokens"] for r in llm.registro_llamadas] == [20, 40, 60]
+    resumen = llm.resumen_llamadas()
+    assert (resumen["llamadas"], resumen["prompt_tokens"], resumen["prompt_tokens_max"]) == (3, 120, 60)
+    assert resumen["completion_tokens"] == 9 and resumen["modo"] == decisionTree.MODO_HISTORIAL
+
+def test_modo_desconocido():
+    with pytest.raises(ValueError):
+        decisionTree.AtestadoLLM("texto", modo="otro")
+
+# ------------------------- TESTS DE CADENA DE DEPENDENCIAS -------------------------
+
+def test_cadena_dependencias():
+    raiz = {"class": "Report", "existe": True, "content": {"respuesta": ["atestado"]}}
+    assert decisionTree.cadena_dependencias(raiz) == []
+    assert decisionTree.cadena_dependencias(None) == []
+
+    padre = {"existe": True, "cadena": [], "content": {"prompt": "¿Objetos?", "respuesta": ["móvil"]}}
+    hija = {"existe": True, "cadena": decisionTree.cadena_dependencias(padre),
+            "content": {"prompt": "¿Quién robó el 'móvil'?", "respuesta": ["Juan"]}}
+    assert decisionTree.cadena_dependencias(hija) == [
+        ["¿Objetos?", '{"respuesta": ["móvil"]}'],
+        ["¿Quién robó el 'móvil'?", '{"respuesta": ["Juan"]}']
+    ]
+
+# ------------------------- TESTS DE CACHÉ DE PREFIJO -------------------------
+
+def test_cache_control_solo_en_modelos_que_lo_requieren(cliente, monkeypatch):
+    monkeypatch.setattr(decisionTree, "LLM_PROMPT_CACHE", "auto")
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE)
+    llm.preguntar_llm("p1", "openai/gpt-4.1-mini", {})
+    llm.preguntar_llm("p1", "anthropic/claude-sonnet-4", {})
+    assert cliente.mensajes_sistema[0] == llm.mensajes[0]
+    assert cliente.mensajes_sistema[1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert cliente.llamadas[0] == cliente.llamadas[1]
+
+    monkeypatch.setattr(decisionTree, "LLM_PROMPT_CACHE", "off")
+    llm.preguntar_llm("p1", "anthropic/claude-sonnet-4", {})
+    assert cliente.mensajes_sistema[2] == llm.mensajes[0]
+
+def test_prefijo_del_atestado_estable_en_modo_historial(cliente, monkeypatch):
+    monkeypatch.setattr(decisionTree, "LLM_PROMPT_CACHE", "on")
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_HISTORIAL)
+    llm.preguntar_llm("p1", "m", {})
+    llm.preguntar_llm("p2", "m", {})
+    assert cliente.mensajes_sistema[0] == cliente.mensajes_sistema[1]
+    assert cliente.llamadas[1] == [llm.mensajes[0]["content"], "p1", '{"respuesta": ["R1"]}', "p2"]
+    # El historial guardado no lleva la marca de caché
+    assert isinstance(llm.mensajes[0]["content"], str)
+
+def test_resumen_tokens_cacheados(cliente):
+    llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE)
+    for pregunta in ("p1", "p2", "p3"):
+        llm.preguntar_llm(pregunta, "m", {})
+    assert [r["cached_tokens"] for r in llm.registro_llamadas] == [0, 10, 10]
+    assert [r["uncached_tokens"] for r in llm.registro_llamadas] == [20, 10, 10]
+    resumen = llm.resumen_llamadas()
+    assert (resumen["prompt_tokens"], resumen["cached_tokens"], resumen["uncached_tokens"]) == (60, 20, 40)
+    assert resumen["proporcion_cacheada"] == round(20 / 60, 4)
+    assert len(resumen["detalle"]) == 3
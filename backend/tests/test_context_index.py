@@ -0,0 +1,115 @@
+import copy
+import json
+import pytest
+
+import decisionTree
+from context_index import ListaContextos, ListaEntidades, contextos_propiedad, contextos_restriccion
+
+# ------------------------- FIXTURES -------------------------
+
+def _ctx(nombre, domain, range_, elemento_dominio, positivo=True, respuesta=None):
+    return {"tipo_elemeto": "extraccion", "nombre_elemento": nombre, "domain": domain, "elemento_dominio": elemento_dominio,
+            "range": range_, "prompt": f"¿{nombre} de {elemento_dominio}?", "respuesta": respuesta, "positivo": positivo}
+
+def _entidad(nombre, dominio):
+    return {"nombre": nombre, "dominios": [dominio], "dominios_negativos": [], "propiedades": []}
+
+class _Traversal:
+    """Jerarquía Thing > Property > StolenObject"""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def most_specific(self, clase_a, clase_b):
+        self.llamadas += 1
+        orden = ["Thing", "Property", "StolenObject"]
+        if clase_a in orden and clase_b in orden:
+            return max(clase_a, clase_b, key=orden.index)
+        return ""
+
+def _busqueda_lineal(listas, nombre, dominio, rango, elementos):
+    """Doble bucle original de procesar_clase_atestado (rama object_property)."""
+    return [(ctx, e) for lista in listas for ctx in lista for e in elementos
+            if sorted(ctx.get("domain")) == sorted(dominio) and sorted(ctx.get("range")) == sorted(rango)
+            and ctx.get("nombre_elemento") == nombre and ctx.get("elemento_dominio") == e]
+
+# ------------------------- TESTS DEL ÍNDICE -------------------------
+
+def test_buscar_por_restriccion_ignora_el_orden_de_dominio_y_rango():
+    lista = ListaContextos([_ctx("hasVictim", ["Theft", "Report"], ["Person"], "robo1")])
+    assert lista.buscar("hasVictim", ["Report", "Theft"], ("Person",), "robo1") == [0]
+    assert lista.buscar("hasVictim", ["Report"], ["Person"], "robo1") == []
+    assert lista.buscar("hasVictim", ["Report", "Theft"], ["Person"], "robo2") == []
+
+def test_mismo_orden_que_la_busqueda_lineal():
+    positivos = ListaContextos([_ctx("p", ["D"], ["R"], e) for e in ("b", "a", "b")])
+    negativos = ListaContextos([_ctx("p", ["D"], ["R"], "a", positivo=False), _ctx("q", ["D"], ["R"], "a")])
+    elementos = ["a", "b", "c"]
+    esperado = _busqueda_lineal([positivos, negativos], "p", ["D"], ["R"], elementos)
+    assert contextos_restriccion([positivos, negativos], "p", ["D"], ["R"], elementos) == esperado
+    assert len(esperado) == 4
+
+def test_contextos_propiedad_por_dominio():
+    positivos = ListaContextos([_ctx("Age", ["Person"], [], "Juan"), _ctx("Age", ["Company"], [], "ACME")])
+    negativos = ListaContextos([_ctx("Age", ["Person"], [], "Ana", positivo=False)])
+    encontrados = contextos_propiedad([positivos, negativos], "Age", ["Person"])
+    assert [ctx["elemento_dominio"] for ctx in encontrados] == ["Juan", "Ana"]
+
+def test_indice_al_dia_tras_modificar_la_lista():
+    lista = ListaContextos()
+    lista.append(_ctx("p", ["D"], ["R"], "a"))
+    lista += [_ctx("p", ["D"], ["R"], "b")]
+    lista.insert(0, _ctx("p", ["D"], ["R"], "b"))
+    assert lista.buscar("p", ["D"], ["R"], "b") == [0, 2]
+    del lista[0]
+    assert lista.buscar("p", ["D"], ["R"], "b") == [1]
+
+def test_claves_no_hashables_se_comparan_una_a_una():
+    lista = ListaContextos([_ctx("p", ["D"], ["R"], ["lista"]), _ctx("p", ["D"], ["R"], "a")])
+    assert lista.buscar("p", ["D"], ["R"], ["lista"]) == [0]
+    assert lista.buscar("p", ["D"], ["R"], "a") == [1]
+
+def test_copia_y_serializacion():
+    lista = ListaContextos([_ctx("p", ["D"], ["R"], "a")])
+    copia = copy.deepcopy(lista)
+    copia.append(_ctx("p", ["D"], ["R"], "a"))
+    assert isinstance(copia, ListaContextos)
+    assert (lista.buscar("p", ["D"], ["R"], "a"), copia.buscar("p", ["D"], ["R"], "a")) == ([0], [0, 1])
+    assert json.loads(json.dumps(lista)) == list(lista)
+
+# ------------------------- TESTS DE ENTIDADES -------------------------
+
+def test_entidades_por_nombre_en_orden_de_insercion():
+    entidades = ListaEntidades([_entidad("Juan", "Person"), _entidad("Movil", "Thing"), _entidad("Juan", "Victim")])
+    assert [en["dominios"][0] for en in entidades.con_nombre("Juan")] == ["Person", "Victim"]
+    assert entidades.con_nombre("Ana") == []
+    entidades.append(_entidad(["no", "hashable"], "Thing"))
+    assert entidades.con_nombre(["no", "hashable"]) == [entidades[-1]]
+
+def test_acumular_entidades_resuelve_cada_par_de_dominios_una_vez():
+    traversal = _Traversal()
+    analisis_atestado = {"contexto_positivo": [], "contexto_negativo": [], "objetos": [], "entidades": []}
+    for clase in ("Property", "StolenObject", "Property", "StolenObject"):
+        analisis_clase = {"contexto": [], "objetos": [], "entidades": [_entidad("Movil", clase), _entidad("Cartera", clase)]}
+        decisionTree.acumular_resultados_clase(analisis_atestado, analisis_clase, traversal)
+    entidades = analisis_atestado["entidades"]
+    assert isinstance(entidades, ListaEntidades)
+    assert [(en["nombre"], en["dominios"][0]) for en in entidades] == [("Movil", "StolenObject"), ("Cartera", "StolenObject")]
+    # (StolenObject, Property) y (Property, StolenObject) se resuelven con Movil y se reutilizan con Cartera
+    assert traversal.llamadas == 2
+    assert entidades.decisiones_reutilizadas == 2
+
+def test_acumular_entidades_sin_relacion_se_anaden():
+    analisis_atestado = {"contexto_positivo": [], "contexto_negativo": [], "objetos": [], "entidades": ListaEntidades()}
+    for clase in ("Person", "Vehicle"):
+        analisis_clase = {"contexto": [], "objetos": [], "entidades": [_entidad("Seat", clase)]}
+        decisionTree.acumular_resultados_clase(analisis_atestado, analisis_clase, _Traversal())
+    assert [en["dominios"][0] for en in analisis_atestado["entidades"].con_nombre("Seat")] == ["Person", "Vehicle"]
+
+def test_copia_de_entidades_conserva_las_decisiones():
+    entidades = ListaEntidades([_entidad("Juan", "Person")])
+    assert entidades.subclase_entre("Victim", "Person", lambda a, b: a) == "Victim"
+    copia = copy.deepcopy(entidades)
+    copia.append(_entidad("Juan", "Victim"))
+    assert len(entidades.con_nombre("Juan")) == 1 and len(copia.con_nombre("Juan")) == 2
+    assert copia.subclase_entre("Victim", "Person", lambda a, b: pytest.fail("decisión ya resuelta")) == "Victim"
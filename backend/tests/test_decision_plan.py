@@ -0,0 +1,86 @@
+import os
+import threading
+from types import SimpleNamespace
+import pytest
+
+import decision_plan
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture()
+def traversal(crear_traversal):
+    """Un traversal por test: los planes se guardan en él y algunos tests modifican sus preguntas."""
+    return crear_traversal()
+
+# ------------------------- TESTS DEL PLAN -------------------------
+
+def test_plan_sigue_el_orden_dfs(traversal):
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    dfs = traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport")
+    assert [c["nombre"] for c in plan["clases"]] == list(dfs["classes"])
+    assert plan["clases"][0]["profundidad"] == 0
+    assert plan["estadisticas"]["clases"] == len(dfs["classes"])
+
+def test_plan_resuelve_preguntas_y_dominios(traversal):
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    pasos = [p for c in plan["clases"] for p in c["pasos"]]
+    propiedades = [p for p in pasos if p["elemento"]["type"] == "object_property"]
+    assert propiedades and all(p["dominio_propiedad"] is not None for p in propiedades)
+    assert any(p["pregunta"] for p in propiedades)
+    assert plan["estadisticas"]["preguntas_vinculadas"] > 0
+
+def test_plan_sin_operadores_de_disyuncion(traversal):
+    # procesar_clase_atestado solo trata '&' y 'Not': cada disyunción llega como un único elemento
+    P = "SCPO_Extended_Ontology_V01R08_AT08Q."
+    clase_data = {"equivalent_classes": [{"raw": f"{P}Report & {P}threatMade.some({P}Threats | {P}Insult)"}]}
+    pasos = decision_plan._compilar_pasos(traversal, "Amenaza", clase_data, SimpleNamespace(pregunta=lambda c, e: None))
+    elementos = [(p["elemento"]["type"], p["elemento"]["element"]) for p in pasos]
+    assert ("operator", "|") not in elementos
+    assert elementos[-1] == ("entity_object", "Threats | Insult")
+
+def test_plan_compartido_y_solo_lectura(traversal):
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    assert decision_plan.obtener_plan(traversal, "PropertyCrimeReport") is plan
+    with pytest.raises(TypeError):
+        plan["clases"][0]["detalles"]["preguntas"] = []
+
+def test_plan_se_recompila_si_cambian_las_preguntas(traversal):
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    os.utime(traversal.questions_path, (1, 1))
+    assert decision_plan.obtener_plan(traversal, "PropertyCrimeReport") is not plan
+
+def test_plan_se_recompila_si_cambia_el_tamano_con_la_misma_fecha(traversal):
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    estado = os.stat(traversal.questions_path)
+    # Edición dentro del mismo tick de mtime: solo cambia el tamaño
+    with open(traversal.questions_path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    os.utime(traversal.questions_path, ns=(estado.st_atime_ns, estado.st_mtime_ns))
+    assert not decision_plan.diagnostico_planes(traversal)["PropertyCrimeReport"]["vigente"]
+    assert decision_plan.obtener_plan(traversal, "PropertyCrimeReport") is not plan
+
+def test_iterar_plan_sin_compilar_es_perezoso(traversal):
+    compilado = decision_plan.compilar_plan(traversal, "PropertyCrimeReport")
+    entradas = list(decision_plan.iterar_plan(traversal, "PropertyCrimeReport"))
+    assert [e["nombre"] for e in entradas] == [c["nombre"] for c in compilado["clases"]]
+    # Las clases que no se consultan (p.ej. podadas) no se extraen ni se compilan
+    assert not any(e["clase_data"].loaded for e in entradas[1:])
+    assert entradas[0]["profundidad"] == 0 and not entradas[0].loaded
+    assert entradas[0]["pasos"] == compilado["clases"][0]["pasos"]
+    assert entradas[0]["detalles"] == compilado["clases"][0]["detalles"]
+
+def test_iterar_plan_compila_el_plan_al_terminar(traversal):
+    list(decision_plan.iterar_plan(traversal, "PropertyCrimeReport"))
+    for hilo in threading.enumerate():
+        if hilo.name == "plan-PropertyCrimeReport":
+            hilo.join()
+    assert decision_plan.diagnostico_planes(traversal)["PropertyCrimeReport"]["vigente"] is True
+    plan = decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    assert list(decision_plan.iterar_plan(traversal, "PropertyCrimeReport")) == list(plan["clases"])
+
+def test_diagnostico_planes(traversal):
+    decision_plan.obtener_plan(traversal, "PropertyCrimeReport")
+    diagnostico = decision_plan.diagnostico_planes(traversal)["PropertyCrimeReport"]
+    assert diagnostico["vigente"] is True
+    assert diagnostico["tiempo_compilacion_ms"] >= 0
+    assert diagnostico["tamano_bytes"] > 0
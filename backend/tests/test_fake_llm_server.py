@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+import pytest
+
+import decisionTree
+import llm_cache
+import llm_client
+from documents import leer_docx
+from fake_llm_server import (DEFAULT_FIXTURES, FakeAPIError, FakeLLM, FixtureStore, LatencyModel, RecordingClient,
+                             _run_tree, document_key, request_key, serve)
+from llm_client import LLMClient
+from local_traversal import BACKEND_DIR
+
+ATESTADO_1 = os.path.join(BACKEND_DIR, "..", "report_examples", "1.INFORME_Atestado1.docx")
+
+# ------------------------- FIXTURES -------------------------
+
+ESQUEMA_LISTA = {"type": "object", "properties": {"respuesta": {"type": "array", "items": {"type": "string"}},
+                                                  "referencia": {"type": "array"}}}
+DOCUMENTO = "Eres un analista. ATESTADO: Juan Pérez denuncia el robo de su Bicicleta Orbea en la Calle Mayor."
+
+def mensajes(pregunta):
+    return [{"role": "system", "content": DOCUMENTO}, {"role": "user", "content": pregunta}]
+
+def peticion(pregunta, esquema=ESQUEMA_LISTA):
+    return {"model": "m", "messages": mensajes(pregunta),
+            "extra_body": {"response_format": {"type": "json_schema", "json_schema": {"schema": esquema}}}}
+
+def contenido(completion):
+    return json.loads(completion.choices[0].message.content)
+
+def grabadas(respuestas):
+    store = FixtureStore()
+    for pregunta, respuesta in respuestas.items():
+        store.put(request_key(document_key(mensajes(pregunta)), pregunta, ESQUEMA_LISTA),
+                  {"prompt": pregunta, "latency_ms": 40, "response": json.dumps(respuesta)})
+    return store
+
+# ------------------------- TESTS DE REPRODUCCIÓN -------------------------
+
+def test_reproduce_las_respuestas_grabadas_y_sintetiza_el_resto():
+    grabada = {"respuesta": ["Bicicleta Orbea"], "referencia": [["robo de su Bicicleta Orbea"]]}
+    fake = FakeLLM(grabadas({"¿Qué se robó?": grabada}))
+    assert contenido(fake.create(**peticion("¿Qué se robó?"))) == grabada
+    sintetica = contenido(fake.create(**peticion("¿Quién denuncia?")))
+    assert sintetica == contenido(FakeLLM().create(**peticion("¿Quién denuncia?")))  # determinista
+    assert all(termino in DOCUMENTO for termino in sintetica["respuesta"])
+    stats = fake.stats()
+    assert (stats["requests"], stats["hits"], stats["misses"], stats["synthesized"]) == (2, 1, 1, 1)
+
+def test_sin_sintesis_una_pregunta_no_grabada_es_un_404():
+    with pytest.raises(FakeAPIError) as error:
+        FakeLLM(on_miss="error").create(**peticion("¿Quién denuncia?"))
+    assert error.value.status_code == 404
+
+def test_las_llamadas_compuestas_se_responden_pregunta_a_pregunta():
+    grabada = {"respuesta": ["Juan Pérez"], "referencia": [["Juan Pérez denuncia"]]}
+    fake = FakeLLM(grabadas({"¿Quién denuncia?": grabada}))
+    esquema = {"type": "object", "properties": {"pregunta_0": ESQUEMA_LISTA, "pregunta_1": ESQUEMA_LISTA}}
+    prompt = "Responde:\n\n### pregunta_0\n¿Quién denuncia?\n\n### pregunta_1\n¿Dónde?"
+    respuesta = contenido(fake.create(**peticion(prompt, esquema)))
+    assert respuesta["pregunta_0"] == grabada and set(respuesta["pregunta_1"]) == {"respuesta", "referencia"}
+    assert (fake.stats()["hits"], fake.stats()["misses"]) == (1, 1)
+
+def test_modelos_de_latencia():
+    assert LatencyModel("fixed:250").sample_ms(None) == 250
+    assert LatencyModel("recorded:2").sample_ms(None, 40) == 80
+    assert LatencyModel("0").sample_ms(None) == 0
+    with pytest.raises(ValueError):
+        LatencyModel("gamma:1")
+    esperas = []
+    fake = FakeLLM(grabadas({"¿Qué?": {"respuesta": []}}), latency="recorded", sleep=esperas.append)
+    fake.create(**peticion("¿Qué?"))
+    assert esperas == [0.04]
+
+# ------------------------- TESTS DE ERRORES INYECTADOS -------------------------
+
+def test_llm_client_absorbe_los_429_y_timeouts_inyectados():
+    fake = FakeLLM(rate_429=0.3, rate_timeout=0.1, timeout_seconds=0, seed=3)
+    capa = LLMClient(max_retries=10, backoff_base=0, sleep=lambda segundos: None)
+    for i in range(20):
+        capa.create(fake, model="m", **{k: v for k, v in peticion(f"Pregunta {i}").items() if k != "model"})
+    stats = fake.stats()
+    assert stats["throttled"] > 0 and stats["timeouts"] > 0
+    assert capa.stats()["retries"] == stats["throttled"] + stats["timeouts"]
+    assert capa.stats()["failures"] == 0 and stats["requests"] == 20 + capa.stats()["retries"]
+
+# ------------------------- TESTS DEL SERVIDOR Y LA GRABACIÓN -------------------------
+
+def test_servidor_http_compatible_con_openai():
+    grabada = {"respuesta": ["Calle Mayor"], "referencia": [["en la Calle Mayor"]]}
+    fake = FakeLLM(grabadas({"¿Dónde?": grabada}), rate_429=1.0)
+    servidor = serve(fake, port=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/api/v1"
+    try:
+        cuerpo = peticion("¿Dónde?")
+        cuerpo["response_format"] = cuerpo.pop("extra_body")["response_format"]
+        datos = json.dumps(cuerpo).encode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(f"{url}/chat/completions", data=datos))
+        assert error.value.code == 429
+        fake.rate_429 = 0.0
+        with urllib.request.urlopen(urllib.request.Request(f"{url}/chat/completions", data=datos)) as respuesta:
+            completion = json.loads(respuesta.read())
+        assert json.loads(completion["choices"][0]["message"]["content"]) == grabada
+        assert completion["usage"]["prompt_tokens"] > 0
+        with urllib.request.urlopen(f"{url}/stats") as respuesta:
+            assert json.loads(respuesta.read())["throttled"] == 1
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+def test_la_grabacion_se_reproduce_igual(tmp_path):
+    store = FixtureStore()
+    grabador = RecordingClient(FakeLLM(), store)
+    original = contenido(grabador.create(**peticion("¿Qué se robó?")))
+    ruta = str(tmp_path / "fixtures.json")
+    store.save(ruta, DOCUMENTO, document_key(mensajes("")))
+    fake = FakeLLM(FixtureStore([ruta]), on_miss="error")
+    assert contenido(fake.create(**peticion("¿Qué se robó?"))) == original
+    assert grabador.recorded == 1 and fake.stats()["hits"] == 1
+
+def test_grabar_restaura_el_cliente_y_la_cache(monkeypatch):
+    monkeypatch.setattr(llm_client, "_default_client", LLMClient())
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    cliente_original = object()
+    monkeypatch.setattr(decisionTree, "client", cliente_original)
+    store = FixtureStore()
+    _run_tree(DOCUMENTO, RecordingClient(FakeLLM(), store), "PropertyCrimeReport", 1)
+    assert len(store) > 0
+    assert decisionTree.client is cliente_original and llm_cache.LLM_CACHE_ENABLED is True
+
+# ------------------------- TESTS DE EXTREMO A EXTREMO -------------------------
+
+@pytest.mark.parametrize("lote", [1, 4])
+def test_analisis_del_atestado_1_sin_red(monkeypatch, traversal, lote):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_client, "_default_client", LLMClient())
+    monkeypatch.setattr(decisionTree, "LLM_BATCH_SIZE", lote)
+    fake = FakeLLM(FixtureStore([DEFAULT_FIXTURES]), on_miss="error")
+    monkeypatch.setattr(decisionTree, "client", fake)
+    atestado_llm = decisionTree.AtestadoLLM(leer_docx(ATESTADO_1), modo=decisionTree.MODO_INDEPENDIENTE)
+    resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                              max_in_flight=4)
+    assert "error" not in resultado
+    assert any(a["existe"] for a in resultado["respuestas"][0]["analisis"])
+    assert fake.stats()["misses"] == 0 and fake.stats()["hits"] > 10
@@ -0,0 +1,130 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+import pytest
+
+import decisionTree
+from llm_cache import LLMResponseCache, cache_key, document_hash, response_problem
+
+# ------------------------- FIXTURES -------------------------
+
+class ClienteSimulado:
+    """Cuenta las llamadas y responde con el número de llamada."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.llamadas += 1
+        contenido = json.dumps({"respuesta": [f"R{self.llamadas}"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=3))
+
+@pytest.fixture
+def cliente(monkeypatch):
+    cliente = ClienteSimulado()
+    monkeypatch.setattr(decisionTree, "client", cliente)
+    return cliente
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"))
+
+# ------------------------- TESTS DE LA CACHÉ -------------------------
+
+def test_cache_guarda_y_recupera(cache):
+    clave = cache_key(document_hash("texto"), "m", "p", {"type": "object"}, "historial", [])
+    assert cache.get(clave) is None
+    cache.put(clave, '{"respuesta": []}')
+    assert cache.get(clave) == '{"respuesta": []}'
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["hit_ratio"]) == (1, 1, 1, 0.5)
+
+def test_clave_distingue_todos_los_componentes():
+    base = [document_hash("texto"), "m", "p", {"type": "object"}, "historial", []]
+    variantes = [[document_hash("otro")] + base[1:], base[:1] + ["m2"] + base[2:], base[:2] + ["p2"] + base[3:],
+                 base[:3] + [{"type": "array"}] + base[4:], base[:4] + ["independiente", []],
+                 base[:5] + [[{"role": "user", "content": "previa"}]]]
+    claves = {cache_key(*base)} | {cache_key(*variante) for variante in variantes}
+    assert len(claves) == 7
+
+def test_cache_persiste_entre_instancias(tmp_path):
+    ruta = str(tmp_path / "llm_cache.sqlite3")
+    LLMResponseCache(ruta).put("k", "v")
+    assert LLMResponseCache(ruta).get("k") == "v"
+
+def test_cache_caduca_entradas(cache):
+    cache.ttl_seconds = 1
+    cache.put("k", "v")
+    cache._conn.execute("UPDATE responses SET created = ?", (time.time() - 2,))
+    assert cache.get("k") is None
+    assert (cache.stats()["expired"], cache.stats()["entries"]) == (1, 0)
+
+def test_cache_expulsa_las_menos_usadas(cache):
+    cache.max_bytes = 10
+    cache.put("a", "1234")
+    cache.put("b", "1234")
+    cache._conn.execute("UPDATE responses SET last_used = last_used - 10 WHERE key = 'b'")
+    cache.put("c", "1234")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1234", None, "1234")
+    assert cache.stats()["evicted"] == 1
+
+def test_cache_desactivada_por_defecto():
+    entorno = {k: v for k, v in os.environ.items() if k != "LLM_CACHE"}
+    salida = subprocess.run([sys.executable, "-c", "import llm_cache; print(llm_cache.default_cache_stats())"],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    assert salida.strip() == "{'enabled': False}"
+
+@pytest.mark.parametrize("contenido, motivo", [
+    ('{"respuesta": ["R1"]}', None),
+    ('{"respuesta": ["R1"', "no es JSON"),
+    ('{"respuesta": "R1"}', "$.respuesta: se esperaba array"),
+])
+def test_motivo_para_no_guardar_una_respuesta(contenido, motivo):
+    esquema = {"type": "object", "properties": {"respuesta": {"type": "array", "items": {"type": "string"}}}}
+    assert response_problem(contenido, esquema) == motivo
+
+# ------------------------- TESTS DE ATESTADOLLM CON CACHÉ -------------------------
+
+def test_reprocesar_atestado_no_llama_al_modelo(cliente, cache):
+    primero = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_HISTORIAL, cache=cache)
+    respuestas = [primero.preguntar_llm(p, "m", {}) for p in ("p1", "p2")]
+    segundo = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_HISTORIAL, cache=cache)
+    assert [segundo.preguntar_llm(p, "m", {}) for p in ("p1", "p2")] == respuestas
+    assert cliente.llamadas == 2
+    # El historial se reconstruye igual que con las llamadas reales
+    assert segundo.mensajes == primero.mensajes
+    resumen = segundo.resumen_llamadas()
+    assert (resumen["respuestas_cacheadas"], resumen["tasa_respuestas_cacheadas"], resumen["prompt_tokens"]) == (2, 1.0, 0)
+
+def test_otro_atestado_o_contexto_no_reutiliza(cliente, cache):
+    decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE, cache=cache).preguntar_llm("p", "m", {})
+    decisionTree.AtestadoLLM("otro", modo=decisionTree.MODO_INDEPENDIENTE, cache=cache).preguntar_llm("p", "m", {})
+    decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE, cache=cache).preguntar_llm(
+        "p", "m", {}, contexto_previo=[["previa", "{}"]])
+    assert cliente.llamadas == 3
+
+def test_saltar_cache_pregunta_y_actualiza(cliente, cache):
+    decisionTree.AtestadoLLM("texto", cache=cache).preguntar_llm("p", "m", {})
+    forzado = decisionTree.AtestadoLLM("texto", cache=cache, usar_cache=False).preguntar_llm("p", "m", {})
+    assert cliente.llamadas == 2
+    assert decisionTree.AtestadoLLM("texto", cache=cache).preguntar_llm("p", "m", {}) == forzado
+    assert cache.stats()["bypassed"] == 1
+
+@pytest.mark.parametrize("contenido", ['{"respuesta": ["R1"', '{"respuesta": "R1"}'])
+def test_respuestas_invalidas_no_se_guardan(monkeypatch, cliente, cache, contenido):
+    esquema = {"type": "object", "properties": {"respuesta": {"type": "array", "items": {"type": "string"}}}}
+    monkeypatch.setattr(cliente.chat.completions, "create", lambda model, messages, **kwargs: SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))], usage=None))
+    # Respuesta truncada o fuera del esquema: se devuelve, pero no se guarda
+    assert decisionTree.AtestadoLLM("texto", cache=cache).preguntar_llm("p", "m", esquema) == contenido
+    assert cache.stats()["entries"] == 0
+    monkeypatch.setattr(cliente.chat.completions, "create", cliente.create)
+    valida = decisionTree.AtestadoLLM("texto", cache=cache).preguntar_llm("p", "m", esquema)
+    assert decisionTree.AtestadoLLM("texto", cache=cache).preguntar_llm("p", "m", esquema) == valida
+    assert (cache.stats()["entries"], cliente.llamadas) == (1, 1)
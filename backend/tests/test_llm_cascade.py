@@ -0,0 +1,168 @@
+import json
+import pytest
+
+import decisionTree
+import llm_cache
+import llm_cascade
+import llm_client
+import llm_telemetry
+from llm_client import LLMClient
+from llm_telemetry import Telemetry
+from local_traversal import DEFAULT_QUESTIONS_FILE
+
+# ------------------------- FIXTURES -------------------------
+
+ATESTADO = "Atestado de prueba. Se sustraen E0, E1, E2, E3 y E4 del domicilio."
+
+@pytest.fixture()
+def cliente_cascada(cliente_simulado):
+    """
+    El modelo "principal" responde según la pregunta, con referencias que están en el atestado.
+    El modelo "rapido" acierta en la mitad de las preguntas y en el resto da una respuesta
+    inválida (o lo que diga 'fallo').
+    """
+
+    def crear(fallo=lambda respuesta: "no lo sé"):
+        def alterar(modelo, h, respuesta):
+            return fallo(respuesta) if modelo == "rapido" and h % 2 else None
+        return cliente_simulado(alterar=alterar)
+
+    return crear
+
+@pytest.fixture()
+def preguntas_con_cascada(crear_traversal):
+    def crear(tmp_path, **cascada):
+        with open(DEFAULT_QUESTIONS_FILE, encoding="utf-8") as f:
+            contenido = json.load(f)
+        contenido["cascada"].update(cascada)
+        tmp_path.mkdir(exist_ok=True)
+        ruta = tmp_path / "preguntas_extendido.json"
+        ruta.write_text(json.dumps(contenido, ensure_ascii=False), encoding="utf-8")
+        return crear_traversal(ruta)
+
+    return crear
+
+def analizar(monkeypatch, traversal, cliente, max_in_flight=1, lote=1, modo=decisionTree.MODO_INDEPENDIENTE):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_client, "_default_client", LLMClient())
+    monkeypatch.setattr(llm_telemetry, "_global_telemetry", Telemetry())
+    monkeypatch.setattr(decisionTree, "LLM_BATCH_SIZE", lote)
+    monkeypatch.setattr(decisionTree, "client", cliente)
+    atestado_llm = decisionTree.AtestadoLLM(ATESTADO, modo=modo)
+    return decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                         max_in_flight=max_in_flight)
+
+ESQUEMA_LISTA = {"type": "object", "properties": {"respuesta": {"type": "array", "items": {"type": "string"}},
+                                                  "referencia": {"type": "array"}}, "required": ["respuesta"]}
+ESQUEMA_PROPIEDAD = {"type": "object", "properties": {"fecha_denuncia": {"type": "string"}}, "required": ["respuesta"]}
+
+# ------------------------- TESTS DE LA POLÍTICA -------------------------
+
+def test_politica_por_tipo_de_pregunta_y_por_pregunta(monkeypatch):
+    monkeypatch.setattr(llm_cascade, "LLM_CASCADE_MODEL", "")
+    lista = {"formato_extraccion": ESQUEMA_LISTA}
+    propiedad = {"formato_extraccion": ESQUEMA_PROPIEDAD}
+    config = {"tipos": {"propiedad": {"escalar_si": ["esquema"]}, "simple": {"activa": False}}}
+    # Sin modelo rápido no hay cascada
+    assert llm_cascade.resolve_policy(lista, config) is None
+    config["modelo"] = "rapido"
+    assert llm_cascade.resolve_policy(lista, config) == {"modelo": "rapido", "escalar_si": list(llm_cascade.REASONS)}
+    assert llm_cascade.resolve_policy(propiedad, config)["escalar_si"] == ["esquema"]
+    assert llm_cascade.resolve_policy({**lista, "tipo": "simple"}, config) is None
+    assert llm_cascade.resolve_policy({**lista, "cascada": False}, config) is None
+    assert llm_cascade.resolve_policy({**lista, "cascada": {"modelo": "otro"}}, config)["modelo"] == "otro"
+    # Las preguntas que ya usan el modelo rápido no tienen cascada
+    assert llm_cascade.resolve_policy({**lista, "llm_preferente": "rapido"}, config) is None
+    monkeypatch.setattr(llm_cascade, "LLM_CASCADE_MODEL", "de_entorno")
+    contenido = llm_cascade.resolve_policies({"cascada": {}, "A": {"preguntas": [dict(lista)]}})
+    assert contenido["A"]["preguntas"][0]["_cascada"]["modelo"] == "de_entorno"
+
+# ------------------------- TESTS DE LOS MOTIVOS DE ESCALADO -------------------------
+
+@pytest.mark.parametrize("respuesta, motivo", [
+    ("no es JSON", "esquema"),
+    (json.dumps({"respuesta": "E1"}), "esquema"),
+    (json.dumps({"referencia": []}), "esquema"),
+    (json.dumps({"respuesta": [], "referencia": []}), "vacia"),
+    (json.dumps({"respuesta": ["E1"], "referencia": [["se  SUSTRAEN e0"]]}), None),
+    (json.dumps({"respuesta": ["E1"], "referencia": [["«Se  sustraen… del domicilio»"]]}), None),
+    (json.dumps({"respuesta": ["E1"], "referencia": [["E9"]]}), "referencia"),
+    (json.dumps({"respuesta": ["E1", "E2"], "referencia": [["E1"]]}), "referencia"),
+])
+def test_motivos_de_escalado_de_una_lista(respuesta, motivo):
+    assert llm_cascade.escalation_reason(respuesta, ESQUEMA_LISTA, ATESTADO) == motivo
+
+def test_motivos_de_escalado_de_una_propiedad_y_criterios_desactivados():
+    assert llm_cascade.escalation_reason(json.dumps({"fecha_denuncia": "1/1/2024"}), ESQUEMA_PROPIEDAD, ATESTADO) is None
+    assert llm_cascade.escalation_reason(json.dumps({"fecha_denuncia": ""}), ESQUEMA_PROPIEDAD, ATESTADO) == "vacia"
+    assert llm_cascade.escalation_reason(json.dumps({"fecha_denuncia": 3}), ESQUEMA_PROPIEDAD, ATESTADO) == "esquema"
+    vacia = json.dumps({"respuesta": [], "referencia": []})
+    assert llm_cascade.escalation_reason(vacia, ESQUEMA_LISTA, ATESTADO, ["esquema", "referencia"]) is None
+
+def test_resumen_con_ahorro_estimado(monkeypatch):
+    monkeypatch.setattr(llm_telemetry, "LLM_PRICES", {"rapido": {"prompt": 0.1}, "principal": {"prompt": 1.0}})
+    llamada = {"prompt_tokens": 1000, "cached_tokens": 0, "completion_tokens": 0, "respuesta_cacheada": False}
+    registros = [
+        {**llamada, "modelo": "rapido", "cascada": "rapido", "latencia_ms": 100.0},
+        {**llamada, "modelo": "rapido", "cascada": "rapido", "latencia_ms": 100.0},
+        {**llamada, "modelo": "principal", "cascada": "escalado", "latencia_ms": 1000.0},
+    ]
+    decisiones = [{"modelo_rapido": "rapido", "motivo": None}, {"modelo_rapido": "rapido", "motivo": "vacia"}]
+    resumen = llm_cascade.summary(decisiones, registros)
+    assert (resumen["escaladas"], resumen["tasa_escalado"], resumen["motivos"]) == (1, 0.5, {"vacia": 1})
+    assert (resumen["latencia_ms"], resumen["latencia_sin_cascada_ms"], resumen["ahorro_latencia_ms"]) == (1200.0, 2000.0, 800.0)
+    assert resumen["ahorro_coste_usd"] == pytest.approx(2 * 0.001 - (0.0002 + 0.001))
+
+# ------------------------- TESTS DEL ANÁLISIS -------------------------
+
+@pytest.mark.parametrize("max_in_flight, lote", [(1, 1), (4, 1), (1, 4)])
+def test_la_cascada_escala_las_respuestas_invalidas_sin_cambiar_el_resultado(monkeypatch, tmp_path, cliente_cascada,
+                                                                       preguntas_con_cascada, max_in_flight, lote):
+    monkeypatch.setattr(llm_cascade, "LLM_CASCADE_MODEL", "")
+    sin_cascada = analizar(monkeypatch, preguntas_con_cascada(tmp_path / "principal"), cliente_cascada())
+    assert "cascada" not in sin_cascada
+
+    cliente = cliente_cascada()
+    resultado = analizar(monkeypatch, preguntas_con_cascada(tmp_path / "cascada", modelo="rapido"), cliente,
+                         max_in_flight, lote)
+    assert resultado["respuestas"] == sin_cascada["respuestas"]
+    cascada = resultado["cascada"]
+    # Las respuestas rápidas inválidas escalan por esquema; las listas vacías correctas, por vacías
+    assert cascada["motivos"]["esquema"] > 0 and set(cascada["motivos"]) <= {"esquema", "vacia"}
+    assert 0 < cascada["aceptadas"] and cascada["escaladas"] + cascada["aceptadas"] == cascada["preguntas"]
+    # Con el planificador las llamadas repetidas se comparten y puede haber menos que decisiones
+    assert cascada["llamadas_escaladas"] == len(cliente.modelos) - cliente.modelos.count("rapido")
+    if max_in_flight == 1:
+        assert cascada["llamadas_escaladas"] == cascada["escaladas"]
+    detalle = resultado["llm"]["detalle"]
+    assert {r["motivo_escalado"] for r in detalle if r["cascada"] == "escalado"} <= {"esquema", "vacia"}
+    assert cascada["ahorro_coste_usd"] is None  # sin precios
+
+def test_respuestas_vacias_del_modelo_rapido_se_confirman_con_el_principal(monkeypatch, tmp_path, cliente_cascada,
+                                                                          preguntas_con_cascada):
+    monkeypatch.setattr(llm_cascade, "LLM_CASCADE_MODEL", "")
+    vaciar = lambda respuesta: json.dumps({k: type(v)() if isinstance(v, (list, str)) else v for k, v in respuesta.items()})
+    resultado = analizar(monkeypatch, preguntas_con_cascada(tmp_path, modelo="rapido"), cliente_cascada(vaciar))
+    assert set(resultado["cascada"]["motivos"]) <= {"vacia"} and resultado["cascada"]["escaladas"] > 0
+    assert any(a["existe"] for a in resultado["respuestas"][0]["analisis"])
+
+@pytest.mark.parametrize("lote", [1, 4])
+def test_modo_historial_solo_guarda_las_respuestas_aceptadas(monkeypatch, tmp_path, cliente_cascada,
+                                                            preguntas_con_cascada, lote):
+    monkeypatch.setattr(llm_cascade, "LLM_CASCADE_MODEL", "")
+    historial = decisionTree.MODO_HISTORIAL
+    principal = cliente_cascada()
+    sin_cascada = analizar(monkeypatch, preguntas_con_cascada(tmp_path / "principal"), principal, modo=historial)
+    cliente = cliente_cascada(lambda respuesta: "descartada")
+    resultado = analizar(monkeypatch, preguntas_con_cascada(tmp_path / "cascada", modelo="rapido"), cliente,
+                         lote=lote, modo=historial)
+    assert resultado["respuestas"] == sin_cascada["respuestas"] and resultado["cascada"]["motivos"]["esquema"] > 0
+    # Ninguna llamada posterior lleva en el historial una respuesta rápida descartada
+    assert not any("descartada" in envio for envio in cliente.envios)
+    if lote == 1:
+        # La pregunta escalada lleva el mismo historial que la rápida, y el historial (con las
+        # respuestas rápidas aceptadas, iguales a las del principal) es el de preguntar todo al principal
+        for i, modelo in enumerate(cliente.modelos):
+            if modelo != "rapido":
+                assert cliente.envios[i] == cliente.envios[i - 1]
+        assert set(cliente.envios) == set(principal.envios)
@@ -0,0 +1,130 @@
+import json
+import threading
+from types import SimpleNamespace
+import pytest
+
+import decisionTree
+import llm_cache
+import llm_client
+from llm_client import AIMDLimiter, LLMClient, TokenBucket
+
+# ------------------------- FIXTURES -------------------------
+
+class ErrorHTTP(Exception):
+    """Error con 'status_code' y cabeceras, como los de la librería openai."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code,
+                                        headers={"retry-after": retry_after} if retry_after else {})
+
+class ClienteInestable:
+    """Lanza los errores indicados (uno por llamada) y después responde."""
+
+    def __init__(self, errores=()):
+        self.errores = list(errores)
+        self.llamadas = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.llamadas.append(kwargs)
+        if self.errores:
+            raise self.errores.pop(0)
+        contenido = json.dumps({"respuesta": ["ok"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=3))
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+@pytest.fixture
+def capa():
+    esperas = []
+    capa = LLMClient(max_retries=3, backoff_base=1, backoff_max=8, sleep=esperas.append)
+    capa.esperas = esperas
+    return capa
+
+MENSAJES = [{"role": "user", "content": "x" * 400}]
+
+# ------------------------- TESTS DE LOS LÍMITES -------------------------
+
+def test_token_bucket_espera_lo_que_falta_para_reponer():
+    reloj = Reloj()
+    cubo = TokenBucket(rate=2, capacity=2, clock=reloj, sleep=reloj.sleep)
+    assert (cubo.acquire(), cubo.acquire()) == (0.0, 0.0)
+    assert cubo.acquire() == pytest.approx(0.5)
+    reloj.ahora += 10
+    assert cubo.acquire(5) == 0.0  # más que la capacidad: pasa con el cubo lleno
+    assert TokenBucket(rate=0, capacity=0).acquire(100) == 0.0
+
+def test_aimd_reduce_una_vez_por_ventana_y_crece_despacio():
+    limitador = AIMDLimiter(maximum=8, minimum=2)
+    tickets = [limitador.acquire()[0] for _ in range(4)]
+    for ticket in tickets:
+        limitador.release(ticket, throttled=True)
+    assert (limitador.limit, limitador.decreases) == (4.0, 1)
+    ticket, _ = limitador.acquire()
+    limitador.release(ticket, throttled=True)
+    assert limitador.limit == 2.0
+    ticket, _ = limitador.acquire()
+    limitador.release(ticket, throttled=True)
+    assert limitador.limit == 2.0  # mínimo
+    ticket, _ = limitador.acquire()
+    limitador.release(ticket)
+    assert limitador.limit == 2.5
+
+def test_aimd_bloquea_por_encima_del_limite():
+    limitador = AIMDLimiter(maximum=1)
+    ticket, _ = limitador.acquire()
+    liberar = threading.Timer(0.05, limitador.release, (ticket,))
+    liberar.start()
+    _, espera = limitador.acquire()
+    assert espera >= 0.04
+
+# ------------------------- TESTS DE LOS REINTENTOS -------------------------
+
+def test_reintenta_429_y_5xx_con_espera_exponencial(capa):
+    cliente = ClienteInestable([ErrorHTTP(429), ErrorHTTP(503), ErrorHTTP(502)])
+    completion = capa.create(cliente, model="m", messages=MENSAJES, temperature=0)
+    assert json.loads(completion.choices[0].message.content) == {"respuesta": ["ok"]}
+    assert len(cliente.llamadas) == 4 and cliente.llamadas[0]["timeout"] == capa.timeout
+    assert [0 <= espera <= tope for espera, tope in zip(capa.esperas, (1, 2, 4))] == [True] * 3
+    stats = capa.stats()
+    assert (stats["requests"], stats["retries"], stats["throttled"], stats["server_errors"], stats["failures"]) == (4, 3, 1, 2, 0)
+    assert stats["models"]["m"]["concurrency_decreases"] == 1
+
+def test_respeta_retry_after(capa):
+    capa.create(ClienteInestable([ErrorHTTP(429, retry_after="5")]), model="m", messages=MENSAJES)
+    assert capa.esperas == [5.0]
+
+def test_errores_no_reintentables_y_reintentos_agotados(capa):
+    with pytest.raises(ErrorHTTP):
+        capa.create(ClienteInestable([ErrorHTTP(400)]), model="m", messages=MENSAJES)
+    assert capa.esperas == []
+    with pytest.raises(ErrorHTTP):
+        capa.create(ClienteInestable([ErrorHTTP(500)] * 4), model="m", messages=MENSAJES)
+    assert len(capa.esperas) == 3
+    stats = capa.stats()["models"]["m"]
+    assert (stats["failures"], stats["in_flight"]) == (2, 0)
+
+def test_timeouts_se_reintentan(capa):
+    capa.create(ClienteInestable([TimeoutError("lento")]), model="m", messages=MENSAJES)
+    assert capa.stats()["timeouts"] == 1
+
+def test_preguntar_llm_sobrevive_a_un_429(monkeypatch, capa):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_client, "_default_client", capa)
+    monkeypatch.setattr(decisionTree, "client", ClienteInestable([ErrorHTTP(429)]))
+    atestado_llm = decisionTree.AtestadoLLM("texto", modo=decisionTree.MODO_INDEPENDIENTE)
+    assert json.loads(atestado_llm.preguntar_llm("¿?", "m", {"type": "object"})) == {"respuesta": ["ok"]}
+    assert capa.stats()["retries"] == 1
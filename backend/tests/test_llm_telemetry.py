@@ -0,0 +1,98 @@
+import pytest
+
+import decisionTree
+import llm_cache
+import llm_client
+import llm_telemetry
+from llm_client import LLMClient
+from llm_telemetry import Histogram, Telemetry
+
+# ------------------------- FIXTURES -------------------------
+
+class Error429(Exception):
+    status_code = 429
+
+def registro(clase, elemento, prompt_tokens=100, latencia_ms=200.0, **campos):
+    return {"modelo": "m", "clase": clase, "elemento": elemento, "prompt_tokens": prompt_tokens,
+            "cached_tokens": 0, "completion_tokens": 10, "latencia_ms": latencia_ms, "reintentos": 0,
+            "respuesta_cacheada": False, **campos}
+
+# ------------------------- TESTS DE LA ETIQUETA -------------------------
+
+def test_las_etiquetas_se_anidan_y_se_restauran():
+    assert llm_telemetry.current_tag() == {}
+    with llm_telemetry.tag(clase="TheftReport"):
+        with llm_telemetry.tag(elemento="hasProperty"):
+            assert llm_telemetry.current_tag() == {"clase": "TheftReport", "elemento": "hasProperty"}
+        assert llm_telemetry.current_tag() == {"clase": "TheftReport"}
+    assert llm_telemetry.current_tag() == {}
+
+# ------------------------- TESTS DEL AGREGADO -------------------------
+
+def test_totales_por_clase_y_pregunta_ordenados_por_coste():
+    telemetria = Telemetry()
+    telemetria.add_records([
+        registro("A", "p1"), registro("A", "p1", prompt_tokens=5000, reintentos=2),
+        registro("B", "p2", latencia_ms=0.1, respuesta_cacheada=True), registro(None, None)
+    ])
+    telemetria.add_reused("B", 3)
+    resumen = telemetria.summary(top=2)
+    assert [c["clase"] for c in resumen["clases"]] == ["A", "(sin clase)", "B"]
+    clase_a = resumen["clases"][0]
+    assert (clase_a["llamadas"], clase_a["reintentos"], clase_a["tokens"], clase_a["latencia_media_ms"]) == (2, 2, 5120, 200.0)
+    assert resumen["clases"][2]["reutilizados"] == 3 and resumen["clases"][2]["respuestas_cacheadas"] == 1
+    assert [(p["clase"], p["elemento"]) for p in resumen["preguntas_top"]] == [("A", "p1"), ("(sin clase)", "(sin pregunta)")]
+    assert resumen["total"]["llamadas"] == 4 and resumen["total"]["coste_usd"] is None
+    # La respuesta de la caché local no cuenta en la latencia del modelo
+    assert sum(i["llamadas"] for i in resumen["histogramas"]["latencia_ms"]) == 3
+    assert resumen["latencia_percentiles_ms"]["p50"] == 200.0
+
+def test_coste_con_precios_por_modelo(monkeypatch):
+    monkeypatch.setattr(llm_telemetry, "LLM_PRICES", {"m": {"prompt": 1.0, "cached": 0.5, "completion": 2.0}})
+    assert llm_telemetry.call_cost(registro("A", "p", prompt_tokens=1000, cached_tokens=400)) == pytest.approx(
+        (600 * 1.0 + 400 * 0.5 + 10 * 2.0) / 1e6)
+    assert llm_telemetry.call_cost(registro("A", "p", respuesta_cacheada=True)) == 0.0
+    assert llm_telemetry.call_cost(registro("A", "p", modelo="otro")) is None
+
+def test_histograma_y_suma_de_agregados():
+    histograma = Histogram((10, 100))
+    for valor in (5, 10, 50, 1000):
+        histograma.add(valor)
+    assert [i["llamadas"] for i in histograma.to_dict()] == [1, 2, 1]
+    assert histograma.to_dict()[-1]["hasta"] is None
+    uno, otro = Telemetry(), Telemetry()
+    uno.add_records([registro("A", "p1", latencia_ms=10)])
+    otro.add_records([registro("A", "p1", latencia_ms=30), registro("B", "p2", latencia_ms=20)])
+    uno.merge(otro)
+    resumen = uno.summary()
+    assert resumen["total"]["llamadas"] == 3 and resumen["clases"][0]["latencia_max_ms"] == 30
+    assert resumen["latencia_percentiles_ms"] == {"p50": 20, "p90": 30, "p99": 30}
+
+def test_reintentos_de_la_ultima_llamada_del_hilo(cliente_simulado):
+    capa = LLMClient(max_retries=3, backoff_base=0, sleep=lambda segundos: None)
+    assert capa.last_call()["retries"] == 0
+    capa.create(cliente_simulado([Error429(), Error429()]), model="m", messages=[{"role": "user", "content": "x"}],
+                extra_body={"response_format": {"json_schema": {"schema": {}}}})
+    assert capa.last_call()["retries"] == 2
+
+# ------------------------- TESTS DEL ANÁLISIS -------------------------
+
+@pytest.mark.parametrize("max_in_flight", [1, 4])
+def test_cada_llamada_del_analisis_se_atribuye_a_su_clase_y_pregunta(monkeypatch, traversal, cliente_simulado,
+                                                                   max_in_flight):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_client, "_default_client", LLMClient(backoff_base=0, sleep=lambda segundos: None))
+    monkeypatch.setattr(llm_telemetry, "_global_telemetry", Telemetry())
+    monkeypatch.setattr(decisionTree, "client", cliente_simulado([Error429()], cached_tokens=60))
+    atestado_llm = decisionTree.AtestadoLLM("Atestado de prueba", modo=decisionTree.MODO_INDEPENDIENTE)
+    resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                              max_in_flight=max_in_flight)
+    detalle = resultado["llm"]["detalle"]
+    assert detalle and all(r["clase"] and r["elemento"] for r in detalle)
+    assert sum(r["reintentos"] for r in detalle) == 1
+    telemetria = resultado["telemetria"]
+    assert telemetria["total"]["llamadas"] == resultado["llm"]["llamadas"] == sum(c["llamadas"] for c in telemetria["clases"])
+    assert telemetria["total"]["cached_tokens"] == 60 * len(detalle)
+    assert telemetria["total"]["reutilizados"] == sum(a["reutilizados"] for a in resultado["respuestas"][0]["analisis"])
+    assert {c["clase"] for c in telemetria["clases"]} <= {a["nombre"] for a in resultado["respuestas"][0]["analisis"]}
+    assert llm_telemetry.global_telemetry().summary()["total"]["llamadas"] == len(detalle)
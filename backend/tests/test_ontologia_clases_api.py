@@ -0,0 +1,64 @@
+import os
+import pytest
+
+from local_traversal import BACKEND_DIR
+from ontology_registry import OntologyRegistry
+
+ONTOLOGY_FILE = os.path.join(BACKEND_DIR, "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture(scope="module")
+def api():
+    pytest.importorskip("httpx")  # TestClient de FastAPI
+    with pytest.MonkeyPatch.context() as entorno:
+        # Neo4jManager crea el driver al importar api (sin conectar): basta una URI válida
+        entorno.setenv("NEO4J_URI", "bolt://localhost:7687")
+        import api
+    return api
+
+@pytest.fixture(scope="module")
+def versiones(tmp_path_factory):
+    """Registro con la ontología (activa) y una segunda versión con una clase renombrada."""
+    v2 = tmp_path_factory.mktemp("ontologia") / "v2.owl"
+    with open(ONTOLOGY_FILE, "rb") as f:
+        v2.write_bytes(f.read().replace(b"#TheftReport\"", b"#TheftReportV2\""))
+    registro = OntologyRegistry()
+    return registro, registro.load(ONTOLOGY_FILE)["version"], registro.load(str(v2), activate=False)["version"]
+
+@pytest.fixture()
+def cliente(api, monkeypatch, versiones):
+    from fastapi.testclient import TestClient
+    registro, v1, _ = versiones
+    registro.activate(v1)
+    monkeypatch.setattr(api, "ontology_registry", registro)
+    return TestClient(api.app)
+
+# ------------------------- TESTS DEL ETAG -------------------------
+
+def test_if_none_match_con_el_etag_responde_304(cliente):
+    respuesta = cliente.get("/ontologia/clases/")
+    assert respuesta.status_code == 200 and respuesta.json()
+    etag = respuesta.headers["ETag"]
+    no_modificada = cliente.get("/ontologia/clases/", headers={"If-None-Match": etag})
+    assert no_modificada.status_code == 304 and no_modificada.content == b""
+    assert no_modificada.headers["ETag"] == etag
+
+@pytest.mark.parametrize("cabecera", ["W/{etag}", '"otro", {etag}', 'W/"otro",W/{etag}', "*"])
+def test_etag_debil_y_lista_de_etags(cliente, cabecera):
+    etag = cliente.get("/ontologia/clases/").headers["ETag"]
+    assert cliente.get("/ontologia/clases/", headers={"If-None-Match": cabecera.format(etag=etag)}).status_code == 304
+
+def test_otro_etag_devuelve_el_catalogo(cliente):
+    respuesta = cliente.get("/ontologia/clases/", headers={"If-None-Match": '"otro", W/"otro-mas"'})
+    assert respuesta.status_code == 200 and respuesta.json()
+
+def test_el_etag_cambia_al_activar_otra_version(cliente, versiones):
+    registro, v1, v2 = versiones
+    etag = cliente.get("/ontologia/clases/").headers["ETag"]
+    registro.activate(v2)
+    respuesta = cliente.get("/ontologia/clases/", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200 and respuesta.headers["ETag"] != etag
+    # La versión anterior se sigue pudiendo pedir con su ETag
+    assert cliente.get("/ontologia/clases/", params={"version": v1},
+                       headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,132 @@
+import os
+import shutil
+import pytest
+
+import ontology_snapshot
+from ontology_registry import OntologyRegistry, UnknownOntologyVersion, version_id
+
+ONTOLOGY_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl"))
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture
+def ontologias(tmp_path, monkeypatch):
+    """Dos versiones de la ontología: la original y una con un comentario añadido"""
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    v1 = str(tmp_path / "v1.owl")
+    v2 = str(tmp_path / "v2.owl")
+    shutil.copyfile(ONTOLOGY_FILE, v1)
+    with open(ONTOLOGY_FILE, "rb") as f:
+        contenido = f.read()
+    with open(v2, "wb") as f:
+        f.write(contenido.replace(b"</rdf:RDF>", b"<!-- v2 --></rdf:RDF>"))
+    return v1, v2
+
+# ------------------------- TESTS DE REGISTRO -------------------------
+
+def test_version_es_hash_del_contenido(ontologias, tmp_path):
+    v1, v2 = ontologias
+    assert version_id(v1) == version_id(ONTOLOGY_FILE)
+    assert version_id(v1) != version_id(v2)
+
+def test_carga_activa_la_version(ontologias):
+    registry = OntologyRegistry()
+    assert registry.get() is None
+    entrada = registry.load(ontologias[0])
+    assert registry.active_version == entrada["version"]
+    assert registry.get() is entrada["traversal"]
+    assert registry.version_of(entrada["traversal"]) == entrada["version"]
+
+def test_mismo_contenido_no_se_recarga(ontologias):
+    calentados = []
+    registry = OntologyRegistry(warm_up=calentados.append)
+    primera = registry.load(ontologias[0])
+    segunda = registry.load(ONTOLOGY_FILE)
+    assert segunda is primera
+    assert calentados == [primera["traversal"]]
+
+def test_precalentamiento_antes_de_publicar(ontologias):
+    v1, v2 = ontologias
+    vistos = []
+
+    def warm_up(traversal):
+        # Durante el precalentamiento la versión nueva aún no es visible ni activa
+        vistos.append((registry.active_version, len(registry.versions())))
+        traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport")
+
+    registry = OntologyRegistry(warm_up=warm_up)
+    activa = registry.load(v1)["version"]
+    nueva = registry.load(v2)
+    assert vistos == [(None, 0), (activa, 1)]
+    assert registry.active_version == nueva["version"]
+    assert nueva["traversal"].dfs_cache_stats()["entries"] == 1
+
+def test_carga_sin_activar_y_seleccion_explicita(ontologias):
+    v1, v2 = ontologias
+    registry = OntologyRegistry()
+    activa = registry.load(v1)
+    candidata = registry.load(v2, activate=False)
+    assert registry.active_version == activa["version"]
+    assert registry.get() is activa["traversal"]
+    assert registry.get(candidata["version"]) is candidata["traversal"]
+
+    registry.activate(candidata["version"])
+    assert registry.get() is candidata["traversal"]
+    assert [v["active"] for v in registry.versions()] == [False, True]
+
+def test_version_desconocida(ontologias):
+    registry = OntologyRegistry()
+    registry.load(ontologias[0])
+    with pytest.raises(UnknownOntologyVersion):
+        registry.get("0000000000000000")
+    with pytest.raises(UnknownOntologyVersion):
+        registry.activate("0000000000000000")
+
+def test_expulsion_conserva_la_activa_y_los_trabajos_fijados(ontologias):
+    v1, v2 = ontologias
+    registry = OntologyRegistry(max_versions=1)
+    antigua = registry.load(v1)
+    fijado = antigua["traversal"]  # p.ej. una tarea de /procesarG/ en curso
+    nueva = registry.load(v2)
+
+    assert [v["version"] for v in registry.versions()] == [nueva["version"]]
+    with pytest.raises(UnknownOntologyVersion):
+        registry.get(antigua["version"])
+    # La tarea en curso sigue pudiendo usar su versión
+    assert "PropertyCrimeReport" in fijado.dfs_equivalent_and_subclasses("PropertyCrimeReport")["classes"]
+
+def test_carga_sin_activar_no_expulsa_la_activa(ontologias):
+    v1, v2 = ontologias
+    registry = OntologyRegistry(max_versions=1)
+    activa = registry.load(v1)
+    candidata = registry.load(v2, activate=False)
+    assert registry.get() is activa["traversal"]
+    assert registry.get(candidata["version"]) is candidata["traversal"]
+
+def test_versiones_aisladas_sin_instantaneas(ontologias, tmp_path, monkeypatch):
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_ENABLED", False)
+    v1 = ontologias[0]
+    # Misma IRI base que v1, con una clase renombrada (p.ej. una subida A/B)
+    v3 = str(tmp_path / "v3.owl")
+    with open(ONTOLOGY_FILE, "rb") as f:
+        contenido = f.read()
+    with open(v3, "wb") as f:
+        f.write(contenido.replace(b"#TheftReport\"", b"#TheftReportV3\""))
+    registry = OntologyRegistry()
+    activa = registry.load(v1)["traversal"]
+    candidata = registry.load(v3, activate=False)["traversal"]
+    assert activa.world is not candidata.world
+    clases_activa = activa.dfs_equivalent_and_subclasses("PropertyCrimeReport", use_cache=False)["classes"]
+    clases_candidata = candidata.dfs_equivalent_and_subclasses("PropertyCrimeReport", use_cache=False)["classes"]
+    assert "TheftReport" in clases_activa and "TheftReportV3" not in clases_activa
+    assert "TheftReportV3" in clases_candidata and "TheftReport" not in clases_candidata
+
+def test_fichero_temporal_sin_instantanea(ontologias, tmp_path, monkeypatch):
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_ENABLED", True)
+    # Como /ontologia/cargar/: se carga el fichero subido y se borra a continuación
+    subida = str(tmp_path / "subida.owl")
+    shutil.copyfile(ontologias[1], subida)
+    entrada = OntologyRegistry().load(f"file://{subida}", source="subida.owl", snapshot=False)
+    os.remove(subida)
+    assert not os.path.exists(tmp_path / "snapshots") or not os.listdir(tmp_path / "snapshots")
+    assert "TheftReport" in entrada["traversal"].dfs_equivalent_and_subclasses("PropertyCrimeReport")["classes"]
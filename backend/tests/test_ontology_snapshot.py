@@ -0,0 +1,78 @@
+import gc
+import os
+import shutil
+import owlready2
+import pytest
+
+import ontology_snapshot
+from ontology_traversal import OntologyTraversal
+
+ONTOLOGY_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl"))
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "snapshots")
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_DIR", directory)
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_ENABLED", True)
+    return directory
+
+# ------------------------- TESTS DE INSTANTÁNEA -------------------------
+
+def test_instantanea_se_crea_una_vez(snapshot_dir):
+    ruta = ontology_snapshot.build_snapshot(ONTOLOGY_FILE)
+    assert os.path.dirname(ruta) == snapshot_dir
+    mtime = os.path.getmtime(ruta)
+    assert ontology_snapshot.build_snapshot(ONTOLOGY_FILE) == ruta
+    assert os.path.getmtime(ruta) == mtime
+    assert not [f for f in os.listdir(snapshot_dir) if f.endswith(".tmp")]
+
+def test_instantanea_cambia_con_el_contenido(snapshot_dir, tmp_path):
+    copia = str(tmp_path / "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+    shutil.copyfile(ONTOLOGY_FILE, copia)
+    original = ontology_snapshot.snapshot_path(copia)
+    with open(copia, "a", encoding="utf-8") as f:
+        f.write("\n<!-- cambio -->\n")
+    assert ontology_snapshot.snapshot_path(copia) != original
+
+def test_instantanea_mantiene_nombre_y_prefijo(snapshot_dir):
+    world, onto = ontology_snapshot.open_snapshot(ONTOLOGY_FILE)
+    assert onto.name == "SCPO_Extended_Ontology_V01R08_AT08Q"
+    report = getattr(onto, "PropertyCrimeReport")
+    assert report is not None
+    assert str(report.equivalent_to[0]).startswith("SCPO_Extended_Ontology_V01R08_AT08Q.Report")
+
+def test_traversal_desde_instantanea_igual_que_rdfxml(snapshot_dir, monkeypatch):
+    desde_instantanea = OntologyTraversal(ONTOLOGY_FILE)
+    assert desde_instantanea.world is not None
+    monkeypatch.setattr(ontology_snapshot, "SNAPSHOT_ENABLED", False)
+    desde_rdfxml = OntologyTraversal(ONTOLOGY_FILE)
+    assert desde_rdfxml.world is not None and desde_rdfxml.world is not owlready2.default_world
+
+    assert (desde_instantanea.dfs_equivalent_and_subclasses("PropertyCrimeReport", use_cache=False) ==
+            desde_rdfxml.dfs_equivalent_and_subclasses("PropertyCrimeReport", use_cache=False))
+    for cls in desde_rdfxml.ontology.classes():
+        for eq in cls.equivalent_to:
+            assert (desde_instantanea.analizar_expresion_owl_simplificada_dict_v5(str(eq)) ==
+                    desde_rdfxml.analizar_expresion_owl_simplificada_dict_v5(str(eq)))
+
+def test_copia_privada_no_modifica_la_instantanea(snapshot_dir):
+    world, onto = ontology_snapshot.load_ontology_world(ONTOLOGY_FILE, private_copy=True)
+    copia = world.filename
+    assert copia != ontology_snapshot.snapshot_path(ONTOLOGY_FILE)
+    with onto:
+        onto.Victim("victima_de_prueba")
+    world.save()
+
+    _, compartida = ontology_snapshot.open_snapshot(ONTOLOGY_FILE)
+    assert compartida.search_one(iri="*victima_de_prueba") is None
+
+    world.close()
+    del world, onto
+    gc.collect()
+    assert not os.path.exists(copia)
+
+def test_ruta_remota_no_usa_instantanea():
+    assert ontology_snapshot.local_path("http://example.org/onto.owl") is None
+    assert ontology_snapshot.local_path(f"file://{ONTOLOGY_FILE}") == ONTOLOGY_FILE
@@ -0,0 +1,218 @@
+import json
+import os
+import pytest
+
+from ontology_traversal import OntologyTraversal, thaw
+
+ONTOLOGY_FILE = os.path.join(os.path.dirname(__file__), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture(scope="module")
+def traversal():
+    return OntologyTraversal(ONTOLOGY_FILE)
+
+def _escaneo_equivalencias(traversal, class_name):
+    """Recorrido completo de clases, tal y como se hacía antes del índice inverso."""
+    resultado = []
+    for cls in traversal.ontology.classes():
+        for eq in cls.equivalent_to:
+            if hasattr(eq, "name") and eq.name == class_name:
+                resultado.append((cls, "equivalent_to_inverse"))
+            elif hasattr(eq, "Classes"):
+                for sub_eq in eq.Classes:
+                    if hasattr(sub_eq, "name") and sub_eq.name == class_name:
+                        resultado.append((cls, "equivalent_complex_inverse"))
+    return resultado
+
+# ------------------------- TESTS DEL ÍNDICE INVERSO DE EQUIVALENCIAS -------------------------
+
+def test_indice_equivalencias_coincide_con_escaneo(traversal):
+    for cls in traversal.ontology.classes():
+        assert traversal.get_equivalent_inverse(cls.name) == _escaneo_equivalencias(traversal, cls.name)
+
+def test_indice_equivalencias_clase_desconocida(traversal):
+    assert traversal.get_equivalent_inverse("ClaseQueNoExiste") == []
+
+@pytest.mark.parametrize("clase", ["Report", "PropertyCrimeReport", "TheftReport", "Person"])
+def test_dfs_con_indice_igual_que_con_escaneo(traversal, monkeypatch, clase):
+    con_indice = traversal.dfs_equivalent_and_subclasses(clase, use_cache=False)
+    con_indice_instancias = traversal.dfs_equivalent_and_subclasses_instances(clase)
+    monkeypatch.setattr(traversal, "get_equivalent_inverse", lambda nombre: _escaneo_equivalencias(traversal, nombre))
+    assert traversal.dfs_equivalent_and_subclasses(clase, use_cache=False) == con_indice
+    assert traversal.dfs_equivalent_and_subclasses_instances(clase) == con_indice_instancias
+
+# ------------------------- TESTS DE ÍNDICES -------------------------
+
+def test_indice_propiedades_dominio_y_rango(traversal):
+    person = traversal.ontology.search_one(iri="*#Person")
+    props = traversal.get_class_properties(person)
+    assert {"name": "Age", "type": "DataProperty"} in props["domain"]
+    assert {"name": "stolenBy", "type": "DataProperty"} in props["range"]
+
+def test_indice_propiedades_devuelve_copia(traversal):
+    person = traversal.ontology.search_one(iri="*#Person")
+    traversal.get_class_properties(person)["domain"].clear()
+    assert traversal.get_class_properties(person)["domain"]
+
+def test_dfs_incluye_subclases_por_equivalencia(traversal):
+    resultado = traversal.dfs_equivalent_and_subclasses("Report")
+    assert "PropertyCrimeReport" in resultado["classes"]
+    assert resultado["traversal_path"][0]["class"] == "Report"
+
+# ------------------------- TESTS DE CACHÉ DFS -------------------------
+
+def test_cache_dfs_aciertos_y_fallos(traversal):
+    traversal.clear_dfs_cache()
+    antes = traversal.dfs_cache_stats()
+    primero = traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport")
+    segundo = traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport")
+    despues = traversal.dfs_cache_stats()
+    assert primero is segundo
+    assert despues["misses"] == antes["misses"] + 1
+    assert despues["hits"] == antes["hits"] + 1
+    assert despues["entries"] == 1
+
+def test_cache_dfs_clave_incluye_max_depth(traversal):
+    completo = traversal.dfs_equivalent_and_subclasses("Report")
+    limitado = traversal.dfs_equivalent_and_subclasses("Report", 1)
+    assert completo is not limitado
+    assert len(limitado["classes"]) < len(completo["classes"])
+
+def test_cache_dfs_resultado_solo_lectura(traversal):
+    resultado = traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport")
+    with pytest.raises(TypeError):
+        resultado["classes"]["PropertyCrimeReport"]["name"] = "otro"
+    with pytest.raises(AttributeError):
+        resultado["traversal_path"].append({})
+
+def test_cache_dfs_equivale_a_recorrido_sin_cache(traversal):
+    cacheado = traversal.dfs_equivalent_and_subclasses("Report")
+    sin_cache = traversal.dfs_equivalent_and_subclasses("Report", use_cache=False)
+    assert thaw(cacheado) == sin_cache
+    assert json.dumps(cacheado, default=str) == json.dumps(sin_cache, default=str)
+
+def test_cache_dfs_se_invalida_al_recargar():
+    traversal = OntologyTraversal(ONTOLOGY_FILE)
+    version = traversal.ontology_version
+    traversal.dfs_subclasses("Report")
+    assert traversal.dfs_cache_stats()["entries"] == 1
+    traversal.load_ontology(ONTOLOGY_FILE)
+    assert traversal.ontology_version > version
+    assert traversal.dfs_cache_stats()["entries"] == 0
+
+# ------------------------- TESTS DE CIERRE DE SUBSUNCIÓN -------------------------
+
+def test_is_subclass_coincide_con_dfs(traversal):
+    nombres = [cls.name for cls in traversal.ontology.classes()]
+    for clase_b in nombres:
+        via_eq = traversal.dfs_equivalent_and_subclasses(clase_b)["classes"]
+        via_sub = traversal.dfs_subclasses(clase_b)["classes"]
+        for clase_a in nombres:
+            assert traversal.is_subclass(clase_a, clase_b, via_equivalences=True) == (clase_a in via_eq)
+            assert traversal.is_subclass(clase_a, clase_b) == (clase_a in via_sub)
+
+def test_is_subclass_clase_desconocida(traversal):
+    assert traversal.is_subclass("ClaseQueNoExiste", "Report") is False
+    assert traversal.is_subclass("Report", "ClaseQueNoExiste") is False
+
+def test_most_specific(traversal):
+    assert traversal.most_specific("PropertyCrimeReport", "PropertyCrimeReport") == "PropertyCrimeReport"
+    assert traversal.most_specific("Person", "StolenGoods") == ""
+    assert traversal.most_specific("ClaseQueNoExiste", "Person") == ""
+
+def test_most_specific_en_ambos_sentidos(traversal):
+    person = traversal.ontology.search_one(iri="*#Person")
+    sub = next(iter(person.subclasses())).name
+    assert traversal.most_specific(sub, "Person") == sub
+    assert traversal.most_specific("Person", sub) == sub
+
+# ------------------------- TESTS DE EXPORTACIÓN JSON -------------------------
+
+def _sin_timestamp(export):
+    export["metadata"].pop("export_timestamp", None)
+    return export
+
+def test_exportacion_stream_igual_que_fichero(traversal, tmp_path):
+    ruta = traversal.export_classes_to_json("PropertyCrimeReport", str(tmp_path / "export.json"), None, True, "dfs")
+    with open(ruta, "r", encoding="utf-8") as f:
+        desde_fichero = json.load(f)
+    total, fragmentos = traversal.export_classes_to_json_stream("PropertyCrimeReport", None, True, "dfs")
+    desde_stream = json.loads("".join(fragmentos))
+
+    assert total == len(desde_fichero["classes"])
+    assert _sin_timestamp(desde_stream) == _sin_timestamp(desde_fichero)
+    assert list(desde_stream["classes"]) == list(desde_fichero["classes"])
+
+def test_exportacion_stream_compacta_y_metadatos_extra(traversal):
+    _, fragmentos = traversal.export_classes_to_json_stream("Person", 1, True, "dfs",
+                                                             extra_metadata={"api_endpoint": "/ontologia/recorrer_bfs/"})
+    texto = "".join(fragmentos)
+    assert "\n" not in texto and ", " not in texto.split('"classes"')[0]
+    assert json.loads(texto)["metadata"]["api_endpoint"] == "/ontologia/recorrer_bfs/"
+
+def test_exportacion_stream_sin_metadatos(traversal):
+    total, fragmentos = traversal.export_classes_to_json_stream("Person", None, False, "dfs", extra_metadata={"x": 1})
+    export = json.loads("".join(fragmentos))
+    assert export["metadata"] == {}
+    assert len(export["classes"]) == total
+
+def test_exportacion_stream_es_perezosa(traversal, monkeypatch):
+    extraidas = []
+    original = traversal._extract_class_data
+    monkeypatch.setattr(traversal, "_extract_class_data", lambda cls: extraidas.append(cls) or original(cls))
+    _, fragmentos = traversal.export_classes_to_json_stream("PropertyCrimeReport", None, True, "dfs")
+    next(fragmentos)
+    assert extraidas == []
+    next(fragmentos)
+    assert len(extraidas) == 1
+
+# ------------------------- TESTS DE DFS PEREZOSO -------------------------
+
+def test_dfs_perezoso_mismo_orden_que_dfs(traversal):
+    dfs = traversal.dfs_equivalent_and_subclasses("PropertyCrimeReport", use_cache=False)
+    perezoso = list(traversal.iter_dfs_equivalent_and_subclasses("PropertyCrimeReport"))
+    assert [nombre for nombre, _, _, _ in perezoso] == list(dfs["classes"])
+    for nombre, datos, profundidad, orden in perezoso:
+        assert dict(datos) == dfs["classes"][nombre]
+        assert (profundidad, orden) == (dfs["classes"][nombre]["dfs_extended_info"]["depth_level"],
+                                        dfs["classes"][nombre]["dfs_extended_info"]["visit_order"])
+
+def test_dfs_perezoso_no_extrae_datos_hasta_consultarlos(traversal, monkeypatch):
+    extraidas = []
+    original = traversal._extract_class_data
+    monkeypatch.setattr(traversal, "_extract_class_data", lambda cls: extraidas.append(cls) or original(cls))
+    recorrido = traversal.iter_dfs_equivalent_and_subclasses("PropertyCrimeReport")
+    nombre, datos, profundidad, _ = next(recorrido)
+    assert nombre == "PropertyCrimeReport" and profundidad == 0
+    assert datos["dfs_extended_info"]["depth_level"] == 0
+    assert extraidas == [] and not datos.loaded
+    assert datos["name"] == "PropertyCrimeReport"
+    datos.get("equivalent_classes")
+    assert len(extraidas) == 1
+
+# ------------------------- TESTS DE CATÁLOGO DE CLASES -------------------------
+
+def test_catalogo_clases_contenido(traversal):
+    body, etag = traversal.class_catalog()
+    catalogo = json.loads(body)
+    nombres = [c["name"] for c in catalogo["classes"]]
+    assert catalogo["total_classes"] == len(list(traversal.ontology.classes())) == len(nombres)
+    assert nombres == sorted(nombres)
+    report = next(c for c in catalogo["classes"] if c["name"] == "PropertyCrimeReport")
+    assert report["has_equivalents"] is True
+    assert etag.startswith('"') and etag.endswith('"')
+
+def test_catalogo_clases_se_construye_una_vez(traversal):
+    body, etag = traversal.class_catalog()
+    assert traversal.class_catalog()[0] is body
+    assert traversal.class_catalog()[1] == etag
+
+def test_catalogo_clases_se_reconstruye_al_recargar():
+    t = OntologyTraversal(ONTOLOGY_FILE)
+    body, etag = t.class_catalog()
+    t.load_ontology(ONTOLOGY_FILE)
+    body_recargado, etag_recargado = t.class_catalog()
+    assert body_recargado is not body
+    # Misma ontología, mismo contenido: el ETag no cambia
+    assert body_recargado == body and etag_recargado == etag
@@ -0,0 +1,120 @@
+import os
+import pytest
+
+from owl_expression_parser import parse_owl_expression, tokenize, OwlExpressionSyntaxError
+from ontology_traversal import OntologyTraversal
+
+ONTOLOGY_FILE = os.path.join(os.path.dirname(__file__), "..", "SCPO_Extended_Ontology_V01R08_AT08Q.owl")
+P = "SCPO_Extended_Ontology_V01R08_AT08Q."
+
+# ------------------------- FIXTURES -------------------------
+
+@pytest.fixture(scope="module")
+def traversal():
+    return OntologyTraversal(ONTOLOGY_FILE)
+
+# ------------------------- TESTS DEL PARSER -------------------------
+
+def test_tokenize_literales_y_tipos():
+    tokens = tokenize("t.d.value('a & b)') | t.d.max(3, <class 'int'>)")
+    assert [t[1] for t in tokens] == ["t.d.value", "(", "'a & b)'", ")", "|", "t.d.max", "(", "3", ",", "<class 'int'>", ")"]
+
+def test_parse_respeta_parentesis_en_conjunciones():
+    arbol = parse_owl_expression("t.Report & t.p.some(t.q.some(t.A) & t.r.some(t.B)) & t.C")
+    assert arbol["kind"] == "and"
+    assert [item["kind"] for item in arbol["items"]] == ["atom", "restriction", "atom"]
+    assert arbol["items"][1]["target"]["kind"] == "and"
+
+def test_parse_disyuncion_anidada():
+    arbol = parse_owl_expression("t.A & (t.B | t.C)")
+    grupo = arbol["items"][1]
+    assert grupo["kind"] == "group"
+    assert grupo["item"]["kind"] == "or"
+    assert [i["raw"] for i in grupo["item"]["items"]] == ["t.B", "t.C"]
+
+def test_parse_cardinalidad_y_datatype():
+    card = parse_owl_expression("t.p.min(2, t.A)")
+    assert card["restriction"] == "min"
+    assert card["cardinality"]["raw"] == "2"
+    assert card["target"]["raw"] == "t.A"
+    dato = parse_owl_expression("t.d.some(ConstrainedDatatype(int, min_exclusive = 3))")
+    assert dato["target"]["kind"] == "datatype"
+
+def test_parse_nombre_que_termina_en_some_no_es_restriccion():
+    assert parse_owl_expression("t.handsome")["kind"] == "atom"
+
+@pytest.mark.parametrize("expresion", ["", "t.A & ", "t.p.some(t.A", "t.A )"])
+def test_parse_expresion_mal_formada(expresion):
+    with pytest.raises(OwlExpressionSyntaxError):
+        parse_owl_expression(expresion)
+
+# ------------------------- TESTS DE LA LISTA PLANA (v5) -------------------------
+
+def test_v5_igual_que_split_sin_anidamiento(traversal):
+    expresion = f"{P}PropertyCrimeReport & Not({P}hasOffenceCharacteristic.some({P}RobberyCharacteristic)) & {P}stolenthing.some({P}stolenBy.some({P}Accused))"
+    assert (traversal.analizar_expresion_owl_simplificada_dict_v5(expresion) ==
+            traversal.analizar_expresion_owl_simplificada_dict_v5_split(expresion))
+
+def test_v5_conjuncion_anidada_mantiene_nivel(traversal):
+    expresion = f"{P}Report & {P}causingInjury.some({P}causedBy.some({P}Accused) & {P}causedTo.some({P}Victim))"
+    niveles = [(e["element"], e["level"]) for e in traversal.analizar_expresion_owl_simplificada_dict_v5(expresion)]
+    assert niveles == [("Report", 0), ("&", 0), ("causingInjury", 0), ("causedBy", 1), ("Accused", 2),
+                       ("&", 1), ("causedTo", 1), ("Victim", 2)]
+
+def test_v5_disyuncion(traversal):
+    elementos = traversal.analizar_expresion_owl_simplificada_dict_v5(f"{P}threatMade.some({P}Threats | {P}Insult)")
+    assert [(e["type"], e["element"], e["level"]) for e in elementos] == [
+        ("object_property", "threatMade", 0), ("entity_object", "Threats", 1),
+        ("operator", "|", 1), ("entity_object", "Insult", 1)]
+
+def test_v5_como_split_para_el_arbol_de_decision(traversal):
+    expresion = f"{P}Report & ({P}threatMade.some({P}Threats | {P}Insult) | {P}Victim) & {P}stolenBy.some({P}Accused)"
+    elementos = traversal.analizar_expresion_owl_simplificada_dict_v5(expresion, como_split=True)
+    assert [(e["type"], e["element"], e["level"]) for e in elementos] == [
+        ("entity_object", "Report", 0), ("operator", "&", 0),
+        ("entity_object", "threatMade.some(Threats | Insult) | Victim", 0), ("operator", "&", 0),
+        ("object_property", "stolenBy", 0), ("entity_object", "Accused", 1)]
+    anidada = traversal.analizar_expresion_owl_simplificada_dict_v5(f"{P}threatMade.some({P}Threats | {P}Insult)",
+                                                                    como_split=True)
+    assert [(e["type"], e["element"], e["level"]) for e in anidada] == [
+        ("object_property", "threatMade", 0), ("entity_object", "Threats | Insult", 1)]
+    # La versión por paréntesis (otra entrada de la caché) no cambia
+    assert any(e["element"] == "|" for e in traversal.analizar_expresion_owl_simplificada_dict_v5(expresion))
+    # Conjunción anidada: el '&' y el término siguiente vuelven al nivel inicial, como con split('&')
+    conjuncion = f"{P}Report & {P}causingInjury.some({P}causedBy.some({P}Accused) & {P}causedTo.some({P}Victim))"
+    niveles = [(e["element"], e["level"]) for e in
+               traversal.analizar_expresion_owl_simplificada_dict_v5(conjuncion, como_split=True)]
+    assert niveles == [("Report", 0), ("&", 0), ("causingInjury", 0), ("causedBy", 1), ("Accused", 2),
+                       ("&", 0), ("causedTo", 0), ("Victim", 1)]
+
+# Clases con una conjunción anidada en una restricción: solo en ellas los niveles por paréntesis
+# difieren de los de split('&')
+CONJUNCIONES_ANIDADAS = {
+    "InjuryCrimeReport", "Article169_1_1", "Article169_2", "Article170", "Article171", "CoercionCrimeReport",
+    "DamageCrimeReport", "AssaultingEmergencyWorkerCrime_a", "AssaultingEmergencyWorkerCrime_b",
+    "AssaultingEmergencyWorkerCrime_c"
+}
+
+def test_v5_igual_que_split_en_toda_la_ontologia(traversal):
+    distintas = set()
+    expresiones = 0
+    for cls in traversal.ontology.classes():
+        for eq in cls.equivalent_to:
+            expresiones += 1
+            expresion = str(eq)
+            split = traversal.analizar_expresion_owl_simplificada_dict_v5_split(expresion)
+            # El formato del árbol de decisión es siempre el de split('&')
+            assert traversal.analizar_expresion_owl_simplificada_dict_v5(expresion, como_split=True) == split, cls.name
+            if traversal.analizar_expresion_owl_simplificada_dict_v5(expresion) != split:
+                distintas.add(cls.name)
+    assert expresiones == 116
+    assert distintas == CONJUNCIONES_ANIDADAS
+
+def test_v5_cache_devuelve_copias(traversal):
+    expresion = f"{P}Report & {P}threatMade.some({P}Threats)"
+    primero = traversal.analizar_expresion_owl_simplificada_dict_v5(expresion)
+    primero[2]["range"].append("Modificado")
+    hits = traversal.expression_cache_stats()["hits"]
+    segundo = traversal.analizar_expresion_owl_simplificada_dict_v5(expresion)
+    assert traversal.expression_cache_stats()["hits"] == hits + 1
+    assert segundo[2]["range"] == ["Threats"]
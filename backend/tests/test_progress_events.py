@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import time
+
+import decisionTree
+import llm_cache
+import progress_events
+from progress_events import CanalProgreso, formato_sse
+
+# ------------------------- FIXTURES -------------------------
+
+def recoger(canal, ultimo_id=0, keepalive=5):
+    async def todos():
+        return [evento async for evento in canal.suscribir(ultimo_id, keepalive)]
+    return asyncio.run(todos())
+
+# ------------------------- TESTS DEL CANAL -------------------------
+
+def test_historico_y_reanudacion_con_last_event_id():
+    canal = CanalProgreso("t")
+    canal.publicar("ley", {"ley": "PropertyCrimeReport"})
+    canal.publicar("clase", {"clase": "TheftReport", "objetos": []})
+    canal.cerrar()
+    canal.publicar("clase", {"clase": "Ignorada"})
+    assert [(i, tipo) for i, tipo, _ in recoger(canal)] == [(1, "ley"), (2, "clase")]
+    assert [json.loads(datos)["clase"] for _, _, datos in recoger(canal, ultimo_id=1)] == ["TheftReport"]
+
+def test_eventos_publicados_desde_otro_hilo_segun_se_producen():
+    canal = CanalProgreso("t")
+    canal.publicar("ley", {"ley": "L"})
+
+    def tarea():
+        time.sleep(0.05)
+        canal.publicar("clase", {"clase": "A"})
+        time.sleep(0.05)
+        canal.cerrar()
+
+    threading.Thread(target=tarea).start()
+    eventos = recoger(canal, keepalive=0.02)
+    assert [evento[1] for evento in eventos if evento] == ["ley", "clase"]
+    assert None in eventos  # keepalive mientras la tarea no publica
+
+def test_los_datos_se_serializan_al_publicar():
+    canal = CanalProgreso("t")
+    entidad = {"nombre": "Movil", "dominios": ["Property"]}
+    canal.publicar("clase", {"entidades": [entidad]})
+    entidad["dominios"][0] = "StolenObject"
+    canal.cerrar()
+    assert json.loads(recoger(canal)[0][2]) == {"entidades": [{"nombre": "Movil", "dominios": ["Property"]}]}
+
+def test_formato_sse():
+    assert formato_sse((3, "clase", '{"a": 1}')) == 'id: 3\nevent: clase\ndata: {"a": 1}\n\n'
+    assert formato_sse(None) == ": keepalive\n\n"
+
+def test_registro_de_canales():
+    canal = progress_events.crear_canal("tarea-prueba")
+    assert progress_events.canal("tarea-prueba") is canal
+    assert progress_events.canal("no-existe") is None
+
+# ------------------------- TESTS DEL ANÁLISIS -------------------------
+
+def test_analizar_atestado_avisa_del_progreso(monkeypatch, traversal, cliente_simulado):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(decisionTree, "client", cliente_simulado())
+    eventos = []
+    atestado_llm = decisionTree.AtestadoLLM("Atestado de prueba", modo=decisionTree.MODO_INDEPENDIENTE)
+    resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                              max_in_flight=1, progreso=lambda tipo, datos: eventos.append((tipo, datos)))
+    analisis = resultado["respuestas"][0]["analisis"]
+    tipos = [tipo for tipo, _ in eventos]
+    assert tipos == ["ley"] + ["clase"] * len(analisis) + ["ley_completada"]
+    clases = [datos for tipo, datos in eventos if tipo == "clase"]
+    assert [c["clase"] for c in clases] == [a["nombre"] for a in analisis]
+    assert [(c["existe"], c["excluido"], c["profundidad"]) for c in clases] == \
+        [(a["existe"], a["excluido"], a["profundidad"]) for a in analisis]
+    # Las llamadas de cada paso suman las del análisis completo
+    assert sum(c["llm"]["llamadas"] for c in clases) == resultado["llm"]["llamadas"] > 0
+    assert sum(c["llm"]["prompt_tokens"] or 0 for c in clases) == resultado["llm"]["prompt_tokens"]
+    assert eventos[-1][1]["clases"] == len(analisis)
+
+def test_un_error_del_receptor_no_interrumpe_el_analisis(monkeypatch, traversal, cliente_simulado):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(decisionTree, "client", cliente_simulado())
+
+    def falla(tipo, datos):
+        raise RuntimeError("cliente desconectado")
+
+    atestado_llm = decisionTree.AtestadoLLM("Atestado de prueba", modo=decisionTree.MODO_INDEPENDIENTE)
+    resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                              max_in_flight=1, progreso=falla)
+    assert "error" not in resultado and resultado["respuestas"][0]["analisis"]
@@ -0,0 +1,64 @@
+import json
+import pytest
+
+import decisionTree
+
+# ------------------------- FIXTURES -------------------------
+
+class LLMSimulado(decisionTree.AtestadoLLM):
+    """Responde con 'responder' a las preguntas sueltas y a las compuestas (una respuesta por campo 'pregunta_<i>')."""
+
+    def __init__(self, responder, omitir=()):
+        super().__init__("Atestado de prueba", modo=decisionTree.MODO_INDEPENDIENTE)
+        self.responder = responder
+        self.llamadas = []
+        self.omitir = omitir
+
+    def preguntar_llm(self, pregunta, llm_model, output_schema, contexto_previo=None):
+        self.llamadas.append(pregunta)
+        campos = (output_schema or {}).get("properties", {})
+        if not all(campo.startswith("pregunta_") for campo in campos):
+            return json.dumps(self.responder(pregunta, output_schema))
+        partes = pregunta.split("\n\n### ")[1:]
+        return json.dumps({campo: self.responder(parte.split("\n", 1)[1], campos[campo])
+                           for parte in partes for campo in [parte.split("\n", 1)[0]] if campo not in self.omitir})
+
+ESQUEMA = {"type": "object", "properties": {"respuesta": {"type": "array", "items": {"type": "string"}}},
+           "required": ["respuesta"], "additionalProperties": False}
+
+# ------------------------- TESTS DE PREGUNTAR_LOTE -------------------------
+
+def test_lote_esquema_compuesto_y_separacion(responder):
+    llm = LLMSimulado(responder)
+    respuestas = decisionTree.preguntar_lote(llm, [("¿A?", ESQUEMA), ("¿B?", ESQUEMA)], "m")
+    assert len(llm.llamadas) == 1
+    assert "### pregunta_0\n¿A?" in llm.llamadas[0] and "### pregunta_1\n¿B?" in llm.llamadas[0]
+    assert [json.loads(r) for r in respuestas] == [responder("¿A?", ESQUEMA), responder("¿B?", ESQUEMA)]
+
+def test_lote_repite_sola_la_pregunta_sin_respuesta(responder):
+    llm = LLMSimulado(responder, omitir=("pregunta_1",))
+    respuestas = decisionTree.preguntar_lote(llm, [("¿A?", ESQUEMA), ("¿B?", ESQUEMA)], "m")
+    assert llm.llamadas[1:] == ["¿B?"]
+    assert json.loads(respuestas[1]) == responder("¿B?", ESQUEMA)
+
+def test_sin_lotes_no_agrupa(monkeypatch, responder):
+    monkeypatch.setattr(decisionTree, "LLM_BATCH_SIZE", 1)
+    pregunta = {"extracción_objetos": {"default-llm": "¿Quién robó $_elemento?"}, "formato_extraccion": ESQUEMA}
+    assert decisionTree.preguntar_elementos_en_lote(LLMSimulado(responder), pregunta, "m", ["a", "b"]) == {}
+
+# ------------------------- TESTS DEL ÁRBOL DE DECISIÓN -------------------------
+
+@pytest.mark.parametrize("max_in_flight", [1, 4])
+def test_analisis_por_lotes_igual_que_pregunta_a_pregunta(traversal, responder, monkeypatch, max_in_flight):
+    monkeypatch.setattr(decisionTree, "LLM_BATCH_SIZE", 1)
+    individual = LLMSimulado(responder)
+    esperado = decisionTree.analizarAtestado(individual, "atestado", ["PropertyCrimeReport"], traversal, max_in_flight=1)
+    assert "error" not in esperado
+
+    monkeypatch.setattr(decisionTree, "LLM_BATCH_SIZE", 8)
+    lotes = LLMSimulado(responder)
+    obtenido = decisionTree.analizarAtestado(lotes, "atestado", ["PropertyCrimeReport"], traversal, max_in_flight=max_in_flight)
+    esperado.pop("llm"), obtenido.pop("llm")
+    assert json.dumps(obtenido, default=str) == json.dumps(esperado, default=str)
+    if max_in_flight == 1:
+        assert len(lotes.llamadas) < len(individual.llamadas)
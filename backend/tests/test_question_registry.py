@@ -0,0 +1,78 @@
+import json
+import os
+import pytest
+
+import decisionTree
+from question_registry import RegistroPreguntas, fichero_preguntas, registro_de
+
+# ------------------------- FIXTURES -------------------------
+
+PREGUNTAS = {
+    "TheftReport": {
+        "preguntas": [
+            {"elemento": "hasStolenObject", "extracción_objetos": {"default-llm": "¿Qué se robó?"}},
+            {"elemento": "hasStolenObject", "extracción_objetos": {"default-llm": "Duplicada"}},
+            {"elemento": "hasVictim", "extracción_objetos": {"default-llm": "¿Quién es la víctima?"}}
+        ]
+    }
+}
+
+@pytest.fixture
+def ruta(tmp_path):
+    ruta = tmp_path / "preguntas_extendido.json"
+    ruta.write_text(json.dumps(PREGUNTAS), encoding="utf-8")
+    return str(ruta)
+
+def _clase_data(ruta):
+    return {"seeAlso": [f"file://{ruta}#TheftReport"]}
+
+# ------------------------- TESTS DEL REGISTRO -------------------------
+
+def test_fichero_preguntas_desde_see_also(ruta):
+    assert fichero_preguntas(_clase_data(ruta)) == ruta
+    assert fichero_preguntas({"seeAlso": ["sin_fragmento"]}) is None
+
+def test_carga_una_vez_e_indexa_por_clase_y_elemento(ruta):
+    registro = RegistroPreguntas()
+    fichero = registro.fichero(ruta)
+    assert registro.fichero(ruta) is fichero
+    assert fichero.pregunta("TheftReport", "hasStolenObject")["extracción_objetos"]["default-llm"] == "¿Qué se robó?"
+    assert fichero.pregunta("TheftReport", "hasOwner") is None
+    assert (registro.cargas, registro.recargas, registro.consultas) == (1, 0, 2)
+
+def test_vistas_de_solo_lectura(ruta):
+    detalles = RegistroPreguntas().detalles("TheftReport", _clase_data(ruta))
+    with pytest.raises(TypeError):
+        detalles["preguntas"] = []
+    with pytest.raises(TypeError):
+        detalles["preguntas"][0]["elemento"] = "otro"
+
+def test_recarga_si_cambia_el_fichero(ruta):
+    registro = RegistroPreguntas()
+    assert registro.detalles("Otra", _clase_data(ruta)) is None
+    modificado = dict(PREGUNTAS, Otra={"preguntas": []})
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(modificado, f)
+    mtime = os.path.getmtime(ruta) + 10
+    os.utime(ruta, (mtime, mtime))
+    assert registro.detalles("Otra", _clase_data(ruta)) == {"preguntas": ()}
+    assert (registro.cargas, registro.recargas) == (1, 1)
+
+def test_fichero_inexistente(tmp_path):
+    assert RegistroPreguntas().fichero(str(tmp_path / "no_existe.json")) is None
+
+def test_un_registro_por_traversal():
+    class Traversal:
+        pass
+    a, b = Traversal(), Traversal()
+    assert registro_de(a) is registro_de(a)
+    assert registro_de(a) is not registro_de(b)
+    assert registro_de(None) is registro_de()
+
+def test_recuperar_contexto_usa_el_registro(ruta):
+    class Traversal:
+        pass
+    traversal = Traversal()
+    detalles = decisionTree.recuperarContexto("TheftReport", _clase_data(ruta), traversal)
+    assert decisionTree.recuperarContexto("TheftReport", _clase_data(ruta), traversal) is detalles
+    assert registro_de(traversal).cargas == 1
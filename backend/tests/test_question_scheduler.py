@@ -0,0 +1,266 @@
+import json
+import threading
+import time
+import pytest
+
+import decisionTree
+import llm_cache
+import llm_client
+from llm_client import LLMClient
+from question_scheduler import PlanificadorPreguntas, RamaEspeculativa
+
+# ------------------------- FIXTURES -------------------------
+
+class LLMSimulado(decisionTree.AtestadoLLM):
+    """Responde con 'responder', con una pequeña latencia; cuenta llamadas simultáneas."""
+
+    def __init__(self, responder, latencia=0.005):
+        super().__init__("Atestado de prueba", modo=decisionTree.MODO_INDEPENDIENTE)
+        self.responder = responder
+        self.latencia = latencia
+        self.preguntas = []
+        self.en_curso = 0
+        self.pico = 0
+        self._contador = threading.Lock()
+
+    def preguntar_llm(self, pregunta, llm_model, output_schema, contexto_previo=None):
+        with self._contador:
+            self.preguntas.append(pregunta)
+            self.en_curso += 1
+            self.pico = max(self.pico, self.en_curso)
+        time.sleep(self.latencia)
+        with self._contador:
+            self.en_curso -= 1
+        return json.dumps(self.responder(pregunta, output_schema))
+
+@pytest.fixture()
+def analizar_con_cliente(monkeypatch, traversal, cliente_simulado):
+    """Análisis con el AtestadoLLM real (construye los mensajes) y el cliente simulado."""
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm_client, "_default_client", LLMClient())
+
+    def analizar(modo, max_in_flight, **kwargs):
+        cliente = cliente_simulado(latencia=0.001)
+        monkeypatch.setattr(decisionTree, "client", cliente)
+        atestado_llm = decisionTree.AtestadoLLM("Atestado de prueba", modo=modo)
+        resultado = decisionTree.analizarAtestado(atestado_llm, "atestado", ["PropertyCrimeReport"], traversal,
+                                                  max_in_flight=max_in_flight, **kwargs)
+        assert "error" not in resultado
+        return resultado, cliente, atestado_llm
+
+    return analizar
+
+def _plan(nombre, padre):
+    return {"nombre": nombre, "clase_data": {"dfs_extended_info": {"parent": padre}}}
+
+# ------------------------- TESTS DEL PLANIFICADOR -------------------------
+
+def test_planificador_comparte_llamadas_iguales(responder):
+    llm = LLMSimulado(responder)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=4)
+    anticipada = planificador.lanzar("p", "m", {"type": "object"})
+    assert planificador.lanzar("p", "m", {"type": "object"}) is anticipada
+    planificador.respuesta("p", "m", {"type": "object"})
+    planificador.lanzar("otra", "m", {"type": "object"}).result()
+    estadisticas = planificador.cerrar()
+    assert llm.preguntas == ["p", "otra"]
+    assert (estadisticas["llamadas"], estadisticas["usadas"], estadisticas["descartadas"]) == (2, 1, 1)
+
+def test_planificador_respeta_max_in_flight(responder):
+    llm = LLMSimulado(responder, latencia=0.02)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=3)
+    futuros = [planificador.lanzar(f"p{i}", "m", {}) for i in range(10)]
+    for futuro in futuros:
+        futuro.result()
+    planificador.cerrar()
+    assert llm.pico == 3
+
+def test_planificador_no_anticipa_hijas_de_clases_inexistentes(responder):
+    planificador = PlanificadorPreguntas(LLMSimulado(responder), max_in_flight=2)
+    recorridas = []
+    terminado = threading.Event()
+    planes = [_plan("Raiz", None), _plan("Existe", "Raiz"), _plan("NoExiste", "Raiz"),
+              _plan("HijaDeExiste", "Existe"), _plan("HijaDeNoExiste", "NoExiste")]
+
+    def anticipar(consulta, plan_clase, estado):
+        recorridas.append((plan_clase["nombre"], list(estado)))
+        if len(recorridas) == 4:
+            terminado.set()
+        if plan_clase["nombre"] == "NoExiste":
+            return None
+        return estado + [plan_clase["nombre"]]
+
+    planificador.anticipar_clases(planes, anticipar, [])
+    assert terminado.wait(5)
+    time.sleep(0.05)
+    planificador.cerrar()
+    assert sorted(recorridas) == [("Existe", ["Raiz"]), ("HijaDeExiste", ["Raiz", "Existe"]),
+                                  ("NoExiste", ["Raiz"]), ("Raiz", [])]
+
+def test_especulacion_cancela_las_hijas_de_un_padre_inexistente(responder):
+    llm = LLMSimulado(responder, latencia=0.05)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=1, presupuesto_especulativo=10, preguntas_especulativas=2)
+    raiz_lanzada, hija_terminada = threading.Event(), threading.Event()
+
+    def anticipar(consulta, plan_clase, estado):
+        if plan_clase["nombre"] == "Raiz":
+            # La hija lanza sus preguntas mientras la del padre ocupa el único hueco del pool
+            consulta.anticipar("raiz", "m", {})
+            raiz_lanzada.set()
+            hija_terminada.wait(5)
+            return None
+        raiz_lanzada.wait(5)
+        try:
+            for pregunta in ("h1", "h2", "h3"):
+                consulta.anticipar(pregunta, "m", {})
+        finally:
+            hija_terminada.set()
+
+    planificador.anticipar_clases([_plan("Raiz", None), _plan("Hija", "Raiz")], anticipar, [])
+    assert hija_terminada.wait(5)
+    time.sleep(0.1)
+    especulacion = planificador.cerrar()["especulacion"]
+    assert llm.preguntas == ["raiz"]
+    assert especulacion == {"presupuesto": 10, "lanzadas": 2, "utiles": 0, "desperdiciadas": 0,
+                            "canceladas": 2, "ramas_descartadas": 1}
+
+def test_especulacion_respeta_el_presupuesto_y_cuenta_las_utiles(responder):
+    llm = LLMSimulado(responder)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=2, presupuesto_especulativo=1, preguntas_especulativas=5)
+    lanzadas = []
+    terminado = threading.Event()
+
+    def anticipar(consulta, plan_clase, estado):
+        if plan_clase["nombre"] == "Raiz":
+            return estado
+        if consulta.rama is None:
+            return estado
+        try:
+            for pregunta in ("h1", "h2"):
+                consulta.anticipar(pregunta, "m", {})
+                lanzadas.append(pregunta)
+        finally:
+            terminado.set()
+
+    planificador.anticipar_clases([_plan("Raiz", None), _plan("Hija", "Raiz")], anticipar, [])
+    assert terminado.wait(5)
+    planificador.respuesta("h1", "m", {})
+    especulacion = planificador.cerrar()["especulacion"]
+    assert lanzadas == ["h1"]
+    assert (especulacion["lanzadas"], especulacion["utiles"], especulacion["desperdiciadas"]) == (1, 1, 0)
+
+def test_descartar_una_rama_mientras_el_definitivo_reclama_su_pregunta(responder):
+    llm = LLMSimulado(responder, latencia=0.05)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=1, presupuesto_especulativo=5, preguntas_especulativas=5)
+    rama = RamaEspeculativa("Hija", "Raiz")
+    planificador.lanzar("ocupa", "m", {})  # la pregunta de la rama queda en cola, sin empezar
+    planificador.lanzar("h1", "m", {}, rama=rama)
+    lanzar = planificador.lanzar
+
+    def lanzar_y_descartar(*args, **kwargs):
+        # La rama se descarta justo después de que el recorrido definitivo obtenga la llamada
+        futuro = lanzar(*args, **kwargs)
+        planificador._descartar_rama(rama)
+        return futuro
+
+    planificador.lanzar = lanzar_y_descartar
+    assert planificador.respuesta("h1", "m", {}) == json.dumps(responder("h1", {}))
+    especulacion = planificador.cerrar()["especulacion"]
+    assert (especulacion["utiles"], especulacion["canceladas"]) == (1, 0)
+
+def test_rama_descartada_y_recorrido_definitivo_con_la_misma_pregunta(responder):
+    llm = LLMSimulado(responder, latencia=0.05)
+    planificador = PlanificadorPreguntas(llm, max_in_flight=1, presupuesto_especulativo=5, preguntas_especulativas=5)
+    lanzada = threading.Event()
+    respuestas = []
+
+    def anticipar(consulta, plan_clase, estado):
+        if plan_clase["nombre"] == "Raiz":
+            consulta.anticipar("raiz", "m", {})
+            lanzada.wait(5)
+            # El padre no existe cuando el recorrido definitivo ya espera la pregunta de la hija
+            while not planificador._usadas:
+                time.sleep(0.001)
+            return None
+        consulta.anticipar("comun", "m", {})
+        lanzada.set()
+
+    planificador.anticipar_clases([_plan("Raiz", None), _plan("Hija", "Raiz")], anticipar, [])
+    assert lanzada.wait(5)
+    definitivo = threading.Thread(target=lambda: respuestas.append(planificador.respuesta("comun", "m", {})))
+    definitivo.start()
+    definitivo.join(5)
+    especulacion = planificador.cerrar()["especulacion"]
+    assert respuestas == [json.dumps(responder("comun", {}))]
+    assert llm.preguntas.count("comun") == 1
+    assert (especulacion["ramas_descartadas"], especulacion["utiles"], especulacion["canceladas"]) == (1, 1, 0)
+
+def test_planificador_cerrado_no_lanza_llamadas(responder):
+    planificador = PlanificadorPreguntas(LLMSimulado(responder), max_in_flight=2)
+    planificador.cerrar()
+    with pytest.raises(Exception):
+        planificador.lanzar("p", "m", {})
+
+# ------------------------- TESTS DEL ÁRBOL DE DECISIÓN -------------------------
+
+def test_analisis_concurrente_igual_que_secuencial(traversal, responder):
+    secuencial = LLMSimulado(responder)
+    esperado = decisionTree.analizarAtestado(secuencial, "atestado", ["PropertyCrimeReport"], traversal,
+                                             max_in_flight=1)
+    assert "error" not in esperado
+    concurrente = LLMSimulado(responder)
+    obtenido = decisionTree.analizarAtestado(concurrente, "atestado", ["PropertyCrimeReport"], traversal, max_in_flight=4)
+    assert json.dumps(obtenido, default=str) == json.dumps(esperado, default=str)
+    assert 1 < concurrente.pico <= 4
+
+def test_analisis_concurrente_propaga_errores_del_llm(traversal, responder):
+    class LLMCaido(LLMSimulado):
+        def preguntar_llm(self, pregunta, llm_model, output_schema, contexto_previo=None):
+            raise RuntimeError("Error llamando a llm")
+
+    resultado = decisionTree.analizarAtestado(LLMCaido(responder), "atestado", ["PropertyCrimeReport"], traversal,
+                                              max_in_flight=4)
+    assert resultado == {"error": "Error llamando a llm"}
+
+def test_analisis_especulativo_igual_que_secuencial(traversal, responder):
+    esperado = decisionTree.analizarAtestado(LLMSimulado(responder), "atestado", ["PropertyCrimeReport"], traversal,
+                                             max_in_flight=1)
+    obtenido = decisionTree.analizarAtestado(LLMSimulado(responder), "atestado", ["PropertyCrimeReport"], traversal,
+                                             max_in_flight=4, presupuesto_especulativo=20)
+    especulacion = obtenido.pop("especulacion")["PropertyCrimeReport"]
+    assert json.dumps(obtenido, default=str) == json.dumps(esperado, default=str)
+    assert 0 < especulacion["lanzadas"] <= 20
+    assert especulacion["utiles"] + especulacion["desperdiciadas"] + especulacion["canceladas"] <= especulacion["lanzadas"]
+
+def test_modo_historial_envia_los_mismos_mensajes_que_el_secuencial(analizar_con_cliente):
+    _, secuencial, llm_secuencial = analizar_con_cliente(decisionTree.MODO_HISTORIAL, 1)
+    _, concurrente, llm_concurrente = analizar_con_cliente(decisionTree.MODO_HISTORIAL, 4)
+    assert concurrente.envios == secuencial.envios
+    assert llm_concurrente.mensajes == llm_secuencial.mensajes
+    with pytest.raises(ValueError):
+        PlanificadorPreguntas(decisionTree.AtestadoLLM("Atestado de prueba", modo=decisionTree.MODO_HISTORIAL), max_in_flight=4)
+
+def test_modo_independiente_concurrente_envia_los_mensajes_del_secuencial(analizar_con_cliente):
+    esperado, secuencial, _ = analizar_con_cliente(decisionTree.MODO_INDEPENDIENTE, 1)
+    obtenido, concurrente, llm_concurrente = analizar_con_cliente(decisionTree.MODO_INDEPENDIENTE, 4)
+    assert obtenido["respuestas"] == esperado["respuestas"]
+    # Cada llamada del secuencial se hace igual (las anticipadas descartadas pueden sumar otras)
+    assert set(secuencial.envios) <= set(concurrente.envios)
+    assert len(llm_concurrente.mensajes) == 1
+
+def test_las_respuestas_especulativas_no_entran_en_el_historial(analizar_con_cliente):
+    # Modo historial: sin especulación (recorrido secuencial), mismos mensajes e historial
+    _, secuencial, llm_secuencial = analizar_con_cliente(decisionTree.MODO_HISTORIAL, 1)
+    obtenido, especulativo, llm_especulativo = analizar_con_cliente(decisionTree.MODO_HISTORIAL, 4,
+                                                                    presupuesto_especulativo=20)
+    assert "especulacion" not in obtenido
+    assert especulativo.envios == secuencial.envios
+    assert llm_especulativo.mensajes == llm_secuencial.mensajes
+    # Modo independiente: las ramas especulativas no escriben en el historial ni cambian lo enviado
+    esperado, secuencial, _ = analizar_con_cliente(decisionTree.MODO_INDEPENDIENTE, 1)
+    obtenido, especulativo, llm_especulativo = analizar_con_cliente(decisionTree.MODO_INDEPENDIENTE, 4,
+                                                                    presupuesto_especulativo=20)
+    assert obtenido.pop("especulacion")["PropertyCrimeReport"]["lanzadas"] > 0
+    assert obtenido["respuestas"] == esperado["respuestas"]
+    assert set(secuencial.envios) <= set(especulativo.envios)
+    assert len(llm_especulativo.mensajes) == 1